@@ -16,21 +16,28 @@ def get_or_create_voucher_number(organization, voucher_type, voucher_date=None):
     """
     Generate next voucher number for the given type and financial year.
     """
-    from .models import VoucherNumberSeries, FinancialYear
+    # Generate next number
+    return get_voucher_number_series(organization, voucher_type, voucher_date).get_next_number()
 
-    voucher_date = voucher_date or date.today()
 
-    # Determine financial year (April to March)
+def financial_year_name(voucher_date):
+    """Indian financial year (April to March) of a date, e.g. "2025-26"."""
     if voucher_date.month >= 4:
-        fy_name = f"{voucher_date.year}-{str(voucher_date.year + 1)[2:]}"
-    else:
-        fy_name = f"{voucher_date.year - 1}-{str(voucher_date.year)[2:]}"
+        return f"{voucher_date.year}-{str(voucher_date.year + 1)[2:]}"
+    return f"{voucher_date.year - 1}-{str(voucher_date.year)[2:]}"
+
+
+def get_voucher_number_series(organization, voucher_type, voucher_date=None):
+    """
+    Get or create the number series for the given type and the financial
+    year of voucher_date.
+    """
+    from .models import VoucherNumberSeries
 
-    # Get or create number series
     series, created = VoucherNumberSeries.objects.get_or_create(
         organization=organization,
         voucher_type=voucher_type,
-        financial_year=fy_name,
+        financial_year=financial_year_name(voucher_date or date.today()),
         defaults={
             'prefix': f"{voucher_type.upper()[:3]}/",
             'starting_number': 1,
@@ -38,9 +45,7 @@ def get_or_create_voucher_number(organization, voucher_type, voucher_date=None):
             'number_width': 4
         }
     )
-
-    # Generate next number
-    return series.get_next_number()
+    return series
 
 
 def get_system_ledger(organization, account_code):
@@ -83,6 +88,195 @@ def get_supplier_ledger(organization, supplier):
     ).first()
 
 
+# System ledgers used by the sales and purchase vouchers
+SALES_LEDGER_CODES = ('SALES', 'OUTPUT_CGST', 'OUTPUT_SGST', 'OUTPUT_IGST', 'ROUND_OFF')
+PURCHASE_LEDGER_CODES = ('PURCHASE', 'INPUT_CGST', 'INPUT_SGST', 'INPUT_IGST', 'ROUND_OFF')
+
+# Payment methods received into / paid from a bank account (others use Cash)
+BANK_PAYMENT_METHODS = ('bank_transfer', 'cheque', 'upi', 'card')
+
+# ExpensePayment categories mapped to expense ledger names
+EXPENSE_CATEGORY_LEDGERS = {
+    'salary': 'Salary & Wages',
+    'rent': 'Rent',
+    'utilities': 'Electricity Charges',
+    'office': 'Office Expenses',
+    'travel': 'Travelling Expenses',
+    'professional': 'Office Expenses',  # Map to Office Expenses
+    'maintenance': 'Office Expenses',
+    'communication': 'Telephone Charges',
+    'insurance': 'Office Expenses',
+    'taxes': 'Round Off',  # For misc taxes
+    'bank_charges': 'Bank Charges',
+    'general': 'Office Expenses',
+    'other': 'Office Expenses',
+}
+
+
+class LedgerCache:
+    """
+    All active ledgers of an organization, loaded in one query, answering
+    the same lookups as get_system_ledger(), get_client_ledger(),
+    get_supplier_ledger(), get_bank_cash_ledger_from_method() and
+    get_expense_ledger_from_category() from memory. Used when creating
+    vouchers in bulk.
+    """
+
+    def __init__(self, organization):
+        from .models import LedgerAccount
+
+        self.by_code = {}
+        self.by_name = {}
+        self.by_client = {}
+        self.by_supplier = {}
+        self.by_type = {}
+        # Same order as the single lookups' .first(), keeping the first match
+        for ledger in LedgerAccount.objects.filter(organization=organization, is_active=True).order_by(
+            'group__sequence', 'name'
+        ):
+            self.by_code.setdefault(ledger.account_code, ledger)
+            self.by_name.setdefault(ledger.name, ledger)
+            self.by_type.setdefault(ledger.account_type, ledger)
+            if ledger.linked_client_id:
+                self.by_client.setdefault(ledger.linked_client_id, ledger)
+            if ledger.linked_supplier_id:
+                self.by_supplier.setdefault(ledger.linked_supplier_id, ledger)
+
+    def system(self, account_code):
+        return self.by_code.get(account_code)
+
+    def system_ledgers(self, account_codes):
+        return {code: self.by_code.get(code) for code in account_codes}
+
+    def client(self, client_id):
+        return self.by_client.get(client_id)
+
+    def supplier(self, supplier_id):
+        return self.by_supplier.get(supplier_id)
+
+    def bank_cash(self, payment_method):
+        if payment_method in BANK_PAYMENT_METHODS:
+            return self.by_type.get('bank') or self.system('CASH')
+        return self.system('CASH')
+
+    def expense(self, category):
+        ledger_name = EXPENSE_CATEGORY_LEDGERS.get(category, 'Office Expenses')
+        return self.by_name.get(ledger_name) or self.by_type.get('expense')
+
+
+def _system_ledgers(organization, account_codes):
+    return {code: get_system_ledger(organization, code) for code in account_codes}
+
+
+def save_voucher(voucher, entries, post_immediately=True):
+    """
+    Number and save a voucher built by one of the build_*_voucher()
+    functions, save its entries and post it if requested and balanced.
+    """
+    from .models import VoucherEntry
+
+    voucher.voucher_number = get_or_create_voucher_number(
+        voucher.organization, voucher.voucher_type, voucher.voucher_date
+    )
+    voucher.save()
+    for entry in entries:
+        entry.voucher = voucher
+    VoucherEntry.objects.bulk_create(entries)
+
+    if post_immediately and voucher.is_balanced:
+        voucher.post()
+    return voucher
+
+
+def build_sales_voucher(invoice, client_ledger, ledgers):
+    """
+    Unsaved Sales Voucher (without a number) and its entries for an invoice.
+    ledgers maps SALES_LEDGER_CODES to ledger accounts (or None).
+    """
+    from .models import Voucher, VoucherEntry
+
+    voucher = Voucher(
+        organization=invoice.organization,
+        voucher_type='sales',
+        voucher_date=invoice.invoice_date,
+        invoice=invoice,
+        narration=f"Sales Invoice {invoice.invoice_number} to {invoice.client.name}",
+        status='draft'
+    )
+
+    entries = []
+    sequence = 0
+
+    # Debit: Client Account (Grand Total)
+    grand_total = invoice.total_amount or Decimal('0')
+    if grand_total > 0:
+        sequence += 1
+        entries.append(VoucherEntry(
+            ledger_account=client_ledger,
+            debit_amount=grand_total,
+            credit_amount=Decimal('0'),
+            bill_reference=invoice.invoice_number,
+            bill_date=invoice.invoice_date,
+            bill_type='New Ref',
+            particulars=f"Being sales to {invoice.client.name}",
+            sequence=sequence
+        ))
+
+    # Credit: Sales Account (Subtotal / Taxable Value)
+    subtotal = invoice.subtotal or Decimal('0')
+    if subtotal > 0 and ledgers['SALES']:
+        sequence += 1
+        entries.append(VoucherEntry(
+            ledger_account=ledgers['SALES'],
+            debit_amount=Decimal('0'),
+            credit_amount=subtotal,
+            particulars="Sales",
+            sequence=sequence
+        ))
+
+    # Credit: Output CGST / SGST / IGST (IGST for interstate)
+    for code, amount, particulars in (
+        ('OUTPUT_CGST', invoice.cgst_amount, "Output CGST"),
+        ('OUTPUT_SGST', invoice.sgst_amount, "Output SGST"),
+        ('OUTPUT_IGST', invoice.igst_amount, "Output IGST"),
+    ):
+        amount = amount or Decimal('0')
+        if amount > 0 and ledgers[code]:
+            sequence += 1
+            entries.append(VoucherEntry(
+                ledger_account=ledgers[code],
+                debit_amount=Decimal('0'),
+                credit_amount=amount,
+                particulars=particulars,
+                sequence=sequence
+            ))
+
+    # Round Off (can be Dr or Cr)
+    round_off = invoice.round_off or Decimal('0')
+    if round_off != 0 and ledgers['ROUND_OFF']:
+        sequence += 1
+        if round_off > 0:
+            # Round off increased the total (Dr. Client, Cr. Round Off)
+            entries.append(VoucherEntry(
+                ledger_account=ledgers['ROUND_OFF'],
+                debit_amount=Decimal('0'),
+                credit_amount=round_off,
+                particulars="Round Off",
+                sequence=sequence
+            ))
+        else:
+            # Round off decreased the total (Dr. Round Off, Cr. Client)
+            entries.append(VoucherEntry(
+                ledger_account=ledgers['ROUND_OFF'],
+                debit_amount=abs(round_off),
+                credit_amount=Decimal('0'),
+                particulars="Round Off",
+                sequence=sequence
+            ))
+
+    return voucher, entries
+
+
 def create_sales_voucher(invoice, post_immediately=True):
     """
     Create a Sales Voucher for an invoice with proper GST entries.
@@ -102,7 +296,7 @@ def create_sales_voucher(invoice, post_immediately=True):
     Returns:
         Voucher instance or None if creation failed
     """
-    from .models import Voucher, VoucherEntry, LedgerAccount, AccountGroup
+    from .models import Voucher
 
     # Skip if voucher already exists for this invoice
     if Voucher.objects.filter(invoice=invoice, voucher_type='sales').exists():
@@ -127,137 +321,20 @@ def create_sales_voucher(invoice, post_immediately=True):
         return None
 
     # Get system ledger accounts
-    sales_ledger = get_system_ledger(org, 'SALES')
-    output_cgst = get_system_ledger(org, 'OUTPUT_CGST')
-    output_sgst = get_system_ledger(org, 'OUTPUT_SGST')
-    output_igst = get_system_ledger(org, 'OUTPUT_IGST')
-    round_off_ledger = get_system_ledger(org, 'ROUND_OFF')
-
-    if not sales_ledger:
+    ledgers = _system_ledgers(org, SALES_LEDGER_CODES)
+    if not ledgers['SALES']:
         logger.warning(f"Sales ledger not found for org {org.name}, cannot create sales voucher")
         return None
 
     try:
         with transaction.atomic():
-            # Generate voucher number
-            voucher_number = get_or_create_voucher_number(org, 'sales', invoice.invoice_date)
-
-            # Create voucher
-            voucher = Voucher.objects.create(
-                organization=org,
-                voucher_type='sales',
-                voucher_number=voucher_number,
-                voucher_date=invoice.invoice_date,
-                invoice=invoice,
-                narration=f"Sales Invoice {invoice.invoice_number} to {invoice.client.name}",
-                status='draft'
-            )
-
-            entries = []
-            sequence = 0
-
-            # Debit: Client Account (Grand Total)
-            grand_total = invoice.total_amount or Decimal('0')
-            if grand_total > 0:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=client_ledger,
-                    debit_amount=grand_total,
-                    credit_amount=Decimal('0'),
-                    bill_reference=invoice.invoice_number,
-                    bill_date=invoice.invoice_date,
-                    bill_type='New Ref',
-                    particulars=f"Being sales to {invoice.client.name}",
-                    sequence=sequence
-                ))
-
-            # Credit: Sales Account (Subtotal / Taxable Value)
-            subtotal = invoice.subtotal or Decimal('0')
-            if subtotal > 0 and sales_ledger:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=sales_ledger,
-                    debit_amount=Decimal('0'),
-                    credit_amount=subtotal,
-                    particulars="Sales",
-                    sequence=sequence
-                ))
-
-            # Credit: Output CGST
-            cgst = invoice.cgst_amount or Decimal('0')
-            if cgst > 0 and output_cgst:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=output_cgst,
-                    debit_amount=Decimal('0'),
-                    credit_amount=cgst,
-                    particulars="Output CGST",
-                    sequence=sequence
-                ))
-
-            # Credit: Output SGST
-            sgst = invoice.sgst_amount or Decimal('0')
-            if sgst > 0 and output_sgst:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=output_sgst,
-                    debit_amount=Decimal('0'),
-                    credit_amount=sgst,
-                    particulars="Output SGST",
-                    sequence=sequence
-                ))
-
-            # Credit: Output IGST (for interstate)
-            igst = invoice.igst_amount or Decimal('0')
-            if igst > 0 and output_igst:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=output_igst,
-                    debit_amount=Decimal('0'),
-                    credit_amount=igst,
-                    particulars="Output IGST",
-                    sequence=sequence
-                ))
-
-            # Round Off (can be Dr or Cr)
-            round_off = invoice.round_off or Decimal('0')
-            if round_off != 0 and round_off_ledger:
-                sequence += 1
-                if round_off > 0:
-                    # Round off increased the total (Dr. Client, Cr. Round Off)
-                    entries.append(VoucherEntry(
-                        voucher=voucher,
-                        ledger_account=round_off_ledger,
-                        debit_amount=Decimal('0'),
-                        credit_amount=round_off,
-                        particulars="Round Off",
-                        sequence=sequence
-                    ))
-                else:
-                    # Round off decreased the total (Dr. Round Off, Cr. Client)
-                    entries.append(VoucherEntry(
-                        voucher=voucher,
-                        ledger_account=round_off_ledger,
-                        debit_amount=abs(round_off),
-                        credit_amount=Decimal('0'),
-                        particulars="Round Off",
-                        sequence=sequence
-                    ))
-
-            # Bulk create entries
-            VoucherEntry.objects.bulk_create(entries)
-
-            # Post voucher if requested and balanced
-            if post_immediately and voucher.is_balanced:
-                voucher.post()
-                logger.info(f"Created and posted sales voucher {voucher_number} for invoice {invoice.invoice_number}")
+            voucher, entries = build_sales_voucher(invoice, client_ledger, ledgers)
+            save_voucher(voucher, entries, post_immediately)
+
+            if voucher.status == 'posted':
+                logger.info(f"Created and posted sales voucher {voucher.voucher_number} for invoice {invoice.invoice_number}")
             else:
-                logger.info(f"Created sales voucher {voucher_number} for invoice {invoice.invoice_number} (not posted)")
+                logger.info(f"Created sales voucher {voucher.voucher_number} for invoice {invoice.invoice_number} (not posted)")
 
             return voucher
 
@@ -266,6 +343,96 @@ def create_sales_voucher(invoice, post_immediately=True):
         return None
 
 
+def build_purchase_voucher(purchase, supplier_ledger, ledgers):
+    """
+    Unsaved Purchase Voucher (without a number) and its entries for a
+    purchase. ledgers maps PURCHASE_LEDGER_CODES to ledger accounts (or None).
+    """
+    from .models import Voucher, VoucherEntry
+
+    voucher = Voucher(
+        organization=purchase.organization,
+        voucher_type='purchase',
+        voucher_date=purchase.purchase_date,
+        purchase=purchase,
+        narration=f"Purchase {purchase.purchase_number} from {purchase.supplier.name}",
+        status='draft'
+    )
+
+    entries = []
+    sequence = 0
+
+    # Debit: Purchase Account (Subtotal / Taxable Value)
+    subtotal = purchase.subtotal or Decimal('0')
+    if subtotal > 0 and ledgers['PURCHASE']:
+        sequence += 1
+        entries.append(VoucherEntry(
+            ledger_account=ledgers['PURCHASE'],
+            debit_amount=subtotal,
+            credit_amount=Decimal('0'),
+            particulars="Purchase",
+            sequence=sequence
+        ))
+
+    # Debit: Input CGST / SGST / IGST (IGST for interstate)
+    for code, amount, particulars in (
+        ('INPUT_CGST', purchase.cgst_amount, "Input CGST"),
+        ('INPUT_SGST', purchase.sgst_amount, "Input SGST"),
+        ('INPUT_IGST', purchase.igst_amount, "Input IGST"),
+    ):
+        amount = amount or Decimal('0')
+        if amount > 0 and ledgers[code]:
+            sequence += 1
+            entries.append(VoucherEntry(
+                ledger_account=ledgers[code],
+                debit_amount=amount,
+                credit_amount=Decimal('0'),
+                particulars=particulars,
+                sequence=sequence
+            ))
+
+    # Round Off (can be Dr or Cr)
+    round_off = getattr(purchase, 'round_off', None) or Decimal('0')
+    if round_off != 0 and ledgers['ROUND_OFF']:
+        sequence += 1
+        if round_off > 0:
+            # Round off increased the total (Dr. Supplier, Cr. Round Off)
+            entries.append(VoucherEntry(
+                ledger_account=ledgers['ROUND_OFF'],
+                debit_amount=round_off,
+                credit_amount=Decimal('0'),
+                particulars="Round Off",
+                sequence=sequence
+            ))
+        else:
+            # Round off decreased the total
+            entries.append(VoucherEntry(
+                ledger_account=ledgers['ROUND_OFF'],
+                debit_amount=Decimal('0'),
+                credit_amount=abs(round_off),
+                particulars="Round Off",
+                sequence=sequence
+            ))
+
+    # Credit: Supplier Account (Total Amount)
+    # Use total_amount field (not grand_total)
+    total_amount = purchase.total_amount or Decimal('0')
+    if total_amount > 0:
+        sequence += 1
+        entries.append(VoucherEntry(
+            ledger_account=supplier_ledger,
+            debit_amount=Decimal('0'),
+            credit_amount=total_amount,
+            bill_reference=purchase.purchase_number,
+            bill_date=purchase.purchase_date,
+            bill_type='New Ref',
+            particulars=f"Being purchase from {purchase.supplier.name}",
+            sequence=sequence
+        ))
+
+    return voucher, entries
+
+
 def create_purchase_voucher(purchase, post_immediately=True):
     """
     Create a Purchase Voucher for a purchase with proper GST entries.
@@ -285,7 +452,7 @@ def create_purchase_voucher(purchase, post_immediately=True):
     Returns:
         Voucher instance or None if creation failed
     """
-    from .models import Voucher, VoucherEntry
+    from .models import Voucher
 
     # Skip if voucher already exists for this purchase
     if Voucher.objects.filter(purchase=purchase, voucher_type='purchase').exists():
@@ -301,138 +468,20 @@ def create_purchase_voucher(purchase, post_immediately=True):
         return None
 
     # Get system ledger accounts
-    purchase_ledger = get_system_ledger(org, 'PURCHASE')
-    input_cgst = get_system_ledger(org, 'INPUT_CGST')
-    input_sgst = get_system_ledger(org, 'INPUT_SGST')
-    input_igst = get_system_ledger(org, 'INPUT_IGST')
-    round_off_ledger = get_system_ledger(org, 'ROUND_OFF')
-
-    if not purchase_ledger:
+    ledgers = _system_ledgers(org, PURCHASE_LEDGER_CODES)
+    if not ledgers['PURCHASE']:
         logger.warning(f"Purchase ledger not found for org {org.name}, cannot create purchase voucher")
         return None
 
     try:
         with transaction.atomic():
-            # Generate voucher number
-            voucher_number = get_or_create_voucher_number(org, 'purchase', purchase.purchase_date)
-
-            # Create voucher
-            voucher = Voucher.objects.create(
-                organization=org,
-                voucher_type='purchase',
-                voucher_number=voucher_number,
-                voucher_date=purchase.purchase_date,
-                purchase=purchase,
-                narration=f"Purchase {purchase.purchase_number} from {purchase.supplier.name}",
-                status='draft'
-            )
-
-            entries = []
-            sequence = 0
-
-            # Debit: Purchase Account (Subtotal / Taxable Value)
-            subtotal = purchase.subtotal or Decimal('0')
-            if subtotal > 0 and purchase_ledger:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=purchase_ledger,
-                    debit_amount=subtotal,
-                    credit_amount=Decimal('0'),
-                    particulars="Purchase",
-                    sequence=sequence
-                ))
-
-            # Debit: Input CGST
-            cgst = purchase.cgst_amount or Decimal('0')
-            if cgst > 0 and input_cgst:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=input_cgst,
-                    debit_amount=cgst,
-                    credit_amount=Decimal('0'),
-                    particulars="Input CGST",
-                    sequence=sequence
-                ))
-
-            # Debit: Input SGST
-            sgst = purchase.sgst_amount or Decimal('0')
-            if sgst > 0 and input_sgst:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=input_sgst,
-                    debit_amount=sgst,
-                    credit_amount=Decimal('0'),
-                    particulars="Input SGST",
-                    sequence=sequence
-                ))
-
-            # Debit: Input IGST (for interstate)
-            igst = purchase.igst_amount or Decimal('0')
-            if igst > 0 and input_igst:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=input_igst,
-                    debit_amount=igst,
-                    credit_amount=Decimal('0'),
-                    particulars="Input IGST",
-                    sequence=sequence
-                ))
-
-            # Round Off (can be Dr or Cr)
-            round_off = getattr(purchase, 'round_off', None) or Decimal('0')
-            if round_off != 0 and round_off_ledger:
-                sequence += 1
-                if round_off > 0:
-                    # Round off increased the total (Dr. Supplier, Cr. Round Off)
-                    entries.append(VoucherEntry(
-                        voucher=voucher,
-                        ledger_account=round_off_ledger,
-                        debit_amount=round_off,
-                        credit_amount=Decimal('0'),
-                        particulars="Round Off",
-                        sequence=sequence
-                    ))
-                else:
-                    # Round off decreased the total
-                    entries.append(VoucherEntry(
-                        voucher=voucher,
-                        ledger_account=round_off_ledger,
-                        debit_amount=Decimal('0'),
-                        credit_amount=abs(round_off),
-                        particulars="Round Off",
-                        sequence=sequence
-                    ))
-
-            # Credit: Supplier Account (Total Amount)
-            # Use total_amount field (not grand_total)
-            total_amount = purchase.total_amount or Decimal('0')
-            if total_amount > 0:
-                sequence += 1
-                entries.append(VoucherEntry(
-                    voucher=voucher,
-                    ledger_account=supplier_ledger,
-                    debit_amount=Decimal('0'),
-                    credit_amount=total_amount,
-                    bill_reference=purchase.purchase_number,
-                    bill_date=purchase.purchase_date,
-                    bill_type='New Ref',
-                    particulars=f"Being purchase from {purchase.supplier.name}",
-                    sequence=sequence
-                ))
-
-            # Bulk create entries
-            VoucherEntry.objects.bulk_create(entries)
-
-            # Post voucher if requested and balanced
-            if post_immediately and voucher.is_balanced:
-                voucher.post()
-                logger.info(f"Created and posted purchase voucher {voucher_number} for purchase {purchase.purchase_number}")
+            voucher, entries = build_purchase_voucher(purchase, supplier_ledger, ledgers)
+            save_voucher(voucher, entries, post_immediately)
+
+            if voucher.status == 'posted':
+                logger.info(f"Created and posted purchase voucher {voucher.voucher_number} for purchase {purchase.purchase_number}")
             else:
-                logger.info(f"Created purchase voucher {voucher_number} for purchase {purchase.purchase_number} (not posted)")
+                logger.info(f"Created purchase voucher {voucher.voucher_number} for purchase {purchase.purchase_number} (not posted)")
 
             return voucher
 
@@ -451,7 +500,7 @@ def get_bank_cash_ledger_from_method(organization, payment_method):
     # Map payment methods to account types
     if payment_method in ['cash']:
         return get_system_ledger(organization, 'CASH')
-    elif payment_method in ['bank_transfer', 'cheque', 'upi', 'card']:
+    elif payment_method in BANK_PAYMENT_METHODS:
         # Try to find any bank account
         bank_account = LedgerAccount.objects.filter(
             organization=organization,
@@ -466,6 +515,70 @@ def get_bank_cash_ledger_from_method(organization, payment_method):
         return get_system_ledger(organization, 'CASH')
 
 
+def build_receipt_voucher(payment, client_ledger, bank_cash_ledger, tds_ledger=None):
+    """
+    Unsaved Receipt Voucher (without a number) and its entries for a
+    payment against an invoice. tds_ledger is only used when TDS was
+    deducted.
+    """
+    from .models import Voucher, VoucherEntry
+
+    invoice = payment.invoice
+    voucher = Voucher(
+        organization=payment.organization,
+        voucher_type='receipt',
+        voucher_date=payment.payment_date,
+        payment_record=payment,
+        invoice=invoice,
+        narration=f"Receipt from {invoice.client.name} against Invoice {invoice.invoice_number}",
+        status='draft'
+    )
+
+    entries = []
+    # Use amount_received (actual cash/bank receipt) instead of total amount
+    amount = payment.amount_received or payment.amount or Decimal('0')
+
+    # Debit: Bank/Cash Account
+    entries.append(VoucherEntry(
+        ledger_account=bank_cash_ledger,
+        debit_amount=amount,
+        credit_amount=Decimal('0'),
+        particulars=f"Received from {invoice.client.name}",
+        sequence=1
+    ))
+
+    # Credit: Client Account (full amount including TDS)
+    total_amount = payment.amount or Decimal('0')
+    entries.append(VoucherEntry(
+        ledger_account=client_ledger,
+        debit_amount=Decimal('0'),
+        credit_amount=total_amount,
+        bill_reference=invoice.invoice_number,
+        bill_date=invoice.invoice_date,
+        bill_type='Against Ref',
+        particulars=f"Against Invoice {invoice.invoice_number}",
+        sequence=2
+    ))
+
+    # Handle TDS if applicable (Dr. TDS Receivable)
+    tds_amount = receipt_tds_amount(payment)
+    if tds_amount > 0 and tds_ledger:
+        entries.append(VoucherEntry(
+            ledger_account=tds_ledger,
+            debit_amount=tds_amount,
+            credit_amount=Decimal('0'),
+            particulars="TDS Deducted",
+            sequence=3
+        ))
+
+    return voucher, entries
+
+
+def receipt_tds_amount(payment):
+    """Income tax plus GST TDS deducted from a payment."""
+    return (payment.tds_amount or Decimal('0')) + (payment.gst_tds_amount or Decimal('0'))
+
+
 def create_receipt_voucher(payment, post_immediately=True):
     """
     Create a Receipt Voucher when payment is received against an invoice.
@@ -481,7 +594,7 @@ def create_receipt_voucher(payment, post_immediately=True):
     Returns:
         Voucher instance or None if creation failed
     """
-    from .models import Voucher, VoucherEntry
+    from .models import Voucher
 
     # Skip if voucher already exists for this payment
     if Voucher.objects.filter(payment_record=payment, voucher_type='receipt').exists():
@@ -506,72 +619,14 @@ def create_receipt_voucher(payment, post_immediately=True):
 
     try:
         with transaction.atomic():
-            # Generate voucher number
-            voucher_number = get_or_create_voucher_number(org, 'receipt', payment.payment_date)
-
-            # Create voucher
-            voucher = Voucher.objects.create(
-                organization=org,
-                voucher_type='receipt',
-                voucher_number=voucher_number,
-                voucher_date=payment.payment_date,
-                payment_record=payment,
-                invoice=invoice,
-                narration=f"Receipt from {invoice.client.name} against Invoice {invoice.invoice_number}",
-                status='draft'
-            )
-
-            entries = []
-            # Use amount_received (actual cash/bank receipt) instead of total amount
-            amount = payment.amount_received or payment.amount or Decimal('0')
-
-            # Debit: Bank/Cash Account
-            entries.append(VoucherEntry(
-                voucher=voucher,
-                ledger_account=bank_cash_ledger,
-                debit_amount=amount,
-                credit_amount=Decimal('0'),
-                particulars=f"Received from {invoice.client.name}",
-                sequence=1
-            ))
-
-            # Credit: Client Account (full amount including TDS)
-            total_amount = payment.amount or Decimal('0')
-            entries.append(VoucherEntry(
-                voucher=voucher,
-                ledger_account=client_ledger,
-                debit_amount=Decimal('0'),
-                credit_amount=total_amount,
-                bill_reference=invoice.invoice_number,
-                bill_date=invoice.invoice_date,
-                bill_type='Against Ref',
-                particulars=f"Against Invoice {invoice.invoice_number}",
-                sequence=2
-            ))
+            tds_ledger = get_system_ledger(org, 'TDS_RECEIVABLE') if receipt_tds_amount(payment) > 0 else None
+            voucher, entries = build_receipt_voucher(payment, client_ledger, bank_cash_ledger, tds_ledger)
+            save_voucher(voucher, entries, post_immediately)
 
-            # Handle TDS if applicable (Dr. TDS Receivable)
-            tds_amount = (payment.tds_amount or Decimal('0')) + (payment.gst_tds_amount or Decimal('0'))
-            if tds_amount > 0:
-                tds_ledger = get_system_ledger(org, 'TDS_RECEIVABLE')
-                if tds_ledger:
-                    entries.append(VoucherEntry(
-                        voucher=voucher,
-                        ledger_account=tds_ledger,
-                        debit_amount=tds_amount,
-                        credit_amount=Decimal('0'),
-                        particulars="TDS Deducted",
-                        sequence=3
-                    ))
-
-            # Bulk create entries
-            VoucherEntry.objects.bulk_create(entries)
-
-            # Post voucher if requested and balanced
-            if post_immediately and voucher.is_balanced:
-                voucher.post()
-                logger.info(f"Created and posted receipt voucher {voucher_number}")
+            if voucher.status == 'posted':
+                logger.info(f"Created and posted receipt voucher {voucher.voucher_number}")
             else:
-                logger.info(f"Created receipt voucher {voucher_number} (not posted)")
+                logger.info(f"Created receipt voucher {voucher.voucher_number} (not posted)")
 
             return voucher
 
@@ -587,24 +642,7 @@ def get_expense_ledger_from_category(organization, category):
     """
     from .models import LedgerAccount
 
-    # Map categories to ledger names
-    category_to_ledger = {
-        'salary': 'Salary & Wages',
-        'rent': 'Rent',
-        'utilities': 'Electricity Charges',
-        'office': 'Office Expenses',
-        'travel': 'Travelling Expenses',
-        'professional': 'Office Expenses',  # Map to Office Expenses
-        'maintenance': 'Office Expenses',
-        'communication': 'Telephone Charges',
-        'insurance': 'Office Expenses',
-        'taxes': 'Round Off',  # For misc taxes
-        'bank_charges': 'Bank Charges',
-        'general': 'Office Expenses',
-        'other': 'Office Expenses',
-    }
-
-    ledger_name = category_to_ledger.get(category, 'Office Expenses')
+    ledger_name = EXPENSE_CATEGORY_LEDGERS.get(category, 'Office Expenses')
 
     # Try to find the ledger by name
     ledger = LedgerAccount.objects.filter(
@@ -624,6 +662,45 @@ def get_expense_ledger_from_category(organization, category):
     return ledger
 
 
+def build_expense_payment_voucher(expense_payment, expense_ledger, bank_cash_ledger):
+    """
+    Unsaved Payment Voucher (without a number) and its entries for an
+    expense payment.
+    """
+    from .models import Voucher, VoucherEntry
+
+    voucher = Voucher(
+        organization=expense_payment.organization,
+        voucher_type='payment',
+        voucher_date=expense_payment.payment_date,
+        expense_payment=expense_payment,
+        narration=expense_payment.description or f"Payment to {expense_payment.payee_name}",
+        status='draft'
+    )
+
+    amount = expense_payment.amount or Decimal('0')
+    entries = [
+        # Debit: Expense Account
+        VoucherEntry(
+            ledger_account=expense_ledger,
+            debit_amount=amount,
+            credit_amount=Decimal('0'),
+            particulars=expense_payment.description or f"Payment to {expense_payment.payee_name}",
+            sequence=1
+        ),
+        # Credit: Bank/Cash Account
+        VoucherEntry(
+            ledger_account=bank_cash_ledger,
+            debit_amount=Decimal('0'),
+            credit_amount=amount,
+            particulars=f"Paid to {expense_payment.payee_name}",
+            sequence=2
+        ),
+    ]
+
+    return voucher, entries
+
+
 def create_expense_payment_voucher(expense_payment, post_immediately=True):
     """
     Create a Payment Voucher for expense payments.
@@ -639,7 +716,7 @@ def create_expense_payment_voucher(expense_payment, post_immediately=True):
     Returns:
         Voucher instance or None if creation failed
     """
-    from .models import Voucher, VoucherEntry
+    from .models import Voucher
 
     # Skip if voucher already exists
     if Voucher.objects.filter(expense_payment=expense_payment, voucher_type='payment').exists():
@@ -662,52 +739,13 @@ def create_expense_payment_voucher(expense_payment, post_immediately=True):
 
     try:
         with transaction.atomic():
-            # Generate voucher number
-            voucher_number = get_or_create_voucher_number(org, 'payment', expense_payment.payment_date)
-
-            # Create voucher
-            voucher = Voucher.objects.create(
-                organization=org,
-                voucher_type='payment',
-                voucher_number=voucher_number,
-                voucher_date=expense_payment.payment_date,
-                expense_payment=expense_payment,
-                narration=expense_payment.description or f"Payment to {expense_payment.payee_name}",
-                status='draft'
-            )
-
-            entries = []
-            amount = expense_payment.amount or Decimal('0')
-
-            # Debit: Expense Account
-            entries.append(VoucherEntry(
-                voucher=voucher,
-                ledger_account=expense_ledger,
-                debit_amount=amount,
-                credit_amount=Decimal('0'),
-                particulars=expense_payment.description or f"Payment to {expense_payment.payee_name}",
-                sequence=1
-            ))
-
-            # Credit: Bank/Cash Account
-            entries.append(VoucherEntry(
-                voucher=voucher,
-                ledger_account=bank_cash_ledger,
-                debit_amount=Decimal('0'),
-                credit_amount=amount,
-                particulars=f"Paid to {expense_payment.payee_name}",
-                sequence=2
-            ))
-
-            # Bulk create entries
-            VoucherEntry.objects.bulk_create(entries)
+            voucher, entries = build_expense_payment_voucher(expense_payment, expense_ledger, bank_cash_ledger)
+            save_voucher(voucher, entries, post_immediately)
 
-            # Post voucher if requested and balanced
-            if post_immediately and voucher.is_balanced:
-                voucher.post()
-                logger.info(f"Created and posted payment voucher {voucher_number}")
+            if voucher.status == 'posted':
+                logger.info(f"Created and posted payment voucher {voucher.voucher_number}")
             else:
-                logger.info(f"Created payment voucher {voucher_number} (not posted)")
+                logger.info(f"Created payment voucher {voucher.voucher_number} (not posted)")
 
             return voucher
 
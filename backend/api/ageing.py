@@ -0,0 +1,166 @@
+"""
+Ageing engine for receivables and payables.
+Buckets outstanding amounts by document age in the database (CASE/WHEN over
+the document date) so callers never load one model instance per open document.
+"""
+
+from django.db.models import Case, When, F, Q, Sum, Value, IntegerField, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from datetime import date, timedelta
+from decimal import Decimal
+
+
+# Upper bound (in days) of each bucket; anything older falls in the last bucket
+DEFAULT_BOUNDARIES = (30, 60, 90, 120)
+
+
+def parse_boundaries(value, default=DEFAULT_BOUNDARIES):
+    """
+    Parse a comma separated list of bucket boundaries (e.g. "30,60,90").
+    Returns the default for empty or invalid input.
+    """
+    if not value:
+        return default
+    try:
+        boundaries = sorted({int(part) for part in str(value).split(',') if part.strip()})
+    except ValueError:
+        return default
+    if not boundaries or boundaries[0] <= 0:
+        return default
+    return tuple(boundaries)
+
+
+def bucket_labels(boundaries=DEFAULT_BOUNDARIES):
+    """Human readable labels for each bucket: 0-30, 31-60, ..., 121+"""
+    labels = []
+    lower = 0
+    for upper in boundaries:
+        labels.append(f"{lower}-{upper}" if lower == 0 else f"{lower + 1}-{upper}")
+        lower = upper
+    labels.append(f"{lower + 1}+")
+    return labels
+
+
+def open_amount_as_of(payments, link_field, as_of, total='total_amount'):
+    """
+    Expression for a document's amount still open at the end of as_of: its
+    total less its ``payments`` (a Payment/SupplierPayment queryset, pointing
+    back at the document through link_field) dated on or before as_of. Ages a
+    past date with the balances documents had then rather than today's.
+    """
+    paid = payments.filter(
+        **{link_field: OuterRef('pk'), 'payment_date__lte': as_of}
+    ).order_by().values(link_field).annotate(total=Sum('amount')).values('total')
+    return F(total) - Coalesce(
+        Subquery(paid), Value(Decimal('0')), output_field=DecimalField(max_digits=15, decimal_places=2)
+    )
+
+
+def _bucket_conditions(date_field, as_of, boundaries):
+    """
+    Q objects selecting each bucket by comparing the document date with as_of.
+    A document is in bucket (lower, upper] when as_of - upper <= date < as_of - lower.
+    Future-dated documents land in the first bucket.
+    """
+    conditions = []
+    lower = None
+    for upper in list(boundaries) + [None]:
+        condition = Q()
+        if upper is not None:
+            condition &= Q(**{f'{date_field}__gte': as_of - timedelta(days=upper)})
+        if lower is not None:
+            condition &= Q(**{f'{date_field}__lt': as_of - timedelta(days=lower)})
+        conditions.append(condition)
+        lower = upper
+    return conditions
+
+
+def _bucket_aggregates(date_field, amount, as_of, boundaries):
+    """Conditional Sum/Count expressions for every bucket."""
+    aggregates = {}
+    for index, condition in enumerate(_bucket_conditions(date_field, as_of, boundaries)):
+        aggregates[f'amount_{index}'] = Coalesce(
+            Sum(Case(When(condition, then=amount), default=Value(0), output_field=DecimalField())),
+            Value(0),
+            output_field=DecimalField()
+        )
+        aggregates[f'count_{index}'] = Coalesce(
+            Sum(Case(When(condition, then=Value(1)), default=Value(0), output_field=IntegerField())),
+            Value(0),
+            output_field=IntegerField()
+        )
+    return aggregates
+
+
+def _format_buckets(row, boundaries):
+    """Turn the flat aggregate row into a list of bucket dicts plus totals."""
+    buckets = []
+    total = Decimal('0')
+    count = 0
+    lower = 0
+    for index, label in enumerate(bucket_labels(boundaries)):
+        upper = boundaries[index] if index < len(boundaries) else None
+        amount = Decimal(str(row[f'amount_{index}'] or 0))
+        bucket_count = row[f'count_{index}'] or 0
+        buckets.append({
+            'label': label,
+            'min_days': lower + 1 if lower else 0,
+            'max_days': upper,
+            'amount': amount,
+            'count': bucket_count,
+        })
+        total += amount
+        count += bucket_count
+        lower = upper
+    return {'buckets': buckets, 'total': total, 'count': count}
+
+
+def ageing_summary(queryset, date_field, amount, as_of=None, boundaries=DEFAULT_BOUNDARIES):
+    """
+    Bucket the outstanding amounts of ``queryset`` by age in one query.
+
+    Args:
+        queryset: Open documents (already filtered to the organization).
+        date_field: Name of the date the age is measured from (e.g. 'invoice_date').
+        amount: Field name or expression giving the outstanding amount.
+        as_of: Date the ages are measured at (defaults to today).
+        boundaries: Ascending bucket upper bounds in days.
+
+    Returns:
+        dict with 'buckets' (label, min_days, max_days, amount, count),
+        'total' and 'count'.
+    """
+    as_of = as_of or date.today()
+    if isinstance(amount, str):
+        amount = F(amount)
+    row = queryset.aggregate(**_bucket_aggregates(date_field, amount, as_of, boundaries))
+    return _format_buckets(row, boundaries)
+
+
+def ageing_by_party(queryset, date_field, amount, group_by, as_of=None, boundaries=DEFAULT_BOUNDARIES):
+    """
+    Same as ageing_summary, but grouped by one or more party fields
+    (e.g. ['client_id', 'client__name']) with a single GROUP BY query.
+
+    Returns:
+        List of dicts, one per party, holding the group_by values plus
+        'buckets', 'total' and 'count'; ordered by total outstanding, largest first.
+    """
+    as_of = as_of or date.today()
+    if isinstance(amount, str):
+        amount = F(amount)
+    if isinstance(group_by, str):
+        group_by = [group_by]
+
+    rows = queryset.order_by().values(*group_by).annotate(
+        **_bucket_aggregates(date_field, amount, as_of, boundaries)
+    )
+
+    results = []
+    for row in rows:
+        entry = {field: row[field] for field in group_by}
+        entry.update(_format_buckets(row, boundaries))
+        results.append(entry)
+
+    results.sort(key=lambda entry: entry['total'], reverse=True)
+    return results
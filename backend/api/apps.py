@@ -24,6 +24,9 @@ class ApiConfig(AppConfig):
             'createsuperuser', 'dbshell', 'test', 'check'
         ]
 
+        if not is_management_command:
+            self._start_email_outbox(settings)
+
         if scheduler_autostart and not is_management_command:
             run_main = os.environ.get('RUN_MAIN')
 
@@ -50,3 +53,22 @@ class ApiConfig(AppConfig):
                         logger.info("Scheduler already running in another worker - skipping")
                     except Exception as e:
                         logger.error(f"Failed to start scheduler: {e}")
+
+    def _start_email_outbox(self, settings):
+        """
+        Deliver queued email (OTPs, invoices, receipts, campaigns) from every
+        web server process, independently of the scheduler lock. Other
+        processes deliver inline (api.email_outbox.wake_outbox).
+        """
+        if settings.EMAIL_OUTBOX_STANDALONE:
+            return
+        run_main = os.environ.get('RUN_MAIN')
+        is_server = run_main == 'true' or '--noreload' in sys.argv or any(
+            server in sys.modules for server in ('gunicorn', 'daphne', 'uvicorn')
+        )
+        if is_server:
+            try:
+                from api.email_outbox import start_outbox_workers
+                start_outbox_workers()
+            except Exception as e:
+                logger.error(f"Failed to start email outbox workers: {e}")
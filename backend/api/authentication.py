@@ -0,0 +1,20 @@
+"""
+JWT authentication that reuses the token already validated by OrganizationMiddleware.
+"""
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+class MiddlewareJWTAuthentication(JWTAuthentication):
+    """
+    Drop-in replacement for simplejwt's JWTAuthentication.
+
+    OrganizationMiddleware has to authenticate the bearer token before DRF runs
+    (to resolve the organization), so it stores the result on the request.
+    Reusing it avoids decoding the token and loading the user a second time.
+    """
+
+    def authenticate(self, request):
+        cached = getattr(request._request, '_jwt_authentication', None)
+        if cached is not None:
+            return cached
+        return super().authenticate(request)
@@ -0,0 +1,153 @@
+"""
+Versioned per-organization cache for dashboard payloads.
+
+Every organization has a version counter that is bumped from model signals
+whenever invoices, payments, purchases or expenses change. Cache keys embed the
+version, so a bump makes all of the org's dashboard entries miss at once and
+TTLs can be long without ever serving numbers that predate a write.
+
+Recomputation is guarded by a short lock so that when a key expires only one
+request rebuilds it while concurrent requests wait briefly for the result.
+
+The module also holds the short-lived membership cache that lets
+OrganizationMiddleware resolve request.organization without the membership
+query on every request.
+"""
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from datetime import date
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Dashboard payloads stay valid until the org's data changes
+DASHBOARD_CACHE_TIMEOUT = 6 * 60 * 60  # 6 hours
+
+# How long a recompute lock is held at most, and how long waiters poll for it
+RECOMPUTE_LOCK_TIMEOUT = 30
+RECOMPUTE_WAIT_SECONDS = 5
+RECOMPUTE_POLL_INTERVAL = 0.05
+
+
+def _version_key(org_id):
+    return f'org_cache_version_{org_id}'
+
+
+def get_org_cache_version(org_id):
+    """Current cache version for an organization (created on first use)."""
+    key = _version_key(org_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_org_cache_version(org_id):
+    """Invalidate every versioned cache entry of an organization."""
+    if not org_id:
+        return
+    key = _version_key(org_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing (never used or evicted) - seeding it is enough
+        get_org_cache_version(org_id)
+
+
+def invalidate_org_cache(org_id):
+    """
+    Bump the org cache version now and again when the current transaction
+    commits, so a request that recomputes between the write and the commit
+    cannot cache pre-commit numbers under the new version.
+    """
+    bump_org_cache_version(org_id)
+    transaction.on_commit(lambda: bump_org_cache_version(org_id))
+
+
+def org_cache_key(org_id, name):
+    """
+    Versioned cache key for an organization payload.
+    Includes today's date because ageing and subscription figures depend on it.
+    """
+    version = get_org_cache_version(org_id)
+    return f'{name}_{org_id}_v{version}_{date.today().isoformat()}'
+
+
+def get_or_set_org_cache(org_id, name, compute, timeout=DASHBOARD_CACHE_TIMEOUT):
+    """
+    Return the cached payload for (org, name), computing it with ``compute()``
+    on a miss. Only one caller recomputes a missing key; others wait for it.
+    """
+    key = org_cache_key(org_id, name)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    lock_key = f'{key}_lock'
+    if cache.add(lock_key, 1, RECOMPUTE_LOCK_TIMEOUT):
+        try:
+            data = compute()
+            cache.set(key, data, timeout)
+        finally:
+            cache.delete(lock_key)
+        return data
+
+    # Another request is recomputing - wait for its result
+    deadline = time.monotonic() + RECOMPUTE_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(RECOMPUTE_POLL_INTERVAL)
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+    logger.warning(f"Timed out waiting for cache recompute of {key}, computing inline")
+    return compute()
+
+
+# =============================================================================
+# ORGANIZATION MEMBERSHIP CACHE (used by OrganizationMiddleware)
+# =============================================================================
+
+def _membership_key(user_id, org_id=None):
+    return f'org_membership_{user_id}_{org_id or "default"}'
+
+
+def get_cached_membership(user_id, org_id=None):
+    """
+    Cached (organization_id, role) for a user and requested organization id
+    (None = the user's default organization). Returns None on a cache miss and
+    (None, None) when the user is known to have no such active membership.
+    """
+    return cache.get(_membership_key(user_id, org_id))
+
+
+def set_cached_membership(user_id, org_id, organization_id, role):
+    """
+    Cache a membership lookup result (organization_id may be None for 'no
+    access'). Signals only clear the current process's local memory cache, so
+    without a shared cache backend entries live just a few seconds.
+    """
+    timeout = getattr(settings, 'ORGANIZATION_MEMBERSHIP_CACHE_TIMEOUT', 300)
+    if isinstance(caches['default'], LocMemCache):
+        timeout = min(timeout, getattr(settings, 'ORGANIZATION_MEMBERSHIP_LOCAL_CACHE_TIMEOUT', 10))
+    cache.set(_membership_key(user_id, org_id), (organization_id, role), timeout)
+
+
+def invalidate_membership_cache(user_ids, org_id=None):
+    """
+    Drop cached membership lookups of the given users: the entry for ``org_id``
+    (if given) and each user's default-organization entry.
+    """
+    keys = []
+    for user_id in user_ids:
+        keys.append(_membership_key(user_id))
+        if org_id:
+            keys.append(_membership_key(user_id, org_id))
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,304 @@
+"""
+Background bulk email campaigns.
+
+Sending a campaign only marks it 'sending' and returns; a runner thread
+resolves the recipients with one annotated query and hands them to the
+email outbox (api.email_outbox) CAMPAIGN_BATCH_SIZE at a time, waiting
+while a batch is still being delivered. The outbox applies the per-sender
+rate limit and retries.
+
+BulkEmailRecipient.status is the checkpoint: pending -> queued (handed to
+the outbox in the same transaction) -> sent/failed (set by the outbox
+delivery hooks). A runner that dies loses nothing: resume_campaigns(),
+scheduled from api.scheduler, restarts every 'sending' campaign whose
+runner has stopped sending heartbeats, and the outbox idempotency keys
+make re-queueing harmless. Progress is pushed to the campaign creator's
+NotificationConsumer websocket as ``campaign_progress`` messages.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import BulkEmailCampaign, BulkEmailRecipient, OrganizationMembership, Subscription
+from .email_outbox import enqueue_emails
+from .notifications import notify_user
+
+logger = logging.getLogger(__name__)
+
+# Recipients written per INSERT while resolving a campaign
+RECIPIENT_INSERT_BATCH = 1000
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CAMPAIGN_RUNNER_WORKERS,
+            thread_name_prefix='email-campaign'
+        )
+    return _executor
+
+
+def campaign_users(recipient_type, target_plan_id=None):
+    """
+    Users a campaign of recipient_type goes to, annotated with their most
+    recently joined active organization (``membership_organization_id`` and
+    ``membership_organization_name``) - in one query.
+    """
+    users = User.objects.filter(is_superuser=False)
+
+    if recipient_type == 'all_admins':
+        admin_user_ids = OrganizationMembership.objects.filter(
+            role__in=['owner', 'admin'],
+            is_active=True
+        ).values_list('user_id', flat=True)
+        users = users.filter(id__in=admin_user_ids)
+    elif recipient_type == 'specific_plan' and target_plan_id:
+        org_ids = Subscription.objects.filter(
+            plan_id=target_plan_id,
+            status__in=['active', 'trial']
+        ).values_list('organization_id', flat=True)
+        user_ids = OrganizationMembership.objects.filter(
+            organization_id__in=org_ids,
+            is_active=True
+        ).values_list('user_id', flat=True)
+        users = users.filter(id__in=user_ids)
+    elif recipient_type == 'active_users':
+        users = users.filter(is_active=True)
+    elif recipient_type == 'inactive_users':
+        users = users.filter(is_active=False)
+
+    membership = OrganizationMembership.objects.filter(
+        user=OuterRef('pk'), is_active=True
+    ).order_by('-joined_at')
+    return users.annotate(
+        membership_organization_id=Subquery(membership.values('organization_id')[:1]),
+        membership_organization_name=Subquery(membership.values('organization__name')[:1]),
+    )
+
+
+def display_name(first_name, last_name, username):
+    """Same as User.get_full_name() or username, from plain values."""
+    return f"{first_name} {last_name}".strip() or username
+
+
+def start_campaign(campaign):
+    """
+    Mark a draft/failed campaign as sending and start its runner once the
+    current transaction commits. Previous recipients are discarded.
+    """
+    campaign.recipients.all().delete()
+    campaign.status = 'sending'
+    campaign.total_recipients = 0
+    campaign.sent_count = 0
+    campaign.failed_count = 0
+    campaign.error_message = ''
+    campaign.started_at = timezone.now()
+    campaign.completed_at = None
+    campaign.runner_heartbeat = None
+    campaign.save()
+    transaction.on_commit(lambda: _submit(campaign.id))
+
+
+def _submit(campaign_id):
+    if settings.CAMPAIGN_RUNNER_WORKERS <= 0:
+        # Inline mode (tests/debugging): run in the calling thread
+        run_campaign(campaign_id)
+    else:
+        _get_executor().submit(_run_in_worker, campaign_id)
+
+
+def _run_in_worker(campaign_id):
+    close_old_connections()
+    try:
+        run_campaign(campaign_id)
+    except Exception as e:
+        logger.error(f"Campaign {campaign_id} runner failed: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+def _claim(campaign_id):
+    """
+    Take over a sending campaign unless another runner is alive, and record
+    a heartbeat. Returns False when the campaign is not ours to run.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.CAMPAIGN_RUNNER_STALE_AFTER)
+    return bool(BulkEmailCampaign.objects.filter(
+        Q(runner_heartbeat__isnull=True) | Q(runner_heartbeat__lt=stale),
+        pk=campaign_id, status='sending',
+    ).update(runner_heartbeat=now))
+
+
+def _heartbeat(campaign_id):
+    """Refresh our heartbeat; False once the campaign stopped sending (completed/cancelled)."""
+    return bool(BulkEmailCampaign.objects.filter(pk=campaign_id, status='sending').update(
+        runner_heartbeat=timezone.now()
+    ))
+
+
+def _resolve_recipients(campaign):
+    """Create the campaign's BulkEmailRecipient rows (all or nothing)."""
+    users = campaign_users(campaign.recipient_type, campaign.target_plan_id).order_by('id').values_list(
+        'id', 'email', 'first_name', 'last_name', 'username', 'membership_organization_id'
+    )
+
+    total = 0
+    with transaction.atomic():
+        batch = []
+        for user_id, email, first_name, last_name, username, organization_id in users.iterator(chunk_size=2000):
+            batch.append(BulkEmailRecipient(
+                campaign=campaign,
+                user_id=user_id,
+                organization_id=organization_id,
+                email=email,
+                user_name=display_name(first_name, last_name, username),
+                status='pending'
+            ))
+            if len(batch) >= RECIPIENT_INSERT_BATCH:
+                BulkEmailRecipient.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            BulkEmailRecipient.objects.bulk_create(batch)
+            total += len(batch)
+        BulkEmailCampaign.objects.filter(pk=campaign.pk).update(total_recipients=total)
+
+    campaign.total_recipients = total
+    logger.info(f"Campaign {campaign.id}: {total} recipients resolved")
+    return total
+
+
+def _queue_batch(campaign, size):
+    """Hand up to `size` pending recipients to the email outbox. Returns how many."""
+    with transaction.atomic():
+        ids = list(
+            BulkEmailRecipient.objects.select_for_update(skip_locked=True)
+            .filter(campaign=campaign, status='pending')
+            .order_by('id')
+            .values_list('id', flat=True)[:size]
+        )
+        if not ids:
+            return 0
+        BulkEmailRecipient.objects.filter(id__in=ids, status='pending').update(status='queued')
+        enqueue_emails('campaign', (
+            ({'recipient_id': recipient_id}, f"campaign:{campaign.id}:{recipient_id}")
+            for recipient_id in ids
+        ))
+    return len(ids)
+
+
+def campaign_progress(campaign):
+    """Recipient counts by status for a campaign (one query)."""
+    counts = campaign.recipients.aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        queued=Count('id', filter=Q(status='queued')),
+        sent=Count('id', filter=Q(status='sent')),
+        failed=Count('id', filter=Q(status__in=['failed', 'bounced'])),
+    )
+    total = campaign.total_recipients
+    done = counts['sent'] + counts['failed']
+    return {
+        'campaign_id': campaign.id,
+        'status': campaign.status,
+        'total_recipients': total,
+        'sent_count': counts['sent'],
+        'failed_count': counts['failed'],
+        'queued_count': counts['queued'],
+        'pending_count': counts['pending'],
+        'progress': int(done * 100 / total) if total else 100,
+    }
+
+
+def _notify(campaign, progress=None):
+    """Send the campaign's progress to its creator's notification websocket (best effort)."""
+    if not campaign.created_by_id:
+        return
+    try:
+        notify_user(campaign.created_by_id, 'campaign_progress', progress or campaign_progress(campaign))
+    except Exception as e:
+        logger.debug(f"Could not push progress for campaign {campaign.id}: {str(e)}")
+
+
+def run_campaign(campaign_id):
+    """Send (or resume sending) a campaign; returns when it is no longer sending."""
+    if not _claim(campaign_id):
+        return
+    campaign = BulkEmailCampaign.objects.get(pk=campaign_id)
+
+    # Recipients are created atomically, so none means not resolved yet
+    if not campaign.recipients.exists():
+        _resolve_recipients(campaign)
+
+    batch_size = settings.CAMPAIGN_BATCH_SIZE
+    while _heartbeat(campaign_id):
+        progress = campaign_progress(campaign)
+        if progress['queued_count'] < batch_size and progress['pending_count']:
+            # Keep at most about two batches in the outbox at a time
+            _queue_batch(campaign, batch_size)
+            progress = campaign_progress(campaign)
+        elif not progress['queued_count'] and not progress['pending_count']:
+            finish_campaign_if_done(campaign_id)
+            campaign.refresh_from_db()
+            _notify(campaign)
+            break
+        _notify(campaign, progress)
+        time.sleep(settings.CAMPAIGN_POLL_INTERVAL)
+
+
+def record_recipient_result(recipient_id, sent, error=None):
+    """Checkpoint one recipient's delivery result (called by the email outbox)."""
+    recipient = BulkEmailRecipient.objects.filter(pk=recipient_id).only('campaign_id').first()
+    if recipient is None:
+        return
+
+    unfinished = BulkEmailRecipient.objects.filter(pk=recipient_id, status__in=['pending', 'queued'])
+    if sent:
+        updated = unfinished.update(status='sent', sent_at=timezone.now())
+        counter = 'sent_count'
+    else:
+        updated = unfinished.update(status='failed', error_message=(error or '')[:500])
+        counter = 'failed_count'
+    if updated:
+        BulkEmailCampaign.objects.filter(pk=recipient.campaign_id).update(**{counter: F(counter) + 1})
+
+
+def finish_campaign_if_done(campaign_id):
+    """Mark a sending campaign completed once every recipient has a result."""
+    if BulkEmailRecipient.objects.filter(campaign_id=campaign_id, status__in=['pending', 'queued']).exists():
+        return False
+    failures = BulkEmailRecipient.objects.filter(
+        campaign_id=campaign_id, status='failed'
+    ).values_list('email', 'error_message')[:10]
+    return bool(BulkEmailCampaign.objects.filter(pk=campaign_id, status='sending').update(
+        status='completed',
+        completed_at=timezone.now(),
+        error_message='\n'.join(f"{email}: {error[:100]}" for email, error in failures),  # first 10 errors
+    ))
+
+
+def resume_campaigns():
+    """
+    Restart runners for campaigns left 'sending' without a live runner
+    (server restart or crash). Scheduled from api.scheduler.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.CAMPAIGN_RUNNER_STALE_AFTER)
+    campaign_ids = list(BulkEmailCampaign.objects.filter(
+        Q(runner_heartbeat__isnull=True) | Q(runner_heartbeat__lt=stale),
+        status='sending',
+    ).values_list('id', flat=True))
+    for campaign_id in campaign_ids:
+        logger.info(f"Resuming email campaign {campaign_id}")
+        _submit(campaign_id)
+    return len(campaign_ids)
@@ -5,7 +5,6 @@ Dashboard API endpoints for financial summaries, analytics, and status displays.
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.core.cache import cache
 from django.db.models import Sum, Count, Q, F, Value, DecimalField, Max, Subquery, OuterRef
 from django.db.models.functions import Coalesce
 from datetime import date, timedelta
@@ -14,6 +13,9 @@ from .models import (
     Invoice, Payment, Purchase, SupplierPayment, ExpensePayment,
     LedgerAccount, BankReconciliation, TallyMapping, AccountGroup
 )
+from .ageing import ageing_summary, ageing_by_party, parse_boundaries, open_amount_as_of
+from .timeseries import month_starts, monthly_totals
+from .cache_utils import get_or_set_org_cache
 
 
 @api_view(['GET'])
@@ -30,47 +32,22 @@ def ageing_report_summary(request):
             'payables': {'total': 0}
         })
 
-    # Check cache first (120 second TTL, keyed by organization)
-    cache_key = f'ageing_report_summary_{org.id}'
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return Response(cached_data)
+    # Served from the org's versioned cache, invalidated by model signals
+    data = get_or_set_org_cache(org.id, 'ageing_report_summary', lambda: _compute_ageing_summary(org))
+    return Response(data)
 
-    today = date.today()
 
-    # Get all unpaid invoices with outstanding amounts in a single query
+def _compute_ageing_summary(org):
+    """Build the ageing_report_summary payload for an organization."""
+    # Bucket unpaid invoices by age in the database (single aggregate query)
     unpaid_invoices = Invoice.objects.filter(
         organization=org,
-        invoice_type='tax'
-    ).exclude(status__in=['cancelled', 'paid']).annotate(
-        total_paid=Coalesce(
-            Sum('payments__amount'), Value(0), output_field=DecimalField()
-        ),
-        outstanding=F('total_amount') - Coalesce(
-            Sum('payments__amount'), Value(0), output_field=DecimalField()
-        )
-    ).filter(outstanding__gt=0)
-
-    # Calculate aging buckets for receivables
-    current = Decimal('0')
-    days30 = Decimal('0')
-    days60 = Decimal('0')
-    days90 = Decimal('0')
-    above90 = Decimal('0')
-
-    for inv in unpaid_invoices:
-        age = (today - inv.invoice_date).days
-
-        if age <= 30:
-            current += inv.outstanding
-        elif age <= 60:
-            days30 += inv.outstanding
-        elif age <= 90:
-            days60 += inv.outstanding
-        elif age <= 120:
-            days90 += inv.outstanding
-        else:
-            above90 += inv.outstanding
+        invoice_type='tax',
+        outstanding__gt=0
+    ).exclude(status__in=['cancelled', 'paid'])
+
+    ageing = ageing_summary(unpaid_invoices, 'invoice_date', 'outstanding')
+    current, days30, days60, days90, above90 = [bucket['amount'] for bucket in ageing['buckets']]
 
     # Get payables (unpaid purchases)
     payables_total = Purchase.objects.filter(
@@ -79,7 +56,7 @@ def ageing_report_summary(request):
         total=Coalesce(Sum(F('total_amount') - F('amount_paid')), Decimal('0'))
     )['total']
 
-    total_receivables = current + days30 + days60 + days90 + above90
+    total_receivables = ageing['total']
 
     data = {
         'receivables': {
@@ -94,8 +71,7 @@ def ageing_report_summary(request):
             'total': float(payables_total)
         }
     }
-    cache.set(cache_key, data, 120)  # Cache for 120 seconds
-    return Response(data)
+    return data
 
 
 @api_view(['GET'])
@@ -113,12 +89,22 @@ def analytics_summary(request):
             'netProfit': 0
         })
 
-    # Check cache first (120 second TTL, keyed by organization)
-    cache_key = f'analytics_summary_{org.id}'
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return Response(cached_data)
+    # Number of months in the cash flow series (default 6, max 36)
+    try:
+        months = int(request.query_params.get('months', 6))
+    except (TypeError, ValueError):
+        months = 6
+    months = max(1, min(months, 36))
+
+    # Served from the org's versioned cache (one entry per window), invalidated by model signals
+    data = get_or_set_org_cache(
+        org.id, f'analytics_summary_{months}', lambda: _compute_analytics_summary(org, months)
+    )
+    return Response(data)
+
 
+def _compute_analytics_summary(org, months):
+    """Build the analytics_summary payload for an organization."""
     today = date.today()
 
     # Current financial year (April to March)
@@ -127,40 +113,30 @@ def analytics_summary(request):
     else:
         fy_start = date(today.year - 1, 4, 1)
 
-    # Last 6 months for cash flow
-    cash_flow_data = []
-    for i in range(5, -1, -1):
-        month_date = today - timedelta(days=i * 30)
-        month_start = date(month_date.year, month_date.month, 1)
-        if month_date.month == 12:
-            month_end = date(month_date.year + 1, 1, 1) - timedelta(days=1)
-        else:
-            month_end = date(month_date.year, month_date.month + 1, 1) - timedelta(days=1)
-
-        # Receipts (payments received)
-        receipts = Payment.objects.filter(
-            organization=org,
-            payment_date__gte=month_start,
-            payment_date__lte=month_end
-        ).aggregate(total=Coalesce(Sum('amount'), Decimal('0')))['total']
-
-        # Payments made (expenses + purchase payments)
-        expense_payments = ExpensePayment.objects.filter(
-            organization=org,
-            payment_date__gte=month_start,
-            payment_date__lte=month_end
-        ).aggregate(total=Coalesce(Sum('amount'), Decimal('0')))['total']
-
-        purchase_payments = SupplierPayment.objects.filter(
-            organization=org,
-            payment_date__gte=month_start,
-            payment_date__lte=month_end
-        ).aggregate(total=Coalesce(Sum('amount'), Decimal('0')))['total']
+    # Cash flow for the last N calendar months - one UNION ALL query for all series
+    starts = month_starts(months, today)
+    if today.month == 12:
+        month_end = date(today.year + 1, 1, 1) - timedelta(days=1)
+    else:
+        month_end = date(today.year, today.month + 1, 1) - timedelta(days=1)
+    totals = monthly_totals({
+        'receipts': (Payment.objects.filter(organization=org), 'payment_date', 'amount'),
+        'expense_payments': (ExpensePayment.objects.filter(organization=org), 'payment_date', 'amount'),
+        'purchase_payments': (SupplierPayment.objects.filter(organization=org), 'payment_date', 'amount'),
+    }, starts[0], month_end)
 
+    cash_flow_data = []
+    for month_start in starts:
+        receipts = totals['receipts'].get(month_start, Decimal('0'))
+        payments = (
+            totals['expense_payments'].get(month_start, Decimal('0')) +
+            totals['purchase_payments'].get(month_start, Decimal('0'))
+        )
         cash_flow_data.append({
             'month': month_start.strftime('%b'),
+            'year': month_start.year,
             'receipts': float(receipts),
-            'payments': float(expense_payments + purchase_payments)
+            'payments': float(payments)
         })
 
     # YTD totals
@@ -190,8 +166,7 @@ def analytics_summary(request):
         'ytdExpenses': float(ytd_expenses + ytd_purchases),
         'netProfit': float(net_profit)
     }
-    cache.set(cache_key, data, 120)  # Cache for 120 seconds
-    return Response(data)
+    return data
 
 
 @api_view(['GET'])
@@ -313,37 +288,113 @@ def payment_reminders_summary(request):
             'overdueAmount': 0,
             'criticalCount': 0
         })
-    today = date.today()
-
-    # Get unpaid invoices with outstanding amounts in a single query
+    # Overdue after 30 days, critical after 90 days - bucketed in one query
     unpaid_invoices = Invoice.objects.filter(
         organization=org,
-        invoice_type='tax'
-    ).exclude(status__in=['cancelled', 'paid']).annotate(
-        total_paid=Coalesce(
-            Sum('payments__amount'), Value(0), output_field=DecimalField()
-        ),
-        outstanding=F('total_amount') - Coalesce(
-            Sum('payments__amount'), Value(0), output_field=DecimalField()
-        )
-    ).filter(outstanding__gt=0)
-
-    overdue_count = 0
-    overdue_amount = Decimal('0')
-    critical_count = 0  # 90+ days
-
-    for inv in unpaid_invoices:
-        age = (today - inv.invoice_date).days
+        invoice_type='tax',
+        outstanding__gt=0
+    ).exclude(status__in=['cancelled', 'paid'])
 
-        if age > 30:  # Consider overdue after 30 days
-            overdue_count += 1
-            overdue_amount += inv.outstanding
+    ageing = ageing_summary(unpaid_invoices, 'invoice_date', 'outstanding', boundaries=(30, 90))
+    _, overdue, critical = ageing['buckets']
 
-            if age > 90:
-                critical_count += 1
+    overdue_count = overdue['count'] + critical['count']
+    overdue_amount = overdue['amount'] + critical['amount']
+    critical_count = critical['count']  # 90+ days
 
     return Response({
         'overdueCount': overdue_count,
         'overdueAmount': float(overdue_amount),
         'criticalCount': critical_count
     })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ageing_report(request):
+    """
+    Party-wise ageing report.
+    Query params:
+      type: 'receivables' (client-wise, default) or 'payables' (supplier-wise)
+      as_of: YYYY-MM-DD date the ages are measured at (default today). For a
+             past date, documents are aged with what was still unpaid at the
+             end of that day (payments dated up to as_of); cancelled
+             documents are left out either way.
+      buckets: comma separated bucket boundaries in days (default 30,60,90,120)
+    """
+    org = getattr(request, 'organization', None)
+    if not org:
+        return Response({'parties': [], 'total': 0})
+
+    report_type = request.query_params.get('type', 'receivables')
+    boundaries = parse_boundaries(request.query_params.get('buckets'))
+    as_of = date.today()
+    if request.query_params.get('as_of'):
+        try:
+            as_of = date.fromisoformat(request.query_params['as_of'])
+        except ValueError:
+            return Response({'error': 'as_of must be a date in YYYY-MM-DD format'}, status=400)
+
+    # Stored balances are today's; a past date recomputes them from the payments made by then
+    historical = as_of < date.today()
+
+    if report_type == 'payables':
+        open_documents = Purchase.objects.filter(
+            organization=org,
+            purchase_date__lte=as_of
+        ).exclude(status='cancelled')
+        if historical:
+            open_documents = open_documents.annotate(
+                open_amount=open_amount_as_of(SupplierPayment.objects.all(), 'purchase', as_of)
+            ).filter(open_amount__gt=0)
+        else:
+            open_documents = open_documents.exclude(payment_status='paid').annotate(
+                open_amount=F('total_amount') - F('amount_paid')
+            )
+        parties = ageing_by_party(
+            open_documents, 'purchase_date', 'open_amount',
+            group_by=['supplier_id', 'supplier__name'], as_of=as_of, boundaries=boundaries
+        )
+        party_key, name_key = 'supplier_id', 'supplier__name'
+    else:
+        open_documents = Invoice.objects.filter(
+            organization=org,
+            invoice_type='tax',
+            invoice_date__lte=as_of
+        ).exclude(status='cancelled')
+        if historical:
+            open_documents = open_documents.annotate(
+                open_amount=open_amount_as_of(Payment.objects.all(), 'invoice', as_of)
+            ).filter(open_amount__gt=0)
+        else:
+            open_documents = open_documents.filter(outstanding__gt=0).exclude(status='paid').annotate(
+                open_amount=F('outstanding')
+            )
+        parties = ageing_by_party(
+            open_documents, 'invoice_date', 'open_amount',
+            group_by=['client_id', 'client__name'], as_of=as_of, boundaries=boundaries
+        )
+        party_key, name_key = 'client_id', 'client__name'
+
+    results = []
+    grand_total = Decimal('0')
+    for party in parties:
+        grand_total += party['total']
+        results.append({
+            'id': party[party_key],
+            'name': party[name_key],
+            'total': float(party['total']),
+            'count': party['count'],
+            'buckets': [
+                {**bucket, 'amount': float(bucket['amount'])}
+                for bucket in party['buckets']
+            ],
+        })
+
+    return Response({
+        'type': 'payables' if report_type == 'payables' else 'receivables',
+        'as_of': as_of.isoformat(),
+        'boundaries': list(boundaries),
+        'parties': results,
+        'total': float(grand_total),
+    })
@@ -0,0 +1,32 @@
+"""
+Database functions Django does not ship, for the backends NexInvo runs on
+(PostgreSQL in production, SQLite in development and tests).
+"""
+
+from django.db import models
+
+
+class DaysBetween(models.Func):
+    """
+    Days from `start` to `end` (dates or datetimes) as a float, so that
+    ``DaysBetween(start, end) >= n`` matches ``(end - start).days >= n``.
+    """
+    output_field = models.FloatField()
+    arity = 2
+    # PostgreSQL: subtract as timestamps and count seconds
+    template = (
+        "(EXTRACT(EPOCH FROM (CAST(%(end)s AS timestamp with time zone)"
+        " - CAST(%(start)s AS timestamp with time zone))) / 86400.0)"
+    )
+    sqlite_template = "(julianday(%(end)s) - julianday(%(start)s))"
+
+    def as_sql(self, compiler, connection, template=None, **extra_context):
+        start, end = self.get_source_expressions()
+        start_sql, start_params = compiler.compile(start)
+        end_sql, end_params = compiler.compile(end)
+        # Both templates name `end` before `start`
+        sql = (template or self.template) % {'start': start_sql, 'end': end_sql}
+        return sql, (*end_params, *start_params)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template=self.sqlite_template, **extra_context)
@@ -0,0 +1,138 @@
+"""
+Concurrent SMTP delivery for bulk sends.
+
+deliver_messages() sends prepared EmailMessages over a small pool of SMTP
+connections (one per worker thread, opened lazily and reused for the whole
+batch). Each message is retried with exponential backoff on transient SMTP
+errors; permanent rejections (5xx replies, refused recipients) fail at once.
+Results are yielded per message as soon as it is delivered or given up on.
+
+Worker threads only talk to the SMTP server - callers do all database work
+before (building messages) and after (recording results) in their own thread.
+"""
+
+import logging
+import queue
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    Fixed-size pool of email backend connections for one organization's
+    SMTP server. Connections are created on first use and closed by close().
+    """
+
+    def __init__(self, connection_factory, size):
+        self._factory = connection_factory
+        self._idle = queue.LifoQueue()
+        self._all = []
+        for _ in range(size):
+            self._idle.put(None)
+
+    def acquire(self):
+        connection = self._idle.get()
+        if connection is None:
+            connection = self._factory()
+            self._all.append(connection)
+        return connection
+
+    def release(self, connection):
+        self._idle.put(connection)
+
+    def close(self):
+        for connection in self._all:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        self._all = []
+
+
+def is_permanent_smtp_error(error):
+    """True for SMTP failures that retrying cannot fix."""
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                          smtplib.SMTPAuthenticationError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+def _send_with_retry(pool, message, max_attempts, retry_delay):
+    """Send one message, retrying transient failures. Returns (attempts, error)."""
+    error = None
+    for attempt in range(1, max_attempts + 1):
+        connection = pool.acquire()
+        try:
+            message.connection = connection
+            message.send(fail_silently=False)
+            return attempt, None
+        except Exception as e:
+            error = e
+            # Drop the (possibly broken) session; the next send reconnects
+            try:
+                connection.close()
+            except Exception:
+                pass
+        finally:
+            pool.release(connection)
+
+        if is_permanent_smtp_error(error) or attempt == max_attempts:
+            break
+        time.sleep(retry_delay * 2 ** (attempt - 1))
+    return attempt, error
+
+
+def deliver_messages(messages, connection_factory, workers=None, max_attempts=None, retry_delay=None):
+    """
+    Send (key, EmailMessage) pairs concurrently over pooled connections.
+
+    Args:
+        messages: iterable of (key, EmailMessage); key identifies the message
+            in the results (e.g. an invoice id)
+        connection_factory: callable returning a new email backend connection
+        workers: concurrent connections (default EMAIL_DELIVERY_WORKERS)
+        max_attempts: tries per message (default EMAIL_DELIVERY_MAX_ATTEMPTS)
+        retry_delay: first backoff in seconds, doubled per retry
+            (default EMAIL_DELIVERY_RETRY_DELAY)
+
+    Yields:
+        dict: {'key', 'sent', 'attempts', 'error', 'permanent'} per message,
+        in completion order; permanent is True when retrying cannot help
+    """
+    messages = list(messages)
+    if not messages:
+        return
+
+    workers = workers or settings.EMAIL_DELIVERY_WORKERS
+    max_attempts = max_attempts or settings.EMAIL_DELIVERY_MAX_ATTEMPTS
+    if retry_delay is None:
+        retry_delay = settings.EMAIL_DELIVERY_RETRY_DELAY
+    workers = max(1, min(workers, len(messages)))
+
+    pool = SMTPConnectionPool(connection_factory, workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='smtp-delivery') as executor:
+            futures = {
+                executor.submit(_send_with_retry, pool, message, max_attempts, retry_delay): key
+                for key, message in messages
+            }
+            for future in as_completed(futures):
+                attempts, error = future.result()
+                if error is not None:
+                    logger.warning(f"Email {futures[future]} failed after {attempts} attempt(s): {str(error)}")
+                yield {
+                    'key': futures[future],
+                    'sent': error is None,
+                    'attempts': attempts,
+                    'error': str(error) if error is not None else None,
+                    'permanent': error is not None and is_permanent_smtp_error(error),
+                }
+    finally:
+        pool.close()
@@ -0,0 +1,589 @@
+"""
+Durable outgoing email queue (transactional outbox).
+
+Request handlers and signals never talk to SMTP: enqueue_email() stores an
+OutboundEmail row in the caller's transaction and returns at once. Worker
+threads claim due rows, build the messages (PDFs are rendered at send time,
+through the PDF cache) and deliver them per sender over pooled SMTP
+connections (api.email_delivery).
+
+- Workers: every web server process (runserver, gunicorn, daphne, uvicorn)
+  starts its own worker threads from api.apps, whether or not it runs the
+  scheduler. A process without workers delivers in the committing thread
+  instead. With EMAIL_OUTBOX_STANDALONE, web processes only queue and the
+  run_email_outbox management command delivers.
+
+- Idempotency: enqueueing an idempotency_key that is already queued returns
+  the existing row, so retried requests and repeated signals send once.
+- Retries: failures are retried with exponential backoff. After
+  max_attempts, or at once for permanent errors (5xx replies, missing
+  settings, deleted invoices), the row is dead-lettered (status 'dead') and
+  kept for inspection and the requeue_dead_emails command.
+- Rate limits: with EMAIL_OUTBOX_RATE_PER_MINUTE set, each sender (the
+  system mailbox or an organization's SMTP account) sends at most that many
+  messages a minute per process; the rest wait without using up an attempt.
+  Unlimited by default - set it for SMTP providers that throttle.
+- Crashes: rows left in 'sending' longer than EMAIL_OUTBOX_LOCK_TIMEOUT go
+  back to the queue.
+
+Rows are claimed with select_for_update(skip_locked=True), so several
+workers and server instances can share one queue.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .email_delivery import deliver_messages
+from .models import (
+    OutboundEmail, Invoice, Receipt, EmailSettings, CompanySettings, InvoiceFormatSettings,
+    BulkEmailRecipient,
+)
+
+logger = logging.getLogger(__name__)
+
+# Claim order: OTPs and account emails first, bulk campaigns last
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BULK = 9
+
+_wake = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+class PermanentEmailError(Exception):
+    """A queued email that can never be sent as it is (retrying cannot help)."""
+
+
+# =============================================================================
+# Enqueueing
+# =============================================================================
+
+def enqueue_email(kind, payload, organization_id=None, idempotency_key=None):
+    """
+    Queue an email for background delivery once the current transaction
+    commits.
+
+    Args:
+        kind: one of EMAIL_KINDS ('system', 'invoice', 'receipt', 'campaign')
+        payload: JSON data the kind's builder needs, e.g. {'invoice_id': 1}
+        organization_id: owning organization, if any
+        idempotency_key: optional; an email already queued with this key is
+            returned instead of queueing another
+
+    Returns:
+        OutboundEmail
+    """
+    if kind not in EMAIL_KINDS:
+        raise ValueError(f"Unknown email kind: {kind}")
+
+    if idempotency_key:
+        existing = OutboundEmail.objects.filter(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing
+
+    try:
+        with transaction.atomic():
+            email = OutboundEmail.objects.create(
+                kind=kind,
+                payload=payload,
+                organization_id=organization_id,
+                idempotency_key=idempotency_key or None,
+                priority=EMAIL_KINDS[kind].priority,
+                max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+            )
+    except IntegrityError:
+        if not idempotency_key:
+            raise
+        # Lost a race with a concurrent request using the same key
+        return OutboundEmail.objects.get(idempotency_key=idempotency_key)
+
+    transaction.on_commit(wake_outbox)
+    return email
+
+
+def enqueue_emails(kind, items, organization_id=None, batch_size=500):
+    """
+    Queue many emails of one kind at once (campaigns). Items whose
+    idempotency key is already queued are skipped.
+
+    Args:
+        kind: one of EMAIL_KINDS
+        items: iterable of (payload, idempotency_key)
+
+    Returns:
+        int: number of items given
+    """
+    kind_spec = EMAIL_KINDS[kind]
+    rows = [
+        OutboundEmail(
+            kind=kind,
+            payload=payload,
+            organization_id=organization_id,
+            idempotency_key=idempotency_key or None,
+            priority=kind_spec.priority,
+            max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        )
+        for payload, idempotency_key in items
+    ]
+    OutboundEmail.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+    if rows:
+        transaction.on_commit(wake_outbox)
+    return len(rows)
+
+
+def idempotency_key_for(request, scope):
+    """
+    Idempotency key for an API call from its ``Idempotency-Key`` header,
+    scoped to what is being sent (e.g. ``invoice:42``). None without a header.
+    """
+    header = request.headers.get('Idempotency-Key', '').strip()
+    if not header:
+        return None
+    return f"{scope}:{header}"[:255]
+
+
+def wake_outbox():
+    """Start delivering queued email now instead of at the next poll."""
+    if settings.EMAIL_OUTBOX_STANDALONE:
+        # A run_email_outbox process picks it up at its next poll
+        return
+    if settings.EMAIL_OUTBOX_WORKERS <= 0 or not _workers:
+        # Inline mode (tests/debugging), or no worker threads in this
+        # process: deliver in the calling thread
+        try:
+            process_outbox()
+        except Exception as e:
+            logger.error(f"Inline email outbox delivery failed: {str(e)}")
+    else:
+        _wake.set()
+
+
+# =============================================================================
+# Rate limiting
+# =============================================================================
+
+class _SenderRateLimiter:
+    """Sliding one-minute window of sends per sender, shared by this process's workers."""
+
+    WINDOW = 60
+
+    def __init__(self):
+        self._sent = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _trim(self, window, now):
+        while window and now - window[0] >= self.WINDOW:
+            window.popleft()
+
+    def take(self, sender, wanted, limit):
+        """Reserve up to `wanted` sends for sender; returns how many are allowed now."""
+        if limit <= 0:
+            return wanted
+        now = time.monotonic()
+        with self._lock:
+            window = self._sent[sender]
+            self._trim(window, now)
+            allowed = max(0, min(wanted, limit - len(window)))
+            window.extend([now] * allowed)
+            return allowed
+
+    def retry_after(self, sender):
+        """Seconds until the sender's window has room again."""
+        now = time.monotonic()
+        with self._lock:
+            window = self._sent[sender]
+            self._trim(window, now)
+            if not window:
+                return 0
+            return max(1, int(self.WINDOW - (now - window[0])) + 1)
+
+
+_rate_limiter = _SenderRateLimiter()
+
+
+# =============================================================================
+# Message builders (one per kind)
+#
+# A builder takes claimed rows of its kind and yields
+# (row, sender, connection_factory, message) - or (row, None, None, error)
+# for rows that could not be built. The sender names the SMTP account the
+# message goes out through; rate limits and connection pools are per sender.
+# =============================================================================
+
+def _system_sender():
+    from .email_utils import get_system_email_sender
+
+    connection_factory, from_email = get_system_email_sender()
+    if connection_factory is None:
+        # Fallback to Django settings
+        return get_connection, settings.DEFAULT_FROM_EMAIL
+    return connection_factory, from_email
+
+
+def _build_system_emails(rows):
+    from .email_utils import build_system_email
+
+    connection_factory, from_email = _system_sender()
+    for row in rows:
+        try:
+            yield row, 'system', connection_factory, build_system_email(row.payload, from_email)
+        except KeyError as e:
+            yield row, None, None, PermanentEmailError(f"Missing payload field {e}")
+
+
+def _organization_mail_settings(organization_id):
+    """(email_settings, company_settings, format_settings) for an organization."""
+    from .email_service import email_settings_problem
+
+    email_settings = EmailSettings.objects.filter(organization_id=organization_id).first()
+    problem = email_settings_problem(email_settings)
+    if problem:
+        raise PermanentEmailError(problem)
+    company_settings = CompanySettings.objects.filter(organization_id=organization_id).first()
+    if company_settings is None:
+        raise PermanentEmailError('Company settings not configured')
+    format_settings = InvoiceFormatSettings.objects.filter(organization_id=organization_id).first()
+    return email_settings, company_settings, format_settings
+
+
+def _group_by_organization(objects):
+    groups = defaultdict(list)
+    for obj in objects:
+        groups[obj.organization_id].append(obj)
+    return groups
+
+
+def _build_invoice_emails(rows):
+    from .email_service import build_invoice_email, smtp_connection
+    from .pdf_batch import generate_invoice_pdfs
+
+    invoices = {
+        invoice.pk: invoice
+        for invoice in Invoice.annotate_due_days(Invoice.objects.filter(
+            pk__in=[row.payload.get('invoice_id') for row in rows]
+        ).select_related('client'))
+    }
+    rows_by_invoice = defaultdict(list)
+    for row in rows:
+        invoice = invoices.get(row.payload.get('invoice_id'))
+        if invoice is None:
+            yield row, None, None, PermanentEmailError('Invoice no longer exists')
+        elif not invoice.client.email:
+            yield row, None, None, PermanentEmailError('Client email not configured')
+        else:
+            rows_by_invoice[invoice.pk].append(row)
+
+    for organization_id, org_invoices in _group_by_organization(
+        invoices[pk] for pk in rows_by_invoice
+    ).items():
+        try:
+            email_settings, company_settings, format_settings = _organization_mail_settings(organization_id)
+        except PermanentEmailError as e:
+            for invoice in org_invoices:
+                for row in rows_by_invoice[invoice.pk]:
+                    yield row, None, None, e
+            continue
+
+        # Render the organization's PDFs together on the PDF process pool
+        pdfs = generate_invoice_pdfs(org_invoices, company_settings, format_settings)
+        connection_factory = _bind(smtp_connection, email_settings)
+        for invoice in org_invoices:
+            for row in rows_by_invoice[invoice.pk]:
+                if invoice.pk not in pdfs:
+                    yield row, None, None, Exception('Could not generate PDF')
+                    continue
+                message = build_invoice_email(invoice, company_settings, email_settings, pdfs[invoice.pk])
+                yield row, f"org:{organization_id}", connection_factory, message
+
+
+def _build_receipt_emails(rows):
+    from .email_service import build_receipt_email, smtp_connection
+    from .pdf_cache import get_invoice_pdf
+
+    receipts = Receipt.objects.filter(
+        pk__in=[row.payload.get('receipt_id') for row in rows]
+    ).select_related('invoice__client', 'payment')
+    receipts = {receipt.pk: receipt for receipt in receipts}
+
+    org_settings = {}
+    for row in rows:
+        receipt = receipts.get(row.payload.get('receipt_id'))
+        if receipt is None:
+            yield row, None, None, PermanentEmailError('Receipt no longer exists')
+            continue
+        if not receipt.invoice.client.email:
+            yield row, None, None, PermanentEmailError('Client email not configured')
+            continue
+        try:
+            if receipt.organization_id not in org_settings:
+                org_settings[receipt.organization_id] = _organization_mail_settings(receipt.organization_id)
+            email_settings, company_settings, format_settings = org_settings[receipt.organization_id]
+            tax_invoice_pdf = get_invoice_pdf(receipt.invoice, company_settings, format_settings)
+            message = build_receipt_email(receipt, receipt.invoice, company_settings, email_settings, tax_invoice_pdf)
+        except Exception as e:
+            yield row, None, None, e
+            continue
+        yield row, f"org:{receipt.organization_id}", _bind(smtp_connection, email_settings), message
+
+
+def _build_campaign_emails(rows):
+    from .email_utils import build_campaign_email
+
+    recipients = BulkEmailRecipient.objects.filter(
+        pk__in=[row.payload.get('recipient_id') for row in rows]
+    ).select_related('campaign', 'organization')
+    recipients = {recipient.pk: recipient for recipient in recipients}
+
+    connection_factory, from_email = _system_sender()
+    for row in rows:
+        recipient = recipients.get(row.payload.get('recipient_id'))
+        if recipient is None:
+            yield row, None, None, PermanentEmailError('Campaign recipient no longer exists')
+        elif recipient.campaign.status == 'cancelled':
+            yield row, None, None, PermanentEmailError('Campaign cancelled')
+        else:
+            yield row, 'system', connection_factory, build_campaign_email(recipient, from_email)
+
+
+def _bind(connection_function, email_settings):
+    return lambda: connection_function(email_settings)
+
+
+# =============================================================================
+# Delivery hooks
+# =============================================================================
+
+def _invoice_sent(row):
+    invoice = Invoice.objects.filter(pk=row.payload.get('invoice_id')).first()
+    if invoice is None:
+        return
+    invoice.is_emailed = True
+    invoice.emailed_at = timezone.now()
+    update_fields = ['is_emailed', 'emailed_at']
+    # Update invoice status to 'sent' if it was 'draft'
+    if invoice.status == 'draft':
+        invoice.status = 'sent'
+        update_fields.append('status')
+    invoice.save(update_fields=update_fields)
+
+
+def _campaign_email_sent(row):
+    from .campaigns import record_recipient_result
+    record_recipient_result(row.payload.get('recipient_id'), sent=True)
+
+
+def _campaign_email_dead(row, error):
+    from .campaigns import record_recipient_result
+    record_recipient_result(row.payload.get('recipient_id'), sent=False, error=error)
+
+
+EmailKind = namedtuple('EmailKind', 'build priority on_sent on_dead')
+
+EMAIL_KINDS = {
+    'system': EmailKind(_build_system_emails, PRIORITY_HIGH, None, None),
+    'invoice': EmailKind(_build_invoice_emails, PRIORITY_NORMAL, _invoice_sent, None),
+    'receipt': EmailKind(_build_receipt_emails, PRIORITY_NORMAL, None, None),
+    'campaign': EmailKind(_build_campaign_emails, PRIORITY_BULK, _campaign_email_sent, _campaign_email_dead),
+}
+
+
+# =============================================================================
+# Processing
+# =============================================================================
+
+def _claim(limit):
+    """Atomically move up to `limit` due emails from pending to sending."""
+    now = timezone.now()
+
+    # Requeue sends whose worker died (process killed mid-delivery)
+    OutboundEmail.objects.filter(
+        status='sending', locked_at__lt=now - timedelta(seconds=settings.EMAIL_OUTBOX_LOCK_TIMEOUT)
+    ).update(status='pending', next_attempt_at=now)
+
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('priority', 'next_attempt_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        OutboundEmail.objects.filter(id__in=ids, status='pending').update(status='sending', locked_at=now)
+
+    return list(OutboundEmail.objects.filter(id__in=ids, status='sending', locked_at=now).order_by('priority', 'next_attempt_at'))
+
+
+def _run_hook(hook, row, *args):
+    if hook is None:
+        return
+    try:
+        hook(row, *args)
+    except Exception as e:
+        logger.error(f"Outbound email {row.id} hook failed: {str(e)}")
+
+
+def _mark_sent(row):
+    # Sent content is dropped - system emails may carry temporary passwords or OTPs
+    OutboundEmail.objects.filter(pk=row.pk).update(
+        status='sent', attempts=row.attempts + 1, sent_at=timezone.now(), payload={}, last_error='', locked_at=None
+    )
+    _run_hook(EMAIL_KINDS[row.kind].on_sent, row)
+
+
+def _mark_failed(row, error, permanent=False):
+    """Reschedule with backoff, or dead-letter when out of attempts."""
+    attempts = row.attempts + 1
+    error = str(error)[:2000]
+    if permanent or attempts >= row.max_attempts:
+        OutboundEmail.objects.filter(pk=row.pk).update(
+            status='dead', attempts=attempts, last_error=error, locked_at=None
+        )
+        logger.warning(f"Outbound {row.kind} email {row.id} dead-lettered after {attempts} attempt(s): {error}")
+        _run_hook(EMAIL_KINDS[row.kind].on_dead, row, error)
+        return
+
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    OutboundEmail.objects.filter(pk=row.pk).update(
+        status='pending', attempts=attempts, last_error=error, locked_at=None,
+        next_attempt_at=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+def _defer(rows, seconds):
+    """Put rate-limited rows back without counting an attempt."""
+    OutboundEmail.objects.filter(pk__in=[row.pk for row in rows]).update(
+        status='pending', locked_at=None, next_attempt_at=timezone.now() + timedelta(seconds=seconds)
+    )
+
+
+def process_outbox(batch_size=None):
+    """
+    Claim and deliver one batch of due emails.
+
+    Returns:
+        int: number of emails claimed (0 when the queue has nothing due)
+    """
+    rows = _claim(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not rows:
+        return 0
+
+    by_kind = defaultdict(list)
+    for row in rows:
+        by_kind[row.kind].append(row)
+
+    # sender -> [(row, message)], and how to connect as that sender
+    by_sender = defaultdict(list)
+    connection_factories = {}
+    for kind, kind_rows in by_kind.items():
+        if kind not in EMAIL_KINDS:
+            for row in kind_rows:
+                _mark_failed(row, f"Unknown email kind: {kind}", permanent=True)
+            continue
+        built = set()
+        try:
+            for row, sender, connection_factory, message in EMAIL_KINDS[kind].build(kind_rows):
+                built.add(row.pk)
+                if sender is None:
+                    _mark_failed(row, message, permanent=isinstance(message, PermanentEmailError))
+                    continue
+                by_sender[sender].append((row, message))
+                connection_factories[sender] = connection_factory
+        except Exception as e:
+            logger.error(f"Could not build {kind} emails: {str(e)}")
+            for row in kind_rows:
+                if row.pk not in built:
+                    _mark_failed(row, e)
+
+    for sender, items in by_sender.items():
+        allowed = _rate_limiter.take(sender, len(items), settings.EMAIL_OUTBOX_RATE_PER_MINUTE)
+        if allowed < len(items):
+            _defer([row for row, _ in items[allowed:]], _rate_limiter.retry_after(sender))
+            items = items[:allowed]
+
+        rows_by_id = {row.pk: row for row, _ in items}
+        # Retries are scheduled by the outbox (backoff across rounds), not inline
+        deliveries = deliver_messages(
+            [(row.pk, message) for row, message in items], connection_factories[sender], max_attempts=1
+        )
+        for delivery in deliveries:
+            row = rows_by_id[delivery['key']]
+            if delivery['sent']:
+                _mark_sent(row)
+            else:
+                _mark_failed(row, delivery['error'], permanent=delivery['permanent'])
+
+    return len(rows)
+
+
+def drain_outbox():
+    """Process batches until nothing is due."""
+    while process_outbox():
+        pass
+
+
+# =============================================================================
+# Worker loop
+# =============================================================================
+
+def _run_worker():
+    while True:
+        _wake.wait(settings.EMAIL_OUTBOX_POLL_INTERVAL)
+        _wake.clear()
+        close_old_connections()
+        try:
+            drain_outbox()
+        except Exception as e:
+            logger.error(f"Email outbox worker error: {str(e)}")
+        finally:
+            close_old_connections()
+
+
+def start_outbox_workers(workers=None):
+    """
+    Start the background delivery threads (EMAIL_OUTBOX_WORKERS by default),
+    once per process. Called from api.apps and the run_email_outbox command.
+
+    Returns:
+        list: this process's worker threads
+    """
+    workers = settings.EMAIL_OUTBOX_WORKERS if workers is None else workers
+    with _workers_lock:
+        if _workers or workers <= 0:
+            return list(_workers)
+        for index in range(workers):
+            worker = threading.Thread(target=_run_worker, name=f'email-outbox-{index}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+    logger.info(f"Email outbox started with {workers} worker(s)")
+    return list(_workers)
+
+
+def requeue_dead_emails(queryset=None):
+    """Give dead-lettered emails a fresh set of attempts. Returns the number requeued."""
+    queryset = OutboundEmail.objects.all() if queryset is None else queryset
+    count = queryset.filter(status='dead').update(
+        status='pending', attempts=0, last_error='', next_attempt_at=timezone.now()
+    )
+    if count:
+        wake_outbox()
+    return count
+
+
+def cleanup_outbox():
+    """Delete sent emails older than EMAIL_OUTBOX_RETENTION_DAYS. Scheduled from api.scheduler."""
+    deleted, _ = OutboundEmail.objects.filter(
+        status='sent', sent_at__lt=timezone.now() - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS)
+    ).delete()
+    if deleted:
+        logger.info(f"Email outbox cleanup: {deleted} sent emails removed")
+    return deleted
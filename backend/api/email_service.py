@@ -1,7 +1,9 @@
 from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
-from .pdf_generator import generate_invoice_pdf, generate_receipt_pdf
+from .pdf_generator import generate_receipt_pdf
+from .pdf_cache import get_invoice_pdf
 from .models import EmailSettings, InvoiceFormatSettings
+from .email_outbox import enqueue_email
 from .email_templates import (
     get_base_email_template,
     format_greeting,
@@ -69,7 +71,134 @@ def clear_cached_connections():
         _thread_local.connections = {}
 
 
-def send_invoice_email(invoice, company_settings, connection=None):
+def smtp_connection(email_settings, timeout=30):
+    """New (unopened) SMTP connection for an organization's email settings."""
+    return get_connection(
+        backend='django.core.mail.backends.smtp.EmailBackend',
+        host=email_settings.smtp_host,
+        port=email_settings.smtp_port,
+        username=email_settings.smtp_username,
+        password=email_settings.smtp_password,
+        use_tls=email_settings.use_tls,
+        timeout=timeout,
+    )
+
+
+def build_invoice_email(invoice, company_settings, email_settings, pdf_buffer):
+    """
+    Build the invoice email (HTML body + PDF attachment) without sending it.
+
+    Args:
+        invoice: Invoice model instance (with client)
+        company_settings: CompanySettings model instance
+        email_settings: EmailSettings of the invoice's organization
+        pdf_buffer: BytesIO with the invoice PDF
+
+    Returns:
+        EmailMessage: message without a connection
+    """
+    # Prepare email
+    subject = f"{invoice.get_invoice_type_display()} - {invoice.invoice_number}"
+
+    # Email body
+    invoice_type_name = "Proforma Invoice" if invoice.invoice_type == 'proforma' else "Tax Invoice"
+
+    # Build professional HTML email content
+    content = format_greeting(invoice.client.name)
+    content += format_paragraph(
+        f"Please find attached <strong>{invoice_type_name} {invoice.invoice_number}</strong> dated {invoice.invoice_date.strftime('%d/%m/%Y')}.",
+        style="lead"
+    )
+
+    # Invoice details info box
+    invoice_details = [
+        ("Invoice Number", invoice.invoice_number),
+        ("Invoice Date", invoice.invoice_date.strftime('%d/%m/%Y')),
+        ("Due Date", invoice.due_date.strftime('%d/%m/%Y') if invoice.due_date else "On Receipt"),
+    ]
+    content += format_info_box("Invoice Details", invoice_details)
+
+    # Amount highlight
+    content += format_highlight_amount(invoice.total_amount, "Total Amount")
+
+    # Payment terms if available
+    if invoice.payment_terms:
+        content += format_alert_box(f"<strong>Payment Terms:</strong> {invoice.payment_terms}", "info")
+
+    # Notes if available
+    if invoice.notes:
+        content += format_paragraph(f"<em>Notes:</em> {invoice.notes}", style="small")
+
+    content += format_divider()
+    content += format_paragraph("Thank you for your business! We appreciate your trust in our services.", style="normal")
+
+    # Signature
+    content += format_signature(
+        name=email_settings.from_name if email_settings.from_name else company_settings.companyName,
+        company=company_settings.companyName,
+        phone=company_settings.phone if company_settings.phone else None,
+        email=email_settings.from_email
+    )
+
+    # Include custom email signature if available
+    if email_settings.email_signature:
+        content += format_paragraph(email_settings.email_signature, style="small")
+
+    # Generate full HTML email with dual branding
+    html_body = get_base_email_template(
+        subject=invoice_type_name,
+        content=content,
+        company_name="NexInvo",
+        company_tagline="Invoice Management System",
+        tenant_company_name=company_settings.companyName if company_settings else None,
+        tenant_tagline=company_settings.tradingName if company_settings and company_settings.tradingName else None,
+    )
+
+    # Plain text fallback
+    plain_body = f"""
+Dear {invoice.client.name},
+
+Please find attached {invoice_type_name} {invoice.invoice_number} dated {invoice.invoice_date.strftime('%d/%m/%Y')}.
+
+Invoice Details:
+- Invoice Number: {invoice.invoice_number}
+- Invoice Date: {invoice.invoice_date.strftime('%d/%m/%Y')}
+- Total Amount: Rs. {invoice.total_amount:,.2f}
+
+{invoice.payment_terms if invoice.payment_terms else ''}
+{invoice.notes if invoice.notes else ''}
+
+Thank you for your business!
+
+Best Regards,
+{email_settings.from_name if email_settings.from_name else company_settings.companyName}
+{company_settings.phone if company_settings.phone else ''}
+{email_settings.from_email}
+{email_settings.email_signature if email_settings.email_signature else ''}
+    """.strip()
+
+    # Create email with HTML content and UTF-8 encoding
+    email = EmailMessage(
+        subject=subject,
+        body=html_body,
+        from_email=email_settings.from_email,
+        to=[invoice.client.email],
+        reply_to=[company_settings.email] if company_settings.email else [],
+    )
+    email.content_subtype = "html"
+    email.encoding = 'utf-8'
+
+    # Attach PDF
+    email.attach(
+        filename=f"Invoice_{invoice.invoice_number}.pdf",
+        content=pdf_buffer.getvalue(),
+        mimetype='application/pdf'
+    )
+
+    return email
+
+
+def send_invoice_email(invoice, company_settings, connection=None, pdf_buffer=None):
     """
     Send invoice email to client with PDF attachment
 
@@ -77,6 +206,7 @@ def send_invoice_email(invoice, company_settings, connection=None):
         invoice: Invoice model instance
         company_settings: CompanySettings model instance
         connection: Optional existing SMTP connection for reuse (bulk sending)
+        pdf_buffer: Optional pre-rendered PDF (bulk sending renders in batch)
 
     Returns:
         bool: True if email sent successfully, False otherwise
@@ -109,119 +239,12 @@ def send_invoice_email(invoice, company_settings, connection=None):
         except InvoiceFormatSettings.DoesNotExist:
             format_settings = None
 
-        # Generate PDF
-        pdf_buffer = generate_invoice_pdf(invoice, company_settings, format_settings)
-
-        # Prepare email
-        subject = f"{invoice.get_invoice_type_display()} - {invoice.invoice_number}"
-
-        # Email body
-        invoice_type_name = "Proforma Invoice" if invoice.invoice_type == 'proforma' else "Tax Invoice"
-
-        # Build professional HTML email content
-        content = format_greeting(invoice.client.name)
-        content += format_paragraph(
-            f"Please find attached <strong>{invoice_type_name} {invoice.invoice_number}</strong> dated {invoice.invoice_date.strftime('%d/%m/%Y')}.",
-            style="lead"
-        )
-
-        # Invoice details info box
-        invoice_details = [
-            ("Invoice Number", invoice.invoice_number),
-            ("Invoice Date", invoice.invoice_date.strftime('%d/%m/%Y')),
-            ("Due Date", invoice.due_date.strftime('%d/%m/%Y') if invoice.due_date else "On Receipt"),
-        ]
-        content += format_info_box("Invoice Details", invoice_details)
-
-        # Amount highlight
-        content += format_highlight_amount(invoice.total_amount, "Total Amount")
-
-        # Payment terms if available
-        if invoice.payment_terms:
-            content += format_alert_box(f"<strong>Payment Terms:</strong> {invoice.payment_terms}", "info")
-
-        # Notes if available
-        if invoice.notes:
-            content += format_paragraph(f"<em>Notes:</em> {invoice.notes}", style="small")
-
-        content += format_divider()
-        content += format_paragraph("Thank you for your business! We appreciate your trust in our services.", style="normal")
-
-        # Signature
-        content += format_signature(
-            name=email_settings.from_name if email_settings.from_name else company_settings.companyName,
-            company=company_settings.companyName,
-            phone=company_settings.phone if company_settings.phone else None,
-            email=email_settings.from_email
-        )
-
-        # Include custom email signature if available
-        if email_settings.email_signature:
-            content += format_paragraph(email_settings.email_signature, style="small")
-
-        # Generate full HTML email with dual branding
-        html_body = get_base_email_template(
-            subject=invoice_type_name,
-            content=content,
-            company_name="NexInvo",
-            company_tagline="Invoice Management System",
-            tenant_company_name=company_settings.companyName if company_settings else None,
-            tenant_tagline=company_settings.tradingName if company_settings and company_settings.tradingName else None,
-        )
-
-        # Plain text fallback
-        plain_body = f"""
-Dear {invoice.client.name},
-
-Please find attached {invoice_type_name} {invoice.invoice_number} dated {invoice.invoice_date.strftime('%d/%m/%Y')}.
-
-Invoice Details:
-- Invoice Number: {invoice.invoice_number}
-- Invoice Date: {invoice.invoice_date.strftime('%d/%m/%Y')}
-- Total Amount: Rs. {invoice.total_amount:,.2f}
+        # Generate PDF (served from the PDF cache when the invoice is unchanged)
+        if pdf_buffer is None:
+            pdf_buffer = get_invoice_pdf(invoice, company_settings, format_settings)
 
-{invoice.payment_terms if invoice.payment_terms else ''}
-{invoice.notes if invoice.notes else ''}
-
-Thank you for your business!
-
-Best Regards,
-{email_settings.from_name if email_settings.from_name else company_settings.companyName}
-{company_settings.phone if company_settings.phone else ''}
-{email_settings.from_email}
-{email_settings.email_signature if email_settings.email_signature else ''}
-        """.strip()
-
-        # Use provided connection or create new one with timeout
-        if connection is None:
-            connection = get_connection(
-                backend='django.core.mail.backends.smtp.EmailBackend',
-                host=email_settings.smtp_host,
-                port=email_settings.smtp_port,
-                username=email_settings.smtp_username,
-                password=email_settings.smtp_password,
-                use_tls=email_settings.use_tls,
-                timeout=30,  # 30 second timeout
-            )
-
-        # Create email with HTML content and UTF-8 encoding
-        email = EmailMessage(
-            subject=subject,
-            body=html_body,
-            from_email=email_settings.from_email,
-            to=[invoice.client.email],
-            reply_to=[company_settings.email] if company_settings.email else [],
-            connection=connection
-        )
-        email.content_subtype = "html"
-        email.encoding = 'utf-8'
-
-        # Attach PDF
-        email.attach(
-            filename=f"Invoice_{invoice.invoice_number}.pdf",
-            content=pdf_buffer.getvalue(),
-            mimetype='application/pdf'
-        )
+        email = build_invoice_email(invoice, company_settings, email_settings, pdf_buffer)
+        email.connection = connection if connection is not None else smtp_connection(email_settings)
 
         # Send email
         try:
@@ -244,72 +267,48 @@ Best Regards,
         return False
 
 
-def send_bulk_invoice_emails(invoices, company_settings):
+def email_settings_problem(email_settings):
+    """
+    Why an organization cannot send email yet, or None when its
+    EmailSettings are complete.
     """
-    Send emails for multiple invoices using a single SMTP connection.
-    Much faster than sending one by one.
+    if email_settings is None:
+        return 'Email settings not configured'
+    if not email_settings.smtp_username or not email_settings.smtp_password:
+        return 'SMTP username or password not configured'
+    if not email_settings.from_email:
+        return 'From email not configured'
+    return None
 
-    Args:
-        invoices: List of Invoice model instances
-        company_settings: CompanySettings model instance
 
-    Returns:
-        dict: {'success': count, 'failed': count, 'errors': [list of errors]}
+def queue_invoice_email(invoice, idempotency_key=None):
     """
-    result = {'success': 0, 'failed': 0, 'errors': []}
-
-    if not invoices:
-        return result
+    Queue an invoice email to the client (see api.email_outbox). The PDF is
+    rendered when the email is sent; the invoice is then marked as emailed
+    and moved from draft to sent.
 
-    # Get email settings from first invoice
-    try:
-        email_settings = EmailSettings.objects.get(organization=invoices[0].organization)
-    except EmailSettings.DoesNotExist:
-        result['errors'].append('Email settings not configured')
-        result['failed'] = len(invoices)
-        return result
-
-    # Validate email settings
-    if not email_settings.smtp_username or not email_settings.smtp_password or not email_settings.from_email:
-        result['errors'].append('SMTP settings incomplete')
-        result['failed'] = len(invoices)
-        return result
-
-    # Create single connection for all emails
-    connection = get_connection(
-        backend='django.core.mail.backends.smtp.EmailBackend',
-        host=email_settings.smtp_host,
-        port=email_settings.smtp_port,
-        username=email_settings.smtp_username,
-        password=email_settings.smtp_password,
-        use_tls=email_settings.use_tls,
-        timeout=30,
+    Returns:
+        OutboundEmail: the queued email (an existing one for a repeated
+        idempotency_key)
+    """
+    return enqueue_email(
+        'invoice', {'invoice_id': invoice.pk},
+        organization_id=invoice.organization_id, idempotency_key=idempotency_key
     )
 
-    try:
-        # Open connection once
-        connection.open()
 
-        for invoice in invoices:
-            try:
-                success = send_invoice_email(invoice, company_settings, connection)
-                if success:
-                    result['success'] += 1
-                else:
-                    result['failed'] += 1
-                    result['errors'].append(f"Invoice {invoice.invoice_number}: Failed to send")
-            except Exception as e:
-                result['failed'] += 1
-                result['errors'].append(f"Invoice {invoice.invoice_number}: {str(e)}")
-
-    finally:
-        # Always close connection
-        try:
-            connection.close()
-        except Exception:
-            pass
+def queue_receipt_email(receipt, idempotency_key=None):
+    """
+    Queue the receipt email (receipt + tax invoice PDFs) to the client, see
+    api.email_outbox.
 
-    return result
+    Returns:
+        OutboundEmail: the queued email
+    """
+    return enqueue_email(
+        'receipt', {'receipt_id': receipt.pk},
+        organization_id=receipt.organization_id, idempotency_key=idempotency_key
+    )
 
 
 def send_proforma_invoice(invoice, company_settings):
@@ -346,6 +345,132 @@ def send_tax_invoice(invoice, company_settings):
     return send_invoice_email(invoice, company_settings)
 
 
+def build_receipt_email(receipt, tax_invoice, company_settings, email_settings, tax_invoice_pdf):
+    """
+    Build the receipt email (HTML body + tax invoice and receipt PDFs)
+    without sending it.
+
+    Args:
+        receipt: Receipt model instance
+        tax_invoice: Tax Invoice model instance
+        company_settings: CompanySettings model instance
+        email_settings: EmailSettings of the receipt's organization
+        tax_invoice_pdf: BytesIO with the tax invoice PDF
+
+    Returns:
+        EmailMessage: message without a connection
+    """
+    client = receipt.invoice.client
+    receipt_pdf = generate_receipt_pdf(receipt, company_settings)
+
+    # Email subject and body
+    subject = f"Tax Invoice & Receipt - {tax_invoice.invoice_number}"
+
+    # Build professional HTML email content
+    content = format_greeting(client.name)
+    content += format_paragraph(
+        "Thank you for your payment! We have received your payment and are pleased to provide you with the following documents.",
+        style="lead"
+    )
+
+    # Attachments info
+    content += format_info_box("Attached Documents", [
+        ("Tax Invoice", tax_invoice.invoice_number),
+        ("Payment Receipt", receipt.receipt_number),
+    ], bg_color="#f0fdf4", border_color="#10b981", title_color="#065f46")
+
+    # Payment details
+    payment_details = [
+        ("Amount Received", f"Rs. {receipt.amount_received:,.2f}"),
+        ("Payment Date", receipt.receipt_date.strftime('%d/%m/%Y')),
+        ("Payment Method", receipt.payment.get_payment_method_display()),
+    ]
+    content += format_info_box("Payment Details", payment_details)
+
+    # Amount highlight
+    content += format_highlight_amount(receipt.amount_received, "Payment Confirmed")
+
+    content += format_alert_box(
+        "Your payment has been successfully processed. Thank you for your prompt payment!",
+        "success"
+    )
+
+    content += format_divider()
+    content += format_paragraph(
+        "If you have any questions regarding this transaction, please don't hesitate to contact us.",
+        style="normal"
+    )
+
+    # Signature
+    content += format_signature(
+        name=company_settings.companyName,
+        phone=company_settings.phone,
+        email=company_settings.email
+    )
+
+    # Include custom email signature if available
+    if email_settings.email_signature:
+        content += format_paragraph(email_settings.email_signature, style="small")
+
+    # Generate full HTML email with dual branding
+    html_body = get_base_email_template(
+        subject="Payment Confirmation",
+        content=content,
+        company_name="NexInvo",
+        company_tagline="Invoice Management System",
+        tenant_company_name=company_settings.companyName if company_settings else None,
+        tenant_tagline=company_settings.tradingName if company_settings and company_settings.tradingName else None,
+    )
+
+    # Plain text fallback
+    plain_body = f"""Dear {client.name},
+
+Thank you for your payment.
+
+Please find attached:
+1. Tax Invoice: {tax_invoice.invoice_number}
+2. Payment Receipt: {receipt.receipt_number}
+
+Payment Details:
+- Amount Received: Rs. {receipt.amount_received:,.2f}
+- Payment Date: {receipt.receipt_date.strftime('%d/%m/%Y')}
+- Payment Method: {receipt.payment.get_payment_method_display()}
+
+If you have any questions, please don't hesitate to contact us.
+
+Best regards,
+{company_settings.companyName}
+{company_settings.email}
+{company_settings.phone}
+{email_settings.email_signature if email_settings.email_signature else ''}
+    """.strip()
+
+    # Create email with HTML content
+    email = EmailMessage(
+        subject=subject,
+        body=html_body,
+        from_email=f"{email_settings.from_name} <{email_settings.from_email}>" if email_settings.from_name else email_settings.from_email,
+        to=[client.email],
+        reply_to=[email_settings.from_email],
+    )
+    email.content_subtype = "html"
+    email.encoding = 'utf-8'
+
+    # Attach PDFs
+    email.attach(
+        filename=f"{tax_invoice.invoice_number}.pdf",
+        content=tax_invoice_pdf.getvalue(),
+        mimetype='application/pdf'
+    )
+    email.attach(
+        filename=f"{receipt.receipt_number}.pdf",
+        content=receipt_pdf,
+        mimetype='application/pdf'
+    )
+
+    return email
+
+
 def send_receipt_email(receipt, tax_invoice, company_settings):
     """
     Send receipt along with tax invoice to client via email
@@ -386,131 +511,15 @@ def send_receipt_email(receipt, tax_invoice, company_settings):
         except InvoiceFormatSettings.DoesNotExist:
             format_settings = None
 
-        # Generate PDFs
-        tax_invoice_buffer = generate_invoice_pdf(tax_invoice, company_settings, format_settings)
-        receipt_pdf = generate_receipt_pdf(receipt, company_settings)
-
-        # Email subject and body
-        subject = f"Tax Invoice & Receipt - {tax_invoice.invoice_number}"
-
-        # Build professional HTML email content
-        content = format_greeting(client.name)
-        content += format_paragraph(
-            "Thank you for your payment! We have received your payment and are pleased to provide you with the following documents.",
-            style="lead"
-        )
-
-        # Attachments info
-        content += format_info_box("Attached Documents", [
-            ("Tax Invoice", tax_invoice.invoice_number),
-            ("Payment Receipt", receipt.receipt_number),
-        ], bg_color="#f0fdf4", border_color="#10b981", title_color="#065f46")
-
-        # Payment details
-        payment_details = [
-            ("Amount Received", f"Rs. {receipt.amount_received:,.2f}"),
-            ("Payment Date", receipt.receipt_date.strftime('%d/%m/%Y')),
-            ("Payment Method", receipt.payment.get_payment_method_display()),
-        ]
-        content += format_info_box("Payment Details", payment_details)
-
-        # Amount highlight
-        content += format_highlight_amount(receipt.amount_received, "Payment Confirmed")
-
-        content += format_alert_box(
-            "Your payment has been successfully processed. Thank you for your prompt payment!",
-            "success"
-        )
-
-        content += format_divider()
-        content += format_paragraph(
-            "If you have any questions regarding this transaction, please don't hesitate to contact us.",
-            style="normal"
-        )
-
-        # Signature
-        content += format_signature(
-            name=company_settings.companyName,
-            phone=company_settings.phone,
-            email=company_settings.email
-        )
-
-        # Include custom email signature if available
-        if email_settings.email_signature:
-            content += format_paragraph(email_settings.email_signature, style="small")
-
-        # Generate full HTML email with dual branding
-        html_body = get_base_email_template(
-            subject="Payment Confirmation",
-            content=content,
-            company_name="NexInvo",
-            company_tagline="Invoice Management System",
-            tenant_company_name=company_settings.companyName if company_settings else None,
-            tenant_tagline=company_settings.tradingName if company_settings and company_settings.tradingName else None,
-        )
-
-        # Plain text fallback
-        plain_body = f"""Dear {client.name},
-
-Thank you for your payment.
-
-Please find attached:
-1. Tax Invoice: {tax_invoice.invoice_number}
-2. Payment Receipt: {receipt.receipt_number}
-
-Payment Details:
-- Amount Received: Rs. {receipt.amount_received:,.2f}
-- Payment Date: {receipt.receipt_date.strftime('%d/%m/%Y')}
-- Payment Method: {receipt.payment.get_payment_method_display()}
-
-If you have any questions, please don't hesitate to contact us.
-
-Best regards,
-{company_settings.companyName}
-{company_settings.email}
-{company_settings.phone}
-{email_settings.email_signature if email_settings.email_signature else ''}
-        """.strip()
-
-        # Configure SMTP connection
-        connection = get_connection(
-            backend='django.core.mail.backends.smtp.EmailBackend',
-            host=email_settings.smtp_host,
-            port=email_settings.smtp_port,
-            username=email_settings.smtp_username,
-            password=email_settings.smtp_password,
-            use_tls=email_settings.use_tls,
-        )
-
-        # Create email with HTML content
-        email = EmailMessage(
-            subject=subject,
-            body=html_body,
-            from_email=f"{email_settings.from_name} <{email_settings.from_email}>" if email_settings.from_name else email_settings.from_email,
-            to=[client.email],
-            reply_to=[email_settings.from_email],
-            connection=connection
-        )
-        email.content_subtype = "html"
-        email.encoding = 'utf-8'
-
-        # Attach PDFs
-        email.attach(
-            filename=f"{tax_invoice.invoice_number}.pdf",
-            content=tax_invoice_buffer.getvalue(),
-            mimetype='application/pdf'
-        )
-        email.attach(
-            filename=f"{receipt.receipt_number}.pdf",
-            content=receipt_pdf,
-            mimetype='application/pdf'
-        )
+        # Generate tax invoice PDF and build the email
+        tax_invoice_buffer = get_invoice_pdf(tax_invoice, company_settings, format_settings)
+        email = build_receipt_email(receipt, tax_invoice, company_settings, email_settings, tax_invoice_buffer)
+        email.connection = smtp_connection(email_settings)
 
         # Send email
         try:
             email.send(fail_silently=False)
 
-
             print(f"Receipt and Tax Invoice sent to {client.email}")
             return True
 
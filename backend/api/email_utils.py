@@ -1,11 +1,12 @@
 """
 Email utility functions for sending automated notifications
 """
-from django.core.mail import send_mail, get_connection
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
 from django.conf import settings
 from django.utils.html import strip_tags
 from django.utils.crypto import get_random_string
 import logging
+from .email_outbox import enqueue_email
 from .email_templates import (
     get_base_email_template,
     format_greeting,
@@ -26,78 +27,123 @@ FRONTEND_URL = getattr(settings, 'FRONTEND_URL', 'https://www.nexinvo.chinmaytec
 SUPPORT_EMAIL = getattr(settings, 'SUPPORT_EMAIL', 'chinmaytechsoft@gmail.com')
 
 
-def get_system_email_settings():
+def get_system_email_sender():
     """
-    Get system email settings from database.
-    Returns tuple: (connection, from_email) or (None, None) if not configured
+    Get the system mailbox from database settings.
+    Returns tuple: (connection_factory, from_email) or (None, None) if not configured.
+    The factory opens a new SMTP connection and needs no database access.
     """
     try:
         from .models import SystemEmailSettings
         system_settings = SystemEmailSettings.objects.first()
 
         if system_settings and system_settings.smtp_host and system_settings.smtp_username:
-            connection = get_connection(
-                backend='django.core.mail.backends.smtp.EmailBackend',
-                host=system_settings.smtp_host,
-                port=system_settings.smtp_port,
-                username=system_settings.smtp_username,
-                password=system_settings.smtp_password,
-                use_tls=system_settings.use_tls,
-                fail_silently=False,
-            )
+            smtp_options = {
+                'host': system_settings.smtp_host,
+                'port': system_settings.smtp_port,
+                'username': system_settings.smtp_username,
+                'password': system_settings.smtp_password,
+                'use_tls': system_settings.use_tls,
+            }
+
+            def connection_factory():
+                return get_connection(
+                    backend='django.core.mail.backends.smtp.EmailBackend',
+                    fail_silently=False,
+                    **smtp_options
+                )
+
             from_email = system_settings.from_email or system_settings.smtp_username
-            logger.info(f"Using system email settings: {system_settings.smtp_host}")
-            return connection, from_email
+            return connection_factory, from_email
     except Exception as e:
         logger.warning(f"Could not load system email settings: {str(e)}")
 
     return None, None
 
 
-def send_email_with_system_settings(subject, plain_message, html_message, recipient_list):
+def send_email_with_system_settings(subject, plain_message, html_message, recipient_list, idempotency_key=None):
     """
-    Send email using system email settings if available, otherwise use Django settings.
+    Queue an email from the system mailbox (see api.email_outbox). It is sent
+    in the background using system email settings if available, otherwise
+    Django settings.
 
     Args:
         subject: Email subject
         plain_message: Plain text message
         html_message: HTML message
         recipient_list: List of recipient email addresses
+        idempotency_key: Optional key; an email already queued with the same
+            key is not queued again
 
     Returns:
         Boolean indicating success
     """
-    connection, from_email = get_system_email_settings()
-
-    if connection and from_email:
-        # Use system email settings
-        try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=from_email,
-                recipient_list=recipient_list,
-                html_message=html_message,
-                fail_silently=False,
-                connection=connection,
-            )
-            logger.info(f"Email sent using system settings to: {recipient_list}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send email using system settings: {str(e)}")
-            raise
+    enqueue_email('system', {
+        'subject': subject,
+        'plain_message': plain_message,
+        'html_message': html_message,
+        'recipient_list': list(recipient_list),
+    }, idempotency_key=idempotency_key)
+    logger.info(f"Email queued for: {recipient_list}")
+    return True
+
+
+def build_system_email(payload, from_email):
+    """Build the message for a queued system email."""
+    message = EmailMultiAlternatives(
+        subject=payload['subject'],
+        body=payload['plain_message'],
+        from_email=from_email,
+        to=payload['recipient_list'],
+    )
+    if payload.get('html_message'):
+        message.attach_alternative(payload['html_message'], 'text/html')
+    return message
+
+
+def build_campaign_email(recipient, from_email):
+    """
+    Build the NexInvo-branded message for one BulkEmailRecipient, filling in
+    the campaign body placeholders.
+    """
+    campaign = recipient.campaign
+
+    # Replace placeholders in body
+    body_content = campaign.body
+    body_content = body_content.replace('{{user_name}}', recipient.user_name)
+    body_content = body_content.replace('{{email}}', recipient.email)
+    if recipient.organization:
+        body_content = body_content.replace('{{organization_name}}', recipient.organization.name)
     else:
-        # Fallback to Django settings
-        logger.info("Using Django default email settings")
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=recipient_list,
-            html_message=html_message,
-            fail_silently=False,
-        )
-        return True
+        body_content = body_content.replace('{{organization_name}}', 'N/A')
+
+    # Build professional HTML email content with NexInvo branding
+    email_content = format_greeting(recipient.user_name)
+    email_content += format_paragraph(body_content, style="normal")
+    email_content += format_divider()
+    email_content += format_signature(
+        name="NexInvo Team",
+        company="NexInvo",
+        email=from_email
+    )
+
+    # Wrap with NexInvo branded template
+    branded_body = get_base_email_template(
+        subject=campaign.subject,
+        content=email_content,
+        company_name="NexInvo",
+        company_tagline="Invoice Management System",
+    )
+
+    message = EmailMessage(
+        subject=campaign.subject,
+        body=branded_body,
+        from_email=from_email,
+        to=[recipient.email],
+    )
+    message.content_subtype = "html"
+    message.encoding = 'utf-8'
+    return message
 
 
 def generate_temporary_password(length=12):
@@ -219,14 +265,17 @@ def send_welcome_email_to_user(user, organization=None, temporary_password=None)
 
         plain_message = strip_tags(html_message)
 
+        # One welcome per account (and per organization joined)
+        welcome_key = f"welcome:{user.pk}:{organization.pk}" if organization else f"welcome:{user.pk}"
         send_email_with_system_settings(
             subject=subject,
             plain_message=plain_message,
             html_message=html_message,
             recipient_list=[user.email],
+            idempotency_key=welcome_key,
         )
 
-        logger.info(f"Welcome email sent to {user.email}")
+        logger.info(f"Welcome email queued for {user.email}")
         return True
 
     except Exception as e:
@@ -291,7 +340,7 @@ def send_user_added_notification_to_owner(owner_user, new_user, organization):
             recipient_list=[owner_user.email],
         )
 
-        logger.info(f"User added notification sent to {owner_user.email}")
+        logger.info(f"User added notification queued for {owner_user.email}")
         return True
 
     except Exception as e:
@@ -368,7 +417,7 @@ def send_organization_registration_email(user, organization):
             recipient_list=superadmin_emails,
         )
 
-        logger.info(f"Organization registration notification sent to superadmins")
+        logger.info(f"Organization registration notification queued for superadmins")
         return True
 
     except Exception as e:
@@ -467,7 +516,7 @@ def send_upgrade_request_notification_to_superadmin(upgrade_request):
             recipient_list=superadmin_emails,
         )
 
-        logger.info(f"Upgrade request notification sent to superadmins for organization: {upgrade_request.organization.name}")
+        logger.info(f"Upgrade request notification queued for superadmins for organization: {upgrade_request.organization.name}")
         return True
 
     except Exception as e:
@@ -548,7 +597,7 @@ Support: {SUPPORT_EMAIL}
             recipient_list=[email],
         )
 
-        logger.info(f"OTP email sent to {email}")
+        logger.info(f"OTP email queued for {email}")
         return True
 
     except Exception as e:
@@ -637,7 +686,7 @@ Support: {SUPPORT_EMAIL}
             recipient_list=[email],
         )
 
-        logger.info(f"Password reset OTP email sent to {email}")
+        logger.info(f"Password reset OTP email queued for {email}")
         return True
 
     except Exception as e:
@@ -0,0 +1,261 @@
+"""
+Background export jobs.
+
+An export request creates an ExportJob row and returns its id immediately;
+the file is built on a small thread pool, written to EXPORT_FILES_ROOT and
+downloaded later through the export-jobs API. Progress is stored on the job
+(for polling) and pushed to the user's NotificationConsumer websocket as
+``export_progress`` messages.
+
+A running job records a heartbeat with its progress. Jobs only live in the
+memory of the process that queued them, so the hourly cleanup fails running
+jobs whose heartbeat stopped (their process died) and resubmits pending
+jobs that have waited too long; claiming is atomic, so a job that is still
+queued elsewhere is built once.
+"""
+
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ExportJob
+from .exports import (
+    ROW_GENERATORS, XLSX_SPOOL_MAX_SIZE,
+    export_types_for, iter_csv, write_xlsx, row_count, personal_data_json, personal_data_filename,
+)
+from .notifications import notify_user
+
+logger = logging.getLogger(__name__)
+
+# Push a progress update at most every this many rows
+PROGRESS_EVERY_ROWS = 1000
+
+_executor = None
+
+
+def get_export_storage():
+    """Local storage holding finished export files."""
+    return FileSystemStorage(location=settings.EXPORT_FILES_ROOT)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.EXPORT_JOB_WORKERS,
+            thread_name_prefix='export-job'
+        )
+    return _executor
+
+
+def wants_background_export(request):
+    """True when an export endpoint is called with ?background=true."""
+    return request.query_params.get('background', '').lower() in ('1', 'true', 'yes')
+
+
+def enqueue_export(user, organization, kind='data', export_format='excel', data_type='all'):
+    """
+    Create an export job and schedule it once the current transaction commits.
+    Raises ValueError for an unknown data_type.
+    """
+    if kind == 'data':
+        export_types_for(data_type)  # validate before creating the job
+
+    job = ExportJob.objects.create(
+        user=user,
+        organization=organization,
+        kind=kind,
+        export_format=export_format,
+        data_type=data_type,
+    )
+    transaction.on_commit(lambda: _submit(job.id))
+    return job
+
+
+def _submit(job_id):
+    if settings.EXPORT_JOB_WORKERS <= 0:
+        # Inline mode (tests/debugging): build the file in the calling thread
+        run_export_job(job_id)
+    else:
+        _get_executor().submit(_run_in_worker, job_id)
+
+
+def _run_in_worker(job_id):
+    close_old_connections()
+    try:
+        run_export_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def _notify(job):
+    """Send the job's state to the user's notification websocket (best effort)."""
+    try:
+        notify_user(job.user_id, 'export_progress', {
+            'job_id': str(job.id),
+            'status': job.status,
+            'progress': job.progress,
+            'rows_written': job.rows_written,
+            'total_rows': job.total_rows,
+            'error': job.error_message or None,
+        })
+    except Exception as e:
+        logger.debug(f"Could not push export progress for job {job.id}: {str(e)}")
+
+
+def _update(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    ExportJob.objects.filter(pk=job.pk).update(**fields)
+    _notify(job)
+
+
+class _ProgressTracker:
+    """Counts written rows and periodically records progress on the job."""
+
+    def __init__(self, job, total_rows):
+        self.job = job
+        self.total_rows = total_rows
+        self.rows_written = 0
+
+    def track(self, rows):
+        """Pass rows through, skipping the header row in the count."""
+        rows = iter(rows)
+        yield next(rows)
+        for row in rows:
+            yield row
+            self.rows_written += 1
+            if self.rows_written % PROGRESS_EVERY_ROWS == 0:
+                self.report()
+
+    def report(self):
+        progress = int(self.rows_written * 100 / self.total_rows) if self.total_rows else 0
+        _update(self.job, rows_written=self.rows_written, progress=min(progress, 99), heartbeat_at=timezone.now())
+
+
+def _write_data_export(job, fileobj):
+    """Write an organization data export (CSV or Excel) into fileobj."""
+    export_types = export_types_for(job.data_type)
+    if job.export_format == 'csv':
+        # For CSV, export only the requested type (or invoices if all)
+        export_types = export_types[:1]
+
+    total_rows = sum(row_count(job.organization, export_type) for export_type in export_types)
+    _update(job, total_rows=total_rows, heartbeat_at=timezone.now())
+    tracker = _ProgressTracker(job, total_rows)
+
+    if job.export_format == 'csv':
+        rows = tracker.track(ROW_GENERATORS[export_types[0]](job.organization))
+        for line in iter_csv(rows):
+            fileobj.write(line.encode('utf-8'))
+        file_name = f'{export_types[0]}_export.csv'
+    else:
+        write_xlsx(job.organization, export_types, fileobj, track=tracker.track)
+        file_name = 'nexinvo_data_export.xlsx'
+
+    return file_name, tracker.rows_written
+
+
+def run_export_job(job_id):
+    """Build the file for a pending export job and store it."""
+    # Claim the job atomically so it can never be built twice
+    now = timezone.now()
+    claimed = ExportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=now, heartbeat_at=now
+    )
+    if not claimed:
+        return
+
+    job = ExportJob.objects.select_related('user', 'organization').get(pk=job_id)
+    _notify(job)
+
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE) as spool:
+            if job.kind == 'personal_data':
+                spool.write(personal_data_json(job.user).encode('utf-8'))
+                file_name, rows_written = personal_data_filename(), 0
+            else:
+                file_name, rows_written = _write_data_export(job, spool)
+
+            spool.seek(0)
+            storage = get_export_storage()
+            stored_path = storage.save(f'{job.user_id}/{job.id}_{file_name}', File(spool))
+            file_size = storage.size(stored_path)
+
+        _update(
+            job,
+            status='completed',
+            progress=100,
+            rows_written=rows_written,
+            file_name=file_name,
+            file_path=stored_path,
+            file_size=file_size,
+            completed_at=timezone.now(),
+        )
+        logger.info(f"Export job {job.id} completed ({rows_written} rows, {file_size} bytes)")
+
+    except Exception as e:
+        logger.error(f"Export job {job.id} failed: {str(e)}")
+        _update(job, status='failed', error_message=str(e), completed_at=timezone.now())
+
+
+def open_export_file(job):
+    """Open the stored file of a completed job for reading."""
+    return get_export_storage().open(job.file_path, 'rb')
+
+
+def cleanup_export_jobs():
+    """
+    Delete export files and jobs older than EXPORT_JOB_RETENTION_HOURS, fail
+    running jobs without a heartbeat for EXPORT_JOB_STALE_AFTER (their worker
+    process has gone away) and resubmit pending jobs queued longer than that.
+    Scheduled from api.scheduler.
+
+    Returns:
+        tuple: (jobs deleted, jobs failed, jobs resubmitted)
+    """
+    now = timezone.now()
+    storage = get_export_storage()
+
+    expired = ExportJob.objects.filter(
+        created_at__lt=now - timedelta(hours=settings.EXPORT_JOB_RETENTION_HOURS)
+    )
+    deleted = 0
+    for job_id, file_path in list(expired.values_list('id', 'file_path')):
+        if file_path:
+            try:
+                storage.delete(file_path)
+            except OSError as e:
+                logger.warning(f"Could not delete export file {file_path}: {str(e)}")
+        ExportJob.objects.filter(pk=job_id).delete()
+        deleted += 1
+
+    stale = now - timedelta(seconds=settings.EXPORT_JOB_STALE_AFTER)
+    failed = ExportJob.objects.filter(status='running').filter(
+        Q(heartbeat_at__lt=stale) | Q(heartbeat_at__isnull=True, started_at__lt=stale)
+    ).update(status='failed', error_message='Export was interrupted', completed_at=now)
+
+    waiting = list(ExportJob.objects.filter(status='pending', created_at__lt=stale).values_list('id', flat=True))
+    for job_id in waiting:
+        _submit(job_id)
+
+    if deleted or failed or waiting:
+        logger.info(
+            f"Export cleanup: {deleted} expired jobs removed, {failed} interrupted jobs failed, "
+            f"{len(waiting)} waiting jobs resubmitted"
+        )
+    return deleted, failed, len(waiting)
+
+
+def remove_export_file(job):
+    """Delete a job's stored file, if any."""
+    if job.file_path:
+        get_export_storage().delete(job.file_path)
@@ -0,0 +1,307 @@
+"""
+Streaming data exports (invoices, clients, payments) to CSV and Excel.
+
+Rows are read with values_list(...).iterator(chunk_size=...) and written out
+one at a time, so memory use stays flat no matter how many rows an
+organization has:
+- CSV is generated lazily and sent with a StreamingHttpResponse.
+- Excel is written with openpyxl's write-only workbook into a spooled
+  temporary file (moved to disk once it grows) and then streamed from there.
+
+The same builders back the synchronous endpoints and background export jobs
+(api.export_jobs).
+"""
+
+import csv
+import json
+import tempfile
+from datetime import timedelta
+
+from django.utils import timezone
+
+from openpyxl import Workbook
+from rest_framework.renderers import JSONRenderer
+
+from .models import Invoice, Client, Payment, CompanySettings, OrganizationMembership
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Spooled Excel files stay in memory up to this size, then move to disk
+XLSX_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+EXPORT_TYPES = ('invoices', 'clients', 'payments')
+
+SHEET_TITLES = {
+    'invoices': 'Invoices',
+    'clients': 'Clients',
+    'payments': 'Payments',
+}
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class CSVFormatRenderer(JSONRenderer):
+    """
+    Lets DRF accept ``?format=csv`` (its URL format override) on export views.
+    File responses bypass renderers; this only renders JSON error responses.
+    """
+    format = 'csv'
+
+
+class ExcelFormatRenderer(JSONRenderer):
+    """Same as CSVFormatRenderer for ``?format=excel``."""
+    format = 'excel'
+
+
+EXPORT_RENDERER_CLASSES = [JSONRenderer, CSVFormatRenderer, ExcelFormatRenderer]
+
+
+def _format_date(value, fmt='%d/%m/%Y'):
+    return value.strftime(fmt) if value else ''
+
+
+def invoice_rows(organization):
+    """Header followed by one row per invoice of the organization."""
+    yield [
+        'Invoice Number', 'Type', 'Client', 'Invoice Date', 'Due Date',
+        'Subtotal', 'Tax Amount', 'Total Amount', 'Status', 'Created'
+    ]
+    invoices = Invoice.annotate_due_days(
+        Invoice.objects.filter(organization=organization)
+    ).values_list(
+        'invoice_number', 'invoice_type', 'client__name', 'invoice_date', 'due_days',
+        'subtotal', 'tax_amount', 'total_amount', 'status', 'created_at'
+    )
+    for (number, invoice_type, client_name, invoice_date, due_days,
+         subtotal, tax_amount, total_amount, invoice_status, created_at) in invoices.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        due_date = invoice_date + timedelta(days=due_days) if invoice_date else None
+        yield [
+            number,
+            invoice_type.upper(),
+            client_name or '',
+            _format_date(invoice_date),
+            _format_date(due_date),
+            float(subtotal or 0),
+            float(tax_amount or 0),
+            float(total_amount or 0),
+            invoice_status.upper(),
+            _format_date(created_at, '%d/%m/%Y %H:%M'),
+        ]
+
+
+def client_rows(organization):
+    """Header followed by one row per client of the organization."""
+    yield ['Name', 'Email', 'Phone', 'GSTIN', 'PAN', 'Address', 'City', 'State', 'PIN Code', 'Created']
+    clients = Client.objects.filter(organization=organization).values_list(
+        'name', 'email', 'phone', 'gstin', 'pan', 'address', 'city', 'state', 'pinCode', 'created_at'
+    )
+    for row in clients.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        *fields, created_at = row
+        yield [value or '' for value in fields] + [_format_date(created_at)]
+
+
+def payment_rows(organization):
+    """Header followed by one row per payment against the organization's invoices."""
+    yield [
+        'Payment ID', 'Invoice Number', 'Client', 'Payment Date', 'Amount',
+        'TDS Deducted', 'Amount Received', 'Payment Method', 'Reference', 'Notes'
+    ]
+    method_labels = dict(Payment.PAYMENT_METHOD_CHOICES)
+    payments = Payment.objects.filter(invoice__organization=organization).values_list(
+        'id', 'invoice__invoice_number', 'invoice__client__name', 'payment_date', 'amount',
+        'tds_amount', 'amount_received', 'payment_method', 'reference_number', 'notes'
+    )
+    for (payment_id, invoice_number, client_name, payment_date, amount,
+         tds_amount, amount_received, method, reference, notes) in payments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            payment_id,
+            invoice_number or '',
+            client_name or '',
+            _format_date(payment_date),
+            float(amount or 0),
+            float(tds_amount or 0),
+            float(amount_received or 0),
+            method_labels.get(method, method) if method else '',
+            reference or '',
+            notes or '',
+        ]
+
+
+ROW_GENERATORS = {
+    'invoices': invoice_rows,
+    'clients': client_rows,
+    'payments': payment_rows,
+}
+
+
+def export_types_for(data_type):
+    """Export types covered by a request's ``type`` parameter ('all' = every type)."""
+    if data_type == 'all':
+        return list(EXPORT_TYPES)
+    if data_type in EXPORT_TYPES:
+        return [data_type]
+    raise ValueError(f"Invalid export type '{data_type}'. Use all, invoices, clients or payments.")
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for lazy csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """
+    Yield CSV text line by line. Starts with a UTF-8 byte order mark so Excel
+    detects the encoding (same output as the previous utf-8-sig export).
+    """
+    writer = csv.writer(_Echo())
+    yield '\ufeff'
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(organization, export_types, fileobj, track=None):
+    """
+    Write one sheet per export type into fileobj with a write-only workbook.
+    ``track`` optionally wraps each sheet's row iterator (progress reporting).
+    """
+    workbook = Workbook(write_only=True)
+    for export_type in export_types:
+        sheet = workbook.create_sheet(SHEET_TITLES[export_type])
+        rows = ROW_GENERATORS[export_type](organization)
+        for row in (track(rows) if track else rows):
+            sheet.append(row)
+    workbook.save(fileobj)
+
+
+def build_xlsx(organization, export_types):
+    """
+    Build an Excel export in a spooled temporary file, rewound and ready to
+    stream. The caller (or the response) is responsible for closing it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    try:
+        write_xlsx(organization, export_types, spool)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def row_count(organization, export_type):
+    """Number of data rows an export type will produce (for progress reporting)."""
+    if export_type == 'invoices':
+        return Invoice.objects.filter(organization=organization).count()
+    if export_type == 'clients':
+        return Client.objects.filter(organization=organization).count()
+    return Payment.objects.filter(invoice__organization=organization).count()
+
+
+# =============================================================================
+# PERSONAL DATA EXPORT (DPDP Act - Right to Data Portability)
+# =============================================================================
+
+def personal_data_filename():
+    return f'nexinvo_personal_data_export_{timezone.now().strftime("%Y%m%d")}.json'
+
+
+def build_personal_data(user):
+    """Gather all personal data of a user across their active organizations."""
+    user_data = {
+        'account_info': {
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'date_joined': user.date_joined.isoformat(),
+            'last_login': user.last_login.isoformat() if user.last_login else None,
+        },
+        'organizations': [],
+        'export_date': timezone.now().isoformat(),
+        'export_purpose': 'Data Portability as per DPDP Act 2023'
+    }
+
+    memberships = OrganizationMembership.objects.filter(
+        user=user, is_active=True
+    ).select_related('organization')
+
+    for membership in memberships:
+        org = membership.organization
+        org_data = {
+            'name': org.name,
+            'role': membership.role,
+            'joined_at': membership.joined_at.isoformat(),
+        }
+
+        # Get company settings
+        company = CompanySettings.objects.filter(organization=org).first()
+        if company:
+            org_data['company_settings'] = {
+                'company_name': company.companyName,
+                'trading_name': company.tradingName,
+                'address': company.address,
+                'city': company.city,
+                'state': company.state,
+                'pin_code': company.pinCode,
+                'gstin': company.gstin,
+                'pan': company.pan,
+                'phone': company.phone,
+                'email': company.email,
+            }
+        else:
+            org_data['company_settings'] = None
+
+        # Get clients
+        clients = Client.objects.filter(organization=org).values_list(
+            'name', 'code', 'email', 'phone', 'address', 'city', 'state', 'gstin', 'pan'
+        )
+        org_data['clients'] = [{
+            'name': name,
+            'code': code,
+            'email': email,
+            'phone': phone,
+            'address': address,
+            'city': city,
+            'state': state,
+            'gstin': gstin,
+            'pan': pan,
+        } for name, code, email, phone, address, city, state, gstin, pan in clients.iterator(chunk_size=EXPORT_CHUNK_SIZE)]
+
+        # Get invoices
+        invoices = Invoice.objects.filter(organization=org).values_list(
+            'invoice_number', 'invoice_type', 'client__name', 'invoice_date',
+            'status', 'subtotal', 'tax_amount', 'total_amount'
+        )
+        org_data['invoices'] = [{
+            'invoice_number': number,
+            'invoice_type': invoice_type,
+            'client': client_name,
+            'invoice_date': invoice_date.isoformat(),
+            'status': invoice_status,
+            'subtotal': str(subtotal),
+            'tax_amount': str(tax_amount),
+            'total_amount': str(total_amount),
+        } for (number, invoice_type, client_name, invoice_date,
+               invoice_status, subtotal, tax_amount, total_amount) in invoices.iterator(chunk_size=EXPORT_CHUNK_SIZE)]
+
+        # Get payments
+        payments = Payment.objects.filter(organization=org).values_list(
+            'invoice__invoice_number', 'amount', 'payment_date', 'payment_method'
+        )
+        org_data['payments'] = [{
+            'invoice': invoice_number,
+            'amount': str(amount),
+            'payment_date': payment_date.isoformat(),
+            'payment_method': method,
+        } for invoice_number, amount, payment_date, method in payments.iterator(chunk_size=EXPORT_CHUNK_SIZE)]
+
+        user_data['organizations'].append(org_data)
+
+    return user_data
+
+
+def personal_data_json(user):
+    return json.dumps(build_personal_data(user), indent=2, ensure_ascii=False)
@@ -0,0 +1,220 @@
+"""
+Financial statements engine: trial balance, profit & loss and balance sheet.
+Ledger totals for the period come from a single GROUP BY over posted voucher
+entries; the organization's AccountGroup tree is loaded in one more query and
+the totals are rolled up through it in memory, so a report costs two queries however
+many groups and ledgers the organization has.
+"""
+
+from django.db.models import Q, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
+from decimal import Decimal
+
+from .models import AccountGroup, LedgerAccount
+
+
+# Primary groups whose ledgers belong to the profit & loss account (Tally
+# style); every other primary group is a balance sheet group
+PROFIT_AND_LOSS_GROUPS = frozenset({
+    'Sales Accounts', 'Purchase Accounts',
+    'Direct Incomes', 'Direct Expenses',
+    'Indirect Incomes', 'Indirect Expenses',
+})
+
+ZERO = Decimal('0.00')
+
+
+def _ledger_totals(organization, from_date, to_date):
+    """
+    Per ledger: opening (signed, Dr positive: opening balance plus posted
+    entries before from_date), period debit and credit (from_date..to_date)
+    and closing. One aggregate query. from_date=None starts at the ledger's
+    opening balance.
+    """
+    zero = Value(ZERO, output_field=DecimalField(max_digits=18, decimal_places=2))
+    posted = Q(voucher_entries__voucher__status='posted')
+    in_period = posted & Q(voucher_entries__voucher__voucher_date__lte=to_date)
+    totals = {}
+    if from_date:
+        in_period &= Q(voucher_entries__voucher__voucher_date__gte=from_date)
+        before = posted & Q(voucher_entries__voucher__voucher_date__lt=from_date)
+        totals['prior_debit'] = Coalesce(Sum('voucher_entries__debit_amount', filter=before), zero)
+        totals['prior_credit'] = Coalesce(Sum('voucher_entries__credit_amount', filter=before), zero)
+    totals['debit'] = Coalesce(Sum('voucher_entries__debit_amount', filter=in_period), zero)
+    totals['credit'] = Coalesce(Sum('voucher_entries__credit_amount', filter=in_period), zero)
+
+    rows = LedgerAccount.objects.filter(organization=organization).order_by().values(
+        'id', 'name', 'account_code', 'group_id', 'opening_balance', 'opening_balance_type'
+    ).annotate(**totals)
+
+    ledgers = []
+    for row in rows:
+        opening = row['opening_balance'] if row['opening_balance_type'] == 'Dr' else -row['opening_balance']
+        opening += row.get('prior_debit', ZERO) - row.get('prior_credit', ZERO)
+        ledgers.append({
+            'id': row['id'],
+            'name': row['name'],
+            'account_code': row['account_code'],
+            'group_id': row['group_id'],
+            'opening': opening,
+            'debit': row['debit'],
+            'credit': row['credit'],
+            'closing': opening + row['debit'] - row['credit'],
+        })
+    return ledgers
+
+
+def _group_tree(organization, ledgers):
+    """
+    The organization's AccountGroup tree (one query) with each group's
+    ledgers attached and opening/debit/credit/closing summed over its
+    subtree. Returns the root groups in display order.
+    """
+    groups = AccountGroup.objects.filter(organization=organization).order_by('sequence', 'name').values(
+        'id', 'name', 'nature', 'parent_id'
+    )
+    nodes = {
+        group['id']: dict(group, groups=[], ledgers=[], opening=ZERO, debit=ZERO, credit=ZERO, closing=ZERO)
+        for group in groups
+    }
+
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node['parent_id'])
+        (parent['groups'] if parent else roots).append(node)
+    for ledger in sorted(ledgers, key=lambda ledger: ledger['name']):
+        nodes[ledger['group_id']]['ledgers'].append(ledger)
+
+    def roll_up(node):
+        for key in ('opening', 'debit', 'credit', 'closing'):
+            node[key] = sum((ledger[key] for ledger in node['ledgers']), ZERO)
+        for child in node['groups']:
+            roll_up(child)
+            for key in ('opening', 'debit', 'credit', 'closing'):
+                node[key] += child[key]
+
+    for root in roots:
+        roll_up(root)
+    return roots
+
+
+def _is_empty(item):
+    return not (item['opening'] or item['debit'] or item['credit'] or item['closing'])
+
+
+def _balance(amount):
+    """(absolute amount, 'Dr'/'Cr') of a signed balance, for display."""
+    return float(abs(amount)), 'Dr' if amount >= 0 else 'Cr'
+
+
+def _trial_balance_item(item):
+    opening, opening_type = _balance(item['opening'])
+    closing, closing_type = _balance(item['closing'])
+    data = {
+        'id': item['id'],
+        'name': item['name'],
+        'opening_balance': opening,
+        'opening_balance_type': opening_type,
+        'debit': float(item['debit']),
+        'credit': float(item['credit']),
+        'closing_balance': closing,
+        'closing_balance_type': closing_type,
+    }
+    if 'nature' in item:
+        data['nature'] = item['nature']
+        data['groups'] = [_trial_balance_item(child) for child in item['groups'] if not _is_empty(child)]
+        data['ledgers'] = [_trial_balance_item(ledger) for ledger in item['ledgers'] if not _is_empty(ledger)]
+    else:
+        data['account_code'] = item['account_code']
+    return data
+
+
+def _statement_item(item, sign, key):
+    """
+    A group or ledger line of the P&L / balance sheet: `key` ('closing' or
+    period 'movement') turned to the side of its section by `sign`
+    (1 for debit sections, -1 for credit sections).
+    """
+    amount = item['closing'] if key == 'closing' else item['debit'] - item['credit']
+    data = {'id': item['id'], 'name': item['name'], 'amount': float(sign * amount)}
+    if 'nature' in item:
+        data['groups'] = [_statement_item(child, sign, key) for child in item['groups'] if not _is_empty(child)]
+        data['ledgers'] = [_statement_item(ledger, sign, key) for ledger in item['ledgers'] if not _is_empty(ledger)]
+    return data
+
+
+def trial_balance(organization, from_date, to_date):
+    """
+    Trial balance for from_date..to_date (from_date may be None): every group
+    and ledger with its opening balance, period debits/credits and closing
+    balance. Groups and ledgers without any balance or movement are left out.
+    """
+    ledgers = _ledger_totals(organization, from_date, to_date)
+    roots = _group_tree(organization, ledgers)
+
+    closing_debit = sum((ledger['closing'] for ledger in ledgers if ledger['closing'] > 0), ZERO)
+    closing_credit = -sum((ledger['closing'] for ledger in ledgers if ledger['closing'] < 0), ZERO)
+    return {
+        'from_date': from_date,
+        'to_date': to_date,
+        'groups': [_trial_balance_item(root) for root in roots if not _is_empty(root)],
+        'totals': {
+            'debit': float(sum((ledger['debit'] for ledger in ledgers), ZERO)),
+            'credit': float(sum((ledger['credit'] for ledger in ledgers), ZERO)),
+            'closing_debit': float(closing_debit),
+            'closing_credit': float(closing_credit),
+            'difference': float(closing_debit - closing_credit),
+        },
+    }
+
+
+def profit_and_loss(organization, from_date, to_date):
+    """
+    Profit & loss account for from_date..to_date: income (credit nature)
+    and expense (debit nature) groups under the P&L primary groups, valued
+    at their movement in the period.
+    """
+    roots = [
+        root for root in _group_tree(organization, _ledger_totals(organization, from_date, to_date))
+        if root['name'] in PROFIT_AND_LOSS_GROUPS
+    ]
+    income = [root for root in roots if root['nature'] == 'credit']
+    expenses = [root for root in roots if root['nature'] != 'credit']
+
+    total_income = sum((root['credit'] - root['debit'] for root in income), ZERO)
+    total_expenses = sum((root['debit'] - root['credit'] for root in expenses), ZERO)
+    return {
+        'from_date': from_date,
+        'to_date': to_date,
+        'income': [_statement_item(root, -1, 'movement') for root in income if not _is_empty(root)],
+        'expenses': [_statement_item(root, 1, 'movement') for root in expenses if not _is_empty(root)],
+        'total_income': float(total_income),
+        'total_expenses': float(total_expenses),
+        'net_profit': float(total_income - total_expenses),
+    }
+
+
+def balance_sheet(organization, as_of):
+    """
+    Balance sheet as of a date: assets (debit nature) and liabilities
+    (credit nature) primary groups at their closing balance, with the
+    accumulated profit or loss of the P&L groups on the liabilities side.
+    """
+    roots = _group_tree(organization, _ledger_totals(organization, None, as_of))
+    balance_sheet_roots = [root for root in roots if root['name'] not in PROFIT_AND_LOSS_GROUPS]
+    assets = [root for root in balance_sheet_roots if root['nature'] == 'debit']
+    liabilities = [root for root in balance_sheet_roots if root['nature'] != 'debit']
+
+    # Signed P&L closings are Dr positive, so a profit is negative
+    profit = -sum((root['closing'] for root in roots if root['name'] in PROFIT_AND_LOSS_GROUPS), ZERO)
+    total_assets = sum((root['closing'] for root in assets), ZERO)
+    total_liabilities = -sum((root['closing'] for root in liabilities), ZERO) + profit
+    return {
+        'as_of': as_of,
+        'assets': [_statement_item(root, 1, 'closing') for root in assets if not _is_empty(root)],
+        'liabilities': [_statement_item(root, -1, 'closing') for root in liabilities if not _is_empty(root)],
+        'profit_and_loss': float(profit),
+        'total_assets': float(total_assets),
+        'total_liabilities': float(total_liabilities),
+        'difference': float(total_assets - total_liabilities),
+    }
@@ -0,0 +1,107 @@
+"""
+Per-organization sharding for the daily background jobs.
+
+A job such as payment reminders or scheduled invoice generation is split
+into one shard per organization. run_sharded() works through the shards on
+a pool of SCHEDULER_SHARD_WORKERS threads, so one organization with a slow
+SMTP server only holds up its own thread.
+
+Every shard is guarded by a JobLease row, taken with an atomic update and
+released when the shard finishes, so app instances running the same job at
+the same time split the organizations between them instead of each doing
+all of them. A lease left behind by a crashed worker expires after
+SCHEDULER_SHARD_LEASE_TIMEOUT seconds.
+"""
+
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import JobLease
+
+logger = logging.getLogger(__name__)
+
+# Returned for shards another instance is already working on
+SKIPPED = object()
+
+
+def acquire_lease(key, timeout=None):
+    """
+    Take the lease `key` unless someone else holds it. Returns the owner token
+    to pass to release_lease(), or None when the lease is taken.
+    """
+    now = timezone.now()
+    timeout = settings.SCHEDULER_SHARD_LEASE_TIMEOUT if timeout is None else timeout
+    token = uuid.uuid4().hex
+    JobLease.objects.get_or_create(key=key)
+    taken = JobLease.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__lte=now),
+        key=key,
+    ).update(owner=token, acquired_at=now, expires_at=now + timedelta(seconds=timeout))
+    return token if taken else None
+
+
+def release_lease(key, token):
+    """Give up a lease taken with acquire_lease() (no-op if it expired and was taken over)."""
+    JobLease.objects.filter(key=key, owner=token).update(owner='', expires_at=None)
+
+
+def _run_shard(job, shard, handler):
+    key = f"{job}:{shard}"
+    token = acquire_lease(key)
+    if token is None:
+        logger.info(f"[{job}] {shard} is being processed by another worker, skipping")
+        return SKIPPED
+    try:
+        return handler(shard)
+    finally:
+        release_lease(key, token)
+
+
+def _run_shard_in_worker(job, shard, handler):
+    close_old_connections()
+    try:
+        return _run_shard(job, shard, handler)
+    finally:
+        close_old_connections()
+
+
+def run_sharded(job, shards, handler, workers=None):
+    """
+    Call handler(shard) once for every shard (organization id) not leased by
+    another worker, on up to `workers` threads (SCHEDULER_SHARD_WORKERS by
+    default, 0 = one after another in the calling thread).
+
+    Returns {shard: result}; shards skipped because of a lease get SKIPPED,
+    shards whose handler raised are logged and left out.
+    """
+    workers = settings.SCHEDULER_SHARD_WORKERS if workers is None else workers
+    shards = list(shards)
+    results = {}
+
+    if workers <= 0 or len(shards) <= 1:
+        for shard in shards:
+            try:
+                results[shard] = _run_shard(job, shard, handler)
+            except Exception as e:
+                logger.error(f"[{job}] {shard} failed: {str(e)}")
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(shards)), thread_name_prefix=job) as executor:
+        futures = {
+            executor.submit(_run_shard_in_worker, job, shard, handler): shard
+            for shard in shards
+        }
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                results[shard] = future.result()
+            except Exception as e:
+                logger.error(f"[{job}] {shard} failed: {str(e)}")
+    return results
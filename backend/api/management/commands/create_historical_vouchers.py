@@ -12,6 +12,11 @@ Usage:
     python manage.py create_historical_vouchers --org-id <uuid>    # Specific organization
     python manage.py create_historical_vouchers --dry-run          # Preview without changes
     python manage.py create_historical_vouchers --type invoices    # Only invoices
+    python manage.py create_historical_vouchers --batch            # Bulk mode for large backfills
+
+--batch builds vouchers in chunks with bulk inserts and recomputes ledger
+balances once per organization at the end (see api/voucher_backfill.py).
+An interrupted batch run resumes where it stopped when started again.
 """
 
 from django.core.management.base import BaseCommand
@@ -23,6 +28,7 @@ from api.accounting_utils import (
     create_sales_voucher, create_purchase_voucher,
     create_receipt_voucher, create_expense_payment_voucher
 )
+from api import voucher_backfill
 
 
 class Command(BaseCommand):
@@ -52,12 +58,25 @@ class Command(BaseCommand):
             default=True,
             help='Skip records that already have vouchers (default: True)'
         )
+        parser.add_argument(
+            '--batch',
+            action='store_true',
+            help='Create vouchers in bulk and recompute ledger balances once at the end'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=voucher_backfill.BATCH_SIZE,
+            help=f'Records per bulk insert in --batch mode (default: {voucher_backfill.BATCH_SIZE})'
+        )
 
     def handle(self, *args, **kwargs):
         org_id = kwargs.get('org_id')
         dry_run = kwargs.get('dry_run', False)
         voucher_type = kwargs.get('type', 'all')
         skip_existing = kwargs.get('skip_existing', True)
+        batch = kwargs.get('batch', False)
+        batch_size = kwargs.get('batch_size') or voucher_backfill.BATCH_SIZE
 
         if dry_run:
             self.stdout.write(self.style.WARNING('\n=== DRY RUN MODE - No changes will be made ===\n'))
@@ -89,9 +108,12 @@ class Command(BaseCommand):
             self.stdout.write(self.style.HTTP_INFO(f'Organization: {org.name}'))
             self.stdout.write(self.style.HTTP_INFO(f'{"="*60}'))
 
-            org_stats = self._process_organization(
-                org, dry_run, voucher_type, skip_existing
-            )
+            if batch and not dry_run:
+                org_stats = self._process_organization_batch(org, voucher_type, batch_size)
+            else:
+                org_stats = self._process_organization(
+                    org, dry_run, voucher_type, skip_existing
+                )
 
             total_stats['orgs_processed'] += 1
             total_stats['invoices_processed'] += org_stats.get('invoices', 0)
@@ -185,6 +207,45 @@ class Command(BaseCommand):
 
         return stats
 
+    def _process_organization_batch(self, org, voucher_type, batch_size):
+        """Process a single organization with bulk voucher creation"""
+        stats = {
+            'invoices': 0,
+            'purchases': 0,
+            'payments': 0,
+            'expenses': 0,
+            'vouchers_created': 0,
+            'errors': 0
+        }
+
+        def progress(kind, done, total):
+            self.stdout.write(f'  [{kind.upper()}] {done}/{total} processed')
+
+        try:
+            ledgers = voucher_backfill.LedgerCache(org)
+            for kind in voucher_backfill.KINDS:
+                if voucher_type not in ['all', kind]:
+                    continue
+                result = voucher_backfill.backfill_vouchers(
+                    org, kind, batch_size=batch_size, ledgers=ledgers, progress=progress
+                )
+                stats[kind] = result['processed']
+                stats['vouchers_created'] += result['created']
+                self.stdout.write(
+                    f'  [{kind.upper()}] Created {result["created"]} vouchers, '
+                    f'{result["skipped"]} skipped (missing ledgers)'
+                )
+
+            changed = voucher_backfill.recalculate_balances(org)
+            self.stdout.write(f'  [BALANCES] Recomputed ledger balances ({changed} changed)')
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'  Error: {str(e)}'))
+            self.stdout.write(self.style.WARNING('  Run the command again to resume from the last saved chunk'))
+            stats['errors'] += 1
+
+        return stats
+
     def _count_invoices_to_process(self, org, skip_existing):
         """Count invoices that need vouchers"""
         invoices = Invoice.objects.filter(
@@ -24,6 +24,9 @@ from api.models import (
 from io import StringIO
 from decimal import Decimal
 
+# Ledgers per INSERT when linking clients and suppliers
+BATCH_SIZE = 500
+
 
 class Command(BaseCommand):
     help = 'Migrate existing NexInvo data to double-entry accounting system'
@@ -189,47 +192,53 @@ class Command(BaseCommand):
 
         self.stdout.write(f'  [CLIENTS] Found {count} clients to link...')
 
-        linked = 0
-        for client in clients_without_ledger:
-            # Calculate opening balance from unpaid invoices
-            opening_balance = Decimal('0.00')
-            if not skip_balances:
-                # Get all non-cancelled invoices for this client
-                invoices = Invoice.objects.filter(
-                    client=client,
+        # Opening balance from unpaid invoices: total invoiced minus total
+        # payments received, for all clients in two grouped queries
+        invoiced, paid = {}, {}
+        if not skip_balances:
+            from api.models import Payment
+            invoiced = dict(
+                Invoice.objects.filter(
                     organization=org,
                     invoice_type='tax'  # Only tax invoices, not proforma
-                ).exclude(status='cancelled')
-
-                # Calculate total invoiced minus total payments received
-                from api.models import Payment
-                total_invoiced = invoices.aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-                total_paid = Payment.objects.filter(
-                    invoice__client=client,
-                    organization=org
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-                opening_balance = total_invoiced - total_paid
-
-            if not dry_run:
-                # Create the debtor ledger
-                LedgerAccount.objects.create(
-                    organization=org,
-                    name=client.name,
-                    group=sundry_debtors,
-                    account_type='debtor',
-                    opening_balance=opening_balance,
-                    opening_balance_type='Dr',
-                    current_balance=opening_balance,
-                    current_balance_type='Dr',
-                    linked_client=client,
-                    gstin=client.gstin or '',
-                    is_system_account=False,
-                    is_active=True
-                )
+                ).exclude(status='cancelled').order_by().values('client_id').annotate(
+                    total=Sum('total_amount')
+                ).values_list('client_id', 'total')
+            )
+            paid = dict(
+                Payment.objects.filter(organization=org).order_by().values('invoice__client_id').annotate(
+                    total=Sum('amount')
+                ).values_list('invoice__client_id', 'total')
+            )
+
+        ledgers = []
+        for client in clients_without_ledger.iterator(chunk_size=2000):
+            opening_balance = Decimal('0.00')
+            if not skip_balances:
+                opening_balance = (invoiced.get(client.id) or Decimal('0')) - (paid.get(client.id) or Decimal('0'))
+
+            # The debtor ledger
+            ledgers.append(LedgerAccount(
+                organization=org,
+                name=client.name,
+                group=sundry_debtors,
+                account_type='debtor',
+                opening_balance=opening_balance,
+                opening_balance_type='Dr',
+                current_balance=opening_balance,
+                current_balance_type='Dr',
+                linked_client=client,
+                gstin=client.gstin or '',
+                is_system_account=False,
+                is_active=True
+            ))
 
             balance_str = f' (Balance: Rs.{opening_balance:,.2f})' if opening_balance > 0 else ''
             self.stdout.write(f'    - {client.name}{balance_str}')
-            linked += 1
+
+        if not dry_run:
+            LedgerAccount.objects.bulk_create(ledgers, batch_size=BATCH_SIZE)
+        linked = len(ledgers)
 
         self.stdout.write(f'  [CLIENTS] Linked {linked} clients to debtor ledgers')
         return linked
@@ -263,34 +272,34 @@ class Command(BaseCommand):
 
         self.stdout.write(f'  [SUPPLIERS] Found {count} suppliers to link...')
 
-        linked = 0
-        for supplier in suppliers_without_ledger:
+        ledgers = []
+        for supplier in suppliers_without_ledger.iterator(chunk_size=2000):
             # Opening balance would come from unpaid purchases
             # For now, set to 0 (can be adjusted later with Opening Balance Import)
             opening_balance = Decimal('0.00')
 
-            if not dry_run:
-                # Create the creditor ledger
-                LedgerAccount.objects.create(
-                    organization=org,
-                    name=supplier.name,
-                    group=sundry_creditors,
-                    account_type='creditor',
-                    opening_balance=opening_balance,
-                    opening_balance_type='Cr',
-                    current_balance=opening_balance,
-                    current_balance_type='Cr',
-                    linked_supplier=supplier,
-                    gst_number=supplier.gstin or '',
-                    address=f"{supplier.address or ''}\n{supplier.city or ''}".strip(),
-                    email=supplier.email or '',
-                    phone=supplier.phone or '',
-                    is_system_account=False,
-                    is_active=True
-                )
+            # The creditor ledger
+            ledgers.append(LedgerAccount(
+                organization=org,
+                name=supplier.name,
+                group=sundry_creditors,
+                account_type='creditor',
+                opening_balance=opening_balance,
+                opening_balance_type='Cr',
+                current_balance=opening_balance,
+                current_balance_type='Cr',
+                linked_supplier=supplier,
+                gstin=supplier.gstin or '',
+                gst_applicable=bool(supplier.gstin),
+                is_system_account=False,
+                is_active=True
+            ))
 
             self.stdout.write(f'    - {supplier.name}')
-            linked += 1
+
+        if not dry_run:
+            LedgerAccount.objects.bulk_create(ledgers, batch_size=BATCH_SIZE)
+        linked = len(ledgers)
 
         self.stdout.write(f'  [SUPPLIERS] Linked {linked} suppliers to creditor ledgers')
         return linked
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from api.models import Organization, LedgerAccount, LedgerBalanceSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in ledger current balances and monthly balance snapshots by recomputing them from posted voucher entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org-id', type=str, help='Organization UUID (optional, checks all orgs if not provided)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be fixed without making changes',
+        )
+
+    def handle(self, *args, **options):
+        org_id = options.get('org_id')
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN - No changes will be made\n'))
+
+        ledgers = LedgerAccount.objects.all()
+        if org_id:
+            if not Organization.objects.filter(id=org_id).exists():
+                self.stdout.write(self.style.ERROR(f'Organization with ID {org_id} not found'))
+                return
+            ledgers = ledgers.filter(organization_id=org_id)
+
+        changed = LedgerAccount.recalculate_balances(ledgers, save=not dry_run)
+
+        for ledger, previous in changed:
+            message = f"{ledger.name} ({ledger.organization_id}): {previous} -> {ledger.balance_display}"
+            if dry_run:
+                self.stdout.write(f"  Would fix {message}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"  Fixed {message}"))
+
+        if not dry_run:
+            snapshot_count = LedgerBalanceSnapshot.rebuild(ledgers)
+            self.stdout.write(f"Rebuilt {snapshot_count} monthly balance snapshot(s)")
+
+        if not changed:
+            self.stdout.write(self.style.SUCCESS('\nNo drift found. All ledger balances are correct!'))
+        else:
+            action = 'Would fix' if dry_run else 'Fixed'
+            self.stdout.write(self.style.SUCCESS(f'\n{action} {len(changed)} ledger(s)'))
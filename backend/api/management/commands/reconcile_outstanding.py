@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from api.models import Organization, Invoice, Payment
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in Invoice.amount_paid / Invoice.outstanding against recorded payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org-id', type=str, help='Organization UUID (optional, checks all orgs if not provided)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be fixed without making changes',
+        )
+
+    def handle(self, *args, **options):
+        org_id = options.get('org_id')
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN - No changes will be made\n'))
+
+        invoices = Invoice.objects.all()
+        if org_id:
+            if not Organization.objects.filter(id=org_id).exists():
+                self.stdout.write(self.style.ERROR(f'Organization with ID {org_id} not found'))
+                return
+            invoices = invoices.filter(organization_id=org_id)
+
+        paid = Payment.objects.filter(
+            invoice=OuterRef('pk')
+        ).values('invoice').annotate(
+            total=Sum('amount')
+        ).values('total')
+
+        # Only invoices whose stored columns disagree with their payments come back
+        drifted = invoices.annotate(
+            actual_paid=Coalesce(Subquery(paid, output_field=DecimalField()), 0, output_field=DecimalField()),
+        ).annotate(
+            actual_outstanding=F('total_amount') - F('actual_paid'),
+        ).filter(
+            ~Q(amount_paid=F('actual_paid')) | ~Q(outstanding=F('actual_outstanding'))
+        ).only('id', 'invoice_number', 'amount_paid', 'outstanding')
+
+        fixed_count = 0
+        for invoice in drifted.iterator(chunk_size=500):
+            message = (
+                f"{invoice.invoice_number}: paid {invoice.amount_paid} -> {invoice.actual_paid}, "
+                f"outstanding {invoice.outstanding} -> {invoice.actual_outstanding}"
+            )
+            if dry_run:
+                self.stdout.write(f"  Would fix {message}")
+            else:
+                Invoice.objects.filter(pk=invoice.pk).update(
+                    amount_paid=invoice.actual_paid,
+                    outstanding=invoice.actual_outstanding
+                )
+                self.stdout.write(self.style.SUCCESS(f"  Fixed {message}"))
+            fixed_count += 1
+
+        if fixed_count == 0:
+            self.stdout.write(self.style.SUCCESS('\nNo drift found. All outstanding balances are correct!'))
+        else:
+            action = 'Would fix' if dry_run else 'Fixed'
+            self.stdout.write(self.style.SUCCESS(f'\n{action} {fixed_count} invoice(s)'))
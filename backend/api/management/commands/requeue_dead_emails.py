@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from api.models import OutboundEmail
+from api.email_outbox import requeue_dead_emails
+
+
+class Command(BaseCommand):
+    help = 'List or requeue dead-lettered emails from the outgoing email queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', type=str, help='Only emails of this kind (system, invoice, receipt, campaign)')
+        parser.add_argument('--org-id', type=str, help='Only emails of this organization UUID')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List dead emails without requeueing them',
+        )
+
+    def handle(self, *args, **options):
+        dead = OutboundEmail.objects.filter(status='dead')
+        if options.get('kind'):
+            dead = dead.filter(kind=options['kind'])
+        if options.get('org_id'):
+            dead = dead.filter(organization_id=options['org_id'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN - No changes will be made\n'))
+            for email in dead.order_by('created_at')[:100]:
+                self.stdout.write(f"  {email.id} {email.kind} ({email.attempts} attempts): {email.last_error[:120]}")
+            self.stdout.write(self.style.SUCCESS(f'\n{dead.count()} dead email(s)'))
+            return
+
+        count = requeue_dead_emails(dead)
+        self.stdout.write(self.style.SUCCESS(f'Requeued {count} email(s); the outbox workers will deliver them'))
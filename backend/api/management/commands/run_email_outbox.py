@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from api.email_outbox import drain_outbox, start_outbox_workers
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outgoing email in the foreground (for EMAIL_OUTBOX_STANDALONE deployments)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Delivery threads (default: EMAIL_OUTBOX_WORKERS, at least 1)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver everything due now and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            drain_outbox()
+            self.stdout.write(self.style.SUCCESS('Email outbox drained'))
+            return
+
+        workers = options.get('workers') or max(settings.EMAIL_OUTBOX_WORKERS, 1)
+        threads = start_outbox_workers(workers)
+        self.stdout.write(self.style.SUCCESS(f'Email outbox running with {len(threads)} worker(s); Ctrl+C to stop'))
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self.stdout.write('Email outbox stopped')
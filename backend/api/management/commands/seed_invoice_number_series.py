@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.models import Organization, InvoiceSettings, InvoiceNumberSeries
+
+
+class Command(BaseCommand):
+    help = 'Seed invoice number series counters from existing invoices (run once after upgrading)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org-id', type=str, help='Organization UUID (optional, seeds all orgs if not provided)')
+        parser.add_argument('--dry-run', action='store_true', help='Show what would be seeded without making changes')
+
+    def handle(self, *args, **kwargs):
+        org_id = kwargs.get('org_id')
+        dry_run = kwargs.get('dry_run', False)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN - No changes will be made\n'))
+
+        if org_id:
+            try:
+                organizations = [Organization.objects.get(id=org_id)]
+            except Organization.DoesNotExist:
+                self.stdout.write(self.style.ERROR(f'Organization with ID {org_id} not found'))
+                return
+        else:
+            organizations = Organization.objects.all()
+
+        seeded_count = 0
+
+        for org in organizations:
+            try:
+                settings = InvoiceSettings.objects.get(organization=org)
+            except InvoiceSettings.DoesNotExist:
+                continue
+
+            # Current prefixes plus any prefix already tracked (settings may have changed)
+            series_keys = {
+                ('tax', settings.invoicePrefix),
+                ('proforma', settings.proformaPrefix),
+            }
+            series_keys.update(
+                InvoiceNumberSeries.objects.filter(organization=org).values_list('invoice_type', 'prefix')
+            )
+
+            for invoice_type, prefix in sorted(series_keys):
+                highest = InvoiceNumberSeries.highest_existing_number(org, invoice_type, prefix)
+
+                if dry_run:
+                    self.stdout.write(f'  Would seed {org.name} [{invoice_type}] {prefix!r} -> {highest}')
+                    seeded_count += 1
+                    continue
+
+                with transaction.atomic():
+                    series = InvoiceNumberSeries.get_or_create_series(org, invoice_type, prefix)
+                    # Never move a counter backwards
+                    if highest > series.current_number:
+                        series.current_number = highest
+                        series.save(update_fields=['current_number', 'updated_at'])
+
+                self.stdout.write(
+                    self.style.SUCCESS(f'  Seeded {org.name} [{invoice_type}] {prefix!r} -> {series.current_number}')
+                )
+                seeded_count += 1
+
+        action = 'Would seed' if dry_run else 'Seeded'
+        self.stdout.write(self.style.SUCCESS(f'\n{action} {seeded_count} series'))
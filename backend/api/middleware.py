@@ -3,12 +3,14 @@ Organization middleware for multi-tenant support.
 Sets the current organization context for each request.
 """
 import logging
+import uuid
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
 from django.http import JsonResponse
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
-from .models import OrganizationMembership, UserSession
+from .models import Organization, OrganizationMembership, UserSession
+from .cache_utils import get_cached_membership, set_cached_membership
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +40,9 @@ class OrganizationMiddleware(MiddlewareMixin):
                 validated_token = jwt_auth.get_validated_token(auth_header.split(' ')[1])
                 user = jwt_auth.get_user(validated_token)
                 request.user = user
+                # Reused by api.authentication.MiddlewareJWTAuthentication so DRF
+                # does not decode the token and load the user a second time
+                request._jwt_authentication = (user, validated_token)
                 
                 # Session validation DISABLED temporarily to allow web + setu to work together
                 # TODO: Re-enable once multi-session support is properly fixed
@@ -51,35 +56,65 @@ class OrganizationMiddleware(MiddlewareMixin):
             return
 
         # Check for organization ID in header (for switching)
-        org_id = request.headers.get('X-Organization-ID')
+        org_id = self._parse_org_id(request.headers.get('X-Organization-ID'))
 
         if org_id:
             # Validate user has access to this organization
-            try:
-                membership = OrganizationMembership.objects.select_related('organization').get(
-                    user=request.user,
-                    organization_id=org_id,
-                    is_active=True,
-                    organization__is_active=True
-                )
-                request.organization = membership.organization
-                request.organization_role = membership.role
+            organization, role = self._get_membership(request.user, org_id)
+            if organization:
+                request.organization = organization
+                request.organization_role = role
                 return
-            except OrganizationMembership.DoesNotExist:
-                # Invalid organization ID, fall through to default
-                pass
+            # Invalid organization ID, fall through to default
 
         # Get user's default organization (most recently joined active one)
         try:
-            membership = OrganizationMembership.objects.select_related('organization').filter(
-                user=request.user,
-                is_active=True,
-                organization__is_active=True
-            ).order_by('-joined_at').first()
-
-            if membership:
-                request.organization = membership.organization
-                request.organization_role = membership.role
+            organization, role = self._get_membership(request.user)
+            if organization:
+                request.organization = organization
+                request.organization_role = role
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.error(f"Error setting organization for user {request.user.email}: {str(e)}")
+
+    @staticmethod
+    def _parse_org_id(value):
+        """Canonical string form of the X-Organization-ID header, or None if malformed."""
+        if not value:
+            return None
+        try:
+            return str(uuid.UUID(str(value)))
+        except ValueError:
+            return None
+
+    def _get_membership(self, user, org_id=None):
+        """
+        Resolve (organization, role) for the user, either for the requested
+        organization or the default one. The organization id and role
+        (including 'no access') are cached briefly and invalidated by
+        membership/organization signals.
+        """
+        cached = get_cached_membership(user.id, org_id)
+        if cached is not None:
+            organization_id, role = cached
+            if organization_id is None:
+                return None, None
+            # Only ids are cached; the organization itself is always read fresh
+            organization = Organization.objects.filter(pk=organization_id, is_active=True).first()
+            return (organization, role) if organization else (None, None)
+
+        memberships = OrganizationMembership.objects.select_related('organization').filter(
+            user=user,
+            is_active=True,
+            organization__is_active=True
+        )
+        if org_id:
+            membership = memberships.filter(organization_id=org_id).first()
+        else:
+            membership = memberships.order_by('-joined_at').first()
+
+        if membership:
+            set_cached_membership(user.id, org_id, membership.organization_id, membership.role)
+            return membership.organization, membership.role
+        set_cached_membership(user.id, org_id, None, None)
+        return None, None
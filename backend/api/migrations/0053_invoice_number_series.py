@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0052_accountgroup_ledgeraccount_bankreconciliation_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InvoiceNumberSeries",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("invoice_type", models.CharField(max_length=20)),
+                ("prefix", models.CharField(blank=True, max_length=20)),
+                ("current_number", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="invoice_number_series",
+                        to="api.organization",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Invoice Number Series",
+                "verbose_name_plural": "Invoice Number Series",
+                "unique_together": {("organization", "invoice_type", "prefix")},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_payment_totals(apps, schema_editor):
+    Invoice = apps.get_model("api", "Invoice")
+    Payment = apps.get_model("api", "Payment")
+
+    paid = (
+        Payment.objects.filter(invoice=OuterRef("pk"))
+        .values("invoice")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    Invoice.objects.update(
+        amount_paid=Coalesce(Subquery(paid, output_field=DecimalField()), 0, output_field=DecimalField())
+    )
+    Invoice.objects.update(outstanding=F("total_amount") - F("amount_paid"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0053_invoice_number_series"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="invoice",
+            name="amount_paid",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0.0,
+                help_text="Sum of payments recorded against this invoice",
+                max_digits=12,
+            ),
+        ),
+        migrations.AddField(
+            model_name="invoice",
+            name="outstanding",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0.0,
+                help_text="total_amount - amount_paid",
+                max_digits=12,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="invoice",
+            index=models.Index(
+                fields=["organization", "outstanding"], name="idx_invoice_org_outstanding"
+            ),
+        ),
+        migrations.RunPython(backfill_payment_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0054_invoice_amount_paid_outstanding"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportJob",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("kind", models.CharField(choices=[("data", "Organization Data"), ("personal_data", "Personal Data")], default="data", max_length=20)),
+                ("export_format", models.CharField(default="excel", help_text="excel, csv or json", max_length=10)),
+                ("data_type", models.CharField(default="all", help_text="all, invoices, clients or payments", max_length=20)),
+                ("status", models.CharField(choices=[("pending", "Pending"), ("running", "Running"), ("completed", "Completed"), ("failed", "Failed")], default="pending", max_length=20)),
+                ("progress", models.PositiveSmallIntegerField(default=0, help_text="Percent complete")),
+                ("rows_written", models.PositiveIntegerField(default=0)),
+                ("total_rows", models.PositiveIntegerField(default=0)),
+                ("error_message", models.TextField(blank=True)),
+                ("file_name", models.CharField(blank=True, help_text="Download file name", max_length=255)),
+                ("file_path", models.CharField(blank=True, help_text="Path inside EXPORT_FILES_ROOT", max_length=500)),
+                ("file_size", models.PositiveBigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                ("organization", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="export_jobs", to="api.organization")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="export_jobs", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "verbose_name": "Export Job",
+                "verbose_name_plural": "Export Jobs",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(fields=["user", "-created_at"], name="idx_exportjob_user_created"),
+                    models.Index(fields=["status", "created_at"], name="idx_exportjob_status_created"),
+                ],
+            },
+        ),
+    ]
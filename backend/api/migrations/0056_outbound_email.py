@@ -0,0 +1,42 @@
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0055_export_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboundEmail",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("kind", models.CharField(choices=[("system", "System Email"), ("invoice", "Invoice"), ("receipt", "Receipt"), ("campaign", "Campaign Email")], max_length=20)),
+                ("payload", models.JSONField(blank=True, default=dict, help_text='What to send, e.g. {"invoice_id": 1}')),
+                ("idempotency_key", models.CharField(blank=True, help_text="Enqueueing the same key again returns the existing email", max_length=255, null=True, unique=True)),
+                ("priority", models.PositiveSmallIntegerField(default=5, help_text="Lower is sent first")),
+                ("status", models.CharField(choices=[("pending", "Pending"), ("sending", "Sending"), ("sent", "Sent"), ("dead", "Dead Letter")], default="pending", max_length=20)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("max_attempts", models.PositiveSmallIntegerField(default=5)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("locked_at", models.DateTimeField(blank=True, help_text="When a worker claimed it", null=True)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                ("organization", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="outbound_emails", to="api.organization")),
+            ],
+            options={
+                "verbose_name": "Outbound Email",
+                "verbose_name_plural": "Outbound Emails",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(fields=["status", "priority", "next_attempt_at"], name="idx_outbound_due"),
+                    models.Index(fields=["organization", "-created_at"], name="idx_outbound_org_created"),
+                ],
+            },
+        ),
+    ]
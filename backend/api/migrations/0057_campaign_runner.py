@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0056_outbound_email"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bulkemailcampaign",
+            name="runner_heartbeat",
+            field=models.DateTimeField(blank=True, help_text="Last sign of life of the sending runner", null=True),
+        ),
+        migrations.AlterField(
+            model_name="bulkemailrecipient",
+            name="status",
+            field=models.CharField(choices=[("pending", "Pending"), ("queued", "Queued"), ("sent", "Sent"), ("failed", "Failed"), ("bounced", "Bounced")], default="pending", max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name="bulkemailrecipient",
+            index=models.Index(fields=["campaign", "status"], name="idx_bulkrecipient_campaign_st"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0057_campaign_runner"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobLease",
+            fields=[
+                ("key", models.CharField(help_text='Job and shard, e.g. "payment_reminders:<org id>"', max_length=150, primary_key=True, serialize=False)),
+                ("owner", models.CharField(blank=True, help_text="Token of the worker holding the lease", max_length=64)),
+                ("acquired_at", models.DateTimeField(blank=True, null=True)),
+                ("expires_at", models.DateTimeField(blank=True, help_text="Free when empty or in the past", null=True)),
+            ],
+            options={
+                "verbose_name": "Job Lease",
+                "verbose_name_plural": "Job Leases",
+            },
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0058_job_lease"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="scheduledinvoice",
+            index=models.Index(fields=["status", "next_generation_date"], name="idx_schedinv_due"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+def mark_posted_vouchers_applied(apps, schema_editor):
+    # Ledger balances were recomputed from every posted voucher so far
+    Voucher = apps.get_model("api", "Voucher")
+    Voucher.objects.filter(status="posted").update(balance_applied=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0059_scheduled_invoice_due_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="voucher",
+            name="balance_applied",
+            field=models.BooleanField(default=False, help_text="Whether the entries are counted in the ledgers' current balances"),
+        ),
+        migrations.RunPython(mark_posted_vouchers_applied, migrations.RunPython.noop),
+    ]
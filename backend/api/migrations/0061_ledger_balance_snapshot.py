@@ -0,0 +1,57 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_snapshots(apps, schema_editor):
+    # Cumulative monthly totals per ledger from the posted entries so far
+    VoucherEntry = apps.get_model("api", "VoucherEntry")
+    LedgerBalanceSnapshot = apps.get_model("api", "LedgerBalanceSnapshot")
+
+    monthly = VoucherEntry.objects.filter(voucher__status="posted").annotate(
+        month=TruncMonth("voucher__voucher_date")
+    ).order_by("ledger_account_id", "month").values("ledger_account_id", "month").annotate(
+        debit=Sum("debit_amount"),
+        credit=Sum("credit_amount"),
+    )
+
+    snapshots = []
+    ledger_id, debit_total, credit_total = None, 0, 0
+    for row in monthly.iterator(chunk_size=2000):
+        if row["ledger_account_id"] != ledger_id:
+            ledger_id, debit_total, credit_total = row["ledger_account_id"], 0, 0
+        debit_total += row["debit"] or 0
+        credit_total += row["credit"] or 0
+        snapshots.append(LedgerBalanceSnapshot(
+            ledger_id=ledger_id, month=row["month"],
+            debit_total=debit_total, credit_total=credit_total,
+        ))
+    LedgerBalanceSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0060_voucher_balance_applied"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerBalanceSnapshot",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("month", models.DateField(help_text="First day of the month")),
+                ("debit_total", models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ("credit_total", models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ("ledger", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="balance_snapshots", to="api.ledgeraccount")),
+            ],
+            options={
+                "verbose_name": "Ledger Balance Snapshot",
+                "verbose_name_plural": "Ledger Balance Snapshots",
+                "ordering": ["ledger", "month"],
+                "unique_together": {("ledger", "month")},
+            },
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
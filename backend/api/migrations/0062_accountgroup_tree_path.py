@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    # Materialized path and stored full path for the existing groups
+    AccountGroup = apps.get_model("api", "AccountGroup")
+    groups = {group.pk: group for group in AccountGroup.objects.all()}
+
+    def paths(group):
+        if not group.tree_path:
+            parent = groups.get(group.parent_id)
+            if parent:
+                parent_tree_path, parent_full_path = paths(parent)
+                group.tree_path = f"{parent_tree_path}{group.pk}/"
+                group.full_path = f"{parent_full_path} > {group.name}"
+            else:
+                group.tree_path = f"{group.pk}/"
+                group.full_path = group.name
+        return group.tree_path, group.full_path
+
+    for group in groups.values():
+        paths(group)
+    AccountGroup.objects.bulk_update(groups.values(), ["tree_path", "full_path"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0061_ledger_balance_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="accountgroup",
+            name="tree_path",
+            field=models.CharField(blank=True, db_index=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="accountgroup",
+            name="full_path",
+            field=models.CharField(blank=True, default="", max_length=500),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.utils import timezone
@@ -387,6 +387,9 @@ class Invoice(models.Model):
     emailed_at = models.DateTimeField(null=True, blank=True)
     last_reminder_sent = models.DateTimeField(null=True, blank=True, help_text='Last payment reminder sent date')
     reminder_count = models.IntegerField(default=0, help_text='Number of reminders sent')
+    # Receivables ledger - maintained by Payment.save()/delete(), repaired by reconcile_outstanding
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, help_text='Sum of payments recorded against this invoice')
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, help_text='total_amount - amount_paid')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -397,6 +400,7 @@ class Invoice(models.Model):
             models.Index(fields=['organization', 'invoice_type'], name='idx_invoice_org_type'),
             models.Index(fields=['organization', 'invoice_date'], name='idx_invoice_org_date'),
             models.Index(fields=['organization', 'client'], name='idx_invoice_org_client'),
+            models.Index(fields=['organization', 'outstanding'], name='idx_invoice_org_outstanding'),
         ]
 
     def __str__(self):
@@ -408,9 +412,15 @@ class Invoice(models.Model):
         Calculate the due date based on invoice_date and payment_term.
         If payment_term is set, add those days to invoice_date.
         Otherwise, use paymentDueDays from InvoiceSettings (default 30 days).
+
+        Invoices loaded through Invoice.annotate_due_days() carry the resolved
+        number of days and need no extra queries.
         """
         from datetime import timedelta
 
+        if 'due_days' in self.__dict__:
+            return self.invoice_date + timedelta(days=self.due_days)
+
         if self.payment_term and self.payment_term.days:
             # Use payment term days
             return self.invoice_date + timedelta(days=self.payment_term.days)
@@ -423,6 +433,63 @@ class Invoice(models.Model):
                 # Default to 30 days if no settings found
                 return self.invoice_date + timedelta(days=30)
 
+    @classmethod
+    def annotate_due_days(cls, queryset):
+        """
+        Annotate an invoice queryset with ``due_days``: the payment term's days,
+        else the organization's paymentDueDays, else 30 - the same rules as
+        due_date, resolved in SQL so bulk consumers (exports, reminders) read
+        due_date without a query per invoice. Uses subqueries rather than joins
+        so it can be combined with select_for_update().
+        """
+        from django.db.models.functions import Coalesce
+
+        term_days = PaymentTerm.objects.filter(
+            pk=models.OuterRef('payment_term_id'),
+            days__gt=0
+        ).values('days')[:1]
+        default_days = InvoiceSettings.objects.filter(
+            organization=models.OuterRef('organization_id')
+        ).values('paymentDueDays')[:1]
+        return queryset.annotate(
+            due_days=Coalesce(
+                models.Subquery(term_days),
+                models.Subquery(default_days),
+                models.Value(30),
+                output_field=models.IntegerField()
+            )
+        )
+
+    @classmethod
+    def reminders_due(cls, now=None):
+        """
+        Unpaid proforma/tax invoices whose payment reminder is due, decided in
+        one query against the organization's InvoiceSettings: the invoice is
+        reminderFrequencyDays old and never reminded, or the last reminder was
+        that long ago. Invoices whose client has no email are left out.
+        """
+        from .db_functions import DaysBetween
+
+        now = now or timezone.now()
+        frequency = models.F('organization__invoice_settings__reminderFrequencyDays')
+        return cls.objects.filter(
+            organization__invoice_settings__enablePaymentReminders=True,
+            invoice_type__in=['proforma', 'tax'],
+            status__in=['draft', 'sent'],
+        ).exclude(
+            models.Q(client__email='') | models.Q(client__email__isnull=True)
+        ).annotate(
+            days_since_invoice=DaysBetween(
+                models.F('invoice_date'), models.Value(now.date(), output_field=models.DateField())
+            ),
+            days_since_reminder=DaysBetween(
+                models.F('last_reminder_sent'), models.Value(now, output_field=models.DateTimeField())
+            ),
+        ).filter(
+            models.Q(last_reminder_sent__isnull=True, days_since_invoice__gte=frequency)
+            | models.Q(last_reminder_sent__isnull=False, days_since_reminder__gte=frequency)
+        ).select_related('client')
+
     def should_apply_gst(self):
         """
         Determine if GST should be applied to this invoice based on:
@@ -449,65 +516,193 @@ class Invoice(models.Model):
             # Default to applying GST if settings don't exist
             return True
 
+    def update_payment_totals(self, save=True):
+        """
+        Recalculate amount_paid and outstanding from this invoice's payments.
+        Only touches the two columns so a concurrent edit of other fields is not lost.
+        """
+        from decimal import Decimal
+        from django.db.models import Sum
+
+        total_paid = self.payments.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        self.amount_paid = total_paid
+        self.outstanding = Decimal(str(self.total_amount or 0)) - total_paid
+
+        if save and self.pk:
+            Invoice.objects.filter(pk=self.pk).update(
+                amount_paid=self.amount_paid,
+                outstanding=self.outstanding
+            )
+
     def save(self, *args, **kwargs):
+        from decimal import Decimal
+        from django.db.models import F, Value
+
+        # Keep outstanding in step with edits to the invoice total
+        total = Decimal(str(self.total_amount or 0))
+        update_fields = kwargs.get('update_fields')
+        writes_amount_paid = self._state.adding or update_fields is None or 'amount_paid' in update_fields
+        stored_amount_paid = False
+        if update_fields is None and not self._state.adding:
+            # amount_paid is maintained by Payment.save()/delete() with
+            # queryset updates, so this instance's copy may be stale: full
+            # saves leave it out and work outstanding out from the stored value
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'amount_paid'
+            ]
+            writes_amount_paid = False
+        if writes_amount_paid:
+            self.outstanding = total - Decimal(str(self.amount_paid or 0))
+        elif 'total_amount' in update_fields:
+            stored_amount_paid = True
+            self.outstanding = Value(total, output_field=self._meta.get_field('outstanding')) - F('amount_paid')
+        if update_fields is not None:
+            if 'total_amount' in update_fields or 'amount_paid' in update_fields:
+                update_fields = set(update_fields) | {'outstanding'}
+            kwargs['update_fields'] = update_fields
+
         # Auto-generate unique invoice number if not provided
         if not self.invoice_number:
-            # Auto-generate invoice number with separate series for proforma and tax invoices
+            # Allocate from a per-series counter held under a row lock, so the
+            # cost stays flat as the organization grows and concurrent creates
+            # never hand out the same number. The transaction spans the insert
+            # so a failed save does not burn a number.
+            with transaction.atomic():
+                try:
+                    settings = InvoiceSettings.objects.get(organization=self.organization)
+
+                    # Use different prefixes and starting numbers for proforma and tax invoices
+                    if self.invoice_type == 'proforma':
+                        prefix = settings.proformaPrefix  # Proforma Invoice prefix (e.g., 'PI-')
+                        starting_num = settings.proformaStartingNumber
+                    else:
+                        prefix = settings.invoicePrefix  # Tax Invoice prefix (e.g., 'INV-')
+                        starting_num = settings.startingNumber
+
+                    series = InvoiceNumberSeries.get_or_create_series(
+                        self.organization, self.invoice_type, prefix
+                    )
+                    self.invoice_number = series.get_next_number(starting_num)
+
+                except InvoiceSettings.DoesNotExist:
+                    prefix = 'PI-' if self.invoice_type == 'proforma' else 'INV-'
+                    self.invoice_number = f"{prefix}{self.id or 1:04d}"
+
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+
+            # Explicit numbers (imports, Tally sync, edits) move the series
+            # counter past them, so generated numbers don't have to skip over them
+            if update_fields is None or 'invoice_number' in update_fields:
+                InvoiceNumberSeries.advance_past(self.organization_id, self.invoice_type, self.invoice_number)
+
+        if stored_amount_paid:
+            self.refresh_from_db(fields=['amount_paid', 'outstanding'])
+
+
+class InvoiceNumberSeries(models.Model):
+    """
+    Running counter per (organization, invoice type, prefix).
+    Replaces scanning every existing invoice to find the next number.
+    Rows are created lazily (seeded from existing invoices) or up front
+    by the ``seed_invoice_number_series`` management command.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='invoice_number_series')
+    invoice_type = models.CharField(max_length=20)
+    prefix = models.CharField(max_length=20, blank=True)
+    current_number = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['organization', 'invoice_type', 'prefix']
+        verbose_name = "Invoice Number Series"
+        verbose_name_plural = "Invoice Number Series"
+
+    def __str__(self):
+        return f"{self.organization.name} - {self.invoice_type} ({self.prefix}{self.current_number})"
+
+    @classmethod
+    def highest_existing_number(cls, organization, invoice_type, prefix):
+        """
+        Highest numeric suffix among existing invoices in this series.
+        Only used to seed a new series, never on the hot path.
+        """
+        numbers = Invoice.objects.filter(
+            organization=organization,
+            invoice_type=invoice_type,
+            invoice_number__startswith=prefix
+        ).values_list('invoice_number', flat=True)
+
+        max_num = 0
+        for invoice_number in numbers.iterator(chunk_size=2000):
             try:
-                settings = InvoiceSettings.objects.get(organization=self.organization)
+                # Extract numeric part after prefix
+                num = int(invoice_number[len(prefix):])
+            except (ValueError, TypeError):
+                # Skip invoices with non-numeric suffixes
+                continue
+            if num > max_num:
+                max_num = num
+        return max_num
 
-                # Use different prefixes and starting numbers for proforma and tax invoices
-                if self.invoice_type == 'proforma':
-                    prefix = settings.proformaPrefix  # Proforma Invoice prefix (e.g., 'PI-')
-                    starting_num = settings.proformaStartingNumber
-                else:
-                    prefix = settings.invoicePrefix  # Tax Invoice prefix (e.g., 'INV-')
-                    starting_num = settings.startingNumber
-
-                # Find the highest invoice number by extracting numeric part from all matching invoices
-                # This ensures we always get the next number in sequence regardless of creation order
-                matching_invoices = Invoice.objects.filter(
-                    organization=self.organization,
-                    invoice_type=self.invoice_type,
-                    invoice_number__startswith=prefix
-                )
+    @classmethod
+    def get_or_create_series(cls, organization, invoice_type, prefix):
+        """
+        Get the series row locked for update, creating and seeding it on first use.
+        Must be called inside a transaction.
+        """
+        series, created = cls.objects.select_for_update().get_or_create(
+            organization=organization,
+            invoice_type=invoice_type,
+            prefix=prefix,
+            defaults={
+                'current_number': lambda: cls.highest_existing_number(organization, invoice_type, prefix),
+            }
+        )
+        return series
 
-                max_num = 0
-                for inv in matching_invoices:
-                    try:
-                        # Extract numeric part after prefix
-                        num_str = inv.invoice_number.replace(prefix, '')
-                        num = int(num_str)
-                        if num > max_num:
-                            max_num = num
-                    except (ValueError, TypeError):
-                        # Skip invoices with non-numeric suffixes
-                        continue
-
-                # Determine new number: max found + 1, or starting number if none found
-                if max_num > 0:
-                    new_num = max_num + 1
-                else:
-                    new_num = starting_num
-
-                # Ensure uniqueness by checking if the generated number already exists
-                max_attempts = 100
-                for attempt in range(max_attempts):
-                    potential_number = f"{prefix}{new_num:04d}"
-                    if not Invoice.objects.filter(invoice_number=potential_number).exists():
-                        self.invoice_number = potential_number
-                        break
-                    new_num += 1
-                else:
-                    # Fallback if all attempts fail
-                    import uuid
-                    self.invoice_number = f"{prefix}{uuid.uuid4().hex[:8].upper()}"
+    @classmethod
+    def advance_past(cls, organization_id, invoice_type, invoice_number):
+        """
+        Move the counter of the series an explicitly numbered invoice belongs
+        to (prefix followed by digits) up to its number. The conditional
+        UPDATE leaves the row alone, and unlocked, when it is already past it.
+        """
+        for series_id, prefix in cls.objects.filter(
+            organization_id=organization_id, invoice_type=invoice_type
+        ).values_list('id', 'prefix'):
+            suffix = invoice_number[len(prefix):]
+            if invoice_number.startswith(prefix) and suffix.isdigit():
+                cls.objects.filter(pk=series_id, current_number__lt=int(suffix)).update(
+                    current_number=int(suffix), updated_at=timezone.now()
+                )
 
-            except InvoiceSettings.DoesNotExist:
-                prefix = 'PI-' if self.invoice_type == 'proforma' else 'INV-'
-                self.invoice_number = f"{prefix}{self.id or 1:04d}"
+    def get_next_number(self, starting_number=1):
+        """Generate next invoice number and increment counter"""
+        new_num = max(self.current_number + 1, starting_number or 1)
+
+        # invoice_number is unique across all organizations, so skip any
+        # number already taken (e.g. another tenant using the same prefix).
+        # After a long run of taken numbers, re-seed from the highest number
+        # in the series instead of probing one by one.
+        attempts = 0
+        while True:
+            potential_number = f"{self.prefix}{new_num:04d}"
+            if not Invoice.objects.filter(invoice_number=potential_number).exists():
+                break
+            new_num += 1
+            attempts += 1
+            if attempts % 100 == 0:
+                new_num = max(
+                    new_num,
+                    self.highest_existing_number(self.organization, self.invoice_type, self.prefix) + 1
+                )
 
-        super().save(*args, **kwargs)
+        self.current_number = new_num
+        self.save(update_fields=['current_number', 'updated_at'])
+        return potential_number
 
 
 class InvoiceItem(models.Model):
@@ -558,12 +753,34 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment {self.amount} for {self.invoice.invoice_number}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the invoice as loaded so moving a payment updates both invoices
+        instance._loaded_invoice_id = instance.__dict__.get('invoice_id')
+        return instance
+
     def save(self, *args, **kwargs):
         # If amount_received is not set, calculate it from amount - tds_amount - gst_tds_amount
         if self.amount_received == 0 and self.amount > 0:
             self.amount_received = self.amount - self.tds_amount - self.gst_tds_amount
         super().save(*args, **kwargs)
 
+        # Keep the invoice's receivable columns current
+        self.invoice.update_payment_totals()
+        previous_invoice_id = getattr(self, '_loaded_invoice_id', None)
+        if previous_invoice_id and previous_invoice_id != self.invoice_id:
+            previous_invoice = Invoice.objects.filter(pk=previous_invoice_id).first()
+            if previous_invoice:
+                previous_invoice.update_payment_totals()
+        self._loaded_invoice_id = self.invoice_id
+
+    def delete(self, *args, **kwargs):
+        invoice = self.invoice
+        result = super().delete(*args, **kwargs)
+        invoice.update_payment_totals()
+        return result
+
 
 class Receipt(models.Model):
     """
@@ -1641,6 +1858,9 @@ class BulkEmailCampaign(models.Model):
     # Error tracking
     error_message = models.TextField(blank=True)
 
+    # Background runner liveness (see api.campaigns)
+    runner_heartbeat = models.DateTimeField(null=True, blank=True, help_text='Last sign of life of the sending runner')
+
     # Audit
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_email_campaigns')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -1661,6 +1881,7 @@ class BulkEmailRecipient(models.Model):
     """
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('queued', 'Queued'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
         ('bounced', 'Bounced'),
@@ -1683,6 +1904,9 @@ class BulkEmailRecipient(models.Model):
         verbose_name = "Bulk Email Recipient"
         verbose_name_plural = "Bulk Email Recipients"
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['campaign', 'status'], name='idx_bulkrecipient_campaign_st'),
+        ]
 
     def __str__(self):
         return f"{self.email} - {self.status}"
@@ -2152,132 +2376,131 @@ class ScheduledInvoice(models.Model):
         verbose_name = "Scheduled Invoice"
         verbose_name_plural = "Scheduled Invoices"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_generation_date'], name='idx_schedinv_due'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.client.name} ({self.frequency})"
 
-    def calculate_next_generation_date(self, from_date=None):
-        """Calculate the next date when invoice should be generated"""
-        from datetime import date, timedelta
-        from dateutil.relativedelta import relativedelta
-
-        if from_date is None:
-            from_date = date.today()
-
-        # If schedule hasn't started yet, return start_date
-        if from_date < self.start_date:
-            return self.start_date
+    @classmethod
+    def due_for_generation(cls, today=None):
+        """
+        Active schedules with an invoice due on or before `today` - an index
+        range scan on next_generation_date, which always holds the next
+        occurrence not generated yet (None once the schedule has finished).
+        """
+        from datetime import date
 
-        # Check if max occurrences reached
-        if self.max_occurrences and self.occurrences_generated >= self.max_occurrences:
-            return None
+        return cls.objects.filter(
+            status='active',
+            next_generation_date__lte=today or date.today()
+        )
 
-        # Check if end date passed
-        if self.end_date and from_date > self.end_date:
-            return None
+    def occurrence_after(self, from_date):
+        """
+        The first date strictly after from_date that matches the recurrence
+        pattern, ignoring start/end dates and max occurrences.
+        """
+        from datetime import timedelta
+        from dateutil.relativedelta import relativedelta
 
         if self.frequency == 'daily':
-            next_date = from_date + timedelta(days=1)
+            return from_date + timedelta(days=1)
 
-        elif self.frequency == 'weekly':
+        if self.frequency == 'weekly':
             # Find next occurrence of the specified day of week
-            days_ahead = self.day_of_week - from_date.weekday()
+            days_ahead = (self.day_of_week or 0) - from_date.weekday()
             if days_ahead <= 0:  # Target day already happened this week
                 days_ahead += 7
-            next_date = from_date + timedelta(days=days_ahead)
-
-        elif self.frequency == 'monthly':
-            # Next month on the specified day
-            next_date = from_date + relativedelta(months=1)
-            # Handle months with fewer days
-            day = min(self.day_of_month, 28)
-            next_date = next_date.replace(day=day)
+            return from_date + timedelta(days=days_ahead)
 
+        # Monthly, quarterly (months counted from start_date's month) and
+        # yearly (month_of_year) schedules fall on day_of_month, capped at 28
+        # to handle months with fewer days
+        if self.frequency == 'monthly':
+            step, anchor_month = 1, 1
         elif self.frequency == 'quarterly':
-            # Every 3 months on the specified day
-            next_date = from_date + relativedelta(months=3)
-            day = min(self.day_of_month, 28)
-            next_date = next_date.replace(day=day)
-
+            step, anchor_month = 3, self.start_date.month
         elif self.frequency == 'yearly':
-            # Next year on the specified month and day
-            next_date = from_date + relativedelta(years=1)
-            month = self.month_of_year or 1
-            day = min(self.day_of_month, 28)
-            next_date = next_date.replace(month=month, day=day)
-
+            step, anchor_month = 12, self.month_of_year or 1
         else:
             return None
 
-        # Check end date
-        if self.end_date and next_date > self.end_date:
-            return None
+        day = min(self.day_of_month, 28)
+        month_start = from_date.replace(day=1)
+        for months_ahead in range(step + 1):
+            candidate = (month_start + relativedelta(months=months_ahead)).replace(day=day)
+            if candidate > from_date and (candidate.month - anchor_month) % step == 0:
+                return candidate
+        return None
 
-        return next_date
+    def first_generation_date(self, not_before=None):
+        """First occurrence on or after start_date (and not_before, if given)."""
+        from datetime import timedelta
 
-    def should_generate_today(self):
-        """Check if an invoice should be generated today"""
-        from datetime import date
-        today = date.today()
+        from_date = max(self.start_date, not_before) if not_before else self.start_date
+        return self.calculate_next_generation_date(from_date - timedelta(days=1))
 
-        # Check status
-        if self.status != 'active':
-            return False
+    def reschedule(self):
+        """
+        Recompute next_generation_date from today on, e.g. after the recurrence
+        settings changed or the schedule was resumed. Periods before today are
+        not generated, and nothing is generated twice on the same day.
+        """
+        from datetime import date, timedelta
 
-        # Check start date
-        if today < self.start_date:
-            return False
+        not_before = date.today()
+        if self.last_generated_date and self.last_generated_date >= not_before:
+            not_before = self.last_generated_date + timedelta(days=1)
+        self.next_generation_date = self.first_generation_date(not_before=not_before)
 
-        # Check end date
-        if self.end_date and today > self.end_date:
-            return False
+    def calculate_next_generation_date(self, from_date=None):
+        """
+        Calculate the next date after from_date when an invoice should be
+        generated, or None once the schedule has ended.
+        """
+        from datetime import date, timedelta
 
-        # Check max occurrences
-        if self.max_occurrences and self.occurrences_generated >= self.max_occurrences:
-            return False
+        if from_date is None:
+            from_date = date.today()
 
-        # Check if already generated today
-        if self.last_generated_date == today:
-            return False
+        # If schedule hasn't started yet, start counting from start_date
+        if from_date < self.start_date:
+            from_date = self.start_date - timedelta(days=1)
 
-        # Use next_generation_date for reliable scheduling
-        # This is the most reliable way to check as it's calculated correctly
-        if self.next_generation_date:
-            return today >= self.next_generation_date
+        # Check if max occurrences reached
+        if self.max_occurrences and self.occurrences_generated >= self.max_occurrences:
+            return None
 
-        # Fallback: Check if today matches the schedule pattern
-        if self.frequency == 'daily':
-            return True
+        # Check if end date passed
+        if self.end_date and from_date > self.end_date:
+            return None
 
-        elif self.frequency == 'weekly':
-            return today.weekday() == self.day_of_week
+        next_date = self.occurrence_after(from_date)
 
-        elif self.frequency == 'monthly':
-            day = min(self.day_of_month, 28)
-            return today.day == day
+        # Check end date
+        if next_date is None or (self.end_date and next_date > self.end_date):
+            return None
 
-        elif self.frequency == 'quarterly':
-            day = min(self.day_of_month, 28)
-            # Check if today is the correct day and a quarterly month from start_date
-            if today.day != day:
-                return False
-            # Calculate quarterly months based on start_date's month
-            start_month = self.start_date.month
-            # Generate the 4 quarterly months based on start month
-            quarterly_months = [(start_month + i * 3 - 1) % 12 + 1 for i in range(4)]
-            return today.month in quarterly_months
+        return next_date
 
-        elif self.frequency == 'yearly':
-            day = min(self.day_of_month, 28)
-            month = self.month_of_year or 1
-            return today.day == day and today.month == month
+    def should_generate_today(self):
+        """Check if an invoice is due today (or overdue from missed runs)"""
+        from datetime import date
 
-        return False
+        return (
+            self.status == 'active'
+            and self.next_generation_date is not None
+            and self.next_generation_date <= date.today()
+        )
 
     def save(self, *args, **kwargs):
-        # Calculate next generation date if not set
-        if not self.next_generation_date:
-            self.next_generation_date = self.calculate_next_generation_date(self.start_date)
+        # A new schedule starts its due queue at the first occurrence from
+        # today, rather than back-filling periods before it was created
+        if self._state.adding and not self.next_generation_date and self.status == 'active':
+            from datetime import date
+            self.next_generation_date = self.first_generation_date(not_before=date.today())
         super().save(*args, **kwargs)
 
 
@@ -3178,6 +3401,11 @@ class AccountGroup(models.Model):
     sequence = models.IntegerField(default=0)  # Display order
     description = models.TextField(blank=True)
 
+    # Materialized path, maintained by save(): ancestor ids down to this group
+    # ("12/40/57/"), so a subtree is a tree_path__startswith filter
+    tree_path = models.CharField(max_length=255, blank=True, default='', db_index=True)
+    full_path = models.CharField(max_length=500, blank=True, default='')  # Parent > Child > Grandchild
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -3192,15 +3420,93 @@ class AccountGroup(models.Model):
             return f"{self.parent.name} > {self.name}"
         return self.name
 
-    @property
-    def full_path(self):
-        """Get full hierarchical path: Parent > Child > Grandchild"""
-        path = [self.name]
-        current = self.parent
-        while current:
-            path.insert(0, current.name)
-            current = current.parent
-        return ' > '.join(path)
+    def save(self, *args, **kwargs):
+        """
+        Keep tree_path and full_path in step with parent and name. When a
+        group is renamed or moved, the paths of its whole subtree are
+        rewritten in one pass.
+        """
+        # Paths are read from the database: in-memory instances of this group
+        # or its parent may predate a rename or move of an ancestor
+        old_tree_path, old_full_path = '', ''
+        if self.pk:
+            old_tree_path, old_full_path = AccountGroup.objects.filter(pk=self.pk).values_list(
+                'tree_path', 'full_path'
+            ).first() or ('', '')
+        parent_tree_path, parent_full_path = '', ''
+        if self.parent_id:
+            parent_tree_path, parent_full_path = AccountGroup.objects.filter(pk=self.parent_id).values_list(
+                'tree_path', 'full_path'
+            ).get()
+        self.full_path = f"{parent_full_path} > {self.name}" if self.parent_id else self.name
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'full_path'}
+        super().save(*args, **kwargs)
+
+        # The id is only known after the first save
+        self.tree_path = f"{parent_tree_path}{self.pk}/"
+        if self.tree_path != old_tree_path:
+            AccountGroup.objects.filter(pk=self.pk).update(tree_path=self.tree_path)
+
+        if old_tree_path and (old_tree_path, old_full_path) != (self.tree_path, self.full_path):
+            descendants = list(
+                AccountGroup.objects.filter(
+                    organization_id=self.organization_id, tree_path__startswith=old_tree_path
+                ).exclude(pk=self.pk)
+            )
+            for group in descendants:
+                group.tree_path = self.tree_path + group.tree_path[len(old_tree_path):]
+                group.full_path = self.full_path + group.full_path[len(old_full_path):]
+            AccountGroup.objects.bulk_update(descendants, ['tree_path', 'full_path'])
+
+    def is_descendant_of(self, group):
+        """True if this group lies in group's subtree (including group itself)."""
+        return bool(group.tree_path) and self.tree_path.startswith(group.tree_path)
+
+    @classmethod
+    def load_tree(cls, organization):
+        """
+        The organization's whole group tree in one query. Returns the root
+        groups in display order; every group gets `tree_children`,
+        `ledger_count` (own ledgers), `balance` (own ledgers, signed with Dr
+        positive) and the subtree rollups `total_ledger_count` and
+        `total_balance`.
+        """
+        from decimal import Decimal
+        from django.db.models import Case, F, When
+        from django.db.models.functions import Coalesce
+
+        signed_balance = Case(
+            When(accounts__current_balance_type='Dr', then=F('accounts__current_balance')),
+            default=-F('accounts__current_balance'),
+            output_field=models.DecimalField(max_digits=15, decimal_places=2),
+        )
+        groups = list(
+            cls.objects.filter(organization=organization).annotate(
+                ledger_count=models.Count('accounts'),
+                balance=Coalesce(models.Sum(signed_balance), Decimal('0.00'),
+                                 output_field=models.DecimalField(max_digits=15, decimal_places=2)),
+            ).order_by('sequence', 'name')
+        )
+
+        by_id = {group.pk: group for group in groups}
+        roots = []
+        for group in groups:
+            group.tree_children = []
+            group.total_ledger_count = group.ledger_count
+            group.total_balance = group.balance
+        for group in groups:
+            parent = by_id.get(group.parent_id)
+            (parent.tree_children if parent else roots).append(group)
+
+        # Deepest groups first, so every child is complete before its parent
+        for group in sorted(groups, key=lambda group: group.tree_path.count('/'), reverse=True):
+            parent = by_id.get(group.parent_id)
+            if parent:
+                parent.total_ledger_count += group.total_ledger_count
+                parent.total_balance += group.total_balance
+        return roots
 
 
 class LedgerAccount(models.Model):
@@ -3271,8 +3577,78 @@ class LedgerAccount(models.Model):
     def __str__(self):
         return f"{self.name} ({self.group.name})"
 
+    @classmethod
+    def apply_balance_delta(cls, ledger_id, delta):
+        """
+        Move a ledger's current balance by `delta` (debit positive, credit
+        negative) with a single UPDATE computed from the stored balance, so
+        the cost does not depend on how many entries the ledger has. Call
+        inside the transaction that posts or cancels the voucher.
+        """
+        from django.db.models.functions import Abs
+        from django.db.models.lookups import GreaterThanOrEqual
+
+        amount = models.DecimalField(max_digits=15, decimal_places=2)
+        # Signed balance: Dr positive, Cr negative
+        signed = models.Case(
+            models.When(current_balance_type='Dr', then=models.F('current_balance')),
+            default=-models.F('current_balance'),
+            output_field=amount,
+        ) + models.Value(delta, output_field=amount)
+        cls.objects.filter(pk=ledger_id).update(
+            current_balance=Abs(signed),
+            current_balance_type=models.Case(
+                models.When(GreaterThanOrEqual(signed, 0), then=models.Value('Dr')),
+                default=models.Value('Cr'),
+            ),
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def recalculate_balances(cls, queryset, save=True):
+        """
+        Recompute current balances of the ledgers in `queryset` from their
+        opening balance and every posted voucher entry, in one aggregate
+        query. Used to repair drift; posting keeps balances up to date
+        incrementally. Returns [(ledger, previous balance display)] for the
+        ledgers whose balance changed (saved unless save=False).
+        """
+        from django.db.models import Sum
+        from django.db.models.functions import Coalesce
+
+        zero = models.Value(0, output_field=models.DecimalField(max_digits=15, decimal_places=2))
+        posted = models.Q(voucher_entries__voucher__status='posted')
+        ledgers = queryset.annotate(
+            posted_debit=Coalesce(Sum('voucher_entries__debit_amount', filter=posted), zero),
+            posted_credit=Coalesce(Sum('voucher_entries__credit_amount', filter=posted), zero),
+        )
+
+        changed = []
+        for ledger in ledgers.iterator(chunk_size=2000):
+            previous = ledger.balance_display
+            net = ledger.posted_debit - ledger.posted_credit
+            net += ledger.opening_balance if ledger.opening_balance_type == 'Dr' else -ledger.opening_balance
+            balance, balance_type = (net, 'Dr') if net >= 0 else (-net, 'Cr')
+            if balance == 0:
+                # A zero balance is correct on either side
+                balance_type = ledger.current_balance_type
+            if balance != ledger.current_balance or balance_type != ledger.current_balance_type:
+                ledger.current_balance, ledger.current_balance_type = balance, balance_type
+                changed.append((ledger, previous))
+
+        if save and changed:
+            cls.objects.bulk_update(
+                [ledger for ledger, _ in changed],
+                ['current_balance', 'current_balance_type'],
+                batch_size=500,
+            )
+        return changed
+
     def update_balance(self):
-        """Recalculate current balance from all voucher entries"""
+        """
+        Recalculate current balance from all voucher entries. Posting adjusts
+        balances incrementally; this full recomputation is a repair tool.
+        """
         from django.db.models import Sum
 
         entries = self.voucher_entries.filter(voucher__status='posted')
@@ -3300,11 +3676,60 @@ class LedgerAccount(models.Model):
 
         self.save(update_fields=['current_balance', 'current_balance_type', 'updated_at'])
 
+    def balance_before(self, as_of):
+        """
+        Signed balance (Dr positive) from the opening balance and the posted
+        entries dated before as_of: the nearest monthly snapshot plus the
+        entries of as_of's month, so the cost does not grow with history.
+        """
+        from django.db.models import Sum
+
+        balance = self.opening_balance if self.opening_balance_type == 'Dr' else -self.opening_balance
+
+        month = as_of.replace(day=1)
+        snapshot = self.balance_snapshots.filter(month__lt=month).order_by('-month').first()
+        if snapshot:
+            balance += snapshot.debit_total - snapshot.credit_total
+
+        totals = self.voucher_entries.filter(
+            voucher__status='posted',
+            voucher__voucher_date__gte=month,
+            voucher__voucher_date__lt=as_of,
+        ).aggregate(debit=Sum('debit_amount'), credit=Sum('credit_amount'))
+        return balance + (totals['debit'] or 0) - (totals['credit'] or 0)
+
     @property
     def balance_display(self):
         """Display balance with Dr/Cr suffix"""
         return f"{self.current_balance:.2f} {self.current_balance_type}"
 
+    @classmethod
+    def linked_ledgers(cls, organization, link_field, party):
+        """
+        Active ledgers linked to a client or supplier (``link_field`` is
+        'linked_client' or 'linked_supplier'), the one whose balance is shown
+        first.
+        """
+        return cls.objects.filter(
+            organization=organization,
+            is_active=True,
+            **{link_field: party}
+        ).order_by('group__sequence', 'name')
+
+    @classmethod
+    def annotate_linked_balance(cls, queryset, link_field):
+        """
+        Annotate a Client/Supplier queryset with the balance of its linked ledger
+        (``link_field`` is 'linked_client' or 'linked_supplier') as
+        linked_ledger_balance / linked_ledger_balance_type, in the same query.
+        Rows without an active linked ledger get None for both.
+        """
+        ledgers = cls.linked_ledgers(models.OuterRef('organization'), link_field, models.OuterRef('pk'))
+        return queryset.annotate(
+            linked_ledger_balance=models.Subquery(ledgers.values('current_balance')[:1]),
+            linked_ledger_balance_type=models.Subquery(ledgers.values('current_balance_type')[:1]),
+        )
+
 
 class Voucher(models.Model):
     """
@@ -3351,6 +3776,9 @@ class Voucher(models.Model):
 
     # Status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='posted')
+    balance_applied = models.BooleanField(
+        default=False, help_text="Whether the entries are counted in the ledgers' current balances"
+    )
 
     # Tally Sync
     synced_to_tally = models.BooleanField(default=False)
@@ -3383,26 +3811,152 @@ class Voucher(models.Model):
         total_credit = totals['total_credit'] or 0
         return abs(total_debit - total_credit) < 0.01  # Allow for rounding
 
+    def save(self, *args, **kwargs):
+        # balance_applied is only ever flipped by _adjust_balances' conditional
+        # UPDATE; a full save of a stale instance must not write it back
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'balance_applied'
+            ]
+        super().save(*args, **kwargs)
+
+    def _ledger_totals(self):
+        """(debit, credit) per ledger across this voucher's entries."""
+        from django.db.models import Sum
+
+        rows = self.entries.order_by().values('ledger_account_id').annotate(
+            debit=Sum('debit_amount'),
+            credit=Sum('credit_amount')
+        )
+        return {row['ledger_account_id']: (row['debit'] or 0, row['credit'] or 0) for row in rows}
+
+    def _adjust_balances(self, applied):
+        """
+        Add (applied=True) or remove this voucher's entries from the ledger
+        balances and monthly balance snapshots, unless they already are.
+        balance_applied is flipped with a conditional UPDATE, so repeated or
+        concurrent calls count once.
+        """
+        with transaction.atomic():
+            if not Voucher.objects.filter(pk=self.pk, balance_applied=not applied).update(balance_applied=applied):
+                self.balance_applied = applied
+                return
+            self.balance_applied = applied
+            sign = 1 if applied else -1
+            # The date the entries are (or are to be) counted on, as saved
+            voucher_date = Voucher.objects.values_list('voucher_date', flat=True).get(pk=self.pk)
+            # Fixed ledger order so concurrent postings lock rows consistently.
+            # The ledger row update comes first and holds its lock while the
+            # snapshots are adjusted.
+            for ledger_id, (debit, credit) in sorted(self._ledger_totals().items()):
+                if debit or credit:
+                    LedgerAccount.apply_balance_delta(ledger_id, sign * (debit - credit))
+                    LedgerBalanceSnapshot.apply_delta(ledger_id, voucher_date, sign * debit, sign * credit)
+
+    def apply_balances(self):
+        """Add this voucher's entries to the current balance of its ledgers."""
+        self._adjust_balances(True)
+
+    def reverse_balances(self):
+        """Take this voucher's entries back out of the current balance of its ledgers."""
+        self._adjust_balances(False)
+
     def post(self):
         """Post the voucher and update account balances"""
         if not self.is_balanced:
             raise ValueError("Voucher is not balanced. Total Debit must equal Total Credit.")
 
-        self.status = 'posted'
-        self.save()
+        with transaction.atomic():
+            self.status = 'posted'
+            self.save(update_fields=['status', 'updated_at'])
 
-        # Update all affected account balances
-        for entry in self.entries.all():
-            entry.ledger_account.update_balance()
+            # Update all affected account balances
+            self.apply_balances()
 
     def cancel(self):
         """Cancel the voucher and reverse account balances"""
-        self.status = 'cancelled'
-        self.save()
+        with transaction.atomic():
+            self.status = 'cancelled'
+            self.save(update_fields=['status', 'updated_at'])
+
+            # Update all affected account balances
+            self.reverse_balances()
 
-        # Update all affected account balances
-        for entry in self.entries.all():
-            entry.ledger_account.update_balance()
+
+class LedgerBalanceSnapshot(models.Model):
+    """
+    Cumulative posted debit/credit totals of a ledger up to the end of a
+    month (opening balance excluded), kept up to date as vouchers are posted
+    and cancelled. A balance on any date is the nearest earlier snapshot
+    plus at most one month of entries.
+    """
+    ledger = models.ForeignKey(LedgerAccount, on_delete=models.CASCADE, related_name='balance_snapshots')
+    month = models.DateField(help_text='First day of the month')
+    debit_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    credit_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['ledger', 'month']
+        ordering = ['ledger', 'month']
+        verbose_name = "Ledger Balance Snapshot"
+        verbose_name_plural = "Ledger Balance Snapshots"
+
+    def __str__(self):
+        return f"{self.ledger_id} {self.month:%Y-%m}: Dr {self.debit_total} / Cr {self.credit_total}"
+
+    @classmethod
+    def apply_delta(cls, ledger_id, voucher_date, debit, credit):
+        """
+        Add debit/credit posted on voucher_date to that month's snapshot and
+        every later one (a backdated voucher moves all closings after it).
+        Call inside the posting transaction, after locking the ledger row.
+        """
+        month = voucher_date.replace(day=1)
+        if not cls.objects.filter(ledger_id=ledger_id, month=month).exists():
+            # Start the month from the previous closing
+            previous = cls.objects.filter(
+                ledger_id=ledger_id, month__lt=month
+            ).order_by('-month').values('debit_total', 'credit_total').first()
+            cls.objects.get_or_create(ledger_id=ledger_id, month=month, defaults=previous or {})
+        cls.objects.filter(ledger_id=ledger_id, month__gte=month).update(
+            debit_total=models.F('debit_total') + debit,
+            credit_total=models.F('credit_total') + credit,
+        )
+
+    @classmethod
+    def rebuild(cls, ledgers):
+        """
+        Recreate the snapshots of the ledgers in `ledgers` (a queryset) from
+        their posted voucher entries. Returns the number of snapshots written.
+        """
+        from django.db.models import Sum
+        from django.db.models.functions import TruncMonth
+
+        cls.objects.filter(ledger__in=ledgers).delete()
+        monthly = VoucherEntry.objects.filter(
+            ledger_account__in=ledgers,
+            voucher__status='posted'
+        ).annotate(
+            month=TruncMonth('voucher__voucher_date')
+        ).order_by('ledger_account_id', 'month').values('ledger_account_id', 'month').annotate(
+            debit=Sum('debit_amount'),
+            credit=Sum('credit_amount')
+        )
+
+        snapshots = []
+        ledger_id, debit_total, credit_total = None, 0, 0
+        for row in monthly.iterator(chunk_size=2000):
+            if row['ledger_account_id'] != ledger_id:
+                ledger_id, debit_total, credit_total = row['ledger_account_id'], 0, 0
+            debit_total += row['debit'] or 0
+            credit_total += row['credit'] or 0
+            snapshots.append(cls(
+                ledger_id=ledger_id, month=row['month'],
+                debit_total=debit_total, credit_total=credit_total
+            ))
+        cls.objects.bulk_create(snapshots, batch_size=1000)
+        return len(snapshots)
 
 
 class VoucherEntry(models.Model):
@@ -3466,15 +4020,34 @@ class VoucherNumberSeries(models.Model):
         """Generate next voucher number and increment counter"""
         self.current_number += 1
         self.save(update_fields=['current_number'])
+        return self.format_number(self.current_number)
 
-        # Format: PREFIX/FY/PADDED_NUMBER
-        # Example: RCP/2025-26/0001
-        padded_num = str(self.current_number).zfill(self.number_width)
+    def format_number(self, number):
+        """
+        Format: PREFIX/FY/PADDED_NUMBER
+        Example: RCP/2025-26/0001
+        """
+        padded_num = str(number).zfill(self.number_width)
 
         if self.prefix:
             return f"{self.prefix}{self.financial_year}/{padded_num}"
         return f"{self.financial_year}/{padded_num}"
 
+    def reserve_numbers(self, count):
+        """
+        Take the next `count` voucher numbers with a single atomic counter
+        update (for bulk voucher creation). Returns them in order.
+        """
+        with transaction.atomic():
+            VoucherNumberSeries.objects.filter(pk=self.pk).update(
+                current_number=models.F('current_number') + count
+            )
+            self.current_number = VoucherNumberSeries.objects.values_list(
+                'current_number', flat=True
+            ).get(pk=self.pk)
+        first = self.current_number - count + 1
+        return [self.format_number(number) for number in range(first, self.current_number + 1)]
+
     @classmethod
     def get_or_create_series(cls, organization, voucher_type, financial_year):
         """Get or create a number series for the given voucher type and FY"""
@@ -3579,3 +4152,130 @@ class BankReconciliationItem(models.Model):
         return f"{self.transaction_date} - {self.description}"
 
 
+# =============================================================================
+# BACKGROUND EXPORT JOBS
+# =============================================================================
+
+class ExportJob(models.Model):
+    """
+    A data export built in the background (see api.export_jobs).
+    The finished file is kept in EXPORT_FILES_ROOT until it expires.
+    """
+    KIND_CHOICES = [
+        ('data', 'Organization Data'),
+        ('personal_data', 'Personal Data'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, null=True, blank=True, related_name='export_jobs')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='data')
+    export_format = models.CharField(max_length=10, default='excel', help_text='excel, csv or json')
+    data_type = models.CharField(max_length=20, default='all', help_text='all, invoices, clients or payments')
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0, help_text='Percent complete')
+    rows_written = models.PositiveIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+
+    file_name = models.CharField(max_length=255, blank=True, help_text='Download file name')
+    file_path = models.CharField(max_length=500, blank=True, help_text='Path inside EXPORT_FILES_ROOT')
+    file_size = models.PositiveBigIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text='Last sign of life of the building worker')
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Export Job"
+        verbose_name_plural = "Export Jobs"
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='idx_exportjob_user_created'),
+            models.Index(fields=['status', 'created_at'], name='idx_exportjob_status_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} export {self.id} ({self.status})"
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting in (or delivered from) the outgoing queue, see
+    api.email_outbox. The message itself is built from payload at send time.
+    """
+    KIND_CHOICES = [
+        ('system', 'System Email'),
+        ('invoice', 'Invoice'),
+        ('receipt', 'Receipt'),
+        ('campaign', 'Campaign Email'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead Letter'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, null=True, blank=True, related_name='outbound_emails')
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict, blank=True, help_text='What to send, e.g. {"invoice_id": 1}')
+    idempotency_key = models.CharField(
+        max_length=255, unique=True, null=True, blank=True,
+        help_text='Enqueueing the same key again returns the existing email'
+    )
+    priority = models.PositiveSmallIntegerField(default=5, help_text='Lower is sent first')
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True, help_text='When a worker claimed it')
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+        indexes = [
+            models.Index(fields=['status', 'priority', 'next_attempt_at'], name='idx_outbound_due'),
+            models.Index(fields=['organization', '-created_at'], name='idx_outbound_org_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} email {self.id} ({self.status})"
+
+
+class JobLease(models.Model):
+    """
+    A time-limited claim on one shard of a background job (e.g. one
+    organization's payment reminders), shared by every app instance through
+    the database; see api.job_shards.
+    """
+    key = models.CharField(max_length=150, primary_key=True, help_text='Job and shard, e.g. "payment_reminders:<org id>"')
+    owner = models.CharField(max_length=64, blank=True, help_text='Token of the worker holding the lease')
+    acquired_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text='Free when empty or in the past')
+
+    class Meta:
+        verbose_name = "Job Lease"
+        verbose_name_plural = "Job Leases"
+
+    def __str__(self):
+        return f"{self.key} (held by {self.owner or 'nobody'})"
@@ -22,6 +22,7 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         {"type": "notification", "data": {...}}
         {"type": "sync_status", "data": {...}}
         {"type": "invoice_update", "data": {...}}
+        {"type": "export_progress", "data": {...}}
     """
 
     async def connect(self):
@@ -80,3 +81,17 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
             'type': 'invoice_update',
             'data': event.get('data', {}),
         })
+
+    async def export_progress(self, event):
+        """Handle background export job progress updates."""
+        await self.send_json({
+            'type': 'export_progress',
+            'data': event.get('data', {}),
+        })
+
+    async def campaign_progress(self, event):
+        """Handle bulk email campaign progress updates."""
+        await self.send_json({
+            'type': 'campaign_progress',
+            'data': event.get('data', {}),
+        })
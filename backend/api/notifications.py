@@ -9,7 +9,8 @@ def notify_user(user_id, notification_type, data):
 
     Args:
         user_id: The user's ID
-        notification_type: One of 'notification_message', 'sync_status', 'invoice_update'
+        notification_type: One of 'notification_message', 'sync_status', 'invoice_update',
+            'export_progress', 'campaign_progress'
         data: Dict of notification data
     """
     channel_layer = get_channel_layer()
@@ -0,0 +1,133 @@
+"""
+Streaming ZIP archives of invoice and receipt PDFs (bulk downloads).
+
+Archives are written with zipfile into an unseekable buffer that is drained
+after every file, so the response starts as soon as the first PDF is ready
+and memory holds at most one chunk of rendered PDFs. Invoices are rendered
+BULK_PDF_CHUNK_SIZE at a time through api.pdf_batch (PDF cache + process
+pool); receipts have no cache and are rendered one by one.
+"""
+
+import logging
+import zipfile
+from io import BytesIO
+
+from .pdf_batch import generate_invoice_pdfs
+from .pdf_generator import generate_receipt_pdf
+
+logger = logging.getLogger(__name__)
+
+# Most PDFs a single bulk download may contain
+BULK_PDF_MAX_FILES = 2000
+
+# Invoices rendered per batch while streaming an archive
+BULK_PDF_CHUNK_SIZE = 50
+
+
+class _ZipBuffer:
+    """
+    Write-only, unseekable target for zipfile. zipfile then writes data
+    descriptors instead of seeking back, and output can be drained as it
+    is produced.
+    """
+
+    def __init__(self):
+        self._buffer = BytesIO()
+        self._written = 0
+
+    def write(self, data):
+        self._buffer.write(data)
+        self._written += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._written
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+def iter_zip(files):
+    """Yield a ZIP archive of (name, bytes) pairs piece by piece, one file at a time."""
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def pdf_file_name(number, prefix=''):
+    """Archive member name for a document number (slashes would create folders)."""
+    safe_number = number.replace('/', '-').replace('\\', '-')
+    return f"{prefix}{safe_number}.pdf"
+
+
+def invoice_pdf_files(invoices, company_settings, format_settings=None):
+    """
+    Yield (file name, PDF bytes) for invoices, rendering them in chunks.
+    Invoices that fail to render are listed in a trailing errors.txt.
+    """
+    failed = []
+
+    def render(chunk):
+        pdfs = generate_invoice_pdfs(chunk, company_settings, format_settings)
+        for invoice in chunk:
+            pdf = pdfs.get(invoice.pk)
+            if pdf is None:
+                failed.append(invoice.invoice_number)
+                continue
+            yield pdf_file_name(invoice.invoice_number, 'Invoice_'), pdf.getvalue()
+
+    chunk = []
+    for invoice in invoices:
+        chunk.append(invoice)
+        if len(chunk) >= BULK_PDF_CHUNK_SIZE:
+            yield from render(chunk)
+            chunk = []
+    if chunk:
+        yield from render(chunk)
+
+    if failed:
+        yield 'errors.txt', ('Could not generate PDFs for:\n' + '\n'.join(failed) + '\n').encode('utf-8')
+
+
+def receipt_pdf_files(receipts, company_settings):
+    """Yield (file name, PDF bytes) for receipts; failures are listed in errors.txt."""
+    failed = []
+    for receipt in receipts:
+        try:
+            yield pdf_file_name(receipt.receipt_number), generate_receipt_pdf(receipt, company_settings)
+        except Exception as e:
+            logger.error(f"Could not generate PDF for receipt {receipt.receipt_number}: {str(e)}")
+            failed.append(receipt.receipt_number)
+
+    if failed:
+        yield 'errors.txt', ('Could not generate PDFs for:\n' + '\n'.join(failed) + '\n').encode('utf-8')
+
+
+def requested_ids(request):
+    """
+    Ids selected for a bulk download: ``ids`` in a POST body (list) or the
+    query string (comma separated). Returns None when no ids were given,
+    meaning "everything matching the list filters".
+    Raises ValueError for malformed ids.
+    """
+    ids = request.data.get('ids') if request.method == 'POST' else None
+    if ids is None:
+        raw = request.query_params.get('ids', '')
+        if not raw:
+            return None
+        ids = raw.split(',')
+    if not isinstance(ids, (list, tuple)):
+        raise ValueError('ids must be a list')
+    try:
+        return [int(value) for value in ids]
+    except (TypeError, ValueError):
+        raise ValueError('ids must be integers')
@@ -0,0 +1,165 @@
+"""
+Batch invoice PDF rendering on a process pool.
+
+ReportLab rendering is CPU bound, so rendering many invoices in the request
+or scheduler thread uses a single core. generate_invoice_pdfs() serializes
+the invoices and settings into plain dicts and fans them out over a
+ProcessPoolExecutor of PDF_RENDER_WORKERS processes. The workers only import
+api.pdf_generator; they never touch the ORM or the database.
+
+Invoices whose PDF is already in the PDF cache (api.pdf_cache) are not
+rendered again, and freshly rendered PDFs are added to it.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+
+from .pdf_cache import get_pdf_cache, invoice_pdf_key, get_default_terms_notes
+from .pdf_generator import render_invoice_pdfs_data
+
+logger = logging.getLogger(__name__)
+
+# Invoices sent to a worker per task
+PDF_RENDER_CHUNK_SIZE = 10
+
+# Smaller batches are rendered in the calling process (not worth the round trip)
+PDF_RENDER_MIN_BATCH = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context(settings.PDF_RENDER_START_METHOD),
+            )
+        return _executor
+
+
+def shutdown_pool():
+    """Stop the worker processes (a new pool is started on the next batch)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _serialize_instance(instance):
+    """Concrete field values of a model instance as a plain dict."""
+    if instance is None:
+        return None
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
+
+
+def serialize_invoice(invoice):
+    """Plain-dict form of an invoice with everything its PDF prints."""
+    return {
+        'invoice': _serialize_instance(invoice),
+        'client': _serialize_instance(invoice.client),
+        'items': [_serialize_instance(item) for item in invoice.items.all()],
+        'payment_term': _serialize_instance(invoice.payment_term),
+    }
+
+
+def _render(invoices, settings_data):
+    """Render invoices in the pool; returns (pdf bytes, error) per invoice, in order."""
+    invoices_data = [serialize_invoice(invoice) for invoice in invoices]
+    if settings.PDF_RENDER_WORKERS <= 0 or len(invoices_data) < PDF_RENDER_MIN_BATCH:
+        return render_invoice_pdfs_data(settings_data, invoices_data)
+
+    chunks = [
+        invoices_data[start:start + PDF_RENDER_CHUNK_SIZE]
+        for start in range(0, len(invoices_data), PDF_RENDER_CHUNK_SIZE)
+    ]
+    try:
+        executor = _get_executor()
+        futures = [executor.submit(render_invoice_pdfs_data, settings_data, chunk) for chunk in chunks]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+    except BrokenProcessPool as e:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        logger.error(f"PDF render pool failed, rendering {len(invoices_data)} invoices inline: {str(e)}")
+        shutdown_pool()
+        return render_invoice_pdfs_data(settings_data, invoices_data)
+
+
+def generate_invoice_pdfs(invoices, company_settings, format_settings=None):
+    """
+    Render PDFs for many invoices of one organization.
+
+    Args:
+        invoices: Invoice model instances (same organization)
+        company_settings: CompanySettings model instance
+        format_settings: InvoiceFormatSettings model instance (optional)
+
+    Returns:
+        dict: {invoice id: BytesIO PDF buffer}. Invoices that failed to
+        render are logged and left out.
+    """
+    invoices = list(invoices)
+    if not invoices:
+        return {}
+
+    prefetch_related_objects(invoices, 'client', 'items', 'payment_term')
+    default_terms_notes = get_default_terms_notes(company_settings.organization_id)
+
+    cache = get_pdf_cache()
+    try:
+        keys = {
+            invoice.pk: invoice_pdf_key(invoice, company_settings, format_settings, default_terms_notes)
+            for invoice in invoices
+        }
+        cached = cache.get_many(list(keys.values()))
+    except Exception as e:
+        # The cache is an optimization only - never fail a render because of it
+        logger.warning(f"PDF cache lookup failed for batch: {str(e)}")
+        keys, cached = {}, {}
+
+    pdfs = {}
+    pending = []
+    for invoice in invoices:
+        pdf_bytes = cached.get(keys.get(invoice.pk))
+        if pdf_bytes is not None:
+            pdfs[invoice.pk] = BytesIO(pdf_bytes)
+        else:
+            pending.append(invoice)
+
+    if not pending:
+        return pdfs
+
+    settings_data = {
+        'company_settings': _serialize_instance(company_settings),
+        'format_settings': _serialize_instance(format_settings),
+        'default_terms_notes': default_terms_notes,
+    }
+    rendered = {}
+    for invoice, (pdf_bytes, error) in zip(pending, _render(pending, settings_data)):
+        if pdf_bytes is None:
+            logger.error(f"Could not generate PDF for {invoice.invoice_number}: {error}")
+            continue
+        pdfs[invoice.pk] = BytesIO(pdf_bytes)
+        if invoice.pk in keys:
+            rendered[keys[invoice.pk]] = pdf_bytes
+
+    if rendered:
+        try:
+            cache.set_many(rendered, getattr(settings, 'PDF_CACHE_TIMEOUT', None))
+        except Exception as e:
+            logger.warning(f"Could not cache {len(rendered)} batch PDFs: {str(e)}")
+
+    logger.info(f"Rendered {len(rendered)} of {len(invoices)} invoice PDFs ({len(invoices) - len(pending)} cached)")
+    return pdfs
@@ -0,0 +1,129 @@
+"""
+Content-addressed cache for generated invoice PDFs.
+
+The cache key is a SHA-256 over everything that ends up on the page: the
+invoice, its client and line items, the company, format and invoice settings,
+and the source of the PDF generator itself. Any edit to those inputs (or a new
+layout deployed) produces a new key, so entries never need explicit
+invalidation; stale ones simply age out of the cache.
+
+PDFs are stored in the PDF_CACHE_ALIAS cache backend with PDF_CACHE_TIMEOUT,
+so they are always evictable: locmem culls in LRU order, and a Redis
+instance shared with sessions must use the volatile-lru maxmemory policy
+(see the CACHES setting).
+"""
+
+import hashlib
+import logging
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Invoice, InvoiceSettings, PaymentTerm
+from .pdf_generator import generate_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+# Fields that change without affecting the rendered PDF (tracking/status data)
+VOLATILE_FIELDS = {
+    'created_at', 'updated_at', 'status', 'is_emailed', 'emailed_at',
+    'last_reminder_sent', 'reminder_count', 'amount_paid', 'outstanding',
+}
+
+# Layout changes ship as code changes - fold the generator source into every key
+_GENERATOR_VERSION = hashlib.sha256(
+    Path(__file__).with_name('pdf_generator.py').read_bytes()
+).hexdigest()[:16]
+
+
+def get_pdf_cache():
+    return caches[getattr(settings, 'PDF_CACHE_ALIAS', 'default')]
+
+
+def _fingerprint_instance(instance):
+    """Stable text form of a model instance's rendered fields."""
+    if instance is None:
+        return 'None'
+    values = []
+    for field in instance._meta.concrete_fields:
+        if field.name in VOLATILE_FIELDS:
+            continue
+        values.append(f'{field.attname}={field.value_from_object(instance)!r}')
+    return f'{instance._meta.label}(' + ','.join(values) + ')'
+
+
+def get_default_terms_notes(organization_id):
+    """(terms, notes) from the organization's InvoiceSettings, as printed on its invoices."""
+    row = InvoiceSettings.objects.filter(organization_id=organization_id).values_list(
+        'termsAndConditions', 'notes'
+    ).first()
+    return tuple(row) if row else ('', '')
+
+
+def _payment_term_description(invoice):
+    if not invoice.payment_term_id:
+        return None
+    if Invoice._meta.get_field('payment_term').is_cached(invoice):
+        return invoice.payment_term.description
+    return PaymentTerm.objects.filter(pk=invoice.payment_term_id).values_list('description', flat=True).first()
+
+
+def invoice_pdf_key(invoice, company_settings, format_settings=None, default_terms_notes=None):
+    """
+    Cache key for the PDF generate_invoice_pdf would produce for these inputs.
+    Pass default_terms_notes (see get_default_terms_notes) to skip its query
+    when computing keys for many invoices of one organization.
+    """
+    digest = hashlib.sha256()
+
+    def update(part):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x1f')
+
+    update(_GENERATOR_VERSION)
+    update(_fingerprint_instance(invoice))
+    update(_fingerprint_instance(invoice.client))
+    for item in invoice.items.all():
+        update(_fingerprint_instance(item))
+    update(_fingerprint_instance(company_settings))
+    update(_fingerprint_instance(format_settings))
+
+    # Default terms/notes and the payment term description are also printed
+    if default_terms_notes is None:
+        default_terms_notes = get_default_terms_notes(invoice.organization_id)
+    update(repr(tuple(default_terms_notes)))
+    update(repr(_payment_term_description(invoice)))
+
+    return f'invoice_pdf_{digest.hexdigest()}'
+
+
+def get_invoice_pdf(invoice, company_settings, format_settings=None):
+    """
+    Drop-in replacement for generate_invoice_pdf that serves unchanged
+    invoices from the PDF cache.
+
+    Returns:
+        BytesIO: PDF file buffer
+    """
+    cache = get_pdf_cache()
+    try:
+        key = invoice_pdf_key(invoice, company_settings, format_settings)
+        pdf_bytes = cache.get(key)
+    except Exception as e:
+        # The cache is an optimization only - never fail a render because of it
+        logger.warning(f"PDF cache lookup failed for {invoice.invoice_number}: {str(e)}")
+        key, pdf_bytes = None, None
+
+    if pdf_bytes is not None:
+        return BytesIO(pdf_bytes)
+
+    buffer = generate_invoice_pdf(invoice, company_settings, format_settings)
+    if key:
+        try:
+            cache.set(key, buffer.getvalue(), getattr(settings, 'PDF_CACHE_TIMEOUT', None))
+        except Exception as e:
+            logger.warning(f"Could not cache PDF for {invoice.invoice_number}: {str(e)}")
+    buffer.seek(0)
+    return buffer
@@ -5,8 +5,12 @@ from reportlab.lib.units import inch, mm
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, HRFlowable, KeepTogether
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER, TA_JUSTIFY
 from reportlab.pdfgen import canvas
+from reportlab.lib.utils import ImageReader
+from collections import OrderedDict
+from types import SimpleNamespace
 from io import BytesIO
 import base64
+import threading
 from django.db.models import Sum
 from .utils import get_state_code
 
@@ -95,7 +99,157 @@ def format_address_for_pdf(address):
     return address.replace('\r\n', '<br/>').replace('\n', '<br/>').replace('\r', '<br/>')
 
 
-def generate_invoice_pdf(invoice, company_settings, format_settings=None):
+# ==================== COMPILED INVOICE TEMPLATES ====================
+
+def _invoice_styles():
+    """Paragraph styles used on every invoice (identical for all organizations)."""
+    return {
+        'right_header': ParagraphStyle(
+            'RightHeader', fontSize=10, textColor=colors.HexColor('#1e3a8a'),
+            fontName='Helvetica-Bold', alignment=TA_RIGHT, leading=12
+        ),
+        'invoice_label': ParagraphStyle(
+            'InvoiceLabel', fontSize=14, textColor=colors.HexColor('#1e3a8a'),
+            fontName='Helvetica-Bold', alignment=TA_RIGHT, leading=16
+        ),
+        'info': ParagraphStyle(
+            'InfoStyle', fontSize=9, textColor=colors.black,
+            fontName='Helvetica', leading=11, alignment=TA_LEFT
+        ),
+        'bold': ParagraphStyle(
+            'BoldStyle', fontSize=9, textColor=colors.black,
+            fontName='Helvetica-Bold', leading=11, alignment=TA_LEFT
+        ),
+        'invoice_info_right': ParagraphStyle(
+            'InvoiceInfoRight', fontSize=9, textColor=colors.black,
+            fontName='Helvetica', leading=11, alignment=TA_RIGHT
+        ),
+        'bill_to': ParagraphStyle(
+            'BillTo', fontSize=9, textColor=colors.black,
+            fontName='Helvetica-Bold', leading=11
+        ),
+        'total_words': ParagraphStyle(
+            'TotalWords', fontSize=9, textColor=colors.black,
+            fontName='Helvetica-Bold', leading=11, alignment=TA_RIGHT
+        ),
+        'footer': ParagraphStyle(
+            'Footer', fontSize=8, textColor=colors.black,
+            fontName='Helvetica', leading=10, alignment=TA_LEFT
+        ),
+        'footer_bold': ParagraphStyle(
+            'FooterBold', fontSize=8, textColor=colors.black,
+            fontName='Helvetica-Bold', leading=10, alignment=TA_LEFT
+        ),
+        'terms_notes': ParagraphStyle(
+            'TermsNotes', fontSize=8, textColor=colors.black,
+            fontName='Helvetica', leading=10, alignment=TA_LEFT
+        ),
+        'terms_notes_title': ParagraphStyle(
+            'TermsNotesTitle', fontSize=9, textColor=colors.black,
+            fontName='Helvetica-Bold', leading=11, alignment=TA_LEFT
+        ),
+        'signature': ParagraphStyle(
+            'Signature', fontSize=9, textColor=colors.black,
+            fontName='Helvetica', leading=11, alignment=TA_RIGHT
+        ),
+        'note': ParagraphStyle(
+            'Note', fontSize=7, textColor=colors.grey,
+            fontName='Helvetica-Oblique', alignment=TA_CENTER
+        ),
+    }
+
+
+INVOICE_STYLES = _invoice_styles()
+
+# Organizations whose compiled template is kept in memory (least recently used are dropped)
+INVOICE_TEMPLATE_CACHE_SIZE = 256
+
+_template_cache = OrderedDict()
+_template_cache_lock = threading.Lock()
+
+
+class _LogoImage(Image):
+    """Image flowable drawing an already decoded ImageReader, so a logo is parsed only once."""
+
+    def __init__(self, reader, width, height):
+        self._img = reader
+        super().__init__(BytesIO(), width=width, height=height)
+
+
+class InvoicePdfTemplate:
+    """
+    Per-organization parts of an invoice PDF that do not depend on the invoice:
+    paragraph styles, table header colors and the decoded company logo.
+    Built once by get_invoice_template() and reused across renders.
+    """
+
+    def __init__(self, company_settings, format_settings=None):
+        self.source = self.source_of(company_settings, format_settings)
+        logo_data, header_bg, header_text = self.source
+
+        self.styles = INVOICE_STYLES
+        self.header_bg = colors.HexColor(header_bg)
+        self.header_text = colors.HexColor(header_text) if header_text else colors.white
+
+        self.logo = None
+        if logo_data:
+            try:
+                if ',' in logo_data:
+                    logo_data = logo_data.split(',')[1]
+                self.logo = ImageReader(BytesIO(base64.b64decode(logo_data)))
+            except Exception as e:
+                print(f"Error adding logo: {e}")
+
+    @staticmethod
+    def source_of(company_settings, format_settings=None):
+        """The settings values a template is compiled from (used to detect stale templates)."""
+        if format_settings:
+            header_colors = (format_settings.table_header_bg_color, format_settings.table_header_text_color)
+        else:
+            header_colors = ('#1e3a8a', None)  # Dark blue on white
+        return (company_settings.logo or None,) + header_colors
+
+    def logo_flowable(self):
+        """A fresh logo flowable for one document (flowables keep layout state)."""
+        if self.logo is None:
+            return None
+        return _LogoImage(self.logo, width=50*mm, height=25*mm)
+
+
+def get_invoice_template(company_settings, format_settings=None):
+    """
+    Return the compiled invoice template of the company's organization.
+
+    Templates are cached per process. A cached template is reused only while
+    the settings it was compiled from are unchanged, so edits made through
+    another process are picked up on the next render as well.
+    """
+    org_id = company_settings.organization_id
+    source = InvoicePdfTemplate.source_of(company_settings, format_settings)
+
+    with _template_cache_lock:
+        template = _template_cache.get(org_id)
+        if template is not None and template.source == source:
+            _template_cache.move_to_end(org_id)
+            return template
+
+    template = InvoicePdfTemplate(company_settings, format_settings)
+    with _template_cache_lock:
+        _template_cache[org_id] = template
+        _template_cache.move_to_end(org_id)
+        while len(_template_cache) > INVOICE_TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
+    return template
+
+
+def invalidate_invoice_template(organization_id):
+    """Drop an organization's compiled template (called when its settings are saved)."""
+    with _template_cache_lock:
+        _template_cache.pop(organization_id, None)
+
+
+def generate_invoice_pdf(invoice, company_settings, format_settings=None, template=None,
+                         default_terms_notes=None):
     """
     Generate invoice PDF matching the specified format
 
@@ -103,10 +257,18 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
         invoice: Invoice model instance
         company_settings: CompanySettings model instance
         format_settings: InvoiceFormatSettings model instance (optional)
+        template: InvoicePdfTemplate to render with (optional, looked up
+            from the settings by default)
+        default_terms_notes: (terms, notes) tuple used when the invoice has
+            none of its own (optional, read from InvoiceSettings by default)
 
     Returns:
         BytesIO: PDF file buffer
     """
+    if template is None:
+        template = get_invoice_template(company_settings, format_settings)
+    styles = template.styles
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(
         buffer,
@@ -121,50 +283,16 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
     available_width = A4[0] - 30*mm
     table_width = available_width * 0.85  # Table uses 85% of available width
 
-    # Use format settings or defaults
-    if format_settings:
-        HEADER_BG = colors.HexColor(format_settings.table_header_bg_color)
-        HEADER_TEXT = colors.HexColor(format_settings.table_header_text_color)
-    else:
-        HEADER_BG = colors.HexColor('#1e3a8a')  # Dark blue
-        HEADER_TEXT = colors.white
-
     # ==================== HEADER SECTION ====================
     header_data = []
     left_header = []
 
     # Logo
-    if company_settings.logo:
-        try:
-            logo_data = company_settings.logo
-            if ',' in logo_data:
-                logo_data = logo_data.split(',')[1]
-            logo_bytes = base64.b64decode(logo_data)
-            logo_buffer = BytesIO(logo_bytes)
-            logo_img = Image(logo_buffer, width=50*mm, height=25*mm)
-            left_header.append(logo_img)
-        except Exception as e:
-            print(f"Error adding logo: {e}")
+    logo_img = template.logo_flowable()
+    if logo_img is not None:
+        left_header.append(logo_img)
 
     # Right header - Company designation and Invoice label
-    right_header_style = ParagraphStyle(
-        'RightHeader',
-        fontSize=10,
-        textColor=colors.HexColor('#1e3a8a'),
-        fontName='Helvetica-Bold',
-        alignment=TA_RIGHT,
-        leading=12
-    )
-
-    invoice_label_style = ParagraphStyle(
-        'InvoiceLabel',
-        fontSize=14,
-        textColor=colors.HexColor('#1e3a8a'),
-        fontName='Helvetica-Bold',
-        alignment=TA_RIGHT,
-        leading=16
-    )
-
     # Invoice type display
     invoice_type_label = "TAX INVOICE" if invoice.invoice_type == 'tax' else "PROFORMA INVOICE"
 
@@ -174,8 +302,8 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
         designation_text = format_settings.company_designation_text
 
     right_header = [
-        Paragraph(designation_text.upper(), right_header_style),
-        Paragraph(invoice_type_label, invoice_label_style)
+        Paragraph(designation_text.upper(), styles['right_header']),
+        Paragraph(invoice_type_label, styles['invoice_label'])
     ]
 
     header_table = Table(
@@ -194,24 +322,6 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
 
     # ==================== COMPANY INFO & INVOICE DETAILS ====================
 
-    info_style = ParagraphStyle(
-        'InfoStyle',
-        fontSize=9,
-        textColor=colors.black,
-        fontName='Helvetica',
-        leading=11,
-        alignment=TA_LEFT
-    )
-
-    bold_style = ParagraphStyle(
-        'BoldStyle',
-        fontSize=9,
-        textColor=colors.black,
-        fontName='Helvetica-Bold',
-        leading=11,
-        alignment=TA_LEFT
-    )
-
     # Company name display logic
     company_display = company_settings.tradingName if company_settings.tradingName else company_settings.companyName
 
@@ -220,28 +330,19 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
     company_address_formatted = format_address_for_pdf(company_settings.address)
 
     company_info = [
-        Paragraph(f"<b>{company_display or 'Company Name'}</b>", bold_style),
-        Paragraph(f"{company_address_formatted}", info_style),
-        Paragraph(f"{company_settings.city or ''}, {company_settings.state or ''} - {company_settings.pinCode or ''}", info_style),
-        Paragraph(f"<b>GSTIN:</b> {company_settings.gstin or 'N/A'}", info_style),
-        Paragraph(f"<b>PAN:</b> {company_settings.pan or 'N/A'}", info_style),
-        Paragraph(f"<b>Phone:</b> {company_settings.phone or 'N/A'}", info_style),
-        Paragraph(f"<b>Email:</b> {company_settings.email or 'N/A'}", info_style),
+        Paragraph(f"<b>{company_display or 'Company Name'}</b>", styles['bold']),
+        Paragraph(f"{company_address_formatted}", styles['info']),
+        Paragraph(f"{company_settings.city or ''}, {company_settings.state or ''} - {company_settings.pinCode or ''}", styles['info']),
+        Paragraph(f"<b>GSTIN:</b> {company_settings.gstin or 'N/A'}", styles['info']),
+        Paragraph(f"<b>PAN:</b> {company_settings.pan or 'N/A'}", styles['info']),
+        Paragraph(f"<b>Phone:</b> {company_settings.phone or 'N/A'}", styles['info']),
+        Paragraph(f"<b>Email:</b> {company_settings.email or 'N/A'}", styles['info']),
     ]
 
     # Right side - Invoice details
-    invoice_info_right_style = ParagraphStyle(
-        'InvoiceInfoRight',
-        fontSize=9,
-        textColor=colors.black,
-        fontName='Helvetica',
-        leading=11,
-        alignment=TA_RIGHT
-    )
-
     invoice_info = [
-        Paragraph(f"<b>Invoice No:</b> {invoice.invoice_number}", invoice_info_right_style),
-        Paragraph(f"<b>Invoice Date:</b> {invoice.invoice_date.strftime('%d/%m/%Y')}", invoice_info_right_style),
+        Paragraph(f"<b>Invoice No:</b> {invoice.invoice_number}", styles['invoice_info_right']),
+        Paragraph(f"<b>Invoice Date:</b> {invoice.invoice_date.strftime('%d/%m/%Y')}", styles['invoice_info_right']),
     ]
 
     info_table = Table(
@@ -259,23 +360,15 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
 
     # ==================== BILL TO SECTION ====================
 
-    bill_to_style = ParagraphStyle(
-        'BillTo',
-        fontSize=9,
-        textColor=colors.black,
-        fontName='Helvetica-Bold',
-        leading=11
-    )
-
     # Format client address to preserve line breaks entered by user
     client_address_formatted = format_address_for_pdf(invoice.client.address)
 
     bill_to_content = [
-        Paragraph(f"<b>Bill To:</b>", bill_to_style),
-        Paragraph(f"{invoice.client.name}", info_style),
-        Paragraph(f"{client_address_formatted}", info_style),
-        Paragraph(f"{invoice.client.city or ''}, {invoice.client.state or ''} - {invoice.client.pinCode or ''}", info_style),
-        Paragraph(f"<b>GSTIN:</b> {invoice.client.gstin or 'N/A'}", info_style),
+        Paragraph(f"<b>Bill To:</b>", styles['bill_to']),
+        Paragraph(f"{invoice.client.name}", styles['info']),
+        Paragraph(f"{client_address_formatted}", styles['info']),
+        Paragraph(f"{invoice.client.city or ''}, {invoice.client.state or ''} - {invoice.client.pinCode or ''}", styles['info']),
+        Paragraph(f"<b>GSTIN:</b> {invoice.client.gstin or 'N/A'}", styles['info']),
     ]
 
     for item in bill_to_content:
@@ -456,8 +549,8 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
 
     table_style = [
         # Header row styling
-        ('BACKGROUND', (0, 0), (-1, 0), HEADER_BG),
-        ('TEXTCOLOR', (0, 0), (-1, 0), HEADER_TEXT),
+        ('BACKGROUND', (0, 0), (-1, 0), template.header_bg),
+        ('TEXTCOLOR', (0, 0), (-1, 0), template.header_text),
         ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
         ('FONTSIZE', (0, 0), (-1, 0), 7),
         ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
@@ -508,69 +601,28 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
     # Add Grand Total in Words if enabled
     if format_settings and format_settings.show_grand_total_in_words:
         total_in_words = number_to_words(invoice.total_amount)
-        words_style = ParagraphStyle(
-            'TotalWords',
-            fontSize=9,
-            textColor=colors.black,
-            fontName='Helvetica-Bold',
-            leading=11,
-            alignment=TA_RIGHT
-        )
-        elements.append(Paragraph(f"Amount in Words: {total_in_words}", words_style))
+        elements.append(Paragraph(f"Amount in Words: {total_in_words}", styles['total_words']))
         elements.append(Spacer(1, 5*mm))
     else:
         elements.append(Spacer(1, 10*mm))
 
     # ==================== FOOTER SECTION ====================
 
-    footer_style = ParagraphStyle(
-        'Footer',
-        fontSize=8,
-        textColor=colors.black,
-        fontName='Helvetica',
-        leading=10,
-        alignment=TA_LEFT
-    )
-
-    footer_bold_style = ParagraphStyle(
-        'FooterBold',
-        fontSize=8,
-        textColor=colors.black,
-        fontName='Helvetica-Bold',
-        leading=10,
-        alignment=TA_LEFT
-    )
-
     # ==================== TERMS, NOTES & CONDITIONS SECTION ====================
     # Add these BEFORE bank details and signature
 
-    terms_notes_style = ParagraphStyle(
-        'TermsNotes',
-        fontSize=8,
-        textColor=colors.black,
-        fontName='Helvetica',
-        leading=10,
-        alignment=TA_LEFT
-    )
-
-    terms_notes_title_style = ParagraphStyle(
-        'TermsNotesTitle',
-        fontSize=9,
-        textColor=colors.black,
-        fontName='Helvetica-Bold',
-        leading=11,
-        alignment=TA_LEFT
-    )
-
     # Get default terms and notes from InvoiceSettings
-    try:
-        from .models import InvoiceSettings
-        invoice_settings = InvoiceSettings.objects.get(organization=invoice.organization)
-        default_terms = invoice_settings.termsAndConditions
-        default_notes = invoice_settings.notes
-    except Exception:
-        default_terms = ""
-        default_notes = ""
+    if default_terms_notes is not None:
+        default_terms, default_notes = default_terms_notes
+    else:
+        try:
+            from .models import InvoiceSettings
+            invoice_settings = InvoiceSettings.objects.get(organization=invoice.organization)
+            default_terms = invoice_settings.termsAndConditions
+            default_notes = invoice_settings.notes
+        except Exception:
+            default_terms = ""
+            default_notes = ""
 
     # Payment Terms
     if format_settings and format_settings.show_payment_terms:
@@ -582,71 +634,62 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
             payment_terms_text = invoice.payment_terms
 
         if payment_terms_text:
-            elements.append(Paragraph("<b>Payment Terms:</b>", terms_notes_title_style))
-            elements.append(Paragraph(payment_terms_text, terms_notes_style))
+            elements.append(Paragraph("<b>Payment Terms:</b>", styles['terms_notes_title']))
+            elements.append(Paragraph(payment_terms_text, styles['terms_notes']))
             elements.append(Spacer(1, 3*mm))
 
     # Notes
     if format_settings and format_settings.show_notes:
         notes_text = invoice.notes if invoice.notes else default_notes
         if notes_text:
-            elements.append(Paragraph("<b>Notes:</b>", terms_notes_title_style))
-            elements.append(Paragraph(notes_text, terms_notes_style))
+            elements.append(Paragraph("<b>Notes:</b>", styles['terms_notes_title']))
+            elements.append(Paragraph(notes_text, styles['terms_notes']))
             elements.append(Spacer(1, 3*mm))
 
     # Terms & Conditions
     if format_settings and format_settings.show_terms_conditions:
         if default_terms:
-            elements.append(Paragraph("<b>Terms & Conditions:</b>", terms_notes_title_style))
-            elements.append(Paragraph(default_terms, terms_notes_style))
+            elements.append(Paragraph("<b>Terms & Conditions:</b>", styles['terms_notes_title']))
+            elements.append(Paragraph(default_terms, styles['terms_notes']))
             elements.append(Spacer(1, 3*mm))
 
     # Bank Details (left side) - use format settings if available
     bank_details = []
     if format_settings and format_settings.show_bank_details:
-        bank_details.append(Paragraph("<b>Bank Details:</b>", footer_bold_style))
+        bank_details.append(Paragraph("<b>Bank Details:</b>", styles['footer_bold']))
         if format_settings.bank_account_number:
-            bank_details.append(Paragraph(f"Account No: {format_settings.bank_account_number}", footer_style))
+            bank_details.append(Paragraph(f"Account No: {format_settings.bank_account_number}", styles['footer']))
         if format_settings.bank_name:
-            bank_details.append(Paragraph(f"Bank Name: {format_settings.bank_name}", footer_style))
+            bank_details.append(Paragraph(f"Bank Name: {format_settings.bank_name}", styles['footer']))
         if format_settings.bank_ifsc:
-            bank_details.append(Paragraph(f"IFSC: {format_settings.bank_ifsc}", footer_style))
+            bank_details.append(Paragraph(f"IFSC: {format_settings.bank_ifsc}", styles['footer']))
         if format_settings.bank_branch:
-            bank_details.append(Paragraph(f"Branch: {format_settings.bank_branch}", footer_style))
+            bank_details.append(Paragraph(f"Branch: {format_settings.bank_branch}", styles['footer']))
     elif not format_settings:  # Default behavior when no format settings
         bank_details = [
-            Paragraph("<b>Bank Details:</b>", footer_bold_style),
-            Paragraph("Account No: XXXXXXXXXX", footer_style),
-            Paragraph("Bank Name: XXXX Bank", footer_style),
-            Paragraph("IFSC: XXXXXX", footer_style),
+            Paragraph("<b>Bank Details:</b>", styles['footer_bold']),
+            Paragraph("Account No: XXXXXXXXXX", styles['footer']),
+            Paragraph("Bank Name: XXXX Bank", styles['footer']),
+            Paragraph("IFSC: XXXXXX", styles['footer']),
         ]
 
     # Signature section (right side)
-    sig_style = ParagraphStyle(
-        'Signature',
-        fontSize=9,
-        textColor=colors.black,
-        fontName='Helvetica',
-        leading=11,
-        alignment=TA_RIGHT
-    )
-
     # Signature section (right side) - use format settings if available
     signature_section = []
     if format_settings and format_settings.show_signature:
         signature_label = format_settings.signature_label or "Authorized Signatory"
         signature_section = [
             Spacer(1, 15*mm),
-            Paragraph(f"<b>For {company_display or 'Company Name'}</b>", sig_style),
+            Paragraph(f"<b>For {company_display or 'Company Name'}</b>", styles['signature']),
             Spacer(1, 15*mm),
-            Paragraph(f"<b>{signature_label}</b>", sig_style),
+            Paragraph(f"<b>{signature_label}</b>", styles['signature']),
         ]
     elif not format_settings:  # Default behavior
         signature_section = [
             Spacer(1, 15*mm),
-            Paragraph(f"<b>For {company_display or 'Company Name'}</b>", sig_style),
+            Paragraph(f"<b>For {company_display or 'Company Name'}</b>", styles['signature']),
             Spacer(1, 15*mm),
-            Paragraph("<b>Authorized Signatory</b>", sig_style),
+            Paragraph("<b>Authorized Signatory</b>", styles['signature']),
         ]
 
     # Only show footer table if there's content
@@ -665,14 +708,7 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
     # Computer generated note - check format settings
     if not format_settings or format_settings.show_computer_generated_note:
         elements.append(Spacer(1, 5*mm))
-        note_style = ParagraphStyle(
-            'Note',
-            fontSize=7,
-            textColor=colors.grey,
-            fontName='Helvetica-Oblique',
-            alignment=TA_CENTER
-        )
-        elements.append(Paragraph("This is a computer-generated invoice and does not require a signature.", note_style))
+        elements.append(Paragraph("This is a computer-generated invoice and does not require a signature.", styles['note']))
 
     # Build PDF - check page number setting
     if format_settings and not format_settings.show_page_numbers:
@@ -683,6 +719,57 @@ def generate_invoice_pdf(invoice, company_settings, format_settings=None):
     return buffer
 
 
+# ==================== RENDERING FROM PLAIN DATA ====================
+
+class _Record(SimpleNamespace):
+    """Attribute access over a serialized model instance."""
+
+
+class _RecordList(list):
+    """Serialized related objects, standing in for a related manager."""
+
+    def all(self):
+        return self
+
+
+def _invoice_from_data(data):
+    invoice = _Record(**data['invoice'])
+    invoice.client = _Record(**data['client'])
+    invoice.items = _RecordList(_Record(**item) for item in data['items'])
+    invoice.payment_term = _Record(**data['payment_term']) if data['payment_term'] else None
+    return invoice
+
+
+def render_invoice_pdfs_data(settings_data, invoices_data):
+    """
+    Render invoice PDFs from the plain dicts built by api.pdf_batch.
+
+    Works without database access (the default terms and notes are part of
+    settings_data), so it can run in a worker process that never set up the
+    ORM. Each invoice is rendered independently; a failure is returned
+    instead of aborting the rest of the chunk.
+
+    Returns:
+        list: (pdf bytes, None) or (None, error message) per invoice
+    """
+    company_settings = _Record(**settings_data['company_settings'])
+    format_settings = _Record(**settings_data['format_settings']) if settings_data['format_settings'] else None
+    template = get_invoice_template(company_settings, format_settings)
+    default_terms_notes = tuple(settings_data['default_terms_notes'])
+
+    results = []
+    for data in invoices_data:
+        try:
+            buffer = generate_invoice_pdf(
+                _invoice_from_data(data), company_settings, format_settings,
+                template=template, default_terms_notes=default_terms_notes
+            )
+            results.append((buffer.getvalue(), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
 def generate_receipt_pdf(receipt, company_settings):
     """Generate a professional receipt PDF"""
     buffer = BytesIO()
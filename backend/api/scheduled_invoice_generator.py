@@ -16,13 +16,15 @@ from django.conf import settings
 logger = logging.getLogger(__name__)
 
 
-def generate_invoice_from_schedule(scheduled_invoice, manual=False):
+def generate_invoice_from_schedule(scheduled_invoice, manual=False, generation_date=None):
     """
     Generate an invoice from a scheduled invoice configuration.
 
     Args:
         scheduled_invoice: ScheduledInvoice model instance
         manual: Boolean indicating if this is a manual generation
+        generation_date: Date of the period being generated (default: today);
+            also used as the invoice date
 
     Returns:
         tuple: (invoice, email_sent)
@@ -31,10 +33,9 @@ def generate_invoice_from_schedule(scheduled_invoice, manual=False):
         Invoice, InvoiceItem, ScheduledInvoiceLog,
         EmailSettings, CompanySettings, InvoiceSettings
     )
-    from .pdf_generator import generate_invoice_pdf
 
     organization = scheduled_invoice.organization
-    today = date.today()
+    today = generation_date or date.today()
 
     log_entry = ScheduledInvoiceLog(
         scheduled_invoice=scheduled_invoice,
@@ -109,7 +110,14 @@ def generate_invoice_from_schedule(scheduled_invoice, manual=False):
             # Update scheduled invoice tracking
             scheduled_invoice.occurrences_generated += 1
             scheduled_invoice.last_generated_date = today
-            scheduled_invoice.next_generation_date = scheduled_invoice.calculate_next_generation_date(today)
+
+            # Advance the due queue past the period just generated. A manual
+            # generation before the schedule is due leaves it where it is.
+            due_date = scheduled_invoice.next_generation_date
+            if due_date is not None and due_date <= today:
+                scheduled_invoice.next_generation_date = scheduled_invoice.calculate_next_generation_date(due_date)
+                if scheduled_invoice.next_generation_date is None:
+                    scheduled_invoice.status = 'completed'
 
             # Check if max occurrences reached
             if scheduled_invoice.max_occurrences and scheduled_invoice.occurrences_generated >= scheduled_invoice.max_occurrences:
@@ -190,7 +198,7 @@ def send_scheduled_invoice_email(invoice, scheduled_invoice, organization):
         bool: True if email sent successfully
     """
     from .models import EmailSettings, CompanySettings
-    from .pdf_generator import generate_invoice_pdf
+    from .pdf_cache import get_invoice_pdf
     from .email_templates import (
         get_base_email_template,
         format_greeting,
@@ -329,7 +337,7 @@ def send_scheduled_invoice_email(invoice, scheduled_invoice, organization):
     attachment_names = []
     if company_settings:
         try:
-            pdf_buffer = generate_invoice_pdf(invoice, company_settings)
+            pdf_buffer = get_invoice_pdf(invoice, company_settings)
             pdf_content = pdf_buffer.getvalue()
             pdf_filename = f'{invoice.invoice_number}.pdf'
             email.attach(
@@ -362,10 +370,16 @@ def process_scheduled_invoices():
     Process all scheduled invoices that are due today.
     This function is called by the APScheduler job.
 
+    Only schedules whose next_generation_date has arrived are read, so the
+    cost follows the number of due schedules. Organizations are processed in
+    parallel and claimed through api.job_shards, so several app instances
+    running this job share the work.
+
     Returns:
         dict: Statistics about the processing
     """
     from .models import ScheduledInvoice
+    from .job_shards import SKIPPED, run_sharded
 
     logger.info("Starting scheduled invoice processing...")
 
@@ -377,36 +391,78 @@ def process_scheduled_invoices():
         'emails_sent': 0
     }
 
-    # Get all active scheduled invoices
-    scheduled_invoices = ScheduledInvoice.objects.filter(
-        status='active'
+    organization_ids = ScheduledInvoice.due_for_generation().order_by().values_list(
+        'organization_id', flat=True
+    ).distinct()
+    results = run_sharded('scheduled_invoices', organization_ids, process_organization_schedules)
+
+    for org_stats in results.values():
+        if org_stats is SKIPPED:
+            continue
+        for key, value in org_stats.items():
+            stats[key] += value
+
+    logger.info(
+        f"Scheduled invoice processing completed: "
+        f"{stats['generated']} generated, {stats['skipped']} skipped, "
+        f"{stats['failed']} failed, {stats['emails_sent']} emails sent"
+    )
+
+    return stats
+
+
+def process_organization_schedules(organization_id):
+    """
+    Generate the invoices due from one organization's schedules.
+
+    Periods missed while the job did not run (e.g. server downtime) are caught
+    up oldest first, one invoice per period dated on that period, up to
+    SCHEDULED_INVOICE_MAX_CATCH_UP per schedule and run; the rest stay due and
+    count as skipped.
+
+    Returns:
+        dict: Statistics about the processing, as process_scheduled_invoices()
+    """
+    from .models import ScheduledInvoice
+
+    stats = {
+        'processed': 0,
+        'generated': 0,
+        'failed': 0,
+        'skipped': 0,
+        'emails_sent': 0
+    }
+
+    scheduled_invoices = ScheduledInvoice.due_for_generation().filter(
+        organization_id=organization_id
     ).select_related('client', 'organization', 'payment_term').prefetch_related('items')
 
     for scheduled_invoice in scheduled_invoices:
         stats['processed'] += 1
 
-        # Check if should generate today
-        if not scheduled_invoice.should_generate_today():
-            stats['skipped'] += 1
-            continue
-
-        try:
-            invoice, email_sent = generate_invoice_from_schedule(scheduled_invoice)
-            stats['generated'] += 1
+        for _ in range(settings.SCHEDULED_INVOICE_MAX_CATCH_UP):
+            if not scheduled_invoice.should_generate_today():
+                break
 
-            if email_sent:
-                stats['emails_sent'] += 1
+            try:
+                invoice, email_sent = generate_invoice_from_schedule(
+                    scheduled_invoice,
+                    generation_date=scheduled_invoice.next_generation_date
+                )
+                stats['generated'] += 1
 
-            logger.info(f"[OK] Generated {invoice.invoice_number} for {scheduled_invoice.name}")
+                if email_sent:
+                    stats['emails_sent'] += 1
 
-        except Exception as e:
-            stats['failed'] += 1
-            logger.error(f"[FAILED] {scheduled_invoice.name}: {str(e)}")
+                logger.info(f"[OK] Generated {invoice.invoice_number} for {scheduled_invoice.name}")
 
-    logger.info(
-        f"Scheduled invoice processing completed: "
-        f"{stats['generated']} generated, {stats['skipped']} skipped, "
-        f"{stats['failed']} failed, {stats['emails_sent']} emails sent"
-    )
+            except Exception as e:
+                stats['failed'] += 1
+                logger.error(f"[FAILED] {scheduled_invoice.name}: {str(e)}")
+                break
+        else:
+            if scheduled_invoice.should_generate_today():
+                stats['skipped'] += 1
+                logger.warning(f"[CATCH-UP LIMIT] {scheduled_invoice.name}: more periods due, continuing next run")
 
     return stats
@@ -9,13 +9,12 @@ import logging
 import threading
 from datetime import datetime
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from django.core.mail import EmailMessage
 
 from apscheduler.schedulers.background import BackgroundScheduler
 
-# Lock to prevent multiple simultaneous reminder sends
-_reminder_lock = threading.Lock()
 _scheduler_started = False
 from apscheduler.triggers.cron import CronTrigger
 from django_apscheduler.jobstores import DjangoJobStore
@@ -40,117 +39,98 @@ def send_payment_reminders():
     """
     Send payment reminders for all organizations with active reminder settings.
     This function is called automatically by the scheduler.
+
+    Organizations are processed in parallel and claimed through api.job_shards,
+    so several app instances running this job share the work.
     """
-    global _reminder_lock
+    from api.models import Invoice
+    from api.job_shards import SKIPPED, run_sharded
 
-    # Use lock to prevent multiple simultaneous executions
-    if not _reminder_lock.acquire(blocking=False):
-        logger.warning("Payment reminder process already running, skipping...")
-        return "Skipped: Already running"
+    logger.info("Starting automated payment reminder process...")
 
-    try:
-        from api.models import Invoice, InvoiceSettings, EmailSettings, CompanySettings
-        from api.pdf_generator import generate_invoice_pdf
+    # Only organizations with at least one reminder due
+    organization_ids = Invoice.reminders_due().order_by().values_list('organization_id', flat=True).distinct()
+    results = run_sharded('payment_reminders', organization_ids, send_organization_reminders)
 
-        logger.info("Starting automated payment reminder process...")
+    total_sent = total_skipped = total_failed = 0
+    for result in results.values():
+        if result is SKIPPED:
+            continue
+        total_sent += result['sent']
+        total_skipped += result['skipped']
+        total_failed += result['failed']
 
-        # Get all organizations with active reminders
-        orgs_with_reminders = InvoiceSettings.objects.filter(
-            enablePaymentReminders=True
-        )
+    logger.info(f'Payment reminders completed: {total_sent} sent, {total_skipped} skipped, {total_failed} failed')
+    return f"Sent: {total_sent}, Skipped: {total_skipped}, Failed: {total_failed}"
+
+
+def send_organization_reminders(organization_id):
+    """
+    Send the due payment reminders of one organization.
+    Returns {'sent': n, 'skipped': n, 'failed': n}.
+    """
+    from api.models import Invoice, CompanySettings
+    from api.pdf_batch import generate_invoice_pdfs
 
-        total_sent = 0
-        total_skipped = 0
-        total_failed = 0
-
-        for invoice_settings in orgs_with_reminders:
-            # Skip if no organization is linked (legacy data)
-            if not invoice_settings.organization_id:
-                logger.warning(f'Skipping InvoiceSettings {invoice_settings.id} - no organization linked')
-                continue
-
-            organization = invoice_settings.organization
-            frequency_days = invoice_settings.reminderFrequencyDays
-
-            # Get unpaid invoices (both proforma and tax) for this organization
-            unpaid_invoices = Invoice.objects.filter(
-                organization=organization,
-                invoice_type__in=['proforma', 'tax'],
-                status__in=['draft', 'sent']
-            ).exclude(
-                status='paid'
-            ).exclude(
-                status='cancelled'
-            )
-
-            for invoice in unpaid_invoices:
-                # Check if reminder should be sent based on frequency
-                should_send = False
-                skip_reason = None
-
-                if invoice.last_reminder_sent is None:
-                    # Never sent a reminder, check if invoice is old enough
-                    days_since_invoice = (timezone.now().date() - invoice.invoice_date).days
-                    if days_since_invoice >= frequency_days:
-                        should_send = True
-                    else:
-                        skip_reason = f"Invoice only {days_since_invoice} days old (needs {frequency_days} days)"
-                else:
-                    # Check if enough days have passed since last reminder
-                    days_since_last_reminder = (timezone.now() - invoice.last_reminder_sent).days
-                    if days_since_last_reminder >= frequency_days:
-                        should_send = True
-                    else:
-                        skip_reason = f"Last reminder {days_since_last_reminder} days ago (needs {frequency_days} days)"
-
-                # Check if client has email
-                if should_send and not invoice.client.email:
-                    should_send = False
-                    skip_reason = f"Client {invoice.client.name} has no email address"
-
-                if should_send:
-                    try:
-                        # Use select_for_update to prevent race conditions
-                        # Re-fetch the invoice with a lock to ensure no duplicate sends
-                        from django.db import transaction
-                        with transaction.atomic():
-                            locked_invoice = Invoice.objects.select_for_update(nowait=True).get(pk=invoice.pk)
-
-                            # Double-check the reminder hasn't been sent by another process
-                            if locked_invoice.last_reminder_sent is not None:
-                                days_since = (timezone.now() - locked_invoice.last_reminder_sent).days
-                                if days_since < frequency_days:
-                                    logger.debug(f'[SKIP] {invoice.invoice_number}: Already sent by another process')
-                                    total_skipped += 1
-                                    continue
-
-                            # Send reminder email
-                            send_reminder_email(locked_invoice, invoice_settings, organization)
-
-                            # Update invoice reminder tracking
-                            locked_invoice.last_reminder_sent = timezone.now()
-                            locked_invoice.reminder_count += 1
-                            locked_invoice.save()
-
-                        total_sent += 1
-                        logger.info(f'[SENT] Reminder for {invoice.invoice_number} to {invoice.client.email}')
-                    except Exception as e:
-                        total_failed += 1
-                        logger.error(f'[FAILED] {invoice.invoice_number}: {str(e)}')
-                else:
-                    total_skipped += 1
-                    logger.debug(f'[SKIP] {invoice.invoice_number}: {skip_reason}')
-
-        logger.info(f'Payment reminders completed: {total_sent} sent, {total_skipped} skipped, {total_failed} failed')
-        return f"Sent: {total_sent}, Skipped: {total_skipped}, Failed: {total_failed}"
-    finally:
-        _reminder_lock.release()
-
-
-def send_reminder_email(invoice, invoice_settings, organization):
-    """Send payment reminder email with invoice PDF attachment"""
+    stats = {'sent': 0, 'skipped': 0, 'failed': 0}
+
+    due_invoices = list(Invoice.annotate_due_days(
+        Invoice.reminders_due().filter(organization_id=organization_id)
+        .select_related('organization', 'organization__invoice_settings')
+    ).order_by('invoice_date', 'id'))
+    if not due_invoices:
+        return stats
+
+    organization = due_invoices[0].organization
+    invoice_settings = organization.invoice_settings
+    frequency_days = invoice_settings.reminderFrequencyDays
+
+    # Render the attachments of this organization's reminders in one batch
+    company_settings = CompanySettings.objects.filter(organization=organization).first()
+    pdfs = generate_invoice_pdfs(due_invoices, company_settings) if company_settings else {}
+
+    for invoice in due_invoices:
+        try:
+            # Use select_for_update to prevent race conditions
+            # Re-fetch the invoice with a lock to ensure no duplicate sends
+            with transaction.atomic():
+                locked_invoice = Invoice.annotate_due_days(
+                    Invoice.objects.select_for_update(nowait=True)
+                ).get(pk=invoice.pk)
+                locked_invoice.client = invoice.client
+
+                # Double-check the reminder hasn't been sent by another process
+                if locked_invoice.last_reminder_sent is not None:
+                    days_since = (timezone.now() - locked_invoice.last_reminder_sent).days
+                    if days_since < frequency_days:
+                        logger.debug(f'[SKIP] {invoice.invoice_number}: Already sent by another process')
+                        stats['skipped'] += 1
+                        continue
+
+                # Send reminder email
+                send_reminder_email(locked_invoice, invoice_settings, organization, pdfs.get(invoice.pk))
+
+                # Update invoice reminder tracking
+                locked_invoice.last_reminder_sent = timezone.now()
+                locked_invoice.reminder_count += 1
+                locked_invoice.save()
+
+            stats['sent'] += 1
+            logger.info(f'[SENT] Reminder for {invoice.invoice_number} to {invoice.client.email}')
+        except Exception as e:
+            stats['failed'] += 1
+            logger.error(f'[FAILED] {invoice.invoice_number}: {str(e)}')
+
+    return stats
+
+
+def send_reminder_email(invoice, invoice_settings, organization, pdf_buffer=None):
+    """
+    Send payment reminder email with invoice PDF attachment.
+    pdf_buffer is the pre-rendered invoice PDF, if the caller has one.
+    """
     from api.models import EmailSettings, CompanySettings
-    from api.pdf_generator import generate_invoice_pdf
+    from api.pdf_cache import get_invoice_pdf
     from django.core.mail import get_connection
 
     # Get email settings
@@ -267,9 +247,11 @@ Best Regards,
 
     # Generate PDF attachment
     pdf_content = None
-    if company_settings:
+    if pdf_buffer is not None:
+        pdf_content = pdf_buffer.getvalue()
+    elif company_settings:
         try:
-            pdf_buffer = generate_invoice_pdf(invoice, company_settings)
+            pdf_buffer = get_invoice_pdf(invoice, company_settings)
             # pdf_buffer is a BytesIO object, get the bytes
             pdf_content = pdf_buffer.getvalue()
         except Exception as e:
@@ -316,6 +298,34 @@ def delete_old_job_executions(max_age=604_800):
     DjangoJobExecution.objects.delete_old_job_executions(max_age)
 
 
+@util.close_old_connections
+def cleanup_export_jobs_job():
+    """
+    Delete expired background export files, fail interrupted export jobs and
+    resubmit export jobs left waiting.
+    """
+    from api.export_jobs import cleanup_export_jobs
+    return cleanup_export_jobs()
+
+
+@util.close_old_connections
+def cleanup_outbox_job():
+    """
+    Delete sent emails past their retention from the outgoing email queue.
+    """
+    from api.email_outbox import cleanup_outbox
+    return cleanup_outbox()
+
+
+@util.close_old_connections
+def resume_campaigns_job():
+    """
+    Restart bulk email campaigns whose sending runner has stopped.
+    """
+    from api.campaigns import resume_campaigns
+    return resume_campaigns()
+
+
 def process_scheduled_invoices_job():
     """
     Process all scheduled invoices that are due today.
@@ -330,44 +340,13 @@ def check_and_send_pending_reminders():
     Check if there are any pending payment reminders that are due and send them.
     This is called on server startup to catch any missed reminders.
     """
-    from api.models import Invoice, InvoiceSettings
+    from api.models import Invoice
 
     def _send_pending():
         try:
-            # Check if there are any due reminders
-            orgs_with_reminders = InvoiceSettings.objects.filter(enablePaymentReminders=True)
-            pending_count = 0
-
-            for invoice_settings in orgs_with_reminders:
-                if not invoice_settings.organization_id:
-                    continue
-
-                organization = invoice_settings.organization
-                frequency_days = invoice_settings.reminderFrequencyDays
-
-                # Get unpaid invoices (both proforma and tax)
-                unpaid_invoices = Invoice.objects.filter(
-                    organization=organization,
-                    invoice_type__in=['proforma', 'tax'],
-                    status__in=['draft', 'sent']
-                ).exclude(status='paid').exclude(status='cancelled')
-
-                for invoice in unpaid_invoices:
-                    should_send = False
-                    if invoice.last_reminder_sent is None:
-                        days_since_invoice = (timezone.now().date() - invoice.invoice_date).days
-                        if days_since_invoice >= frequency_days:
-                            should_send = True
-                    else:
-                        days_since_last = (timezone.now() - invoice.last_reminder_sent).days
-                        if days_since_last >= frequency_days:
-                            should_send = True
-
-                    if should_send:
-                        pending_count += 1
-
-            if pending_count > 0:
-                logger.info(f"Found {pending_count} pending payment reminders on startup. Sending now...")
+            # Check if there are any due reminders (stops at the first one)
+            if Invoice.reminders_due().exists():
+                logger.info("Found pending payment reminders on startup. Sending now...")
                 send_payment_reminders()
             else:
                 logger.info("No pending payment reminders found on startup.")
@@ -420,6 +399,36 @@ def start_scheduler():
     )
     logger.info("Job execution cleanup scheduled for weekly on Sunday at midnight")
 
+    # Remove expired background export files and fail interrupted export jobs - hourly
+    scheduler.add_job(
+        cleanup_export_jobs_job,
+        trigger=CronTrigger(minute="15"),
+        id="cleanup_export_jobs",
+        max_instances=1,
+        replace_existing=True,
+    )
+    logger.info("Export job cleanup scheduled hourly")
+
+    # Remove delivered emails from the outgoing email queue - daily
+    scheduler.add_job(
+        cleanup_outbox_job,
+        trigger=CronTrigger(hour="02", minute="30"),
+        id="cleanup_outbox",
+        max_instances=1,
+        replace_existing=True,
+    )
+    logger.info("Email outbox cleanup scheduled daily at 02:30")
+
+    # Pick up interrupted bulk email campaigns - every 5 minutes
+    scheduler.add_job(
+        resume_campaigns_job,
+        trigger=CronTrigger(minute="*/5"),
+        id="resume_campaigns",
+        max_instances=1,
+        replace_existing=True,
+    )
+    logger.info("Interrupted email campaign check scheduled every 5 minutes")
+
     # Schedule invoice generation - runs daily at configured time (same as payment reminders)
     scheduled_invoice_hour = getattr(settings, 'SCHEDULED_INVOICE_HOUR', reminder_hour)
     scheduled_invoice_minute = getattr(settings, 'SCHEDULED_INVOICE_MINUTE', reminder_minute + 5)
@@ -437,6 +446,9 @@ def start_scheduler():
         logger.info("Starting background scheduler...")
         scheduler.start()
 
+        # Resume campaigns that were sending when the server stopped
+        resume_campaigns_job()
+
         # Check and send any pending reminders on startup
         # This runs after scheduler starts to catch any missed reminders after deployment
         check_and_send_pending_reminders()
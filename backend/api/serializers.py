@@ -13,7 +13,9 @@ from .models import (
     InventoryMovement, SupplierPayment, ExpensePayment,
     # Accounting Module models
     FinancialYear, AccountGroup, LedgerAccount, Voucher, VoucherEntry,
-    VoucherNumberSeries, BankReconciliation, BankReconciliationItem
+    VoucherNumberSeries, BankReconciliation, BankReconciliationItem,
+    # Background export jobs
+    ExportJob
 )
 
 from .utils import get_state_code
@@ -259,9 +261,43 @@ class InvoiceSettingsSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class LinkedLedgerBalanceMixin:
+    """
+    ledger_balance / ledger_balance_type for clients and suppliers, read from the
+    linked ledger account. Querysets annotated with
+    LedgerAccount.annotate_linked_balance are served without extra queries;
+    other instances fall back to a lookup.
+    """
+    ledger_link_field = None
+    default_balance_type = 'Dr'
+
+    def _linked_ledger_values(self, obj):
+        if hasattr(obj, 'linked_ledger_balance'):
+            return obj.linked_ledger_balance, obj.linked_ledger_balance_type
+        try:
+            from .models import LedgerAccount
+            ledger = LedgerAccount.linked_ledgers(obj.organization_id, self.ledger_link_field, obj).first()
+        except Exception:
+            ledger = None
+        if ledger:
+            return ledger.current_balance, ledger.current_balance_type
+        return None, None
+
+    def get_ledger_balance(self, obj):
+        """Get the current balance from the linked ledger account"""
+        balance, _ = self._linked_ledger_values(obj)
+        return float(balance) if balance is not None else 0.0
+
+    def get_ledger_balance_type(self, obj):
+        """Get the balance type (Dr/Cr) from the linked ledger account"""
+        _, balance_type = self._linked_ledger_values(obj)
+        return balance_type or self.default_balance_type
+
+
+class ClientSerializer(LinkedLedgerBalanceMixin, serializers.ModelSerializer):
     ledger_balance = serializers.SerializerMethodField()
     ledger_balance_type = serializers.SerializerMethodField()
+    ledger_link_field = 'linked_client'  # debtor ledger
 
     class Meta:
         model = Client
@@ -279,36 +315,6 @@ class ClientSerializer(serializers.ModelSerializer):
             return value.strip()
         return ''
 
-    def get_ledger_balance(self, obj):
-        """Get the current balance from the linked debtor ledger account"""
-        try:
-            from .models import LedgerAccount
-            ledger = LedgerAccount.objects.filter(
-                organization=obj.organization,
-                linked_client=obj,
-                is_active=True
-            ).first()
-            if ledger:
-                return float(ledger.current_balance)
-            return 0.0
-        except Exception:
-            return 0.0
-
-    def get_ledger_balance_type(self, obj):
-        """Get the balance type (Dr/Cr) from the linked debtor ledger account"""
-        try:
-            from .models import LedgerAccount
-            ledger = LedgerAccount.objects.filter(
-                organization=obj.organization,
-                linked_client=obj,
-                is_active=True
-            ).first()
-            if ledger:
-                return ledger.current_balance_type
-            return 'Dr'
-        except Exception:
-            return 'Dr'
-
 
 class ServiceItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -345,14 +351,14 @@ class InvoiceSerializer(serializers.ModelSerializer):
         fields = ['id', 'client', 'client_name', 'invoice_number', 'invoice_type',
                   'invoice_date', 'status', 'subtotal', 'tax_amount',
                   'cgst_amount', 'sgst_amount', 'igst_amount', 'is_interstate',
-                  'round_off', 'total_amount',
+                  'round_off', 'total_amount', 'amount_paid', 'outstanding',
                   'payment_term', 'payment_term_name', 'payment_term_description',
                   'payment_terms', 'notes', 'parent_proforma', 'is_emailed', 'emailed_at',
                   'items', 'created_at', 'updated_at']
         read_only_fields = ['id', 'invoice_number', 'client_name', 'payment_term_name',
                            'payment_term_description', 'is_emailed', 'emailed_at',
                            'cgst_amount', 'sgst_amount', 'igst_amount', 'is_interstate',
-                           'created_at', 'updated_at']
+                           'amount_paid', 'outstanding', 'created_at', 'updated_at']
 
     def create(self, validated_data):
         from decimal import Decimal
@@ -986,6 +992,12 @@ class ScheduledInvoiceSerializer(serializers.ModelSerializer):
     day_of_week = serializers.IntegerField(min_value=0, max_value=6, default=0, required=False, allow_null=True)
     month_of_year = serializers.IntegerField(min_value=1, max_value=12, default=1, required=False, allow_null=True)
 
+    # Fields that decide when invoices are generated
+    SCHEDULE_FIELDS = {
+        'frequency', 'day_of_month', 'day_of_week', 'month_of_year',
+        'start_date', 'end_date', 'max_occurrences',
+    }
+
     class Meta:
         model = ScheduledInvoice
         fields = [
@@ -1047,9 +1059,17 @@ class ScheduledInvoiceSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', None)
 
+        # A changed recurrence moves the next due date
+        schedule_changed = any(
+            getattr(instance, field) != validated_data[field]
+            for field in self.SCHEDULE_FIELDS & validated_data.keys()
+        )
+
         # Update scheduled invoice fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
+        if schedule_changed and instance.status in ['active', 'paused']:
+            instance.reschedule()
         instance.save()
 
         # Update items if provided
@@ -1138,10 +1158,12 @@ class ProductListSerializer(serializers.ModelSerializer):
         ]
 
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(LinkedLedgerBalanceMixin, serializers.ModelSerializer):
     """Serializer for Supplier master"""
     ledger_balance = serializers.SerializerMethodField()
     ledger_balance_type = serializers.SerializerMethodField()
+    ledger_link_field = 'linked_supplier'  # creditor ledger
+    default_balance_type = 'Cr'
 
     class Meta:
         model = Supplier
@@ -1162,36 +1184,6 @@ class SupplierSerializer(serializers.ModelSerializer):
             return value.strip()
         return ''
 
-    def get_ledger_balance(self, obj):
-        """Get the current balance from the linked creditor ledger account"""
-        try:
-            from .models import LedgerAccount
-            ledger = LedgerAccount.objects.filter(
-                organization=obj.organization,
-                linked_supplier=obj,
-                is_active=True
-            ).first()
-            if ledger:
-                return float(ledger.current_balance)
-            return 0.0
-        except Exception:
-            return 0.0
-
-    def get_ledger_balance_type(self, obj):
-        """Get the balance type (Dr/Cr) from the linked creditor ledger account"""
-        try:
-            from .models import LedgerAccount
-            ledger = LedgerAccount.objects.filter(
-                organization=obj.organization,
-                linked_supplier=obj,
-                is_active=True
-            ).first()
-            if ledger:
-                return ledger.current_balance_type
-            return 'Cr'
-        except Exception:
-            return 'Cr'
-
 
 class SupplierListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for supplier list views"""
@@ -1516,7 +1508,6 @@ class FinancialYearSerializer(serializers.ModelSerializer):
 
 class AccountGroupSerializer(serializers.ModelSerializer):
     """Serializer for Account Groups (Chart of Accounts hierarchy)"""
-    full_path = serializers.CharField(read_only=True)
     parent_name = serializers.CharField(source='parent.name', read_only=True)
     children_count = serializers.SerializerMethodField()
 
@@ -1529,6 +1520,8 @@ class AccountGroupSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_primary', 'full_path', 'children_count', 'created_at', 'updated_at']
 
     def get_children_count(self, obj):
+        if hasattr(obj, 'children_count'):
+            return obj.children_count
         return obj.children.count()
 
     def create(self, validated_data):
@@ -1538,29 +1531,43 @@ class AccountGroupSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
     def validate_parent(self, value):
-        """Ensure parent belongs to same organization"""
+        """Ensure parent belongs to same organization and is not inside this group"""
         request = self.context.get('request')
         if value and request and hasattr(request, 'organization'):
             if value.organization != request.organization:
                 raise serializers.ValidationError("Parent group must belong to the same organization")
+        if value and self.instance and value.is_descendant_of(self.instance):
+            raise serializers.ValidationError("A group cannot be moved under itself or one of its subgroups")
         return value
 
 
 class AccountGroupTreeSerializer(serializers.ModelSerializer):
-    """Serializer for Account Groups with nested children (tree view)"""
+    """
+    Serializer for Account Groups with nested children (tree view).
+    Expects groups from AccountGroup.load_tree(), which carry their children
+    and ledger rollups.
+    """
     children = serializers.SerializerMethodField()
-    ledger_count = serializers.SerializerMethodField()
+    ledger_count = serializers.IntegerField(read_only=True)
+    total_ledger_count = serializers.IntegerField(read_only=True)
+    total_balance = serializers.SerializerMethodField()
+    total_balance_type = serializers.SerializerMethodField()
 
     class Meta:
         model = AccountGroup
-        fields = ['id', 'name', 'nature', 'is_primary', 'sequence', 'children', 'ledger_count']
+        fields = [
+            'id', 'name', 'full_path', 'nature', 'is_primary', 'sequence', 'children',
+            'ledger_count', 'total_ledger_count', 'total_balance', 'total_balance_type'
+        ]
 
     def get_children(self, obj):
-        children = obj.children.all().order_by('sequence', 'name')
-        return AccountGroupTreeSerializer(children, many=True).data
+        return AccountGroupTreeSerializer(obj.tree_children, many=True).data
+
+    def get_total_balance(self, obj):
+        return float(abs(obj.total_balance))
 
-    def get_ledger_count(self, obj):
-        return obj.accounts.count()
+    def get_total_balance_type(self, obj):
+        return 'Dr' if obj.total_balance >= 0 else 'Cr'
 
 
 class LedgerAccountSerializer(serializers.ModelSerializer):
@@ -1728,9 +1735,10 @@ class VoucherSerializer(serializers.ModelSerializer):
         entries_data = validated_data.pop('entries', None)
 
         # Don't allow editing posted vouchers
-        if instance.status == 'posted' and entries_data is not None:
-            # Cancel old entries effect first
-            instance.cancel()
+        date_changed = 'voucher_date' in validated_data and validated_data['voucher_date'] != instance.voucher_date
+        if instance.status == 'posted' and (entries_data is not None or date_changed):
+            # Take the old entries out of the ledger balances (and the month they were counted in) first
+            instance.reverse_balances()
 
         # Update voucher fields
         for attr, value in validated_data.items():
@@ -1755,6 +1763,8 @@ class VoucherSerializer(serializers.ModelSerializer):
         # Re-post if status is posted
         if instance.status == 'posted':
             instance.post()
+        else:
+            instance.reverse_balances()
 
         return instance
 
@@ -1837,3 +1847,27 @@ class BankReconciliationSerializer(serializers.ModelSerializer):
         if request and hasattr(request, 'organization'):
             validated_data['organization'] = request.organization
         return super().create(validated_data)
+
+
+# =============================================================================
+# BACKGROUND EXPORT JOB SERIALIZERS
+# =============================================================================
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """Read-only view of an export job for polling"""
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'kind', 'export_format', 'data_type', 'status', 'progress',
+            'rows_written', 'total_rows', 'error_message',
+            'file_name', 'file_size', 'download_url',
+            'created_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != 'completed':
+            return None
+        return f'/api/export-jobs/{obj.id}/download/'
@@ -1,14 +1,18 @@
 """
 Signal handlers for automated email notifications, accounting ledger creation,
-and auto-voucher generation for double-entry bookkeeping.
+auto-voucher generation for double-entry bookkeeping, and dashboard cache
+invalidation.
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from .models import (
     Organization, OrganizationMembership, Client, Supplier,
-    AccountGroup, LedgerAccount, Invoice, Purchase, Payment, ExpensePayment
+    AccountGroup, LedgerAccount, Invoice, Purchase, Payment, ExpensePayment,
+    SupplierPayment, Subscription, CompanySettings, InvoiceFormatSettings
 )
+from .cache_utils import invalidate_org_cache, invalidate_membership_cache
+from .pdf_generator import invalidate_invoice_template
 from .email_utils import (
     send_welcome_email_to_user,
     send_user_added_notification_to_owner,
@@ -305,3 +309,61 @@ def create_payment_voucher_on_expense_save(sender, instance, created, **kwargs):
             logger.info(f"Auto-created payment voucher {voucher.voucher_number} for expense")
     except Exception as e:
         logger.error(f"Error auto-creating payment voucher for expense: {str(e)}")
+
+
+# =============================================================================
+# DASHBOARD CACHE INVALIDATION
+# =============================================================================
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+@receiver(post_save, sender=ExpensePayment)
+@receiver(post_delete, sender=ExpensePayment)
+@receiver(post_save, sender=SupplierPayment)
+@receiver(post_delete, sender=SupplierPayment)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=OrganizationMembership)
+@receiver(post_delete, sender=OrganizationMembership)
+def invalidate_dashboard_cache(sender, instance, **kwargs):
+    """
+    Bump the organization's dashboard cache version whenever data feeding
+    dashboard_stats, ageing_report_summary or analytics_summary changes.
+    """
+    invalidate_org_cache(instance.organization_id)
+
+
+# =============================================================================
+# ORGANIZATION MEMBERSHIP CACHE INVALIDATION
+# =============================================================================
+
+@receiver(post_save, sender=OrganizationMembership)
+@receiver(post_delete, sender=OrganizationMembership)
+def invalidate_membership_cache_on_membership_change(sender, instance, **kwargs):
+    """Drop the cached organization lookup of the member (role or status may have changed)."""
+    invalidate_membership_cache([instance.user_id], instance.organization_id)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def invalidate_membership_cache_on_organization_change(sender, instance, **kwargs):
+    """Drop cached organization lookups of every member (cached instance is stale)."""
+    user_ids = OrganizationMembership.objects.filter(
+        organization=instance
+    ).values_list('user_id', flat=True)
+    invalidate_membership_cache(list(user_ids), instance.id)
+
+
+@receiver(post_save, sender=CompanySettings)
+@receiver(post_delete, sender=CompanySettings)
+@receiver(post_save, sender=InvoiceFormatSettings)
+@receiver(post_delete, sender=InvoiceFormatSettings)
+def invalidate_invoice_template_on_settings_change(sender, instance, **kwargs):
+    """Recompile the organization's invoice PDF template on its next render."""
+    invalidate_invoice_template(instance.organization_id)
@@ -0,0 +1,466 @@
+"""
+Tests for the double-entry accounting models and endpoints.
+
+Covers incremental ledger balance maintenance on voucher posting and
+cancellation, the full-recompute repair path, ledger statements built
+on monthly balance snapshots, the financial statement reports, the
+materialized account group tree, and bulk voucher backfill.
+"""
+
+import pytest
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.models import AccountGroup, Invoice, LedgerAccount, LedgerBalanceSnapshot, Voucher, VoucherEntry
+
+
+def _ledger(organization, code):
+    return LedgerAccount.objects.get(organization=organization, account_code=code)
+
+
+def _voucher(organization, debit_ledger, credit_ledger, amount, voucher_date=date(2025, 5, 10), number="1", **fields):
+    """A draft journal voucher debiting one ledger and crediting another."""
+    voucher = Voucher.objects.create(
+        organization=organization, voucher_type="journal", voucher_number=number,
+        voucher_date=voucher_date, total_amount=amount, status="draft", **fields
+    )
+    VoucherEntry.objects.create(voucher=voucher, ledger_account=debit_ledger, debit_amount=amount, sequence=1)
+    VoucherEntry.objects.create(voucher=voucher, ledger_account=credit_ledger, credit_amount=amount, sequence=2)
+    return voucher
+
+
+# =============================================================================
+# Ledger Balance Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestLedgerBalances:
+    """Incremental balance updates on Voucher.post()/cancel()."""
+
+    def test_post_and_cancel_adjust_balances(self, organization):
+        """Posting moves both ledgers by the voucher amount; cancelling moves them back."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+
+        voucher = _voucher(organization, cash, sales, Decimal("500.00"))
+        voucher.post()
+        cash.refresh_from_db()
+        sales.refresh_from_db()
+        assert (cash.current_balance, cash.current_balance_type) == (Decimal("500.00"), "Dr")
+        assert (sales.current_balance, sales.current_balance_type) == (Decimal("500.00"), "Cr")
+
+        # Crossing zero flips the balance side
+        _voucher(organization, sales, cash, Decimal("800.00"), number="2").post()
+        cash.refresh_from_db()
+        assert (cash.current_balance, cash.current_balance_type) == (Decimal("300.00"), "Cr")
+
+        voucher.cancel()
+        cash.refresh_from_db()
+        sales.refresh_from_db()
+        assert (cash.current_balance, cash.current_balance_type) == (Decimal("800.00"), "Cr")
+        assert (sales.current_balance, sales.current_balance_type) == (Decimal("800.00"), "Dr")
+
+    def test_posting_twice_counts_once(self, organization):
+        """Re-posting an already posted voucher (e.g. after an edit without entry changes) is a no-op."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+
+        voucher = _voucher(organization, cash, sales, Decimal("100.00"))
+        voucher.post()
+        Voucher.objects.get(pk=voucher.pk).post()
+        voucher.cancel()
+        voucher.cancel()
+
+        cash.refresh_from_db()
+        assert cash.current_balance == Decimal("0.00")
+
+    def test_stale_instances_count_once(self, organization):
+        """Saves of instances loaded before a post/cancel don't reset the applied flag."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+
+        voucher = _voucher(organization, cash, sales, Decimal("100.00"))
+        first = Voucher.objects.get(pk=voucher.pk)
+        second = Voucher.objects.get(pk=voucher.pk)
+        first.post()
+        second.post()
+        cash.refresh_from_db()
+        assert cash.current_balance == Decimal("100.00")
+
+        # An edit through an instance loaded before the post leaves the flag alone
+        second.narration = "Edited"
+        second.save()
+        first = Voucher.objects.get(pk=voucher.pk)
+        assert first.balance_applied
+
+        stale = Voucher.objects.get(pk=voucher.pk)
+        stale.balance_applied = False
+        stale.cancel()
+        cash.refresh_from_db()
+        assert cash.current_balance == Decimal("0.00")
+
+    def test_posting_cost_does_not_depend_on_history(self, organization):
+        """Posting issues the same queries whatever the ledger's number of entries."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+
+        def post_queries(number):
+            voucher = _voucher(organization, cash, sales, Decimal("10.00"), number=number)
+            with CaptureQueriesContext(connection) as ctx:
+                voucher.post()
+            return len(ctx.captured_queries)
+
+        post_queries("1")  # creates the month's balance snapshot
+        baseline = post_queries("2")
+        for number in range(3, 12):
+            post_queries(str(number))
+        assert post_queries("12") == baseline
+
+        cash.refresh_from_db()
+        assert cash.current_balance == Decimal("120.00")
+
+    def test_recalculate_repairs_drift(self, organization):
+        """The repair command recomputes balances from opening balance and posted entries."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+        LedgerAccount.objects.filter(pk=cash.pk).update(opening_balance=Decimal("50.00"), opening_balance_type="Dr")
+        _voucher(organization, cash, sales, Decimal("100.00")).post()
+        _voucher(organization, cash, sales, Decimal("999.00"), number="2")  # draft, not counted
+        LedgerAccount.objects.filter(pk=cash.pk).update(current_balance=Decimal("1.00"), current_balance_type="Cr")
+
+        out = StringIO()
+        call_command("recalculate_ledger_balances", org_id=str(organization.id), dry_run=True, stdout=out)
+        assert "Would fix 1 ledger(s)" in out.getvalue()
+        cash.refresh_from_db()
+        assert cash.current_balance == Decimal("1.00")
+
+        call_command("recalculate_ledger_balances", org_id=str(organization.id), stdout=StringIO())
+        cash.refresh_from_db()
+        assert (cash.current_balance, cash.current_balance_type) == (Decimal("150.00"), "Dr")
+
+    def test_editing_and_deleting_posted_voucher(self, auth_client, organization):
+        """Replacing a posted voucher's entries swaps their effect; deleting it removes it."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+        voucher = _voucher(organization, cash, sales, Decimal("100.00"))
+        voucher.post()
+
+        response = auth_client.patch(f"/api/vouchers/{voucher.id}/", {
+            "entries": [
+                {"ledger_account": cash.id, "debit_amount": "250.00", "credit_amount": "0.00"},
+                {"ledger_account": sales.id, "debit_amount": "0.00", "credit_amount": "250.00"},
+            ],
+        }, format="json")
+        assert response.status_code == 200
+        cash.refresh_from_db()
+        assert (cash.current_balance, cash.current_balance_type) == (Decimal("250.00"), "Dr")
+
+        response = auth_client.delete(f"/api/vouchers/{voucher.id}/")
+        assert response.status_code == 204
+        cash.refresh_from_db()
+        assert cash.current_balance == Decimal("0.00")
+
+
+# =============================================================================
+# Ledger Statement Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestLedgerStatement:
+    """Monthly balance snapshots and the ledger statement endpoint."""
+
+    def _snapshots(self, ledger):
+        return list(LedgerBalanceSnapshot.objects.filter(ledger=ledger).values_list("month", "debit_total", "credit_total"))
+
+    def test_snapshots_follow_posting_and_backdating(self, organization):
+        """Each month keeps cumulative totals; a backdated voucher moves every later closing."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+
+        _voucher(organization, cash, sales, Decimal("100.00"), voucher_date=date(2025, 4, 5), number="1").post()
+        _voucher(organization, sales, cash, Decimal("30.00"), voucher_date=date(2025, 6, 20), number="2").post()
+        backdated = _voucher(organization, cash, sales, Decimal("5.00"), voucher_date=date(2025, 5, 1), number="3")
+        backdated.post()
+
+        assert self._snapshots(cash) == [
+            (date(2025, 4, 1), Decimal("100.00"), Decimal("0.00")),
+            (date(2025, 5, 1), Decimal("105.00"), Decimal("0.00")),
+            (date(2025, 6, 1), Decimal("105.00"), Decimal("30.00")),
+        ]
+
+        backdated.cancel()
+        assert self._snapshots(cash)[2] == (date(2025, 6, 1), Decimal("100.00"), Decimal("30.00"))
+
+        # The repair path rebuilds the same closings (only for months with entries)
+        LedgerBalanceSnapshot.rebuild(LedgerAccount.objects.filter(pk=cash.pk))
+        assert self._snapshots(cash) == [
+            (date(2025, 4, 1), Decimal("100.00"), Decimal("0.00")),
+            (date(2025, 6, 1), Decimal("100.00"), Decimal("30.00")),
+        ]
+
+    def test_statement_opening_includes_earlier_entries(self, auth_client, organization):
+        """A date-range statement opens with the balance of everything before from_date."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+        LedgerAccount.objects.filter(pk=cash.pk).update(opening_balance=Decimal("1000.00"), opening_balance_type="Dr")
+
+        _voucher(organization, cash, sales, Decimal("100.00"), voucher_date=date(2025, 4, 5), number="1").post()
+        _voucher(organization, cash, sales, Decimal("20.00"), voucher_date=date(2025, 6, 3), number="2").post()
+        _voucher(organization, sales, cash, Decimal("50.00"), voucher_date=date(2025, 6, 15), number="3").post()
+        _voucher(organization, cash, sales, Decimal("7.00"), voucher_date=date(2025, 7, 1), number="4").post()
+
+        response = auth_client.get(f"/api/ledger-accounts/{cash.id}/statement/?from_date=2025-06-10&to_date=2025-06-30")
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["opening_balance"], data["opening_balance_type"]) == (1120.0, "Dr")
+        assert [entry["credit"] for entry in data["entries"]] == [50.0]
+        assert (data["closing_balance"], data["closing_balance_type"]) == (1070.0, "Dr")
+
+        response = auth_client.get(f"/api/ledger-accounts/{cash.id}/statement/")
+        data = response.json()
+        assert data["opening_balance"] == 1000.0
+        assert (data["closing_balance"], len(data["entries"])) == (1077.0, 4)
+
+    def test_statement_opening_cost_is_constant(self, organization):
+        """The opening balance is one snapshot lookup plus one aggregate, however long the history."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+        for month in range(1, 13):
+            _voucher(organization, cash, sales, Decimal("10.00"), voucher_date=date(2024, month, 1), number=str(month)).post()
+
+        cash.refresh_from_db()
+        with CaptureQueriesContext(connection) as ctx:
+            balance = cash.balance_before(date(2024, 12, 15))
+        assert balance == Decimal("120.00")
+        assert len(ctx.captured_queries) == 2
+
+
+# =============================================================================
+# Financial Statement Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestFinancialReports:
+    """Trial balance, P&L and balance sheet built from one aggregate over voucher entries."""
+
+    def _post_sample_vouchers(self, organization):
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+        expense = LedgerAccount.objects.create(
+            organization=organization, name="Office Rent", account_code="RENT",
+            group=AccountGroup.objects.get(organization=organization, name="Indirect Expenses"),
+        )
+        LedgerAccount.objects.filter(pk=cash.pk).update(opening_balance=Decimal("1000.00"), opening_balance_type="Dr")
+        _voucher(organization, cash, sales, Decimal("500.00"), voucher_date=date(2025, 3, 20), number="1").post()
+        _voucher(organization, cash, sales, Decimal("800.00"), voucher_date=date(2025, 5, 10), number="2").post()
+        _voucher(organization, expense, cash, Decimal("300.00"), voucher_date=date(2025, 6, 1), number="3").post()
+        _voucher(organization, expense, cash, Decimal("999.00"), voucher_date=date(2025, 6, 2), number="4")  # draft
+        return cash, sales, expense
+
+    def test_trial_balance_rolls_up_groups(self, auth_client, organization):
+        """Group rows sum their subtree and the closing debits equal the closing credits."""
+        self._post_sample_vouchers(organization)
+
+        response = auth_client.get("/api/accounting/trial-balance/?from_date=2025-04-01&to_date=2025-06-30")
+        assert response.status_code == 200
+        data = response.json()
+        totals = data["totals"]
+        assert (totals["debit"], totals["credit"]) == (1100.0, 1100.0)
+        # Closing balances include the 1000 opening, which has no contra entry
+        assert totals["difference"] == 1000.0
+
+        current_assets = next(group for group in data["groups"] if group["name"] == "Current Assets")
+        assert (current_assets["opening_balance"], current_assets["opening_balance_type"]) == (1500.0, "Dr")
+        assert (current_assets["closing_balance"], current_assets["closing_balance_type"]) == (2000.0, "Dr")
+        cash_in_hand = next(group for group in current_assets["groups"] if group["name"] == "Cash-in-Hand")
+        assert [ledger["account_code"] for ledger in cash_in_hand["ledgers"]] == ["CASH"]
+
+        sales_accounts = next(group for group in data["groups"] if group["name"] == "Sales Accounts")
+        assert (sales_accounts["credit"], sales_accounts["closing_balance"]) == (800.0, 1300.0)
+
+        response = auth_client.get("/api/accounting/trial-balance/?to_date=06-30-2025")
+        assert response.status_code == 400
+
+    def test_profit_and_loss_and_balance_sheet(self, auth_client, organization):
+        """The P&L covers the period; the balance sheet carries the accumulated profit."""
+        self._post_sample_vouchers(organization)
+
+        data = auth_client.get("/api/accounting/profit-and-loss/?from_date=2025-04-01&to_date=2025-06-30").json()
+        assert (data["total_income"], data["total_expenses"], data["net_profit"]) == (800.0, 300.0, 500.0)
+        assert [group["name"] for group in data["expenses"]] == ["Indirect Expenses"]
+        assert [(ledger["name"], ledger["amount"]) for ledger in data["expenses"][0]["ledgers"]] == [("Office Rent", 300.0)]
+
+        data = auth_client.get("/api/accounting/balance-sheet/?to_date=2025-06-30").json()
+        assert data["profit_and_loss"] == 1000.0
+        assert data["total_assets"] == 2000.0
+        # The cash opening balance has no capital ledger behind it
+        assert data["difference"] == 1000.0
+
+    def test_reports_query_count_is_constant(self, organization):
+        """Each report is two queries however many groups, ledgers and vouchers there are."""
+        from api import financial_reports
+
+        self._post_sample_vouchers(organization)
+        with CaptureQueriesContext(connection) as ctx:
+            financial_reports.trial_balance(organization, date(2025, 4, 1), date(2025, 6, 30))
+        assert len(ctx.captured_queries) == 2
+        with CaptureQueriesContext(connection) as ctx:
+            financial_reports.balance_sheet(organization, date(2025, 6, 30))
+        assert len(ctx.captured_queries) == 2
+
+
+# =============================================================================
+# Account Group Tree Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestAccountGroupTree:
+    """Materialized tree_path/full_path and the single-query group tree."""
+
+    def _group(self, organization, name):
+        return AccountGroup.objects.get(organization=organization, name=name)
+
+    def test_paths_follow_rename_and_move(self, organization):
+        """Renaming or moving a group rewrites the stored paths of its whole subtree."""
+        current_assets = self._group(organization, "Current Assets")
+        bank_accounts = self._group(organization, "Bank Accounts")
+        savings = AccountGroup.objects.create(organization=organization, name="Savings", parent=bank_accounts, nature="debit")
+        fixed_deposits = AccountGroup.objects.create(organization=organization, name="Fixed Deposits", parent=savings, nature="debit")
+
+        assert fixed_deposits.full_path == "Current Assets > Bank Accounts > Savings > Fixed Deposits"
+        assert fixed_deposits.tree_path == f"{current_assets.pk}/{bank_accounts.pk}/{savings.pk}/{fixed_deposits.pk}/"
+
+        bank_accounts.name = "Banks"
+        bank_accounts.save()
+        fixed_deposits.refresh_from_db()
+        assert fixed_deposits.full_path == "Current Assets > Banks > Savings > Fixed Deposits"
+
+        investments = self._group(organization, "Investments")
+        savings.parent = investments
+        savings.save()
+        fixed_deposits.refresh_from_db()
+        assert fixed_deposits.full_path == "Investments > Savings > Fixed Deposits"
+        assert fixed_deposits.tree_path == f"{investments.pk}/{savings.pk}/{fixed_deposits.pk}/"
+        assert fixed_deposits.is_descendant_of(investments)
+        assert not fixed_deposits.is_descendant_of(current_assets)
+
+    def test_group_cannot_move_under_its_subgroup(self, auth_client, organization):
+        """The API refuses a parent inside the group's own subtree."""
+        current_assets = self._group(organization, "Current Assets")
+        bank_accounts = self._group(organization, "Bank Accounts")
+
+        response = auth_client.patch(f"/api/account-groups/{current_assets.id}/", {"parent": bank_accounts.id}, format="json")
+        assert response.status_code == 400
+        assert "parent" in response.json()
+
+    def test_tree_loads_in_one_query_with_rollups(self, auth_client, organization):
+        """The tree endpoint is one query and rolls ledger counts and balances up to the roots."""
+        cash = _ledger(organization, "CASH")
+        sales = _ledger(organization, "SALES")
+        _voucher(organization, cash, sales, Decimal("250.00")).post()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = auth_client.get("/api/account-groups/tree/")
+        assert response.status_code == 200
+        group_queries = [q for q in ctx.captured_queries if "api_accountgroup" in q["sql"]]
+        assert len(group_queries) == 1
+
+        current_assets = next(group for group in response.json() if group["name"] == "Current Assets")
+        cash_in_hand = next(group for group in current_assets["children"] if group["name"] == "Cash-in-Hand")
+        assert cash_in_hand["full_path"] == "Current Assets > Cash-in-Hand"
+        assert cash_in_hand["ledger_count"] >= 1
+        assert current_assets["total_ledger_count"] >= cash_in_hand["total_ledger_count"] + current_assets["ledger_count"]
+        assert (current_assets["total_balance"], current_assets["total_balance_type"]) == (250.0, "Dr")
+
+
+# =============================================================================
+# Voucher Backfill Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestVoucherBackfill:
+    """create_historical_vouchers --batch matches the one-by-one vouchers and resumes."""
+
+    def _invoices(self, organization, client_obj, count):
+        invoices = []
+        for day in range(1, count + 1):
+            invoices.append(Invoice.objects.create(
+                organization=organization, client=client_obj, invoice_type="tax",
+                invoice_date=date(2025, 5, day), status="sent",
+                subtotal=Decimal("1000.00"), cgst_amount=Decimal("90.00"), sgst_amount=Decimal("90.00"),
+                tax_amount=Decimal("180.00"), total_amount=Decimal("1180.00"),
+            ))
+        return invoices
+
+    def _state(self, organization):
+        """Per invoice: voucher status and entries; per ledger: balance."""
+        vouchers = {
+            voucher.invoice_id: (
+                voucher.status,
+                [(e.ledger_account_id, e.debit_amount, e.credit_amount) for e in voucher.entries.all()],
+            )
+            for voucher in Voucher.objects.filter(organization=organization, voucher_type="sales").prefetch_related("entries")
+        }
+        balances = set(
+            LedgerAccount.objects.filter(organization=organization).values_list("id", "current_balance", "current_balance_type")
+        )
+        return vouchers, balances
+
+    def _reset(self, organization):
+        Voucher.objects.filter(organization=organization, voucher_type="sales").delete()
+        LedgerAccount.recalculate_balances(LedgerAccount.objects.filter(organization=organization))
+
+    def test_batch_matches_single_vouchers(self, organization, client_obj):
+        """Bulk-created vouchers have the same entries and leave the same balances."""
+        self._invoices(organization, client_obj, 5)
+        single_vouchers, single_balances = self._state(organization)
+        assert len(single_vouchers) == 5
+        assert {status for status, _ in single_vouchers.values()} == {"posted"}
+
+        self._reset(organization)
+        out = StringIO()
+        call_command(
+            "create_historical_vouchers", org_id=str(organization.id), type="invoices",
+            batch=True, batch_size=2, stdout=out,
+        )
+        assert "[INVOICES] 4/5 processed" in out.getvalue()
+        assert self._state(organization) == (single_vouchers, single_balances)
+
+        numbers = sorted(Voucher.objects.filter(organization=organization, voucher_type="sales").values_list("voucher_number", flat=True))
+        assert len(set(numbers)) == 5
+        assert LedgerBalanceSnapshot.objects.filter(ledger__organization=organization).exists()
+
+    def test_batch_resumes_after_interruption(self, organization, client_obj):
+        """A second run only creates the vouchers still missing."""
+        from api import voucher_backfill
+
+        invoices = self._invoices(organization, client_obj, 4)
+        _, single_balances = self._state(organization)
+        self._reset(organization)
+
+        # Only the first chunk got saved before the "crash"
+        voucher_backfill.backfill_vouchers(organization, "invoices", batch_size=2)
+        Voucher.objects.filter(invoice__in=invoices[2:]).delete()
+        assert Voucher.objects.filter(organization=organization, voucher_type="sales").count() == 2
+
+        call_command("create_historical_vouchers", org_id=str(organization.id), type="invoices", batch=True, stdout=StringIO())
+        vouchers, balances = self._state(organization)
+        assert sorted(vouchers) == sorted(invoice.id for invoice in invoices)
+        assert balances == single_balances
+
+    def test_batch_query_count_does_not_grow_per_record(self, organization, client_obj):
+        """A chunk costs a fixed number of queries however many records it holds."""
+        from api import voucher_backfill
+
+        self._invoices(organization, client_obj, 8)
+        self._reset(organization)
+        ledgers = voucher_backfill.LedgerCache(organization)
+        with CaptureQueriesContext(connection) as ctx:
+            result = voucher_backfill.backfill_vouchers(organization, "invoices", ledgers=ledgers)
+        assert result == {"processed": 8, "created": 8, "skipped": 0}
+        assert len(ctx.captured_queries) < 15
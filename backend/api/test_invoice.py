@@ -5,11 +5,17 @@ Covers CRUD operations, filtering, PDF generation, multi-tenant isolation,
 and authentication enforcement.
 """
 
+import json
 import pytest
+from datetime import date
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from decimal import Decimal
 
-from api.models import Client, Invoice, InvoiceItem
+from api.models import (
+    Client, Invoice, InvoiceItem, InvoiceSettings, LedgerAccount, PaymentTerm, Supplier
+)
 
 
 # =============================================================================
@@ -276,6 +282,103 @@ class TestInvoiceAPI:
         # PDF files start with the %PDF magic bytes
         assert response.content[:4] == b"%PDF"
 
+    def test_invoice_pdf_is_cached_until_inputs_change(self, auth_client, sample_invoice):
+        """
+        A second download of an unchanged invoice is served from the PDF cache;
+        editing a line item changes the cache key and triggers a re-render.
+        """
+        from unittest.mock import patch
+        from api import pdf_cache
+
+        url = f"/api/invoices/{sample_invoice.id}/pdf/"
+        with patch.object(pdf_cache, "generate_invoice_pdf", wraps=pdf_cache.generate_invoice_pdf) as render:
+            first = auth_client.get(url)
+            second = auth_client.get(url)
+            assert render.call_count == 1
+            assert first.content == second.content
+
+            # Status/reminder bookkeeping does not affect the rendered PDF
+            Invoice.objects.filter(pk=sample_invoice.pk).update(reminder_count=3)
+            auth_client.get(url)
+            assert render.call_count == 1
+
+            item = sample_invoice.items.first()
+            item.description = "Revised Consulting Service"
+            item.save()
+            auth_client.get(url)
+            assert render.call_count == 2
+
+    def test_bulk_pdf_streams_zip(self, auth_client, sample_invoice):
+        """POST /api/invoices/bulk_pdf/ streams a ZIP with one PDF per selected invoice."""
+        import io
+        import zipfile
+        from api.models import CompanySettings
+
+        CompanySettings.objects.get_or_create(
+            organization=sample_invoice.organization, defaults={"companyName": "Test Co"}
+        )
+        response = auth_client.post("/api/invoices/bulk_pdf/", {"ids": [sample_invoice.id]}, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response["Content-Type"] == "application/zip"
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        name = f"Invoice_{sample_invoice.invoice_number.replace('/', '-')}.pdf"
+        assert archive.namelist() == [name]
+        assert archive.read(name)[:4] == b"%PDF"
+
+        # Unknown ids select nothing
+        response = auth_client.get("/api/invoices/bulk_pdf/?ids=999999")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_generate_invoice_pdfs_batch(self, settings, sample_invoice):
+        """
+        generate_invoice_pdfs renders invoices from plain dicts on the process
+        pool and stores the results in the PDF cache.
+        """
+        from unittest.mock import patch
+        from api import pdf_batch
+        from api.models import CompanySettings
+
+        company, _ = CompanySettings.objects.get_or_create(
+            organization=sample_invoice.organization, defaults={"companyName": "Test Co"}
+        )
+        settings.PDF_RENDER_WORKERS = 1
+        try:
+            with patch.object(pdf_batch, "PDF_RENDER_MIN_BATCH", 1):
+                pdfs = pdf_batch.generate_invoice_pdfs([sample_invoice], company)
+        finally:
+            pdf_batch.shutdown_pool()
+        assert pdfs[sample_invoice.pk].getvalue()[:4] == b"%PDF"
+
+        # Unchanged invoices are served from the cache without rendering
+        with patch.object(pdf_batch, "render_invoice_pdfs_data") as render:
+            cached = pdf_batch.generate_invoice_pdfs([sample_invoice], company)
+        render.assert_not_called()
+        assert cached[sample_invoice.pk].getvalue() == pdfs[sample_invoice.pk].getvalue()
+
+    def test_invoice_pdf_template_is_reused_until_settings_change(self, organization):
+        """
+        The compiled per-organization template is shared by renders and rebuilt
+        once the company or format settings it was compiled from are saved.
+        """
+        from api.models import CompanySettings, InvoiceFormatSettings
+        from api.pdf_generator import get_invoice_template
+
+        company, _ = CompanySettings.objects.get_or_create(
+            organization=organization, defaults={"companyName": "Test Co"}
+        )
+        format_settings, _ = InvoiceFormatSettings.objects.get_or_create(organization=organization)
+
+        template = get_invoice_template(company, format_settings)
+        assert get_invoice_template(company, format_settings) is template
+
+        format_settings.table_header_bg_color = "#000000"
+        format_settings.save()
+        recompiled = get_invoice_template(company, format_settings)
+        assert recompiled is not template
+        assert recompiled.header_bg.hexval() == "0x000000"
+
     def test_update_invoice(self, auth_client, sample_invoice):
         """
         PUT /api/invoices/{id}/ updates the invoice and its items (200).
@@ -388,3 +491,632 @@ class TestInvoiceAPI:
         assert num1.startswith("INV-")
         assert num2.startswith("INV-")
         assert num1 != num2
+
+    def test_invoice_number_continues_existing_series(self, auth_client, sample_invoice):
+        """The number series is seeded from existing invoices and advances per create."""
+        from api.models import InvoiceNumberSeries
+
+        item_data = {
+            "description": "Service",
+            "quantity": 1,
+            "rate": "100.00",
+            "gst_rate": "18",
+            "taxable_amount": "100.00",
+            "total_amount": "118.00",
+        }
+        payload = {
+            "client": sample_invoice.client_id,
+            "invoice_type": "tax",
+            "invoice_date": "2025-03-01",
+            "items": [item_data],
+        }
+        resp1 = auth_client.post("/api/invoices/", payload, format="json")
+        resp2 = auth_client.post("/api/invoices/", payload, format="json")
+        assert resp1.status_code == status.HTTP_201_CREATED
+        assert resp2.status_code == status.HTTP_201_CREATED
+        assert resp1.json()["invoice_number"] == "INV-0002"
+        assert resp2.json()["invoice_number"] == "INV-0003"
+
+        series = InvoiceNumberSeries.objects.get(
+            organization=sample_invoice.organization, invoice_type="tax", prefix="INV-"
+        )
+        assert series.current_number == 3
+
+    def test_explicit_numbers_advance_series(self, sample_invoice):
+        """Imported invoices with their own numbers move the counter past them."""
+        from api.models import InvoiceNumberSeries
+
+        series = InvoiceNumberSeries.objects.get(
+            organization=sample_invoice.organization, invoice_type="tax", prefix="INV-"
+        )
+        for number in range(2, 152):
+            Invoice.objects.create(
+                organization=sample_invoice.organization, client=sample_invoice.client,
+                invoice_type="tax", invoice_date=date(2025, 2, 1), invoice_number=f"INV-{number:04d}",
+            )
+        series.refresh_from_db()
+        assert series.current_number == 151
+
+        invoice = Invoice.objects.create(
+            organization=sample_invoice.organization, client=sample_invoice.client,
+            invoice_type="tax", invoice_date=date(2025, 2, 2),
+        )
+        assert invoice.invoice_number == "INV-0152"
+
+    def test_number_generation_reseeds_past_long_runs(self, sample_invoice):
+        """A long run of numbers taken behind the counter's back is jumped, not replaced by a random one."""
+        from api.models import InvoiceNumberSeries
+
+        Invoice.objects.bulk_create([
+            Invoice(
+                organization=sample_invoice.organization, client=sample_invoice.client,
+                invoice_type="tax", invoice_date=date(2025, 2, 1), invoice_number=f"INV-{number:04d}",
+            )
+            for number in range(2, 252)
+        ])
+        invoice = Invoice.objects.create(
+            organization=sample_invoice.organization, client=sample_invoice.client,
+            invoice_type="tax", invoice_date=date(2025, 2, 2),
+        )
+        assert invoice.invoice_number == "INV-0252"
+        assert InvoiceNumberSeries.objects.get(
+            organization=sample_invoice.organization, invoice_type="tax", prefix="INV-"
+        ).current_number == 252
+
+
+# =============================================================================
+# Due Date Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestInvoiceDueDate:
+    """Invoice.due_date and its SQL-resolved counterpart Invoice.annotate_due_days."""
+
+    def test_annotated_due_date_matches_property(self, organization, sample_invoice, django_assert_num_queries):
+        """Org default days are resolved in SQL; due_date then needs no query."""
+        InvoiceSettings.objects.filter(organization=organization).update(paymentDueDays=45)
+        sample_invoice.refresh_from_db()
+        expected = sample_invoice.due_date
+
+        invoice = Invoice.annotate_due_days(Invoice.objects.filter(pk=sample_invoice.pk)).get()
+        with django_assert_num_queries(0):
+            assert invoice.due_date == expected
+        assert str(expected) == "2025-03-01"
+
+    def test_annotated_due_date_uses_payment_term(self, organization, sample_invoice, django_assert_num_queries):
+        """A payment term with days overrides the organization default."""
+        term = PaymentTerm.objects.create(
+            organization=organization, term_name="Net 15", days=15, description="Net 15"
+        )
+        Invoice.objects.filter(pk=sample_invoice.pk).update(payment_term=term)
+
+        invoice = Invoice.annotate_due_days(Invoice.objects.filter(pk=sample_invoice.pk)).get()
+        with django_assert_num_queries(0):
+            assert str(invoice.due_date) == "2025-01-30"
+
+
+# =============================================================================
+# Bulk Email Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestBulkInvoiceEmail:
+    """Invoice emails queued through the email outbox and delivered over pooled SMTP connections."""
+
+    @pytest.fixture
+    def email_settings(self, organization):
+        from api.models import CompanySettings, EmailSettings
+
+        CompanySettings.objects.get_or_create(organization=organization, defaults={"companyName": "Test Co"})
+        settings_obj = EmailSettings(
+            organization=organization, smtp_username="mailer", from_email="billing@test.com"
+        )
+        settings_obj.smtp_password = "secret"
+        settings_obj.save()
+        return settings_obj
+
+    def test_bulk_send_queues_and_delivers(self, settings, auth_client, sample_invoice, email_settings):
+        """Bulk send returns at once; the outbox then delivers and marks invoices as emailed."""
+        from unittest.mock import patch
+        from django.core import mail
+        from django.core.mail import get_connection
+        from api.email_outbox import process_outbox
+        from api.models import OutboundEmail
+
+        mail.outbox = []
+        OutboundEmail.objects.all().delete()
+        response = auth_client.post(
+            "/api/invoices/bulk_send_email/", {"invoice_ids": [sample_invoice.id]}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        data = response.json()
+        assert data["success_count"] == 1
+        assert data["results"][0]["status"] == "queued"
+        assert mail.outbox == []
+
+        locmem = lambda *args, **kwargs: get_connection("django.core.mail.backends.locmem.EmailBackend")
+        with patch("api.email_service.smtp_connection", locmem):
+            assert process_outbox() == 1
+
+        assert OutboundEmail.objects.get(id=data["results"][0]["email_id"]).status == "sent"
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == [sample_invoice.client.email]
+        assert mail.outbox[0].attachments[0][0] == f"Invoice_{sample_invoice.invoice_number}.pdf"
+
+        sample_invoice.refresh_from_db()
+        assert sample_invoice.is_emailed
+        assert sample_invoice.status == "sent"
+
+    def test_send_email_is_idempotent(self, auth_client, sample_invoice, email_settings):
+        """Retrying a send with the same Idempotency-Key queues one email."""
+        from api.models import OutboundEmail
+
+        url = f"/api/invoices/{sample_invoice.id}/send_email/"
+        first = auth_client.post(url, HTTP_IDEMPOTENCY_KEY="abc")
+        second = auth_client.post(url, HTTP_IDEMPOTENCY_KEY="abc")
+
+        assert first.status_code == status.HTTP_202_ACCEPTED
+        assert first.json()["email_id"] == second.json()["email_id"]
+        assert OutboundEmail.objects.filter(kind="invoice").count() == 1
+
+    def test_delivery_retries_transient_failures(self):
+        """Transient SMTP errors are retried; permanent rejections are not."""
+        import smtplib
+        from django.core.mail import EmailMessage
+        from api.email_delivery import deliver_messages
+
+        class FlakyConnection:
+            attempts = {}
+
+            def send_messages(self, messages):
+                subject = messages[0].subject
+                self.attempts[subject] = self.attempts.get(subject, 0) + 1
+                if subject == "rejected":
+                    raise smtplib.SMTPRecipientsRefused({"x@test.com": (550, b"No such user")})
+                if self.attempts[subject] < 2:
+                    raise smtplib.SMTPServerDisconnected("connection lost")
+                return 1
+
+            def close(self):
+                pass
+
+        messages = [(name, EmailMessage(subject=name, to=["x@test.com"])) for name in ("flaky", "rejected")]
+        results = {
+            result["key"]: result
+            for result in deliver_messages(messages, FlakyConnection, workers=2, max_attempts=3, retry_delay=0)
+        }
+
+        assert results["flaky"]["sent"] and results["flaky"]["attempts"] == 2
+        assert not results["rejected"]["sent"] and results["rejected"]["attempts"] == 1
+
+
+# =============================================================================
+# Export Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestExportData:
+    """Tests for the streaming GET /api/export/ endpoint."""
+
+    def test_export_invoices_csv(self, auth_client, sample_invoice):
+        """CSV export streams a header and one row per invoice."""
+        response = auth_client.get("/api/export/?format=csv&type=invoices")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert 'invoices_export.csv' in response["Content-Disposition"]
+
+        lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        assert lines[0].startswith("Invoice Number,Type,Client")
+        assert len(lines) == 2
+        assert "Acme Corp" in lines[1]
+        assert "1180.0" in lines[1]
+
+    def test_export_clients_csv(self, auth_client, client_obj):
+        """Client export includes the PIN code column."""
+        response = auth_client.get("/api/export/?format=csv&type=clients")
+        assert response.status_code == status.HTTP_200_OK
+        lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        assert lines[0].endswith("PIN Code,Created")
+        assert lines[1].startswith("Acme Corp,")
+
+    def test_export_all_excel(self, auth_client, sample_invoice):
+        """Excel export contains one sheet per data type."""
+        from io import BytesIO
+        from openpyxl import load_workbook
+
+        response = auth_client.get("/api/export/?format=excel&type=all")
+        assert response.status_code == status.HTTP_200_OK
+
+        workbook = load_workbook(BytesIO(b"".join(response.streaming_content)), read_only=True)
+        assert workbook.sheetnames == ["Invoices", "Clients", "Payments"]
+        rows = list(workbook["Invoices"].iter_rows(values_only=True))
+        assert len(rows) == 2
+        assert rows[1][0] == sample_invoice.invoice_number
+
+    def test_export_invalid_type(self, auth_client):
+        """An unknown type is rejected with 400."""
+        response = auth_client.get("/api/export/?format=csv&type=unknown")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestExportJobs:
+    """Tests for background exports via /api/export-jobs/."""
+
+    @pytest.fixture(autouse=True)
+    def inline_export_jobs(self, settings, tmp_path):
+        settings.EXPORT_JOB_WORKERS = 0  # build in the request thread
+        settings.EXPORT_FILES_ROOT = str(tmp_path)
+
+    def test_background_csv_export(self, auth_client, sample_invoice, django_capture_on_commit_callbacks):
+        """A queued export completes and its file can be downloaded."""
+        with django_capture_on_commit_callbacks(execute=True):
+            response = auth_client.post(
+                "/api/export-jobs/", {"format": "csv", "type": "invoices"}, format="json"
+            )
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job_id = response.json()["id"]
+
+        poll = auth_client.get(f"/api/export-jobs/{job_id}/").json()
+        assert poll["status"] == "completed"
+        assert poll["progress"] == 100
+        assert poll["rows_written"] == 1
+        assert poll["download_url"] == f"/api/export-jobs/{job_id}/download/"
+
+        download = auth_client.get(poll["download_url"])
+        assert download.status_code == status.HTTP_200_OK
+        lines = b"".join(download.streaming_content).decode("utf-8-sig").splitlines()
+        assert len(lines) == 2
+        assert sample_invoice.invoice_number in lines[1]
+
+    def test_export_endpoint_background_flag(self, auth_client, sample_invoice, django_capture_on_commit_callbacks):
+        """GET /api/export/?background=true queues a job instead of building inline."""
+        with django_capture_on_commit_callbacks(execute=True):
+            response = auth_client.get("/api/export/?format=excel&type=all&background=true")
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.json()["kind"] == "data"
+
+        poll = auth_client.get(f"/api/export-jobs/{response.json()['id']}/").json()
+        assert poll["status"] == "completed"
+        assert poll["file_name"] == "nexinvo_data_export.xlsx"
+
+    def test_personal_data_background_export(self, auth_client, sample_invoice, django_capture_on_commit_callbacks):
+        """Personal data exports run through the same job pipeline."""
+        with django_capture_on_commit_callbacks(execute=True):
+            response = auth_client.get("/api/profile/export-data/?background=true")
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+        download = auth_client.get(f"/api/export-jobs/{response.json()['id']}/download/")
+        assert download.status_code == status.HTTP_200_OK
+        data = json.loads(b"".join(download.streaming_content))
+        assert data["organizations"][0]["invoices"][0]["invoice_number"] == sample_invoice.invoice_number
+
+    def test_download_before_completion(self, auth_client, sample_invoice):
+        """A job that has not run yet cannot be downloaded."""
+        response = auth_client.post("/api/export-jobs/", {"format": "csv"}, format="json")
+        download = auth_client.get(f"/api/export-jobs/{response.json()['id']}/download/")
+        assert download.status_code == status.HTTP_409_CONFLICT
+
+    def test_cleanup_only_touches_abandoned_jobs(self, user, organization, sample_invoice):
+        """Cleanup fails running jobs without a heartbeat and runs long-waiting pending ones."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from api.export_jobs import cleanup_export_jobs
+        from api.models import ExportJob
+
+        long_ago = timezone.now() - timedelta(hours=2)
+        alive = ExportJob.objects.create(
+            user=user, organization=organization, export_format="csv", data_type="invoices",
+            status="running", started_at=long_ago, heartbeat_at=timezone.now(),
+        )
+        dead = ExportJob.objects.create(
+            user=user, organization=organization, export_format="csv", data_type="invoices",
+            status="running", started_at=long_ago, heartbeat_at=long_ago,
+        )
+        waiting = ExportJob.objects.create(
+            user=user, organization=organization, export_format="csv", data_type="invoices",
+        )
+        ExportJob.objects.filter(pk=waiting.pk).update(created_at=long_ago)
+        queued = ExportJob.objects.create(
+            user=user, organization=organization, export_format="csv", data_type="invoices",
+        )
+
+        assert cleanup_export_jobs() == (0, 1, 1)
+        statuses = dict(ExportJob.objects.values_list("id", "status"))
+        assert statuses[alive.id] == "running"
+        assert statuses[dead.id] == "failed"
+        assert statuses[waiting.id] == "completed"
+        assert statuses[queued.id] == "pending"
+
+
+# =============================================================================
+# Ledger Balance Query Count Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestPartyListQueryCount:
+    """Client/supplier lists must not query the linked ledger once per row."""
+
+    def _count_queries(self, auth_client, url):
+        auth_client.get(url)  # warm the per-user membership cache
+        with CaptureQueriesContext(connection) as ctx:
+            response = auth_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        return len(ctx.captured_queries), response.json()
+
+    def test_client_list_query_count_is_constant(self, auth_client, organization, client_obj):
+        """Listing many clients costs the same queries as listing one, with balances included."""
+        baseline, _ = self._count_queries(auth_client, "/api/clients/")
+
+        for index in range(5):
+            Client.objects.create(
+                organization=organization, name=f"Client {index}", email=f"c{index}@example.com"
+            )
+        LedgerAccount.objects.filter(linked_client=client_obj).update(
+            current_balance=Decimal("250.00"), current_balance_type="Dr"
+        )
+
+        queries, data = self._count_queries(auth_client, "/api/clients/")
+        assert queries == baseline
+
+        results = data if isinstance(data, list) else data.get("results", data)
+        acme = next(c for c in results if c["name"] == "Acme Corp")
+        assert acme["ledger_balance"] == 250.0
+        assert acme["ledger_balance_type"] == "Dr"
+
+    def test_supplier_list_query_count_is_constant(self, auth_client, organization):
+        """Listing many suppliers costs the same queries as listing one."""
+        Supplier.objects.create(organization=organization, name="Supplier 0")
+        baseline, _ = self._count_queries(auth_client, "/api/suppliers/")
+
+        for index in range(1, 6):
+            Supplier.objects.create(organization=organization, name=f"Supplier {index}")
+
+        queries, data = self._count_queries(auth_client, "/api/suppliers/")
+        assert queries == baseline
+        assert len(data) == 6
+
+    def test_supplier_detail_reads_annotated_balance(self, auth_client, organization):
+        """Supplier detail returns the creditor ledger balance."""
+        supplier = Supplier.objects.create(organization=organization, name="Ledger Supplier")
+        LedgerAccount.objects.filter(linked_supplier=supplier).update(
+            current_balance=Decimal("75.50"), current_balance_type="Cr"
+        )
+
+        response = auth_client.get(f"/api/suppliers/{supplier.id}/")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["ledger_balance"] == 75.5
+        assert response.json()["ledger_balance_type"] == "Cr"
+
+    def test_fallback_picks_the_annotated_ledger(self, organization, client_obj):
+        """With several linked ledgers, both lookup paths report the same one."""
+        from api.models import AccountGroup
+        from api.serializers import ClientSerializer
+
+        debtor_ledger = LedgerAccount.objects.get(linked_client=client_obj)
+        first_group = AccountGroup.objects.filter(organization=organization).order_by("sequence", "name").first()
+        LedgerAccount.objects.create(
+            organization=organization, group=first_group, name="Zeta Advance", linked_client=client_obj,
+            current_balance=Decimal("10.00"), current_balance_type="Cr",
+        )
+        LedgerAccount.objects.filter(pk=debtor_ledger.pk).update(
+            current_balance=Decimal("99.00"), current_balance_type="Dr"
+        )
+
+        annotated = LedgerAccount.annotate_linked_balance(
+            Client.objects.filter(pk=client_obj.pk), "linked_client"
+        ).get()
+        assert ClientSerializer(annotated).data["ledger_balance"] == 10.0
+        assert ClientSerializer(client_obj).data["ledger_balance"] == 10.0
+
+
+# =============================================================================
+# Ageing Report Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestAgeingReport:
+    """Tests for the SQL-side ageing buckets used by the dashboard endpoints."""
+
+    def test_client_wise_ageing_as_of_date(self, auth_client, sample_invoice):
+        """An invoice dated 2025-01-15 is 36 days old on 2025-02-20 (31-60 bucket)."""
+        response = auth_client.get("/api/dashboard/ageing-report/?as_of=2025-02-20&buckets=30,60")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["boundaries"] == [30, 60]
+        assert len(data["parties"]) == 1
+
+        party = data["parties"][0]
+        assert party["name"] == "Acme Corp"
+        assert [bucket["label"] for bucket in party["buckets"]] == ["0-30", "31-60", "61+"]
+        assert [bucket["amount"] for bucket in party["buckets"]] == [0, 1180.0, 0]
+        assert data["total"] == 1180.0
+
+    def test_past_as_of_uses_balances_of_that_date(self, auth_client, sample_invoice):
+        """A past as_of counts payments made by then, not the invoice's current outstanding."""
+        for amount, payment_date in (("180.00", "2025-02-10"), ("1000.00", "2025-03-10")):
+            response = auth_client.post("/api/payments/", {
+                "invoice": sample_invoice.id, "amount": amount,
+                "payment_date": payment_date, "payment_method": "cash",
+            }, format="json")
+            assert response.status_code == status.HTTP_201_CREATED
+
+        data = auth_client.get("/api/dashboard/ageing-report/?as_of=2025-02-20&buckets=30,60").json()
+        assert data["total"] == 1000.0
+        assert [bucket["amount"] for bucket in data["parties"][0]["buckets"]] == [0, 1000.0, 0]
+
+        # Fully paid by today
+        assert auth_client.get("/api/dashboard/ageing-report/").json()["parties"] == []
+
+    def test_payment_reminders_summary_buckets(self, auth_client, sample_invoice):
+        """An old unpaid invoice counts as overdue and critical (90+ days)."""
+        response = auth_client.get("/api/dashboard/payment-reminders/")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["overdueCount"] == 1
+        assert data["criticalCount"] == 1
+        assert data["overdueAmount"] == 1180.0
+
+
+# =============================================================================
+# Payment Reminder Selection Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestPaymentReminderSelection:
+    """Tests for Invoice.reminders_due(), the SQL-side reminder eligibility check."""
+
+    def _now(self):
+        from datetime import datetime, timezone as dt_timezone
+        return datetime(2025, 1, 25, 12, 0, tzinfo=dt_timezone.utc)
+
+    def test_selects_only_due_invoices(self, organization, user, client_obj, sample_invoice):
+        """Never-reminded invoices are due once old enough, reminded ones once the last reminder is."""
+        from datetime import date, timedelta
+
+        InvoiceSettings.objects.filter(organization=organization).update(
+            enablePaymentReminders=True, reminderFrequencyDays=7
+        )
+        now = self._now()
+
+        def make(invoice_date, status="sent", **fields):
+            return Invoice.objects.create(
+                organization=organization, created_by=user, client=client_obj,
+                invoice_type="proforma", invoice_date=invoice_date, status=status,
+                total_amount=Decimal("100.00"), **fields
+            )
+
+        too_new = make(date(2025, 1, 20))
+        reminded_recently = make(date(2025, 1, 1), last_reminder_sent=now - timedelta(days=6, hours=23))
+        reminded_long_ago = make(date(2025, 1, 1), last_reminder_sent=now - timedelta(days=7))
+        paid = make(date(2025, 1, 1), status="paid")
+
+        due = set(Invoice.reminders_due(now).values_list("pk", flat=True))
+        # sample_invoice is dated 2025-01-15: exactly 10 days old
+        assert due == {sample_invoice.pk, reminded_long_ago.pk}
+        assert not due & {too_new.pk, reminded_recently.pk, paid.pk}
+
+    def test_respects_settings_and_client_email(self, organization, client_obj, sample_invoice):
+        """Disabled reminders or a client without email exclude the invoice."""
+        now = self._now()
+        assert list(Invoice.reminders_due(now)) == [sample_invoice]
+
+        Client.objects.filter(pk=client_obj.pk).update(email="")
+        assert not Invoice.reminders_due(now).exists()
+
+        Client.objects.filter(pk=client_obj.pk).update(email="billing@acme.com")
+        InvoiceSettings.objects.filter(organization=organization).update(enablePaymentReminders=False)
+        assert not Invoice.reminders_due(now).exists()
+
+    def test_client_is_preloaded(self, sample_invoice):
+        """Reading the client of a due invoice needs no extra query."""
+        with CaptureQueriesContext(connection) as ctx:
+            invoices = list(Invoice.reminders_due(self._now()))
+            assert [invoice.client.email for invoice in invoices] == ["billing@acme.com"]
+        assert len(ctx.captured_queries) == 1
+
+
+# =============================================================================
+# Scheduled Invoice Due Queue Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestScheduledInvoiceQueue:
+    """next_generation_date as the due queue for scheduled invoice generation."""
+
+    @pytest.fixture(autouse=True)
+    def shard_settings(self, settings):
+        settings.SCHEDULER_SHARD_WORKERS = 0
+        settings.SCHEDULED_INVOICE_MAX_CATCH_UP = 12
+
+    def _schedule(self, organization, client_obj, **fields):
+        from datetime import date
+        from api.models import ScheduledInvoice, ScheduledInvoiceItem
+
+        fields.setdefault("start_date", date(2024, 1, 1))
+        schedule = ScheduledInvoice.objects.create(
+            organization=organization, client=client_obj, name="Retainer",
+            auto_send_email=False, **fields
+        )
+        ScheduledInvoiceItem.objects.create(
+            scheduled_invoice=schedule, description="Retainer",
+            taxable_amount=Decimal("1000.00"), total_amount=Decimal("1180.00"),
+        )
+        return schedule
+
+    def test_occurrences_follow_the_pattern(self, organization, client_obj):
+        """Next occurrences keep the configured day, month and quarter."""
+        from datetime import date
+
+        schedule = self._schedule(organization, client_obj, frequency="monthly", day_of_month=15)
+        assert schedule.occurrence_after(date(2025, 1, 10)) == date(2025, 1, 15)
+        assert schedule.occurrence_after(date(2025, 1, 15)) == date(2025, 2, 15)
+
+        schedule.frequency = "quarterly"  # counted from start_date's month (January)
+        assert schedule.occurrence_after(date(2025, 2, 1)) == date(2025, 4, 15)
+
+        schedule.frequency, schedule.month_of_year = "yearly", 6
+        assert schedule.occurrence_after(date(2025, 1, 1)) == date(2025, 6, 15)
+        assert schedule.occurrence_after(date(2025, 6, 15)) == date(2026, 6, 15)
+
+        schedule.frequency, schedule.day_of_week = "weekly", 0
+        assert schedule.occurrence_after(date(2025, 1, 1)) == date(2025, 1, 6)
+
+    def test_new_schedule_starts_from_today(self, organization, client_obj):
+        """A back-dated schedule does not back-fill the periods before it was created."""
+        from datetime import date, timedelta
+
+        schedule = self._schedule(organization, client_obj, frequency="daily")
+        assert schedule.next_generation_date == date.today()
+
+        future = self._schedule(organization, client_obj, frequency="daily", start_date=date.today() + timedelta(days=3))
+        assert future.next_generation_date == date.today() + timedelta(days=3)
+
+    def test_missed_periods_are_caught_up(self, organization, client_obj):
+        """Each missed period gets one invoice, dated on that period, and the queue moves past today."""
+        from datetime import date, timedelta
+        from api.models import ScheduledInvoice
+        from api.scheduled_invoice_generator import process_scheduled_invoices
+
+        today = date.today()
+        schedule = self._schedule(organization, client_obj, frequency="daily")
+        ScheduledInvoice.objects.filter(pk=schedule.pk).update(next_generation_date=today - timedelta(days=2))
+        not_due = self._schedule(organization, client_obj, frequency="daily", start_date=today + timedelta(days=1))
+
+        stats = process_scheduled_invoices()
+
+        assert stats["processed"] == 1
+        assert stats["generated"] == 3
+        assert sorted(
+            Invoice.objects.filter(organization=organization).values_list("invoice_date", flat=True)
+        ) == [today - timedelta(days=2), today - timedelta(days=1), today]
+
+        schedule.refresh_from_db()
+        assert schedule.occurrences_generated == 3
+        assert schedule.last_generated_date == today
+        assert schedule.next_generation_date == today + timedelta(days=1)
+        not_due.refresh_from_db()
+        assert not_due.occurrences_generated == 0
+
+        # Nothing is due any more
+        assert process_scheduled_invoices()["generated"] == 0
+
+    def test_catch_up_limit_and_completion(self, organization, client_obj, settings):
+        """Catch-up stops at the limit per run; reaching max occurrences completes the schedule."""
+        from datetime import date, timedelta
+        from api.models import ScheduledInvoice
+        from api.scheduled_invoice_generator import process_scheduled_invoices
+
+        settings.SCHEDULED_INVOICE_MAX_CATCH_UP = 2
+        schedule = self._schedule(organization, client_obj, frequency="daily", max_occurrences=3)
+        ScheduledInvoice.objects.filter(pk=schedule.pk).update(next_generation_date=date.today() - timedelta(days=5))
+
+        stats = process_scheduled_invoices()
+        assert (stats["generated"], stats["skipped"]) == (2, 1)
+
+        stats = process_scheduled_invoices()
+        assert (stats["generated"], stats["skipped"]) == (1, 0)
+        schedule.refresh_from_db()
+        assert schedule.status == "completed"
+        assert schedule.next_generation_date is None
@@ -231,6 +231,57 @@ class TestPaymentAPI:
         sample_invoice.refresh_from_db()
         assert sample_invoice.status != "paid"
 
+    def test_payment_maintains_invoice_outstanding(self, auth_client, sample_invoice):
+        """Creating, updating and deleting payments keeps amount_paid/outstanding current."""
+        create_resp = auth_client.post("/api/payments/", {
+            "invoice": sample_invoice.id,
+            "amount": "400.00",
+            "payment_date": "2025-01-20",
+            "payment_method": "cash",
+        }, format="json")
+        assert create_resp.status_code == status.HTTP_201_CREATED
+        payment_id = create_resp.json()["id"]
+
+        sample_invoice.refresh_from_db()
+        assert sample_invoice.amount_paid == Decimal("400.00")
+        assert sample_invoice.outstanding == Decimal("780.00")
+
+        auth_client.put(f"/api/payments/{payment_id}/", {
+            "invoice": sample_invoice.id,
+            "amount": "1000.00",
+            "payment_date": "2025-01-20",
+            "payment_method": "cash",
+        }, format="json")
+        sample_invoice.refresh_from_db()
+        assert sample_invoice.amount_paid == Decimal("1000.00")
+        assert sample_invoice.outstanding == Decimal("180.00")
+
+        auth_client.delete(f"/api/payments/{payment_id}/")
+        sample_invoice.refresh_from_db()
+        assert sample_invoice.amount_paid == Decimal("0.00")
+        assert sample_invoice.outstanding == Decimal("1180.00")
+
+    def test_stale_invoice_save_keeps_amount_paid(self, auth_client, sample_invoice):
+        """Saving an invoice loaded before a payment keeps the payment's amount_paid/outstanding."""
+        stale = Invoice.objects.get(pk=sample_invoice.pk)
+        auth_client.post("/api/payments/", {
+            "invoice": sample_invoice.id,
+            "amount": "400.00",
+            "payment_date": "2025-01-20",
+            "payment_method": "cash",
+        }, format="json")
+
+        stale.notes = "Edited after the payment"
+        stale.total_amount = Decimal("1200.00")
+        stale.save()
+        assert stale.amount_paid == Decimal("400.00")
+        assert stale.outstanding == Decimal("800.00")
+
+        sample_invoice.refresh_from_db()
+        assert sample_invoice.notes == "Edited after the payment"
+        assert sample_invoice.amount_paid == Decimal("400.00")
+        assert sample_invoice.outstanding == Decimal("800.00")
+
     def test_unauthenticated_payment_access(self, api_client):
         """GET /api/payments/ without auth returns 401."""
         response = api_client.get("/api/payments/")
@@ -358,6 +409,29 @@ class TestReceiptAPI:
         # amount_received = 1180 - 118 - 23.60 = 1038.40
         assert Decimal(receipt.amount_received) == Decimal("1038.40")
 
+    def test_receipt_bulk_pdf(self, auth_client, sample_invoice):
+        """GET /api/receipts/bulk_pdf/ streams a ZIP of the filtered receipts' PDFs."""
+        import io
+        import zipfile
+        from api.models import CompanySettings
+
+        CompanySettings.objects.get_or_create(
+            organization=sample_invoice.organization, defaults={"companyName": "Test Co"}
+        )
+        auth_client.post("/api/payments/", {
+            "invoice": sample_invoice.id,
+            "amount": "1180.00",
+            "payment_date": "2025-01-20",
+            "payment_method": "cash",
+        }, format="json")
+        receipt = Receipt.objects.get(invoice=sample_invoice)
+
+        response = auth_client.get(f"/api/receipts/bulk_pdf/?invoice={sample_invoice.id}")
+        assert response.status_code == status.HTTP_200_OK
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        assert archive.namelist() == [f"{receipt.receipt_number}.pdf"]
+        assert archive.read(f"{receipt.receipt_number}.pdf")[:4] == b"%PDF"
+
     def test_receipts_read_only(self, auth_client, sample_invoice):
         """
         The ReceiptViewSet is read-only. POST should return 405 Method Not Allowed.
@@ -406,3 +480,55 @@ class TestReceiptAPI:
         # Verify distinct receipt numbers
         receipt_numbers = list(receipts.values_list("receipt_number", flat=True))
         assert len(set(receipt_numbers)) == 2
+
+
+# =============================================================================
+# Cash Flow Analytics Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestAnalyticsSummary:
+    """Tests for the monthly cash flow series on /api/dashboard/analytics-summary/."""
+
+    def test_cash_flow_months_window(self, auth_client, sample_invoice):
+        """The months= parameter sets the window and payments land in their month."""
+        from datetime import date
+
+        today = date.today()
+        auth_client.post("/api/payments/", {
+            "invoice": sample_invoice.id,
+            "amount": "500.00",
+            "payment_date": today.isoformat(),
+            "payment_method": "cash",
+        }, format="json")
+
+        response = auth_client.get("/api/dashboard/analytics-summary/?months=12")
+        assert response.status_code == status.HTTP_200_OK
+        cash_flow = response.json()["cashFlowData"]
+        assert len(cash_flow) == 12
+        assert cash_flow[-1]["month"] == today.strftime("%b")
+        assert cash_flow[-1]["receipts"] == 500.0
+        assert sum(row["receipts"] for row in cash_flow[:-1]) == 0
+
+
+@pytest.mark.django_db
+class TestDashboardCacheInvalidation:
+    """Dashboard payloads are cached per org and invalidated by writes."""
+
+    def test_payment_invalidates_dashboard_stats(self, auth_client, sample_invoice):
+        """Recording a payment is visible on the next dashboard request."""
+        first = auth_client.get("/api/dashboard/stats/")
+        assert first.status_code == status.HTTP_200_OK
+        assert first.json()["revenue"] == 0
+        assert first.json()["pending"] == 1180.0
+
+        auth_client.post("/api/payments/", {
+            "invoice": sample_invoice.id,
+            "amount": "180.00",
+            "payment_date": "2025-01-20",
+            "payment_method": "cash",
+        }, format="json")
+
+        second = auth_client.get("/api/dashboard/stats/")
+        assert second.json()["revenue"] == 180.0
+        assert second.json()["pending"] == 1000.0
@@ -8,6 +8,9 @@ Covers:
     - Profile retrieval and update
     - Password change
     - Dashboard statistics (authenticated & unauthenticated)
+    - Organization middleware membership cache
+    - Email outbox delivery
+    - Per-organization sharding of the daily jobs
 
 All tests use the shared fixtures from ``conftest.py`` and the
 ``@pytest.mark.django_db`` marker so they run against a real
@@ -20,6 +23,8 @@ from decimal import Decimal
 from unittest.mock import patch, MagicMock
 
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -33,7 +38,11 @@ from api.models import (
     EmailSettings,
     InvoiceFormatSettings,
     SubscriptionPlan,
+    Subscription,
+    OutboundEmail,
 )
+from api.cache_utils import get_cached_membership
+from api.middleware import OrganizationMiddleware
 
 
 # =============================================================================
@@ -430,6 +439,34 @@ class TestDashboard:
         # No payments recorded, so revenue should be 0
         assert response.data["revenue"] == 0
 
+    def test_dashboard_stats_follow_membership_and_subscription(self, auth_client, organization):
+        """Cached subscription usage is refreshed when members or the subscription change."""
+        plan = SubscriptionPlan.objects.create(
+            name="Team", price=Decimal("0.00"), billing_cycle="monthly",
+            max_users=5, max_invoices_per_month=50, max_storage_gb=1,
+        )
+        subscription = Subscription.objects.create(
+            organization=organization, plan=plan, status="active",
+            start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30),
+        )
+
+        response = auth_client.get(self.STATS_URL)
+        assert response.data["subscription"]["current_users"] == 1
+
+        member = User.objects.create_user(username="member@example.com", email="member@example.com", password="TestPass123!")
+        membership = OrganizationMembership.objects.create(organization=organization, user=member, role="user", is_active=True)
+        response = auth_client.get(self.STATS_URL)
+        assert response.data["subscription"]["current_users"] == 2
+        assert response.data["subscription"]["users_remaining"] == 3
+
+        membership.delete()
+        response = auth_client.get(self.STATS_URL)
+        assert response.data["subscription"]["current_users"] == 1
+
+        subscription.delete()
+        response = auth_client.get(self.STATS_URL)
+        assert response.data["subscription"] is None
+
     def test_dashboard_unauthenticated(self, api_client):
         """GET /api/dashboard/stats/ without auth returns 401."""
         response = api_client.get(self.STATS_URL)
@@ -620,3 +657,289 @@ class TestTokenRefresh:
         )
 
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# =============================================================================
+# ORGANIZATION MIDDLEWARE
+# =============================================================================
+
+@pytest.mark.django_db
+class TestOrganizationMiddleware:
+    """Organization context resolution and its membership cache."""
+
+    PROFILE_URL = "/api/profile/"
+
+    def test_membership_lookup_is_cached(self, auth_client, organization):
+        """Repeat requests resolve the organization without a membership query."""
+        auth_client.get(self.PROFILE_URL)
+        with CaptureQueriesContext(connection) as ctx:
+            response = auth_client.get(self.PROFILE_URL)
+
+        assert response.status_code == status.HTTP_200_OK
+        membership_lookups = [
+            query for query in ctx.captured_queries
+            if 'FROM "api_organizationmembership" INNER JOIN "api_organization"' in query['sql']
+        ]
+        assert membership_lookups == []
+
+    def test_deactivated_membership_busts_cache(self, auth_client, user, organization):
+        """Deactivating a membership takes effect on the next lookup."""
+        auth_client.get(self.PROFILE_URL)
+        assert get_cached_membership(user.id, str(organization.id)) is not None
+
+        membership = OrganizationMembership.objects.get(user=user, organization=organization)
+        membership.is_active = False
+        membership.save()
+
+        assert get_cached_membership(user.id, str(organization.id)) is None
+        middleware = OrganizationMiddleware(lambda request: None)
+        assert middleware._get_membership(user, str(organization.id)) == (None, None)
+
+    def test_cache_holds_ids_only(self, auth_client, user, organization):
+        """Only ids are cached, so organization changes made elsewhere are seen at once."""
+        auth_client.get(self.PROFILE_URL)
+        assert get_cached_membership(user.id, str(organization.id)) == (organization.id, "owner")
+
+        # A queryset update sends no signal, like a save in another process
+        Organization.objects.filter(pk=organization.pk).update(is_active=False)
+        middleware = OrganizationMiddleware(lambda request: None)
+        assert middleware._get_membership(user, str(organization.id)) == (None, None)
+
+
+# =============================================================================
+# EMAIL OUTBOX
+# =============================================================================
+
+@pytest.mark.django_db
+class TestEmailOutbox:
+    """Queued email delivery: idempotency, retries, dead letters and rate limits."""
+
+    @pytest.fixture(autouse=True)
+    def empty_outbox(self, settings, user):
+        # Runs after `user` so its welcome email is cleared too
+        from django.core import mail
+        from api import email_outbox
+
+        settings.EMAIL_OUTBOX_RATE_PER_MINUTE = 0
+        OutboundEmail.objects.all().delete()
+        mail.outbox = []
+        with patch.object(email_outbox, "_rate_limiter", email_outbox._SenderRateLimiter()):
+            yield
+
+    def test_welcome_email_is_queued_once(self, user):
+        """Welcome emails are queued (not sent inline) and deduplicated per user."""
+        from django.core import mail
+        from api.email_outbox import process_outbox
+        from api.email_utils import send_welcome_email_to_user
+
+        send_welcome_email_to_user(user)
+        send_welcome_email_to_user(user)
+        assert mail.outbox == []
+        assert OutboundEmail.objects.count() == 1
+
+        assert process_outbox() == 1
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == [user.email]
+        email = OutboundEmail.objects.get()
+        assert email.status == "sent"
+        assert email.payload == {}
+
+    def test_failures_back_off_then_dead_letter(self, settings):
+        """Transient failures are rescheduled; the last allowed attempt dead-letters."""
+        import smtplib
+        from api.email_outbox import enqueue_email, process_outbox
+
+        class DownConnection:
+            def send_messages(self, messages):
+                raise smtplib.SMTPServerDisconnected("connection lost")
+
+            def close(self):
+                pass
+
+        settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 2
+        email = enqueue_email("system", {
+            "subject": "Hi", "plain_message": "Hi", "html_message": "", "recipient_list": ["x@test.com"],
+        })
+
+        with patch("api.email_outbox._system_sender", return_value=(DownConnection, "noreply@test.com")):
+            assert process_outbox() == 1
+            email.refresh_from_db()
+            assert email.status == "pending"
+            assert email.attempts == 1
+            assert email.next_attempt_at > timezone.now()
+            assert process_outbox() == 0  # not due yet
+
+            OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+            assert process_outbox() == 1
+
+        email.refresh_from_db()
+        assert email.status == "dead"
+        assert "connection lost" in email.last_error
+
+    def test_rate_limit_defers_without_using_attempts(self, settings):
+        """Sends over a sender's per-minute limit wait for the next window."""
+        from django.core import mail
+        from api.email_outbox import enqueue_email, process_outbox
+
+        settings.EMAIL_OUTBOX_RATE_PER_MINUTE = 1
+        for index in range(2):
+            enqueue_email("system", {
+                "subject": f"Hi {index}", "plain_message": "Hi", "html_message": "", "recipient_list": ["x@test.com"],
+            })
+
+        assert process_outbox() == 2
+        assert len(mail.outbox) == 1
+        deferred = OutboundEmail.objects.get(status="pending")
+        assert deferred.attempts == 0
+        assert deferred.next_attempt_at > timezone.now()
+
+    def test_delivers_inline_without_workers(self, settings, django_capture_on_commit_callbacks):
+        """A process without outbox workers sends on commit; a standalone deployment leaves it queued."""
+        from django.core import mail
+        from api.email_outbox import enqueue_email
+
+        payload = {"subject": "Hi", "plain_message": "Hi", "html_message": "", "recipient_list": ["x@test.com"]}
+        settings.EMAIL_OUTBOX_WORKERS = 2
+        with django_capture_on_commit_callbacks(execute=True):
+            sent = enqueue_email("system", payload)
+        sent.refresh_from_db()
+        assert sent.status == "sent"
+        assert len(mail.outbox) == 1
+
+        settings.EMAIL_OUTBOX_STANDALONE = True
+        with django_capture_on_commit_callbacks(execute=True):
+            queued = enqueue_email("system", payload)
+        queued.refresh_from_db()
+        assert queued.status == "pending"
+        assert len(mail.outbox) == 1
+
+
+@pytest.mark.django_db
+class TestEmailCampaigns:
+    """Background campaign runner: batched hand-off to the outbox, checkpoints and resume."""
+
+    @pytest.fixture(autouse=True)
+    def runner_settings(self, settings, user):
+        from django.core import mail
+        from api import email_outbox
+
+        settings.CAMPAIGN_RUNNER_WORKERS = 0
+        settings.CAMPAIGN_BATCH_SIZE = 2
+        settings.CAMPAIGN_POLL_INTERVAL = 0
+        settings.EMAIL_OUTBOX_RATE_PER_MINUTE = 0
+        for index in range(2):
+            User.objects.create_user(username=f"member{index}", email=f"member{index}@example.com", password="x")
+        OutboundEmail.objects.all().delete()
+        mail.outbox = []
+        # Waiting for a batch delivers it, as the outbox workers would
+        with patch.object(email_outbox, "_rate_limiter", email_outbox._SenderRateLimiter()), \
+                patch("api.campaigns.time.sleep", side_effect=lambda seconds: email_outbox.drain_outbox()):
+            yield
+
+    def _campaign(self, **fields):
+        from api.models import BulkEmailCampaign
+        return BulkEmailCampaign.objects.create(name="News", subject="News", body="Hello {{user_name}}", **fields)
+
+    def test_campaign_is_sent_in_batches(self, django_capture_on_commit_callbacks):
+        """All recipients are resolved, emailed and checkpointed; the campaign completes."""
+        from django.core import mail
+        from api.campaigns import start_campaign
+
+        campaign = self._campaign()
+        with django_capture_on_commit_callbacks(execute=True):
+            start_campaign(campaign)
+
+        campaign.refresh_from_db()
+        assert campaign.status == "completed"
+        assert campaign.total_recipients == 3
+        assert campaign.sent_count == 3
+        assert set(campaign.recipients.values_list("status", flat=True)) == {"sent"}
+        assert len(mail.outbox) == 3
+        assert OutboundEmail.objects.filter(kind="campaign", status="sent").count() == 3
+
+    def test_interrupted_campaign_resumes(self, user):
+        """A campaign left sending is picked up where it stopped, without resending."""
+        from django.core import mail
+        from api.campaigns import resume_campaigns
+        from api.email_outbox import enqueue_emails
+        from api.models import BulkEmailRecipient
+
+        campaign = self._campaign(status="sending", total_recipients=3, sent_count=1)
+        sent, queued, pending = [
+            BulkEmailRecipient.objects.create(campaign=campaign, email=f"r{index}@example.com", user_name="R", status=state)
+            for index, state in enumerate(["sent", "queued", "pending"])
+        ]
+        enqueue_emails("campaign", [({"recipient_id": queued.id}, f"campaign:{campaign.id}:{queued.id}")])
+
+        assert resume_campaigns() == 1
+
+        campaign.refresh_from_db()
+        assert campaign.status == "completed"
+        assert campaign.sent_count == 3
+        assert sorted(message.to[0] for message in mail.outbox) == ["r1@example.com", "r2@example.com"]
+
+
+# =============================================================================
+# Sharded Daily Jobs Tests
+# =============================================================================
+
+@pytest.mark.django_db
+class TestJobShards:
+    """Per-organization sharding and cross-instance leases for the daily jobs."""
+
+    @pytest.fixture(autouse=True)
+    def shard_settings(self, settings):
+        settings.SCHEDULER_SHARD_WORKERS = 0
+
+    def test_lease_is_exclusive_until_released_or_expired(self):
+        """A held lease cannot be taken; releasing or expiry frees it."""
+        from api.job_shards import acquire_lease, release_lease
+        from api.models import JobLease
+
+        token = acquire_lease("job:1")
+        assert token
+        assert acquire_lease("job:1") is None
+        assert acquire_lease("job:2")
+
+        release_lease("job:1", token)
+        token = acquire_lease("job:1")
+        assert token
+
+        JobLease.objects.filter(key="job:1").update(expires_at=timezone.now() - timedelta(seconds=1))
+        assert acquire_lease("job:1") not in (None, token)
+
+    def test_run_sharded_skips_leased_and_isolates_failures(self):
+        """Shards leased elsewhere are skipped and one failing shard does not stop the others."""
+        from api.job_shards import SKIPPED, acquire_lease, run_sharded
+
+        acquire_lease("job:2")
+
+        def handler(shard):
+            if shard == 3:
+                raise RuntimeError("SMTP down")
+            return shard * 10
+
+        assert run_sharded("job", [1, 2, 3, 4], handler) == {1: 10, 2: SKIPPED, 4: 40}
+
+    def test_payment_reminders_per_organization(self, sample_invoice, other_organization, user):
+        """Each organization with due reminders is processed once; a leased one is left alone."""
+        from api import scheduler
+        from api.job_shards import acquire_lease
+        from api.models import Client, Invoice
+
+        other_client = Client.objects.create(organization=other_organization, name="Other", email="other@example.com")
+        other_invoice = Invoice.objects.create(
+            organization=other_organization, created_by=user, client=other_client,
+            invoice_type="proforma", invoice_date=sample_invoice.invoice_date, status="sent",
+            total_amount=Decimal("100.00"),
+        )
+        acquire_lease(f"payment_reminders:{other_organization.id}")
+
+        with patch.object(scheduler, "send_reminder_email") as send:
+            assert scheduler.send_payment_reminders() == "Sent: 1, Skipped: 0, Failed: 0"
+
+        assert [call.args[0].pk for call in send.call_args_list] == [sample_invoice.pk]
+        sample_invoice.refresh_from_db()
+        other_invoice.refresh_from_db()
+        assert sample_invoice.reminder_count == 1
+        assert other_invoice.reminder_count == 0
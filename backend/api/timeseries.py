@@ -0,0 +1,71 @@
+"""
+Monthly time-series aggregation helpers for dashboard analytics.
+Totals for several models are grouped by calendar month with TruncMonth and
+combined with UNION ALL, so any month range costs a single database round trip.
+"""
+
+from django.db.models import CharField, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from datetime import date
+from decimal import Decimal
+
+
+def month_starts(months, end=None):
+    """
+    First day of each of the last ``months`` calendar months, oldest first,
+    ending with the month containing ``end`` (default today).
+    """
+    end = end or date.today()
+    year, month = end.year, end.month
+    starts = []
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    starts.reverse()
+    return starts
+
+
+def _as_date(value):
+    """TruncMonth may come back as a date, datetime or ISO string depending on the backend."""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if hasattr(value, 'date'):
+        return value.date()
+    return value
+
+
+def monthly_totals(series, start, end):
+    """
+    Sum an amount per calendar month for several querysets in one query.
+
+    Args:
+        series: dict of name -> (queryset, date_field, amount_field).
+        start: First day of the first month (inclusive).
+        end: Last date to include (inclusive).
+
+    Returns:
+        dict of name -> {month_start_date: Decimal total}. Months without
+        rows are absent; callers fill gaps with zero.
+    """
+    combined = None
+    for name, (queryset, date_field, amount_field) in series.items():
+        monthly = queryset.filter(
+            **{f'{date_field}__gte': start, f'{date_field}__lte': end}
+        ).order_by().annotate(
+            series=Value(name, output_field=CharField()),
+            month=TruncMonth(date_field),
+        ).values('series', 'month').annotate(
+            total=Coalesce(Sum(amount_field), Value(0), output_field=DecimalField())
+        ).values_list('series', 'month', 'total')
+        combined = monthly if combined is None else combined.union(monthly, all=True)
+
+    totals = {name: {} for name in series}
+    if combined is None:
+        return totals
+
+    for name, month, total in combined:
+        month = _as_date(month)
+        totals[name][month] = totals[name].get(month, Decimal('0')) + Decimal(str(total or 0))
+    return totals
@@ -7,6 +7,7 @@ from . import dashboard_views
 router = DefaultRouter()
 router.register(r'organizations', views.OrganizationViewSet, basename='organization')
 router.register(r'clients', views.ClientViewSet, basename='client')
+router.register(r'export-jobs', views.ExportJobViewSet, basename='export-job')
 router.register(r'service-items', views.ServiceItemViewSet, basename='service-item')
 router.register(r'payment-terms', views.PaymentTermViewSet, basename='payment-term')
 router.register(r'invoices', views.InvoiceViewSet, basename='invoice')
@@ -127,6 +128,9 @@ urlpatterns = [
 
     # Accounting Module additional endpoints
     path('accounting/dashboard/', views.accounting_dashboard_stats, name='accounting-dashboard'),
+    path('accounting/trial-balance/', views.trial_balance, name='accounting-trial-balance'),
+    path('accounting/profit-and-loss/', views.profit_and_loss, name='accounting-profit-and-loss'),
+    path('accounting/balance-sheet/', views.balance_sheet, name='accounting-balance-sheet'),
 
     # Dashboard Summary APIs (for dashboard widgets)
     path('dashboard/ageing-summary/', dashboard_views.ageing_report_summary, name='dashboard-ageing-summary'),
@@ -135,4 +139,5 @@ urlpatterns = [
     path('dashboard/tally-sync-status/', dashboard_views.tally_sync_status, name='dashboard-tally-sync-status'),
     path('dashboard/opening-balance-status/', dashboard_views.opening_balance_status, name='dashboard-opening-balance-status'),
     path('dashboard/payment-reminders/', dashboard_views.payment_reminders_summary, name='dashboard-payment-reminders'),
+    path('dashboard/ageing-report/', dashboard_views.ageing_report, name='dashboard-ageing-report'),
 ]
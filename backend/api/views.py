@@ -64,6 +64,7 @@ from .views_invoice import (
     import_invoices,
     download_import_template,
     export_data,
+    ExportJobViewSet,
 )
 
 # Payment and Receipt
@@ -158,6 +159,9 @@ from .views_accounting import (
     VoucherNumberSeriesViewSet,
     BankReconciliationViewSet,
     accounting_dashboard_stats,
+    trial_balance,
+    profit_and_loss,
+    balance_sheet,
 )
 
 # Scheduled Invoices
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from api.permissions import ReadOnlyForViewer
 from api.pagination import StandardPagination, LargePagination
+from django.db import transaction
 from django.db.models import Sum, Q, Count
 from datetime import date
 from decimal import Decimal
@@ -13,6 +14,7 @@ from .models import (
     FinancialYear, AccountGroup, LedgerAccount, Voucher, VoucherEntry,
     VoucherNumberSeries, BankReconciliation, BankReconciliationItem,
 )
+from . import financial_reports
 from .serializers import (
     FinancialYearSerializer, AccountGroupSerializer, AccountGroupTreeSerializer,
     LedgerAccountSerializer, LedgerAccountListSerializer, VoucherSerializer,
@@ -72,7 +74,7 @@ class AccountGroupViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = AccountGroup.objects.filter(
             organization=self.request.organization
-        ).select_related('parent')
+        ).select_related('parent').annotate(children_count=Count('children'))
 
         # Filter by parent
         parent_id = self.request.query_params.get('parent', None)
@@ -96,11 +98,11 @@ class AccountGroupViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def tree(self, request):
-        """Get account groups as a tree structure"""
-        root_groups = AccountGroup.objects.filter(
-            organization=request.organization,
-            parent__isnull=True
-        ).order_by('sequence', 'name')
+        """
+        Get account groups as a tree structure. The whole tree, with ledger
+        counts and subtree rollups, is loaded in one query.
+        """
+        root_groups = AccountGroup.load_tree(request.organization)
         serializer = AccountGroupTreeSerializer(root_groups, many=True)
         return Response(serializer.data)
 
@@ -208,11 +210,22 @@ class LedgerAccountViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def statement(self, request, pk=None):
-        """Get ledger statement (all voucher entries)"""
+        """
+        Get ledger statement (voucher entries, optionally between from_date
+        and to_date). The opening balance is the balance before from_date,
+        taken from the nearest monthly balance snapshot, so only the
+        requested window's entries are read.
+        """
         ledger = self.get_object()
         from_date = request.query_params.get('from_date', None)
         to_date = request.query_params.get('to_date', None)
 
+        try:
+            from_date = date.fromisoformat(from_date) if from_date else None
+            to_date = date.fromisoformat(to_date) if to_date else None
+        except ValueError:
+            return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+
         entries = VoucherEntry.objects.filter(
             ledger_account=ledger,
             voucher__status='posted'
@@ -223,11 +236,15 @@ class LedgerAccountViewSet(viewsets.ModelViewSet):
         if to_date:
             entries = entries.filter(voucher__voucher_date__lte=to_date)
 
-        # Calculate running balance
-        opening_balance = ledger.opening_balance
-        if ledger.opening_balance_type == 'Cr':
-            opening_balance = -opening_balance
+        # Opening balance of the window (Dr positive)
+        if from_date:
+            opening_balance = ledger.balance_before(from_date)
+        else:
+            opening_balance = ledger.opening_balance
+            if ledger.opening_balance_type == 'Cr':
+                opening_balance = -opening_balance
 
+        # Calculate running balance
         running_balance = opening_balance
         statement = []
         for entry in entries:
@@ -248,8 +265,8 @@ class LedgerAccountViewSet(viewsets.ModelViewSet):
 
         return Response({
             'ledger': LedgerAccountSerializer(ledger).data,
-            'opening_balance': float(ledger.opening_balance),
-            'opening_balance_type': ledger.opening_balance_type,
+            'opening_balance': float(abs(opening_balance)),
+            'opening_balance_type': 'Dr' if opening_balance >= 0 else 'Cr',
             'closing_balance': float(abs(running_balance)),
             'closing_balance_type': 'Dr' if running_balance >= 0 else 'Cr',
             'entries': statement
@@ -330,6 +347,12 @@ class VoucherViewSet(viewsets.ModelViewSet):
             return VoucherListSerializer
         return VoucherSerializer
 
+    def perform_destroy(self, instance):
+        # Deleted entries no longer count towards the ledger balances
+        with transaction.atomic():
+            instance.reverse_balances()
+            instance.delete()
+
     @action(detail=True, methods=['post'])
     def post_voucher(self, request, pk=None):
         """Post a draft voucher"""
@@ -585,3 +608,58 @@ def accounting_dashboard_stats(request):
         'ledger_count': LedgerAccount.objects.filter(organization=org, is_active=True).count(),
         'group_count': AccountGroup.objects.filter(organization=org).count()
     })
+
+
+# =============================================================================
+# FINANCIAL STATEMENTS
+# =============================================================================
+
+def _report_dates(request):
+    """
+    (from_date, to_date) of a report request. to_date defaults to today and
+    from_date to the start of the financial year containing to_date.
+    Raises ValueError on a malformed date.
+    """
+    from_date = request.query_params.get('from_date', None)
+    to_date = request.query_params.get('to_date', None)
+    to_date = date.fromisoformat(to_date) if to_date else date.today()
+    if from_date:
+        from_date = date.fromisoformat(from_date)
+    else:
+        fy = FinancialYear.get_fy_for_date(request.organization, to_date)
+        from_date = fy.start_date if fy else None
+    return from_date, to_date
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def trial_balance(request):
+    """Trial balance grouped by the account group hierarchy"""
+    try:
+        from_date, to_date = _report_dates(request)
+    except ValueError:
+        return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+    return Response(financial_reports.trial_balance(request.organization, from_date, to_date))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def profit_and_loss(request):
+    """Profit & loss account for a period"""
+    try:
+        from_date, to_date = _report_dates(request)
+    except ValueError:
+        return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+    return Response(financial_reports.profit_and_loss(request.organization, from_date, to_date))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def balance_sheet(request):
+    """Balance sheet as of to_date (default today)"""
+    to_date = request.query_params.get('to_date', None)
+    try:
+        as_of = date.fromisoformat(to_date) if to_date else date.today()
+    except ValueError:
+        return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+    return Response(financial_reports.balance_sheet(request.organization, as_of))
@@ -19,6 +19,9 @@ from .models import (
     EmailSettings, InvoiceFormatSettings, EmailOTP, Client, Invoice, Payment,
     SubscriptionPlan, Subscription, StaffProfile
 )
+from .serializers import ExportJobSerializer
+from .exports import personal_data_json, personal_data_filename
+from .export_jobs import enqueue_export, wants_background_export
 
 logger = logging.getLogger(__name__)
 
@@ -950,103 +953,22 @@ def delete_account_view(request):
 def export_personal_data_view(request):
     """
     Export all personal data for the user (DPDP Act - Right to Data Portability).
-    Returns a JSON file with all user data.
+    Returns a JSON file with all user data, or with ?background=true an
+    export job to poll at /api/export-jobs/<id>/.
     """
-    import json
-    from django.http import HttpResponse
-
     user = request.user
-    organization = request.organization
 
-    try:
-        # Gather all user data
-        user_data = {
-            'account_info': {
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'date_joined': user.date_joined.isoformat(),
-                'last_login': user.last_login.isoformat() if user.last_login else None,
-            },
-            'organizations': [],
-            'export_date': timezone.now().isoformat(),
-            'export_purpose': 'Data Portability as per DPDP Act 2023'
-        }
-
-        # Get all user's organizations
-        memberships = OrganizationMembership.objects.filter(user=user, is_active=True)
-
-        for membership in memberships:
-            org = membership.organization
-            org_data = {
-                'name': org.name,
-                'role': membership.role,
-                'joined_at': membership.joined_at.isoformat(),
-            }
-
-            # Get company settings
-            try:
-                company = CompanySettings.objects.get(organization=org)
-                org_data['company_settings'] = {
-                    'company_name': company.companyName,
-                    'trading_name': company.tradingName,
-                    'address': company.address,
-                    'city': company.city,
-                    'state': company.state,
-                    'pin_code': company.pinCode,
-                    'gstin': company.gstin,
-                    'pan': company.pan,
-                    'phone': company.phone,
-                    'email': company.email,
-                }
-            except CompanySettings.DoesNotExist:
-                org_data['company_settings'] = None
-
-            # Get clients
-            clients = Client.objects.filter(organization=org)
-            org_data['clients'] = [{
-                'name': c.name,
-                'code': c.code,
-                'email': c.email,
-                'phone': c.phone,
-                'address': c.address,
-                'city': c.city,
-                'state': c.state,
-                'gstin': c.gstin,
-                'pan': c.pan,
-            } for c in clients]
-
-            # Get invoices
-            invoices = Invoice.objects.filter(organization=org)
-            org_data['invoices'] = [{
-                'invoice_number': inv.invoice_number,
-                'invoice_type': inv.invoice_type,
-                'client': inv.client.name,
-                'invoice_date': inv.invoice_date.isoformat(),
-                'status': inv.status,
-                'subtotal': str(inv.subtotal),
-                'tax_amount': str(inv.tax_amount),
-                'total_amount': str(inv.total_amount),
-            } for inv in invoices]
-
-            # Get payments
-            payments = Payment.objects.filter(organization=org)
-            org_data['payments'] = [{
-                'invoice': p.invoice.invoice_number,
-                'amount': str(p.amount),
-                'payment_date': p.payment_date.isoformat(),
-                'payment_method': p.payment_method,
-            } for p in payments]
-
-            user_data['organizations'].append(org_data)
+    if wants_background_export(request):
+        job = enqueue_export(user, None, kind='personal_data', export_format='json')
+        return Response(ExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
+    try:
         # Create JSON response
         response = HttpResponse(
-            json.dumps(user_data, indent=2, ensure_ascii=False),
+            personal_data_json(user),
             content_type='application/json; charset=utf-8'
         )
-        response['Content-Disposition'] = f'attachment; filename="nexinvo_personal_data_export_{timezone.now().strftime("%Y%m%d")}.json"'
+        response['Content-Disposition'] = f'attachment; filename="{personal_data_filename()}"'
         return response
 
     except Exception as e:
@@ -2,9 +2,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.core.cache import cache
-from django.db.models import Sum, F, DecimalField, Subquery, OuterRef
-from django.db.models.functions import Coalesce
+from django.db.models import Sum
 from datetime import date, timedelta
 import logging
 
@@ -12,6 +10,7 @@ from .models import (
     Invoice, Payment, Client,
     OrganizationMembership, Subscription
 )
+from .cache_utils import get_or_set_org_cache
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +19,6 @@ logger = logging.getLogger(__name__)
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
     """Get dashboard statistics with subscription info"""
-    from datetime import date, timedelta
     organization = request.organization
 
     # Check if user has an organization
@@ -29,12 +27,15 @@ def dashboard_stats(request):
             'error': 'No organization found for user'
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check cache first (60 second TTL, keyed by organization)
-    cache_key = f'dashboard_stats_{organization.id}'
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return Response(cached_data)
+    # Served from the org's versioned cache, invalidated by model signals
+    data = get_or_set_org_cache(
+        organization.id, 'dashboard_stats', lambda: _compute_dashboard_stats(organization)
+    )
+    return Response(data)
+
 
+def _compute_dashboard_stats(organization):
+    """Build the dashboard_stats payload for an organization."""
     # Total invoices (all types)
     total_invoices = Invoice.objects.filter(organization=organization).count()
 
@@ -43,33 +44,14 @@ def dashboard_stats(request):
         total=Sum('amount')
     )['total'] or 0
 
-    # Calculate pending amount - single query with annotation instead of N+1
-    from django.db.models import Subquery, OuterRef, DecimalField
-    from django.db.models.functions import Coalesce
-
+    # Pending amount - indexed filter on the maintained outstanding column
     pending_result = Invoice.objects.filter(
-        organization=organization
+        organization=organization,
+        outstanding__gt=0
     ).exclude(
         status='cancelled'
-    ).annotate(
-        total_paid=Coalesce(
-            Subquery(
-                Payment.objects.filter(
-                    invoice=OuterRef('pk')
-                ).values('invoice').annotate(
-                    total=Sum('amount')
-                ).values('total'),
-                output_field=DecimalField()
-            ),
-            0,
-            output_field=DecimalField()
-        )
-    ).annotate(
-        balance_due=F('total_amount') - F('total_paid')
-    ).filter(
-        balance_due__gt=0
     ).aggregate(
-        total_pending=Sum('balance_due')
+        total_pending=Sum('outstanding')
     )
     pending = pending_result['total_pending'] or 0
 
@@ -144,5 +126,4 @@ def dashboard_stats(request):
         'clients': clients,
         'subscription': subscription_info
     }
-    cache.set(cache_key, data, 60)  # Cache for 60 seconds
-    return Response(data)
+    return data
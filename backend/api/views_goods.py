@@ -174,6 +174,10 @@ class SupplierViewSet(viewsets.ModelViewSet):
                 Q(gstin__icontains=search)
             )
 
+        if self.action != 'list':
+            # Creditor ledger balance in the same query (read by SupplierSerializer)
+            queryset = LedgerAccount.annotate_linked_balance(queryset, 'linked_supplier')
+
         return queryset.order_by('name')
 
     def perform_create(self, serializer):
@@ -1,11 +1,11 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, action, permission_classes, throttle_classes
+from rest_framework.decorators import api_view, action, permission_classes, throttle_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .throttles import ExportRateThrottle
 from api.permissions import ReadOnlyForViewer
 from api.pagination import StandardPagination
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
 from django.db.models import Q
 from datetime import date
 import os
@@ -15,15 +15,26 @@ import tempfile
 from .models import (
     Client, Invoice, InvoiceItem, ServiceItem, PaymentTerm,
     Payment, CompanySettings, InvoiceSettings, InvoiceFormatSettings,
-    EmailSettings
+    EmailSettings, LedgerAccount, ExportJob
 )
 from .serializers import (
     ClientSerializer, InvoiceSerializer, ServiceItemSerializer,
-    PaymentTermSerializer
+    PaymentTermSerializer, ExportJobSerializer
 )
-from .pdf_generator import generate_invoice_pdf
-from .email_service import send_invoice_email, send_bulk_invoice_emails
+from .pdf_cache import get_invoice_pdf
+from .pdf_archive import (
+    BULK_PDF_MAX_FILES, BULK_PDF_CHUNK_SIZE, iter_zip, invoice_pdf_files, requested_ids
+)
+from .email_service import email_settings_problem, queue_invoice_email
+from .email_outbox import idempotency_key_for
 from .invoice_importer import InvoiceImporter, generate_excel_template
+from .exports import (
+    EXPORT_RENDERER_CLASSES, ROW_GENERATORS, XLSX_CONTENT_TYPE,
+    export_types_for, iter_csv, build_xlsx
+)
+from .export_jobs import (
+    enqueue_export, wants_background_export, open_export_file, remove_export_file
+)
 
 logger = logging.getLogger(__name__)
 
@@ -34,9 +45,11 @@ class ClientViewSet(viewsets.ModelViewSet):
     pagination_class = StandardPagination
 
     def get_queryset(self):
-        return Client.objects.filter(
+        queryset = Client.objects.filter(
             organization=self.request.organization
-        ).select_related('organization').prefetch_related('invoices')
+        ).select_related('organization')
+        # Debtor ledger balance in the same query (read by ClientSerializer)
+        return LedgerAccount.annotate_linked_balance(queryset, 'linked_client')
 
     def perform_create(self, serializer):
         serializer.save(organization=self.request.organization)
@@ -176,6 +189,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated, ReadOnlyForViewer]
     pagination_class = StandardPagination
+    throttle_scope = 'export'  # rate of ExportRateThrottle on bulk_pdf
 
     def get_queryset(self):
         queryset = Invoice.objects.filter(
@@ -235,8 +249,8 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             except InvoiceFormatSettings.DoesNotExist:
                 format_settings = None
 
-            # Generate PDF
-            pdf_buffer = generate_invoice_pdf(invoice, company_settings, format_settings)
+            # Generate PDF (served from the PDF cache when the invoice is unchanged)
+            pdf_buffer = get_invoice_pdf(invoice, company_settings, format_settings)
 
             # Create HTTP response with PDF
             response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
@@ -249,9 +263,50 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['get', 'post'], throttle_classes=[ExportRateThrottle])
+    def bulk_pdf(self, request):
+        """
+        Download many invoice PDFs as one streamed ZIP archive.
+
+        Selects the invoices given as ``ids`` (POST body list or comma
+        separated query parameter), otherwise everything matching the list
+        filters (search, status, invoice_type, unpaid_only).
+        """
+        try:
+            ids = requested_ids(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        invoices = self.get_queryset().prefetch_related(None).select_related(None).select_related(
+            'client', 'payment_term'
+        ).order_by('invoice_date', 'id')
+        if ids is not None:
+            invoices = invoices.filter(id__in=ids)
+
+        count = invoices.count()
+        if not count:
+            return Response({'error': 'No invoices found'}, status=status.HTTP_404_NOT_FOUND)
+        if count > BULK_PDF_MAX_FILES:
+            return Response(
+                {'error': f'Too many invoices ({count}). Download at most {BULK_PDF_MAX_FILES} at a time.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        company_settings = CompanySettings.objects.filter(organization=request.organization).first()
+        if company_settings is None:
+            return Response({'error': 'Company settings not configured'}, status=status.HTTP_400_BAD_REQUEST)
+        format_settings = InvoiceFormatSettings.objects.filter(organization=request.organization).first()
+
+        files = invoice_pdf_files(
+            invoices.iterator(chunk_size=BULK_PDF_CHUNK_SIZE), company_settings, format_settings
+        )
+        response = StreamingHttpResponse(iter_zip(files), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="invoices_{date.today().strftime("%Y%m%d")}.zip"'
+        return response
+
     @action(detail=True, methods=['post'])
     def send_email(self, request, pk=None):
-        """Send invoice email to client"""
+        """Queue the invoice email to the client (delivered by the email outbox)"""
         try:
             invoice = self.get_object()
 
@@ -262,40 +317,28 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Get company settings
-            try:
-                company_settings = CompanySettings.objects.get(organization=request.organization)
-            except CompanySettings.DoesNotExist:
-                company_settings = CompanySettings.objects.create(
-                    user=request.user,
-                    companyName="NexInvo"
-                )
-
-            # Send email
-            success = send_invoice_email(invoice, company_settings)
+            problem = email_settings_problem(EmailSettings.objects.filter(organization=request.organization).first())
+            if problem:
+                return Response({'error': problem}, status=status.HTTP_400_BAD_REQUEST)
 
-            if success:
-                # Update invoice status to 'sent' if it was 'draft'
-                if invoice.status == 'draft':
-                    invoice.status = 'sent'
-                    invoice.save()
+            # Queue the email; the invoice moves from draft to sent once it is delivered
+            email = queue_invoice_email(
+                invoice, idempotency_key=idempotency_key_for(request, f"invoice:{invoice.pk}")
+            )
 
-                return Response({
-                    'message': 'Invoice email sent successfully',
-                    'invoice': InvoiceSerializer(invoice).data
-                })
-            else:
-                return Response(
-                    {'error': 'Failed to send email'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+            return Response({
+                'message': 'Invoice email queued for sending',
+                'email_id': str(email.id),
+                'email_status': email.status,
+                'invoice': InvoiceSerializer(invoice).data
+            }, status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['post'])
     def bulk_send_email(self, request):
-        """Send emails for multiple invoices at once - optimized for speed"""
+        """Queue emails for multiple invoices at once (delivered by the email outbox)"""
         try:
             invoice_ids = request.data.get('invoice_ids', [])
 
@@ -317,32 +360,34 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Get company settings
-            try:
-                company_settings = CompanySettings.objects.get(organization=request.organization)
-            except CompanySettings.DoesNotExist:
-                company_settings = CompanySettings.objects.create(
-                    user=request.user,
-                    companyName="NexInvo"
-                )
-
-            # Send bulk emails using optimized function
-            result = send_bulk_invoice_emails(list(invoices), company_settings)
+            problem = email_settings_problem(EmailSettings.objects.filter(organization=request.organization).first())
+            if problem:
+                return Response({'error': problem}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Update status for successfully sent invoices
-            Invoice.objects.filter(
-                id__in=invoice_ids,
-                organization=request.organization,
-                status='draft',
-                is_emailed=True
-            ).update(status='sent')
+            # Queue one email per invoice; delivery (PDF rendering, pooled SMTP,
+            # retries) happens in the email outbox workers
+            results = []
+            errors = []
+            for invoice in invoices:
+                if not invoice.client.email:
+                    errors.append(f"Invoice {invoice.invoice_number}: Client email not configured")
+                    results.append({'invoice_id': invoice.id, 'invoice_number': invoice.invoice_number,
+                                    'status': 'failed', 'error': 'Client email not configured'})
+                    continue
+                email = queue_invoice_email(
+                    invoice, idempotency_key=idempotency_key_for(request, f"invoice:{invoice.pk}")
+                )
+                results.append({'invoice_id': invoice.id, 'invoice_number': invoice.invoice_number,
+                                'status': 'queued', 'error': None, 'email_id': str(email.id)})
 
+            queued = len(results) - len(errors)
             return Response({
-                'message': f'Emails sent: {result["success"]} successful, {result["failed"]} failed',
-                'success_count': result['success'],
-                'failed_count': result['failed'],
-                'errors': result['errors'][:10] if result['errors'] else []  # Return only first 10 errors
-            })
+                'message': f'Emails queued: {queued} queued, {len(errors)} failed',
+                'success_count': queued,
+                'failed_count': len(errors),
+                'errors': errors[:10],  # Return only first 10 errors
+                'results': results,
+            }, status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -399,18 +444,9 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             proforma_invoice.status = 'paid'
             proforma_invoice.save()
 
-            # Get company settings
-            try:
-                company_settings = CompanySettings.objects.get(organization=request.organization)
-            except CompanySettings.DoesNotExist:
-                company_settings = CompanySettings.objects.create(
-                    user=request.user,
-                    companyName="NexInvo"
-                )
-
             # Auto-send tax invoice email if client has email
             if tax_invoice.client.email:
-                send_invoice_email(tax_invoice, company_settings)
+                queue_invoice_email(tax_invoice, idempotency_key=f"invoice:{tax_invoice.pk}:converted")
 
             return Response({
                 'message': 'Proforma invoice converted to tax invoice successfully',
@@ -515,111 +551,119 @@ def download_import_template(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @throttle_classes([ExportRateThrottle])
+@renderer_classes(EXPORT_RENDERER_CLASSES)
 def export_data(request):
     """
-    Export organization data (invoices, clients, payments) to Excel or CSV
+    Export organization data (invoices, clients, payments) to Excel or CSV.
+    Rows are streamed from the database in chunks (see api.exports), so
+    memory use does not grow with the size of the organization.
+    With ?background=true an export job is queued instead (see ExportJobViewSet).
     """
-    import pandas as pd
-    from io import BytesIO
-
     export_format = request.GET.get('format', 'excel')  # excel or csv
     data_type = request.GET.get('type', 'all')  # all, invoices, clients, payments
 
     organization = request.organization
 
     try:
-        # Prepare data based on type
-        if data_type in ['all', 'invoices']:
-            invoices = Invoice.objects.filter(organization=organization).select_related('client')
-            invoices_data = []
-            for inv in invoices:
-                invoices_data.append({
-                    'Invoice Number': inv.invoice_number,
-                    'Type': inv.invoice_type.upper(),
-                    'Client': inv.client.name if inv.client else '',
-                    'Invoice Date': inv.invoice_date.strftime('%d/%m/%Y') if inv.invoice_date else '',
-                    'Due Date': inv.due_date.strftime('%d/%m/%Y') if inv.due_date else '',
-                    'Subtotal': float(inv.subtotal or 0),
-                    'Tax Amount': float(inv.tax_amount or 0),
-                    'Total Amount': float(inv.total_amount or 0),
-                    'Status': inv.status.upper(),
-                    'Created': inv.created_at.strftime('%d/%m/%Y %H:%M') if inv.created_at else ''
-                })
-            df_invoices = pd.DataFrame(invoices_data)
-
-        if data_type in ['all', 'clients']:
-            clients = Client.objects.filter(organization=organization)
-            clients_data = []
-            for client in clients:
-                clients_data.append({
-                    'Name': client.name,
-                    'Email': client.email or '',
-                    'Phone': client.phone or '',
-                    'GSTIN': client.gstin or '',
-                    'PAN': client.pan or '',
-                    'Address': client.address or '',
-                    'City': client.city or '',
-                    'State': client.state or '',
-                    'PIN Code': client.pin_code or '',
-                    'Created': client.created_at.strftime('%d/%m/%Y') if client.created_at else ''
-                })
-            df_clients = pd.DataFrame(clients_data)
-
-        if data_type in ['all', 'payments']:
-            payments = Payment.objects.filter(invoice__organization=organization).select_related('invoice', 'invoice__client')
-            payments_data = []
-            for payment in payments:
-                payments_data.append({
-                    'Payment ID': payment.id,
-                    'Invoice Number': payment.invoice.invoice_number if payment.invoice else '',
-                    'Client': payment.invoice.client.name if payment.invoice and payment.invoice.client else '',
-                    'Payment Date': payment.payment_date.strftime('%d/%m/%Y') if payment.payment_date else '',
-                    'Amount': float(payment.amount or 0),
-                    'TDS Deducted': float(payment.tds_amount or 0),
-                    'Amount Received': float(payment.amount_received or 0),
-                    'Payment Method': payment.get_payment_method_display() if payment.payment_method else '',
-                    'Reference': payment.reference_number or '',
-                    'Notes': payment.notes or ''
-                })
-            df_payments = pd.DataFrame(payments_data)
-
-        # Generate file based on format
+        export_types = export_types_for(data_type)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if wants_background_export(request):
+        # Build the file in the background; the client polls /api/export-jobs/<id>/
+        job = enqueue_export(
+            request.user, organization, kind='data',
+            export_format=export_format, data_type=data_type
+        )
+        return Response(ExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    try:
         if export_format == 'csv':
             # For CSV, export only the requested type (or invoices if all)
-            if data_type == 'invoices' or data_type == 'all':
-                df = df_invoices
-                filename = 'invoices_export.csv'
-            elif data_type == 'clients':
-                df = df_clients
-                filename = 'clients_export.csv'
-            elif data_type == 'payments':
-                df = df_payments
-                filename = 'payments_export.csv'
-
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            df.to_csv(response, index=False, encoding='utf-8-sig')
+            export_type = export_types[0]
+            rows = ROW_GENERATORS[export_type](organization)
+            response = StreamingHttpResponse(iter_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{export_type}_export.csv"'
             return response
 
         else:  # Excel format
-            output = BytesIO()
-
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                if data_type in ['all', 'invoices']:
-                    df_invoices.to_excel(writer, sheet_name='Invoices', index=False)
-                if data_type in ['all', 'clients']:
-                    df_clients.to_excel(writer, sheet_name='Clients', index=False)
-                if data_type in ['all', 'payments']:
-                    df_payments.to_excel(writer, sheet_name='Payments', index=False)
-
-            output.seek(0)
-
-            response = HttpResponse(
-                output.read(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            spool = build_xlsx(organization, export_types)
+            return FileResponse(
+                spool,
+                as_attachment=True,
+                filename='nexinvo_data_export.xlsx',
+                content_type=XLSX_CONTENT_TYPE
             )
-            response['Content-Disposition'] = 'attachment; filename="nexinvo_data_export.xlsx"'
-            return response
 
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ExportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background exports of the current user.
+
+    POST   /api/export-jobs/                 {kind, format, type} -> 202 with the job
+    GET    /api/export-jobs/<id>/            poll status and progress
+    GET    /api/export-jobs/<id>/download/   download the finished file
+    DELETE /api/export-jobs/<id>/            remove the job and its file
+
+    Progress is also pushed to the notifications websocket as export_progress.
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardPagination
+    throttle_scope = 'export'
+
+    def get_throttles(self):
+        # Only starting an export counts against the export rate
+        if self.action == 'create':
+            return [ExportRateThrottle()]
+        return super().get_throttles()
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user)
+
+    def create(self, request):
+        kind = request.data.get('kind', 'data')
+        if kind not in dict(ExportJob.KIND_CHOICES):
+            return Response({'error': 'Invalid export kind'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if kind == 'personal_data':
+            job = enqueue_export(request.user, None, kind=kind, export_format='json')
+        else:
+            if not request.organization:
+                return Response({'error': 'No organization found for user'}, status=status.HTTP_400_BAD_REQUEST)
+            export_format = request.data.get('format', 'excel')
+            if export_format not in ('excel', 'csv'):
+                return Response({'error': 'Invalid format. Use excel or csv.'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                job = enqueue_export(
+                    request.user, request.organization, kind=kind,
+                    export_format=export_format, data_type=request.data.get('type', 'all')
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    def destroy(self, request, pk=None):
+        job = self.get_object()
+        remove_export_file(job)
+        job.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Stream the finished export file"""
+        job = self.get_object()
+        if job.status != 'completed':
+            return Response(
+                {'error': f'Export is {job.status}', 'status': job.status, 'progress': job.progress},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            fileobj = open_export_file(job)
+        except FileNotFoundError:
+            return Response({'error': 'Export file has expired'}, status=status.HTTP_410_GONE)
+        return FileResponse(fileobj, as_attachment=True, filename=job.file_name)
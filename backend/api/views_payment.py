@@ -4,20 +4,25 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from api.permissions import ReadOnlyForViewer
 from api.pagination import StandardPagination
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
 from django.db import transaction
+from datetime import date
 import logging
 
 from .models import (
     Payment, Receipt, Invoice, InvoiceItem,
-    CompanySettings, InvoiceSettings,
+    CompanySettings, InvoiceSettings, EmailSettings,
     Voucher, VoucherEntry, LedgerAccount, FinancialYear, VoucherNumberSeries,
 )
 from .serializers import (
     PaymentSerializer, ReceiptSerializer
 )
-from .email_service import send_receipt_email
+from .email_service import email_settings_problem, queue_receipt_email
+from .email_outbox import idempotency_key_for
+from .throttles import ExportRateThrottle
+from .pdf_archive import (
+    BULK_PDF_MAX_FILES, BULK_PDF_CHUNK_SIZE, iter_zip, receipt_pdf_files, requested_ids
+)
 
 logger = logging.getLogger(__name__)
 
@@ -71,10 +76,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
         # Update invoice status based on payment
         invoice = payment.invoice
 
-        # Calculate total payments for this invoice
-        total_paid = Payment.objects.filter(invoice=invoice).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
+        # Total payments for this invoice (maintained by Payment.save())
+        total_paid = invoice.amount_paid
 
         # Auto-convert Proforma Invoice to Tax Invoice when payment is received
         if invoice.invoice_type == 'proforma' and total_paid >= invoice.total_amount:
@@ -113,6 +116,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
                     # Transfer payment to tax invoice
                     payment.invoice = tax_invoice
                     payment.save()
+                    invoice.update_payment_totals(save=False)
 
                     # Generate Receipt Number
                     receipt_number = _generate_receipt_number(self.request.organization)
@@ -141,11 +145,10 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
                 # Auto-send tax invoice and receipt email (outside transaction)
                 try:
-                    company_settings = CompanySettings.objects.get(organization=self.request.organization)
                     if tax_invoice.client.email:
-                        send_receipt_email(receipt, tax_invoice, company_settings)
+                        queue_receipt_email(receipt, idempotency_key=f"receipt:{receipt.pk}")
                 except Exception as e:
-                    logger.error(f"Error sending tax invoice and receipt email: {str(e)}")
+                    logger.error(f"Error queueing tax invoice and receipt email: {str(e)}")
             else:
                 # Already converted, just update status
                 invoice.status = 'paid'
@@ -185,10 +188,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
             # Auto-send receipt and tax invoice email (outside transaction)
             if receipt and invoice.client.email:
                 try:
-                    company_settings = CompanySettings.objects.get(organization=self.request.organization)
-                    send_receipt_email(receipt, invoice, company_settings)
+                    queue_receipt_email(receipt, idempotency_key=f"receipt:{receipt.pk}")
                 except Exception as e:
-                    logger.error(f"Error sending receipt email for tax invoice payment: {str(e)}")
+                    logger.error(f"Error queueing receipt email for tax invoice payment: {str(e)}")
         else:
             # Update invoice status for other invoice types
             if total_paid >= invoice.total_amount:
@@ -316,10 +318,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
         # Update invoice status based on updated payment
         invoice = payment.invoice
 
-        # Calculate total payments for this invoice
-        total_paid = Payment.objects.filter(invoice=invoice).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
+        # Total payments for this invoice (maintained by Payment.save())
+        total_paid = invoice.amount_paid
 
         # Update invoice status
         if total_paid >= invoice.total_amount:
@@ -334,10 +334,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
         invoice = instance.invoice
         instance.delete()
 
-        # Recalculate invoice status after payment deletion
-        total_paid = Payment.objects.filter(invoice=invoice).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
+        # Recalculate invoice status after payment deletion (totals refreshed by Payment.delete())
+        total_paid = invoice.amount_paid
 
         if total_paid >= invoice.total_amount:
             invoice.status = 'paid'
@@ -369,6 +367,7 @@ class ReceiptViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ReceiptSerializer
     permission_classes = [IsAuthenticated, ReadOnlyForViewer]
     pagination_class = StandardPagination
+    throttle_scope = 'export'  # rate of ExportRateThrottle on bulk_pdf
 
     def get_queryset(self):
         queryset = Receipt.objects.filter(
@@ -405,13 +404,48 @@ class ReceiptViewSet(viewsets.ReadOnlyModelViewSet):
         response['Content-Disposition'] = f'attachment; filename="{receipt.receipt_number}.pdf"'
         return response
 
+    @action(detail=False, methods=['get', 'post'], throttle_classes=[ExportRateThrottle])
+    def bulk_pdf(self, request):
+        """
+        Download many receipt PDFs as one streamed ZIP archive.
+
+        Selects the receipts given as ``ids`` (POST body list or comma
+        separated query parameter), otherwise everything matching the list
+        filters (invoice, payment).
+        """
+        try:
+            ids = requested_ids(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        receipts = self.get_queryset().select_related('invoice__client', 'payment')
+        if ids is not None:
+            receipts = receipts.filter(id__in=ids)
+
+        count = receipts.count()
+        if not count:
+            return Response({'error': 'No receipts found'}, status=status.HTTP_404_NOT_FOUND)
+        if count > BULK_PDF_MAX_FILES:
+            return Response(
+                {'error': f'Too many receipts ({count}). Download at most {BULK_PDF_MAX_FILES} at a time.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        company_settings = CompanySettings.objects.filter(organization=request.organization).first()
+        if company_settings is None:
+            return Response({'error': 'Company settings not configured'}, status=status.HTTP_400_BAD_REQUEST)
+
+        files = receipt_pdf_files(receipts.iterator(chunk_size=BULK_PDF_CHUNK_SIZE), company_settings)
+        response = StreamingHttpResponse(iter_zip(files), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="receipts_{date.today().strftime("%Y%m%d")}.zip"'
+        return response
+
     @action(detail=True, methods=['post'])
     def resend_email(self, request, pk=None):
-        """Resend receipt email to client"""
+        """Queue the receipt email to the client again (delivered by the email outbox)"""
         receipt = self.get_object()
 
         try:
-            company_settings = CompanySettings.objects.get(organization=request.organization)
             tax_invoice = receipt.invoice
 
             if not tax_invoice.client.email:
@@ -420,15 +454,19 @@ class ReceiptViewSet(viewsets.ReadOnlyModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            success = send_receipt_email(receipt, tax_invoice, company_settings)
+            problem = email_settings_problem(EmailSettings.objects.filter(organization=request.organization).first())
+            if problem:
+                return Response({'error': problem}, status=status.HTTP_400_BAD_REQUEST)
+
+            email = queue_receipt_email(
+                receipt, idempotency_key=idempotency_key_for(request, f"receipt:{receipt.pk}:resend")
+            )
+            return Response({
+                'message': 'Receipt and invoice queued for sending',
+                'email_id': str(email.id),
+                'email_status': email.status,
+            }, status=status.HTTP_202_ACCEPTED)
 
-            if success:
-                return Response({'message': 'Receipt and invoice sent successfully'})
-            else:
-                return Response(
-                    {'error': 'Failed to send email'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -69,8 +69,8 @@ class ScheduledInvoiceViewSet(viewsets.ModelViewSet):
         scheduled_invoice = self.get_object()
         if scheduled_invoice.status == 'paused':
             scheduled_invoice.status = 'active'
-            # Recalculate next generation date
-            scheduled_invoice.next_generation_date = scheduled_invoice.calculate_next_generation_date()
+            # Recalculate next generation date (periods missed while paused are skipped)
+            scheduled_invoice.reschedule()
             scheduled_invoice.save()
             return Response({'status': 'active', 'message': 'Scheduled invoice resumed successfully'})
         return Response(
@@ -16,6 +16,7 @@ from .models import (
     BulkEmailTemplate, BulkEmailCampaign, BulkEmailRecipient
 )
 from .serializers import SystemEmailSettingsSerializer
+from .campaigns import campaign_users, campaign_progress, display_name, start_campaign
 
 logger = logging.getLogger(__name__)
 
@@ -763,6 +764,7 @@ def superadmin_email_campaign_detail(request, campaign_id):
             'started_at': campaign.started_at,
             'completed_at': campaign.completed_at,
             'error_message': campaign.error_message,
+            'progress': campaign_progress(campaign),
             'recipients': [{
                 'email': r.email,
                 'user_name': r.user_name,
@@ -809,58 +811,32 @@ def superadmin_email_preview_recipients(request):
     recipient_type = request.query_params.get('recipient_type', 'all_users')
     plan_id = request.query_params.get('plan_id')
 
-    users = User.objects.filter(is_superuser=False)
-
-    if recipient_type == 'all_users':
-        # All non-superuser users
-        pass
-    elif recipient_type == 'all_admins':
-        # Only organization owners and admins
-        admin_user_ids = OrganizationMembership.objects.filter(
-            role__in=['owner', 'admin'],
-            is_active=True
-        ).values_list('user_id', flat=True)
-        users = users.filter(id__in=admin_user_ids)
-    elif recipient_type == 'specific_plan':
-        if plan_id:
-            # Users whose organizations are on a specific plan
-            org_ids = Subscription.objects.filter(
-                plan_id=plan_id,
-                status__in=['active', 'trial']
-            ).values_list('organization_id', flat=True)
-            user_ids = OrganizationMembership.objects.filter(
-                organization_id__in=org_ids,
-                is_active=True
-            ).values_list('user_id', flat=True)
-            users = users.filter(id__in=user_ids)
-    elif recipient_type == 'active_users':
-        users = users.filter(is_active=True)
-    elif recipient_type == 'inactive_users':
-        users = users.filter(is_active=False)
-
-    # Get user details with organization info
-    recipients = []
-    for user in users[:100]:  # Limit preview to 100
-        membership = OrganizationMembership.objects.filter(user=user, is_active=True).first()
-        recipients.append({
-            'id': user.id,
-            'email': user.email,
-            'name': user.get_full_name() or user.username,
-            'organization': membership.organization.name if membership else 'N/A',
-            'is_active': user.is_active
-        })
-
+    users = campaign_users(recipient_type, plan_id)
+
+    # Get user details with organization info (one query)
+    preview = users.order_by('id').values(
+        'id', 'email', 'first_name', 'last_name', 'username', 'is_active', 'membership_organization_name'
+    )[:100]  # Limit preview to 100
+    recipients = [{
+        'id': user['id'],
+        'email': user['email'],
+        'name': display_name(user['first_name'], user['last_name'], user['username']),
+        'organization': user['membership_organization_name'] or 'N/A',
+        'is_active': user['is_active']
+    } for user in preview]
+
+    total_count = users.count()
     return Response({
-        'total_count': users.count(),
+        'total_count': total_count,
         'preview': recipients,
-        'showing': min(100, users.count())
+        'showing': min(100, total_count)
     })
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsSuperAdmin])
 def superadmin_email_send_campaign(request, campaign_id):
-    """Send a bulk email campaign"""
+    """Start sending a bulk email campaign in the background"""
     if not request.user.is_superuser:
         return Response(
             {'error': 'Permission denied. Superadmin access required.'},
@@ -895,145 +871,16 @@ def superadmin_email_send_campaign(request, campaign_id):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Get recipients based on recipient_type
-    users = User.objects.filter(is_superuser=False)
-    recipient_type = campaign.recipient_type
-
-    if recipient_type == 'all_admins':
-        admin_user_ids = OrganizationMembership.objects.filter(
-            role__in=['owner', 'admin'],
-            is_active=True
-        ).values_list('user_id', flat=True)
-        users = users.filter(id__in=admin_user_ids)
-    elif recipient_type == 'specific_plan' and campaign.target_plan:
-        org_ids = Subscription.objects.filter(
-            plan=campaign.target_plan,
-            status__in=['active', 'trial']
-        ).values_list('organization_id', flat=True)
-        user_ids = OrganizationMembership.objects.filter(
-            organization_id__in=org_ids,
-            is_active=True
-        ).values_list('user_id', flat=True)
-        users = users.filter(id__in=user_ids)
-    elif recipient_type == 'active_users':
-        users = users.filter(is_active=True)
-    elif recipient_type == 'inactive_users':
-        users = users.filter(is_active=False)
-
-    # Clear existing recipients and add new ones
-    campaign.recipients.all().delete()
-
-    recipients_to_create = []
-    for user in users:
-        membership = OrganizationMembership.objects.filter(user=user, is_active=True).first()
-        recipients_to_create.append(BulkEmailRecipient(
-            campaign=campaign,
-            user=user,
-            organization=membership.organization if membership else None,
-            email=user.email,
-            user_name=user.get_full_name() or user.username,
-            status='pending'
-        ))
-
-    BulkEmailRecipient.objects.bulk_create(recipients_to_create)
-
-    # Update campaign status
-    campaign.status = 'sending'
-    campaign.total_recipients = len(recipients_to_create)
-    campaign.started_at = timezone.now()
-    campaign.save()
-
-    # Send emails
-    from django.core.mail import EmailMessage
-    from django.conf import settings
-    import smtplib
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
-    from .email_templates import get_base_email_template, format_paragraph, format_greeting, format_signature, format_divider
-
-    sent_count = 0
-    failed_count = 0
-    error_messages = []
-
-    for recipient in campaign.recipients.filter(status='pending'):
-        try:
-            # Replace placeholders in body
-            body_content = campaign.body
-            body_content = body_content.replace('{{user_name}}', recipient.user_name)
-            body_content = body_content.replace('{{email}}', recipient.email)
-            if recipient.organization:
-                body_content = body_content.replace('{{organization_name}}', recipient.organization.name)
-            else:
-                body_content = body_content.replace('{{organization_name}}', 'N/A')
-
-            # Build professional HTML email content with NexInvo branding
-            email_content = format_greeting(recipient.user_name)
-            email_content += format_paragraph(body_content, style="normal")
-            email_content += format_divider()
-            email_content += format_signature(
-                name="NexInvo Team",
-                company="NexInvo",
-                email=system_email.from_email or system_email.smtp_username
-            )
-
-            # Wrap with NexInvo branded template
-            branded_body = get_base_email_template(
-                subject=campaign.subject,
-                content=email_content,
-                company_name="NexInvo",
-                company_tagline="Invoice Management System",
-            )
-
-            # Send email using system email settings
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = campaign.subject
-            msg['From'] = system_email.from_email or system_email.smtp_username
-            msg['To'] = recipient.email
-
-            # Add HTML content with NexInvo branding
-            html_part = MIMEText(branded_body, 'html', 'utf-8')
-            msg.attach(html_part)
-
-            # Connect and send
-            if system_email.use_tls:
-                server = smtplib.SMTP(system_email.smtp_host, system_email.smtp_port)
-                server.starttls()
-            else:
-                server = smtplib.SMTP_SSL(system_email.smtp_host, system_email.smtp_port)
-
-            server.login(system_email.smtp_username, system_email.smtp_password)
-            server.sendmail(msg['From'], [recipient.email], msg.as_string())
-            server.quit()
-
-            # Update recipient status
-            recipient.status = 'sent'
-            recipient.sent_at = timezone.now()
-            recipient.save()
-            sent_count += 1
-
-        except Exception as e:
-            recipient.status = 'failed'
-            recipient.error_message = str(e)[:500]
-            recipient.save()
-            failed_count += 1
-            error_messages.append(f"{recipient.email}: {str(e)[:100]}")
-
-    # Update campaign status
-    campaign.sent_count = sent_count
-    campaign.failed_count = failed_count
-    campaign.status = 'completed'
-    campaign.completed_at = timezone.now()
-    if error_messages:
-        campaign.error_message = '\n'.join(error_messages[:10])  # Store first 10 errors
-    campaign.save()
+    # Recipients are resolved and emailed in the background (see api.campaigns)
+    start_campaign(campaign)
 
     return Response({
-        'message': f'Campaign sent successfully',
+        'message': 'Campaign is being sent',
         'total_recipients': campaign.total_recipients,
-        'sent_count': sent_count,
-        'failed_count': failed_count,
+        'sent_count': campaign.sent_count,
+        'failed_count': campaign.failed_count,
         'status': campaign.status
-    })
+    }, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['POST'])
@@ -0,0 +1,204 @@
+"""
+Bulk voucher creation for historical invoices, purchases, payments and
+expense payments (create_historical_vouchers --batch).
+
+The create_*_voucher() functions in accounting_utils handle one record at a
+time: several ledger lookups, a number-series update, a voucher insert,
+entry inserts, a balance check and balance updates per voucher. Here the
+organization's ledgers are loaded once (LedgerCache), every chunk of
+records is built in memory with the same build_*_voucher() functions,
+numbered from one block reserved per number series, and inserted with
+bulk_create. Ledger balances and monthly snapshots are recomputed once at
+the end instead of being updated voucher by voucher.
+
+Each chunk commits on its own and only records without a voucher are
+picked up, so an interrupted run is resumed by running it again; the final
+recompute covers every ledger of the organization, including those touched
+by the interrupted run. Run it while nobody is posting vouchers for the
+organization.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+from .accounting_utils import (
+    LedgerCache, SALES_LEDGER_CODES, PURCHASE_LEDGER_CODES,
+    build_sales_voucher, build_purchase_voucher, build_receipt_voucher,
+    build_expense_payment_voucher, financial_year_name, get_voucher_number_series,
+    receipt_tds_amount,
+)
+from .models import (
+    Invoice, Purchase, Payment, ExpensePayment, Voucher, VoucherEntry,
+    LedgerAccount, LedgerBalanceSnapshot,
+)
+
+BATCH_SIZE = 500
+
+KINDS = ('invoices', 'purchases', 'payments', 'expenses')
+
+
+def pending_records(organization, kind):
+    """Records of `kind` that still need a voucher, in primary key order."""
+    if kind == 'invoices':
+        records = Invoice.objects.filter(
+            organization=organization,
+            invoice_type='tax'  # Only tax invoices, not proforma
+        ).exclude(status='draft').select_related('organization', 'client')
+        done = Voucher.objects.filter(
+            organization=organization, voucher_type='sales', invoice__isnull=False
+        ).values_list('invoice_id', flat=True)
+    elif kind == 'purchases':
+        records = Purchase.objects.filter(organization=organization).select_related('organization', 'supplier')
+        done = Voucher.objects.filter(
+            organization=organization, voucher_type='purchase', purchase__isnull=False
+        ).values_list('purchase_id', flat=True)
+    elif kind == 'payments':
+        records = Payment.objects.filter(organization=organization).select_related(
+            'organization', 'invoice', 'invoice__client'
+        )
+        done = Voucher.objects.filter(
+            organization=organization, voucher_type='receipt', payment_record__isnull=False
+        ).values_list('payment_record_id', flat=True)
+    elif kind == 'expenses':
+        records = ExpensePayment.objects.filter(organization=organization).select_related('organization')
+        done = Voucher.objects.filter(
+            organization=organization, voucher_type='payment', expense_payment__isnull=False
+        ).values_list('expense_payment_id', flat=True)
+    else:
+        raise ValueError(f"Unknown record kind: {kind}")
+    return records.exclude(id__in=done).order_by('pk')
+
+
+def _builder(kind, ledgers):
+    """
+    record -> (voucher, entries), or None when a ledger the voucher needs is
+    missing. Returns None when the organization lacks the kind's main
+    system ledger altogether.
+    """
+    if kind == 'invoices':
+        system = ledgers.system_ledgers(SALES_LEDGER_CODES)
+        if not system['SALES']:
+            return None
+
+        def build(invoice):
+            client_ledger = ledgers.client(invoice.client_id)
+            if not client_ledger:
+                return None
+            return build_sales_voucher(invoice, client_ledger, system)
+
+    elif kind == 'purchases':
+        system = ledgers.system_ledgers(PURCHASE_LEDGER_CODES)
+        if not system['PURCHASE']:
+            return None
+
+        def build(purchase):
+            supplier_ledger = ledgers.supplier(purchase.supplier_id)
+            if not supplier_ledger:
+                return None
+            return build_purchase_voucher(purchase, supplier_ledger, system)
+
+    elif kind == 'payments':
+        def build(payment):
+            client_ledger = ledgers.client(payment.invoice.client_id)
+            bank_cash_ledger = ledgers.bank_cash(payment.payment_method)
+            if not (client_ledger and bank_cash_ledger):
+                return None
+            tds_ledger = ledgers.system('TDS_RECEIVABLE') if receipt_tds_amount(payment) > 0 else None
+            return build_receipt_voucher(payment, client_ledger, bank_cash_ledger, tds_ledger)
+
+    else:
+        def build(expense_payment):
+            expense_ledger = ledgers.expense(expense_payment.category)
+            bank_cash_ledger = ledgers.bank_cash(expense_payment.payment_method)
+            if not (expense_ledger and bank_cash_ledger):
+                return None
+            return build_expense_payment_voucher(expense_payment, expense_ledger, bank_cash_ledger)
+
+    return build
+
+
+def _save_chunk(organization, built, number_series):
+    """
+    Number, insert and mark as posted (when balanced) one chunk of built
+    vouchers. Voucher numbers come from one reserved block per series.
+    """
+    by_series = defaultdict(list)
+    for voucher, entries in built:
+        by_series[(voucher.voucher_type, financial_year_name(voucher.voucher_date))].append(voucher)
+    for key, vouchers in by_series.items():
+        if key not in number_series:
+            number_series[key] = get_voucher_number_series(organization, key[0], vouchers[0].voucher_date)
+        for voucher, number in zip(vouchers, number_series[key].reserve_numbers(len(vouchers))):
+            voucher.voucher_number = number
+
+    for voucher, entries in built:
+        debit = sum((entry.debit_amount for entry in entries), Decimal('0'))
+        credit = sum((entry.credit_amount for entry in entries), Decimal('0'))
+        # Same rule as Voucher.is_balanced; unbalanced vouchers stay drafts
+        if abs(debit - credit) < Decimal('0.01'):
+            # Counted by the recompute at the end of the run
+            voucher.status = 'posted'
+            voucher.balance_applied = True
+
+    Voucher.objects.bulk_create([voucher for voucher, entries in built])
+    all_entries = []
+    for voucher, entries in built:
+        for entry in entries:
+            entry.voucher = voucher
+        all_entries.extend(entries)
+    VoucherEntry.objects.bulk_create(all_entries, batch_size=1000)
+
+
+def backfill_vouchers(organization, kind, batch_size=BATCH_SIZE, ledgers=None, progress=None):
+    """
+    Create vouchers for every record of `kind` that has none yet, in chunks
+    of batch_size records. Ledger balances are NOT updated; call
+    recalculate_balances() once all kinds are done.
+
+    progress(kind, done, total) is called after every chunk.
+    Returns {'processed', 'created', 'skipped'}.
+    """
+    result = {'processed': 0, 'created': 0, 'skipped': 0}
+    ledgers = ledgers or LedgerCache(organization)
+    build = _builder(kind, ledgers)
+    records = pending_records(organization, kind)
+    total = records.count()
+    if build is None:
+        result['processed'] = result['skipped'] = total
+        return result
+
+    number_series = {}
+    last_pk = None
+    while True:
+        chunk = records if last_pk is None else records.filter(pk__gt=last_pk)
+        chunk = list(chunk[:batch_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        built = [voucher for voucher in map(build, chunk) if voucher]
+        if built:
+            with transaction.atomic():
+                _save_chunk(organization, built, number_series)
+
+        result['processed'] += len(chunk)
+        result['created'] += len(built)
+        result['skipped'] += len(chunk) - len(built)
+        if progress:
+            progress(kind, result['processed'], total)
+    return result
+
+
+def recalculate_balances(organization):
+    """
+    Recompute the current balances and monthly snapshots of all the
+    organization's ledgers from their posted entries (after a backfill).
+    Returns the number of ledgers whose balance changed.
+    """
+    ledgers = LedgerAccount.objects.filter(organization=organization)
+    with transaction.atomic():
+        changed = LedgerAccount.recalculate_balances(ledgers)
+        LedgerBalanceSnapshot.rebuild(ledgers)
+    return len(changed)
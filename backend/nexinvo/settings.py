@@ -95,7 +95,8 @@ CORS_ALLOW_HEADERS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt's JWTAuthentication, reusing the token validated by OrganizationMiddleware
+        'api.authentication.MiddlewareJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -149,6 +150,19 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# How long OrganizationMiddleware caches a (user, organization) membership lookup.
+# Entries are also invalidated by OrganizationMembership/Organization saves, but
+# with the local memory cache only in the process that made the change, so there
+# entries are kept for ORGANIZATION_MEMBERSHIP_LOCAL_CACHE_TIMEOUT at most.
+ORGANIZATION_MEMBERSHIP_CACHE_TIMEOUT = int(os.getenv('ORGANIZATION_MEMBERSHIP_CACHE_TIMEOUT', '300'))
+ORGANIZATION_MEMBERSHIP_LOCAL_CACHE_TIMEOUT = int(os.getenv('ORGANIZATION_MEMBERSHIP_LOCAL_CACHE_TIMEOUT', '10'))
+
+# Background export jobs (api.export_jobs)
+EXPORT_FILES_ROOT = os.getenv('EXPORT_FILES_ROOT', str(BASE_DIR / 'exports'))
+EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', '2'))  # 0 = build in the request thread
+EXPORT_JOB_RETENTION_HOURS = int(os.getenv('EXPORT_JOB_RETENTION_HOURS', '24'))
+EXPORT_JOB_STALE_AFTER = int(os.getenv('EXPORT_JOB_STALE_AFTER', '900'))  # seconds without heartbeat before a job is failed/requeued
+
 ROOT_URLCONF = "nexinvo.urls"
 
 TEMPLATES = [
@@ -262,6 +276,33 @@ else:
     # Console backend for development (prints emails to console)
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Bulk sends over an organization's SMTP server (api.email_delivery)
+EMAIL_DELIVERY_WORKERS = int(os.getenv('EMAIL_DELIVERY_WORKERS', '4'))  # concurrent SMTP connections per batch
+EMAIL_DELIVERY_MAX_ATTEMPTS = int(os.getenv('EMAIL_DELIVERY_MAX_ATTEMPTS', '3'))
+EMAIL_DELIVERY_RETRY_DELAY = float(os.getenv('EMAIL_DELIVERY_RETRY_DELAY', '2'))  # seconds, doubled per retry
+
+# Durable outgoing email queue (api.email_outbox)
+EMAIL_OUTBOX_WORKERS = int(os.getenv('EMAIL_OUTBOX_WORKERS', '2'))  # per web process, 0 = deliver in the request thread on commit
+EMAIL_OUTBOX_STANDALONE = os.getenv('EMAIL_OUTBOX_STANDALONE', 'False') == 'True'  # web processes only queue; run_email_outbox delivers
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50'))  # messages claimed per round
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '5'))  # seconds between idle polls
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))  # then the message is dead-lettered
+EMAIL_OUTBOX_RETRY_DELAY = int(os.getenv('EMAIL_OUTBOX_RETRY_DELAY', '60'))  # seconds, doubled per attempt
+EMAIL_OUTBOX_RATE_PER_MINUTE = int(os.getenv('EMAIL_OUTBOX_RATE_PER_MINUTE', '0'))  # per sender and process, 0 = unlimited
+EMAIL_OUTBOX_LOCK_TIMEOUT = int(os.getenv('EMAIL_OUTBOX_LOCK_TIMEOUT', '600'))  # seconds before a stuck send is retried
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv('EMAIL_OUTBOX_RETENTION_DAYS', '7'))  # sent messages kept this long
+
+# Bulk email campaigns (api.campaigns)
+CAMPAIGN_RUNNER_WORKERS = int(os.getenv('CAMPAIGN_RUNNER_WORKERS', '2'))  # 0 = run in the request thread
+CAMPAIGN_BATCH_SIZE = int(os.getenv('CAMPAIGN_BATCH_SIZE', '100'))  # recipients handed to the outbox at a time
+CAMPAIGN_POLL_INTERVAL = float(os.getenv('CAMPAIGN_POLL_INTERVAL', '5'))  # seconds between progress checks
+CAMPAIGN_RUNNER_STALE_AFTER = int(os.getenv('CAMPAIGN_RUNNER_STALE_AFTER', '120'))  # seconds without heartbeat before resuming
+
+# Daily reminder and scheduled invoice jobs, sharded per organization (api.job_shards)
+SCHEDULER_SHARD_WORKERS = int(os.getenv('SCHEDULER_SHARD_WORKERS', '4'))  # organizations processed at once, 0 = one at a time
+SCHEDULER_SHARD_LEASE_TIMEOUT = int(os.getenv('SCHEDULER_SHARD_LEASE_TIMEOUT', '1800'))  # seconds before a crashed worker's organization is retried
+SCHEDULED_INVOICE_MAX_CATCH_UP = int(os.getenv('SCHEDULED_INVOICE_MAX_CATCH_UP', '12'))  # missed periods generated per schedule and run
+
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'chinmaytechsoft@gmail.com')
 SUPPORT_EMAIL = os.getenv('SUPPORT_EMAIL', 'chinmaytechsoft@gmail.com')
 
@@ -398,13 +439,27 @@ AUDIT_LOG_IP_HEADER = os.getenv('AUDIT_LOG_IP_HEADER', 'REMOTE_ADDR')
 cache_backend = os.getenv('CACHE_BACKEND', 'locmem')
 
 if cache_backend == 'redis':
+    redis_url = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1')
+    redis_server = redis_url.rsplit('/', 1)[0] if redis_url.count('/') > 2 else redis_url
     CACHES = {
         'default': {
             'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-            'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+            'LOCATION': redis_url,
             'KEY_PREFIX': 'nexinvo',
             'TIMEOUT': 300,  # 5 minutes default timeout
-        }
+        },
+        # Generated invoice PDFs, in their own database (3; Celery uses 2) and
+        # always stored with PDF_CACHE_TIMEOUT. Eviction policy is per Redis
+        # instance, not per database: a shared instance must use
+        # maxmemory-policy volatile-lru, never allkeys-lru, or PDFs evict
+        # sessions and the organization cache version keys (no expiry).
+        # For an allkeys-lru PDF cache, point PDF_CACHE_REDIS_URL at a
+        # separate Redis instance.
+        'pdf': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('PDF_CACHE_REDIS_URL', f'{redis_server}/3'),
+            'KEY_PREFIX': 'nexinvo_pdf',
+        },
     }
     # Use Redis for session storage in production
     SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
@@ -415,9 +470,23 @@ else:
         'default': {
             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
             'LOCATION': 'unique-snowflake',
-        }
+        },
+        # Generated invoice PDFs, evicted least recently used first
+        'pdf': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'nexinvo-pdf',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('PDF_CACHE_MAX_ENTRIES', '500'))},
+        },
     }
 
+# Content-addressed invoice PDF cache (api.pdf_cache)
+PDF_CACHE_ALIAS = 'pdf'
+PDF_CACHE_TIMEOUT = int(os.getenv('PDF_CACHE_TIMEOUT', str(30 * 24 * 60 * 60)))  # 30 days
+
+# Process pool for bulk invoice PDF rendering (api.pdf_batch)
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', str(os.cpu_count() or 1)))  # 0 = render in the calling process
+PDF_RENDER_START_METHOD = os.getenv('PDF_RENDER_START_METHOD', 'spawn')  # spawn is safe in threaded servers
+
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/2'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/2'